@@ -0,0 +1 @@
+"""Benchmarks and synthetic corpus for installer-intel (not shipped in the wheel)."""
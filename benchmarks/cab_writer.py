@@ -0,0 +1,56 @@
+"""
+Writer for synthetic cabinet (CAB) files, stored or MSZIP-compressed, used
+by scripts/check_nested.py.
+"""
+from __future__ import annotations
+
+import struct
+import zlib
+from typing import List, Tuple
+
+BLOCK = 32 * 1024
+NONE = 0
+MSZIP = 1
+LZX = 3
+
+
+def _blocks(data: bytes, compression: int) -> List[Tuple[bytes, int]]:
+    """(packed block, unpacked size) for each 32 KB of data."""
+    out = []
+    for i in range(0, max(len(data), 1), BLOCK):
+        block = data[i:i + BLOCK]
+        if compression == MSZIP:
+            # Each block is its own deflate stream, primed with the previous 32 KB.
+            history = data[max(0, i - BLOCK):i]
+            c = zlib.compressobj(9, zlib.DEFLATED, -15, zdict=history) if history else \
+                zlib.compressobj(9, zlib.DEFLATED, -15)
+            out.append((b"CK" + c.compress(block) + c.flush(), len(block)))
+        else:
+            out.append((block, len(block)))
+    return out
+
+
+def build_cab(files: List[Tuple[str, bytes]], compression: int = MSZIP) -> bytes:
+    """
+    One folder holding files in order. LZX is only recorded in the folder
+    header (its data is written stored), which is enough to test that it is
+    listed but not decoded.
+    """
+    folder = b"".join(data for _, data in files)
+    blocks = _blocks(folder, MSZIP if compression == MSZIP else NONE)
+    entries = b""
+    offset = 0
+    for name, data in files:
+        entries += struct.pack("<IIHHHH", len(data), offset, 0, 0, 0, 0x20) + name.encode("ascii") + b"\0"
+        offset += len(data)
+
+    header_size = 36
+    folder_size = 8
+    files_at = header_size + folder_size
+    data_at = files_at + len(entries)
+    body = b"".join(struct.pack("<IHH", 0, len(packed), size) + packed for packed, size in blocks)
+    total = data_at + len(body)
+    header = struct.pack(
+        "<4sIIIIIBBHHHHH", b"MSCF", 0, total, 0, files_at, 0, 3, 1, 1, len(files), 0, 0x1234, 0,
+    )
+    return header + struct.pack("<IHH", data_at, len(blocks), compression) + entries + body
@@ -0,0 +1,199 @@
+"""
+Deterministic synthetic installer corpus.
+
+EXEs are PE-shaped (MZ stub, PE header, section table) followed by a body
+that mixes high-entropy padding (like compressed payloads) with runs of
+printable text, and installer markers written at chosen offsets inside
+low-entropy script regions (installers keep their scripts and headers
+uncompressed; compressed blocks are not string-scanned). The same
+spec always produces the same bytes, so files are generated once per work
+directory and reused. Files are written in chunks, so multi-GB inputs do
+not need multi-GB of memory.
+"""
+from __future__ import annotations
+
+import json
+import os
+import random
+import struct
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from benchmarks.msi_writer import build_msi, suite_tables
+
+# Strings that identify each installer family (see signatures.json).
+MARKERS: Dict[str, Sequence[bytes]] = {
+    "inno": (b"Inno Setup Setup Data (6.2.0)", b"unins000.exe"),
+    "nsis": (b"Nullsoft Install System v3.08", b"NSIS Error"),
+    "installshield": (b"InstallShield Setup Launcher", b"ISSetup.dll setup.inx"),
+    "burn": (b"WixBundleManufacturer", b"burn.engine", b"Bootstrapper Application"),
+    "squirrel": (b"Squirrel.Windows", b"Update.exe --processStart"),
+    "unknown": (),
+}
+
+_CHUNK = 4 * 1024 * 1024
+_TEXT = (
+    b"This program cannot be run in DOS mode. ",
+    b"KERNEL32.dll GetProcAddress LoadLibraryW ",
+    b"Copyright (C) Example Corporation. All rights reserved. ",
+    b"<assemblyIdentity version=\"1.0.0.0\" name=\"Example.App\"/> ",
+)
+
+
+@dataclass
+class CaseSpec:
+    name: str
+    kind: str  # "exe" | "msi"
+    size: int = 0  # EXE size in bytes
+    family: str = "unknown"  # key of MARKERS for EXEs
+    marker_offsets: Tuple[float, ...] = (0.5,)  # fractions of the file size
+    text_ratio: float = 0.05  # share of the body that is printable text
+    script_size: int = 128 * 1024  # low-entropy bytes around each marker
+    msi_files: int = 0  # rows in the MSI File table
+    seed: int = 0
+    extra: Dict[str, str] = field(default_factory=dict)
+
+    def filename(self) -> str:
+        return f"{self.name}.{self.kind}"
+
+
+def _pe_header(seed: int) -> bytes:
+    """Minimal MZ + PE32 header with a two-section table (0x400 bytes)."""
+    mz = bytearray(0x80)
+    mz[0:2] = b"MZ"
+    struct.pack_into("<I", mz, 0x3C, 0x80)
+    mz[0x40:0x40 + 39] = b"This program cannot be run in DOS mode."
+    coff = struct.pack("<4sHHIIIHH", b"PE\0\0", 0x14C, 2, 0x5F000000 + seed, 0, 0, 0xE0, 0x0102)
+    optional = bytearray(0xE0)
+    struct.pack_into("<H", optional, 0, 0x10B)
+    sections = b"".join(
+        struct.pack("<8sIIIIIIHHI", name, 0x1000, va, 0x1000, raw, 0, 0, 0, 0, flags)
+        for name, va, raw, flags in (
+            (b".text", 0x1000, 0x400, 0x60000020),
+            (b".rsrc", 0x2000, 0x1400, 0x40000040),
+        )
+    )
+    header = bytes(mz) + coff + bytes(optional) + sections
+    return header + b"\0" * (0x400 - len(header))
+
+
+def _body_chunk(rng: random.Random, size: int, text_ratio: float) -> bytes:
+    out = bytearray(rng.randbytes(size))
+    # Sprinkle printable text (and some UTF-16LE) so string extraction has
+    # realistic work to do.
+    budget = int(size * text_ratio)
+    while budget > 0:
+        text = rng.choice(_TEXT)
+        if rng.random() < 0.3:
+            text = text.decode("ascii").encode("utf-16-le")
+        pos = rng.randrange(0, max(1, size - len(text)))
+        out[pos:pos + len(text)] = text
+        budget -= len(text)
+    return bytes(out)
+
+
+def _script(size: int) -> bytes:
+    line = _TEXT[1] + _TEXT[2] + b"\r\n"
+    return (line * (size // len(line) + 1))[:size]
+
+
+def write_exe(path: str, spec: CaseSpec) -> None:
+    rng = random.Random(spec.seed)
+    markers = MARKERS[spec.family]
+    scripts: List[Tuple[int, bytes]] = []
+    placed: List[Tuple[int, bytes]] = []
+    for i, frac in enumerate(spec.marker_offsets):
+        for j, m in enumerate(markers):
+            off = max(0x400, min(spec.size - len(m) - 1, int(spec.size * frac) + j * 4096))
+            placed.append((off, b"\0" + m + b"\0"))
+            lo = max(0x400, off - spec.script_size // 2)
+            scripts.append((lo, _script(min(spec.script_size, spec.size - lo))))
+    # Markers are written after (over) the script regions.
+    placed = sorted(scripts) + sorted(placed)
+
+    with open(path, "wb") as f:
+        header = _pe_header(spec.seed)
+        f.write(header)
+        pos = len(header)
+        while pos < spec.size:
+            n = min(_CHUNK, spec.size - pos)
+            chunk = bytearray(_body_chunk(rng, n, spec.text_ratio))
+            for off, m in placed:
+                if off + len(m) > pos and off < pos + n:
+                    lo = max(off, pos)
+                    hi = min(off + len(m), pos + n)
+                    chunk[lo - pos:hi - pos] = m[lo - off:hi - off]
+            f.write(chunk)
+            pos += n
+
+
+def write_msi(path: str, spec: CaseSpec) -> None:
+    props = {
+        "ProductName": "Benchmark Widget",
+        "ProductCode": "{11111111-2222-3333-4444-%012d}" % spec.seed,
+        "UpgradeCode": "{AAAAAAAA-BBBB-CCCC-DDDD-EEEEEEEEEEEE}",
+        "ProductVersion": "1.2.3",
+        "Manufacturer": "Contoso Ltd",
+        "ALLUSERS": "1",
+        **spec.extra,
+    }
+    tables = suite_tables(props["UpgradeCode"], spec.msi_files) if spec.msi_files else None
+    with open(path, "wb") as f:
+        f.write(build_msi(props, long_refs=spec.msi_files > 30000, tables=tables))
+
+
+def materialize(spec: CaseSpec, work_dir: str) -> str:
+    """
+    Path of the file for spec inside work_dir, generating it unless an
+    identical spec was already generated there.
+    """
+    os.makedirs(work_dir, exist_ok=True)
+    path = os.path.join(work_dir, spec.filename())
+    stamp = path + ".spec.json"
+    want = json.dumps(asdict(spec), sort_keys=True)
+    if os.path.exists(path) and os.path.exists(stamp):
+        with open(stamp, encoding="utf-8") as f:
+            if f.read() == want:
+                return path
+    if spec.kind == "exe":
+        write_exe(path, spec)
+    else:
+        write_msi(path, spec)
+    with open(stamp, "w", encoding="utf-8") as f:
+        f.write(want)
+    return path
+
+
+_UNITS = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+
+
+def parse_size(value: str) -> int:
+    v = value.strip().upper().rstrip("B")
+    if v[-1:] in _UNITS:
+        return int(float(v[:-1]) * _UNITS[v[-1]])
+    return int(v)
+
+
+def default_corpus(sizes: Sequence[int], families: Optional[Sequence[str]] = None) -> List[CaseSpec]:
+    """
+    One EXE per family and size (marker in the middle, which defeats early
+    exit for non-decisive signatures), a marker-less EXE per size (full scan),
+    and small/large synthetic MSIs.
+    """
+    families = list(families or [f for f in MARKERS if f != "unknown"])
+    specs: List[CaseSpec] = []
+    for size in sizes:
+        label = _label(size)
+        for k, family in enumerate(families):
+            specs.append(CaseSpec(f"{family}-{label}", "exe", size=size, family=family, seed=k + 1))
+        specs.append(CaseSpec(f"unknown-{label}", "exe", size=size, family="unknown", seed=99))
+    specs.append(CaseSpec("msi-small", "msi", seed=1))
+    specs.append(CaseSpec("msi-suite", "msi", msi_files=100_000, seed=2))
+    return specs
+
+
+def _label(size: int) -> str:
+    for unit in ("G", "M", "K"):
+        if size % _UNITS[unit] == 0:
+            return f"{size // _UNITS[unit]}{unit}"
+    return str(size)
@@ -0,0 +1,200 @@
+"""
+Writers for synthetic Inno Setup and NSIS installers: PE images with the
+loader offset table, setup header block, NSIS first header and install
+header laid out as the engines write them, used by scripts/check_engines.py.
+"""
+from __future__ import annotations
+
+import bz2
+import lzma
+import struct
+import zlib
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from benchmarks.pe_writer import HEADERS_SIZE, RT_MANIFEST, RT_RCDATA, TEXT_FLAGS, build_pe
+
+UNINSTALL_KEY = "Software\\Microsoft\\Windows\\CurrentVersion\\Uninstall\\"
+
+INNO_LOADER = b"rDlPtS\xcd\xe6\xd7\x7b\x0b\x2a"  # 5.1.5 and later, in RCDATA 11111
+INNO_LOADER_4 = b"rDlPtS07\x87\x65\xba\xcd"  # 4.1.6 to 5.1.4, found through the magic at 0x30
+# Leading setup header strings, in order, for 5.5.6+ and for 5.1.0 to 5.1.12.
+# The names ending in "Text" are ANSI in Unicode builds too.
+INNO_FIELDS = (
+    "AppName", "AppVerName", "AppId", "AppCopyright", "AppPublisher", "AppPublisherURL", "AppSupportPhone",
+    "AppSupportURL", "AppUpdatesURL", "AppVersion", "DefaultDirName", "DefaultGroupName", "BaseFilename",
+    "UninstallFilesDir", "UninstallDisplayName", "UninstallDisplayIcon", "AppMutex", "DefaultUserInfoName",
+    "DefaultUserInfoOrg", "DefaultUserInfoSerial", "AppReadmeFile", "AppContact", "AppComments", "AppModifyPath",
+    "CreateUninstallRegKey", "Uninstallable", "CloseApplicationsFilter", "SetupMutex",
+)
+INNO_FIELDS_5_1 = (
+    "AppName", "AppVerName", "AppId", "AppCopyright", "AppPublisher", "AppPublisherURL", "AppSupportURL",
+    "AppUpdatesURL", "AppVersion", "DefaultDirName", "DefaultGroupName", "BaseFilename", "LicenseText",
+    "InfoBeforeText", "InfoAfterText", "UninstallFilesDir", "UninstallDisplayName", "UninstallDisplayIcon",
+    "AppMutex", "DefaultUserInfoName", "DefaultUserInfoOrg", "DefaultUserInfoSerial", "CompiledCodeText",
+    "AppReadmeFile", "AppContact", "AppComments", "AppModifyPath",
+)
+
+HKLM = 0x80000002
+HKCU = 0x80000001
+SHCTX = 0
+_NSIS_WRITEREG = 51
+_NSIS_VARS = {"$INSTDIR": 21, "$OUTDIR": 22, "$EXEDIR": 23}
+
+_STUB = b"\0".join([b"This program must be run under Win32", b"KERNEL32.dll", b"GetProcAddress"]) * 64
+
+
+def _lzma_raw(data: bytes, dict_size: int = 1 << 16) -> bytes:
+    """Properties (5 bytes) and a raw LZMA1 stream, as Inno Setup and NSIS store them."""
+    lc, lp, pb = 3, 0, 2
+    props = struct.pack("<BI", (pb * 5 + lp) * 9 + lc, dict_size)
+    filters = [{"id": lzma.FILTER_LZMA1, "dict_size": dict_size, "lc": lc, "lp": lp, "pb": pb}]
+    return props + lzma.compress(data, format=lzma.FORMAT_RAW, filters=filters)
+
+
+def _deflate_raw(data: bytes) -> bytes:
+    c = zlib.compressobj(9, zlib.DEFLATED, -15)
+    return c.compress(data) + c.flush()
+
+
+# ----- Inno Setup ------------------------------------------------------------
+
+
+def _inno_block(data: bytes, compression: str) -> bytes:
+    """A setup-0 block (4.0.9+): CRC, stored size, compressed flag, then 4 KB chunks with a CRC each."""
+    if compression == "lzma":
+        stored = _lzma_raw(data)
+    elif compression == "zlib":
+        stored = zlib.compress(data, 9)
+    else:
+        stored = data
+    chunks = b"".join(
+        struct.pack("<I", zlib.crc32(stored[i:i + 4096])) + stored[i:i + 4096] for i in range(0, len(stored), 4096)
+    )
+    head = struct.pack("<IB", len(chunks), compression != "stored")
+    return struct.pack("<I", zlib.crc32(head)) + head + chunks
+
+
+def build_inno(
+    fields: Dict[str, str],
+    version: str = "6.2.0",
+    unicode: bool = True,
+    compression: str = "lzma",
+    old_loader: bool = False,
+    payload: bytes = b"zlb\x1a" + bytes(4096),
+    external_data: bool = False,
+) -> bytes:
+    """
+    An Inno Setup installer. The loader offset table is RCDATA 11111, or
+    with old_loader the 4.1.6 table in the overlay behind the 0x30 magic
+    (give a 5.1.x version and INNO_FIELDS_5_1 fields then).
+    """
+    names = INNO_FIELDS_5_1 if old_loader else INNO_FIELDS
+    ident = f"Inno Setup Setup Data ({version})" + (" (u)" if unicode else "")
+    strings = b""
+    for name in names:
+        value = fields.get(name, "")
+        raw = value.encode("cp1252") if not unicode or name.endswith("Text") else value.encode("utf-16-le")
+        strings += struct.pack("<I", len(raw)) + raw
+    setup0 = ident.encode("ascii").ljust(64, b"\0") + _inno_block(strings + bytes(512), compression)
+    sections = [(".text", _STUB, TEXT_FLAGS)]
+
+    def table(at0: int, at1: int) -> bytes:
+        if old_loader:
+            body = INNO_LOADER_4 + struct.pack("<6I", 0, HEADERS_SIZE, 0x1000, 0, at0, at1)
+        else:
+            body = INNO_LOADER + struct.pack("<7I", 1, 0, HEADERS_SIZE, 0x1000, 0, at0, at1)
+        return body + struct.pack("<I", zlib.crc32(body))
+
+    if old_loader:
+        image = len(build_pe(sections))
+        overlay_table = table(image + 64, image + 64 + len(setup0))
+        data = build_pe(sections, overlay=overlay_table.ljust(64, b"\0") + setup0 + payload)
+        magic = b"Inno" + struct.pack("<II", image, ~image & 0xFFFFFFFF)
+        return data[:0x30] + magic + data[0x3C:]
+    placeholder = {(RT_RCDATA, 11111, 0): table(0, 0)}
+    image = len(build_pe(sections, placeholder))
+    resources = {(RT_RCDATA, 11111, 0): table(image, 0 if external_data else image + len(setup0))}
+    return build_pe(sections, resources, setup0 + (b"" if external_data else payload))
+
+
+# ----- NSIS ------------------------------------------------------------------
+
+
+def _nsis_strings(values: Sequence[str], unicode: bool) -> Tuple[bytes, List[int]]:
+    """A string table (empty string first) and each value's index in characters."""
+    table = bytearray(b"\0\0" if unicode else b"\0")
+    indexes = []
+    for value in values:
+        indexes.append(len(table) // (2 if unicode else 1))
+        pos = 0
+        while pos < len(value):
+            var = next((v for v in _NSIS_VARS if value.startswith(v, pos)), None)
+            if var is not None:
+                n = _NSIS_VARS[var]
+                table += struct.pack("<HH", 3, n | 0x8000) if unicode else bytes((3, n & 0x7F | 0x80, n >> 7 | 0x80))
+                pos += len(var)
+            else:
+                table += value[pos].encode("utf-16-le" if unicode else "cp1252")
+                pos += 1
+        table += b"\0\0" if unicode else b"\0"
+    return bytes(table), indexes
+
+
+def nsis_header(writes: Sequence[Tuple[int, str, str, str]], unicode: bool = True) -> bytes:
+    """An install header whose entries are registry writes of (root, key, value name, string value)."""
+    values = [s for _, key, name, value in writes for s in (key, name, value)]
+    strings, indexes = _nsis_strings(["$INSTDIR", *values], unicode)
+    entries = struct.pack("<7I", 11, indexes[0], 1, 0, 0, 0, 0)  # SetOutPath $INSTDIR
+    for i, (root, _, _, _) in enumerate(writes):
+        k, n, v = indexes[1 + 3 * i:4 + 3 * i]
+        entries += struct.pack("<7I", _NSIS_WRITEREG, root, k, n, v, 1, 1)
+    fixed = 300
+    entries_at = fixed
+    strings_at = entries_at + len(entries)
+    end = strings_at + len(strings)
+    blocks = [(fixed, 0), (fixed, 0), (entries_at, len(entries) // 28), (strings_at, 0)] + [(end, 0)] * 4
+    head = bytearray(fixed)
+    struct.pack_into("<I", head, 0, 0)
+    for i, (offset, num) in enumerate(blocks):
+        struct.pack_into("<II", head, 4 + 8 * i, offset, num)
+    return bytes(head) + entries + strings
+
+
+def build_nsis(
+    header: bytes,
+    compression: str = "lzma",
+    solid: bool = True,
+    flags: int = 0,
+    version: Optional[str] = "3.08",
+    pad: int = 0,
+    filter_flag: bool = False,
+    payload: bytes = bytes(8192),
+) -> bytes:
+    """
+    An NSIS installer: the exehead, then (pad bytes on, a multiple of 512)
+    the first header and the install header compressed with compression
+    ("lzma", "zlib", "bzip2" or "stored"), solid or as blocks.
+    """
+    def pack(data: bytes) -> bytes:
+        if compression == "lzma":
+            return (b"\0" if filter_flag else b"") + _lzma_raw(data)
+        if compression == "zlib":
+            return _deflate_raw(data)
+        return b"1\x09" + bz2.compress(data)[10:]  # bzip2 without its stream header, as NSIS writes it
+
+    if compression == "stored":
+        body = struct.pack("<I", len(header)) + header + payload
+    elif solid:
+        body = pack(struct.pack("<I", len(header)) + header + payload)
+    else:
+        block = pack(header)
+        body = struct.pack("<I", len(block) | 0x80000000) + block + struct.pack("<I", len(payload)) + payload
+    first = struct.pack("<II12sII", flags, 0xDEADBEEF, b"NullsoftInst", len(header), 28 + len(body) + 4)
+    resources = {}
+    if version:
+        resources[(RT_MANIFEST, 1, 1033)] = (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?><assembly xmlns="urn:schemas-microsoft-com:'
+            f'asm.v1" manifestVersion="1.0"><description>Nullsoft Install System v{version}</description>'
+            "</assembly>"
+        ).encode()
+    return build_pe([(".text", _STUB, TEXT_FLAGS)], resources, bytes(pad) + first + body + bytes(4))
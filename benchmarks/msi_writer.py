@@ -0,0 +1,257 @@
+"""
+Writer for synthetic MSI databases (compound file + string pool + tables),
+used by the benchmarks and by scripts/check_msi.py.
+"""
+from __future__ import annotations
+
+import struct
+from typing import Dict, List, Optional, Tuple
+
+SECTOR = 512
+MINI_SECTOR = 64
+MINI_CUTOFF = 4096
+ENDOFCHAIN = 0xFFFFFFFE
+FREESECT = 0xFFFFFFFF
+FATSECT = 0xFFFFFFFD
+NOSTREAM = 0xFFFFFFFF
+
+_MIME = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz._"
+
+
+def encode_stream_name(name: str) -> str:
+    """MSI stream-name compression (the inverse of msidb.decode_stream_name)."""
+    out: List[str] = []
+    if name.startswith("!"):
+        out.append(chr(0x4840))
+        name = name[1:]
+    i = 0
+    while i < len(name):
+        a = _MIME.find(name[i])
+        if a < 0:
+            out.append(name[i])
+            i += 1
+            continue
+        b = _MIME.find(name[i + 1]) if i + 1 < len(name) else -1
+        if b >= 0:
+            out.append(chr(0x3800 + a + (b << 6)))
+            i += 2
+        else:
+            out.append(chr(0x4800 + a))
+            i += 1
+    return "".join(out)
+
+
+def build_cfb(streams: Dict[str, bytes]) -> bytes:
+    """Write a version 3 compound file holding the given root-level streams."""
+    fat: List[int] = []
+    sectors: List[bytes] = []
+
+    def alloc(data: bytes) -> int:
+        if not data:
+            return ENDOFCHAIN
+        count = -(-len(data) // SECTOR)
+        start = len(fat)
+        fat.extend(start + k + 1 for k in range(count - 1))
+        fat.append(ENDOFCHAIN)
+        sectors.append(data + b"\0" * (count * SECTOR - len(data)))
+        return start
+
+    mini = bytearray()
+    minifat: List[int] = []
+    starts: Dict[str, int] = {}
+    for name, data in streams.items():
+        if len(data) >= MINI_CUTOFF or not data:
+            continue
+        count = -(-len(data) // MINI_SECTOR)
+        first = len(mini) // MINI_SECTOR
+        minifat.extend(first + k + 1 for k in range(count - 1))
+        minifat.append(ENDOFCHAIN)
+        mini += data + b"\0" * (count * MINI_SECTOR - len(data))
+        starts[name] = first
+    for name, data in streams.items():
+        if len(data) >= MINI_CUTOFF:
+            starts[name] = alloc(data)
+        elif not data:
+            starts[name] = ENDOFCHAIN
+
+    ministream_start = alloc(bytes(mini))
+    minifat_raw = struct.pack(f"<{len(minifat)}I", *minifat)
+    minifat_start = alloc(minifat_raw)
+
+    def entry(name: str, etype: int, right: int, child: int, start: int, size: int) -> bytes:
+        raw_name = name.encode("utf-16-le")
+        return (
+            raw_name.ljust(64, b"\0")
+            + struct.pack("<HBB", len(raw_name) + 2, etype, 1)
+            + struct.pack("<III", NOSTREAM, right, child)
+            + b"\0" * 36
+            + struct.pack("<IQ", start, size)
+        )
+
+    names = list(streams)
+    dir_raw = entry("Root Entry", 5, NOSTREAM, 1 if names else NOSTREAM, ministream_start, len(mini))
+    for i, name in enumerate(names, start=1):
+        right = i + 1 if i < len(names) else NOSTREAM
+        dir_raw += entry(name, 2, right, NOSTREAM, starts[name], len(streams[name]))
+    dir_start = alloc(dir_raw)
+
+    num_fat = 1
+    while (len(fat) + num_fat) * 4 > num_fat * SECTOR:
+        num_fat += 1
+    if num_fat > 109:
+        raise ValueError("synthetic compound file too large for a header-only DIFAT")
+    fat_start = len(fat)
+    fat.extend([FATSECT] * num_fat)
+    fat.extend([FREESECT] * (num_fat * SECTOR // 4 - len(fat)))
+    sectors.append(struct.pack(f"<{len(fat)}I", *fat))
+
+    difat = list(range(fat_start, fat_start + num_fat)) + [FREESECT] * (109 - num_fat)
+    header = (
+        b"\xD0\xCF\x11\xE0\xA1\xB1\x1A\xE1"
+        + b"\0" * 16
+        + struct.pack("<HHHHH", 0x3E, 3, 0xFFFE, 9, 6)
+        + b"\0" * 6
+        + struct.pack(
+            "<IIIIIIIII",
+            0, num_fat, dir_start, 0, MINI_CUTOFF,
+            minifat_start, -(-len(minifat_raw) // SECTOR), ENDOFCHAIN, 0,
+        )
+        + struct.pack("<109I", *difat)
+    )
+    return header + b"".join(sectors)
+
+
+# _Columns.Type values (msilib conventions)
+STRING_KEY = 0x2D48  # s72, primary key
+STRING = 0x1DFF  # nullable string
+SHORT = 0x1502  # nullable i2
+LONG = 0x1104  # nullable i4
+
+# {table: ([(column, type), ...], [row, ...])}
+Tables = Dict[str, Tuple[List[Tuple[str, int]], List[tuple]]]
+
+
+def build_msi(
+    properties: Dict[str, str],
+    long_refs: bool = False,
+    codepage: int = 1252,
+    tables: Optional[Tables] = None,
+    extra_streams: Optional[Dict[str, bytes]] = None,
+) -> bytes:
+    """
+    A minimal MSI: string pool, _Tables/_Columns, Property and any extra
+    tables, plus extra_streams (e.g. an embedded "Data.cab") stored ahead of them.
+    """
+    codec = "utf-8" if codepage == 65001 else f"cp{codepage}"
+    pool: List[str] = []
+    index: Dict[str, int] = {}
+
+    def intern(s: Optional[str]) -> int:
+        if s is None:
+            return 0
+        if s not in index:
+            pool.append(s)
+            index[s] = len(pool)
+        return index[s]
+
+    ref_size = 3 if long_refs else 2
+
+    def column(values: List[int], size: int) -> bytes:
+        if size == 3:
+            return b"".join(struct.pack("<I", v)[:3] for v in values)
+        return struct.pack(f"<{len(values)}{'I' if size == 4 else 'H'}", *values)
+
+    def stored(value, ctype: int) -> Tuple[int, int]:
+        if ctype & 0x0C00 == 0x0C00:
+            return intern(value), ref_size
+        size = 4 if ctype & 0xFF == 4 else 2
+        if value is None:
+            return 0, size
+        return value + (0x80000000 if size == 4 else 0x8000), size
+
+    all_tables: Tables = {"Property": ([("Property", STRING_KEY), ("Value", STRING)], list(properties.items()))}
+    all_tables.update(tables or {})
+
+    streams: Dict[str, bytes] = {}
+    meta_rows = []
+    for name, (columns, rows) in all_tables.items():
+        meta_rows.append(name)
+        raw = b""
+        for i, (_, ctype) in enumerate(columns):
+            values = [stored(row[i], ctype) for row in rows]
+            size = values[0][1] if values else stored(None, ctype)[1]
+            raw += column([v for v, _ in values], size)
+        streams["!" + name] = raw
+
+    streams["!_Tables"] = column([intern(n) for n in meta_rows], ref_size)
+    col_rows = [
+        (name, number, cname, ctype)
+        for name, (columns, _) in all_tables.items()
+        for number, (cname, ctype) in enumerate(columns, start=1)
+    ]
+    streams["!_Columns"] = (
+        column([intern(r[0]) for r in col_rows], ref_size)
+        + column([r[1] + 0x8000 for r in col_rows], 2)
+        + column([intern(r[2]) for r in col_rows], ref_size)
+        + column([r[3] + 0x8000 for r in col_rows], 2)
+    )
+
+    encoded = [s.encode(codec) for s in pool]
+    pool_raw = struct.pack("<HH", codepage & 0xFFFF, (codepage >> 16) | (0x8000 if long_refs else 0))
+    pool_raw += b"".join(struct.pack("<HH", len(e), 1) for e in encoded)
+    streams["!_StringPool"] = pool_raw
+    streams["!_StringData"] = b"".join(encoded)
+    return build_cfb({
+        **{encode_stream_name(k): v for k, v in (extra_streams or {}).items()},
+        **{encode_stream_name(k): v for k, v in streams.items()},
+    })
+
+
+def suite_tables(upgrade_code: str, filler: int) -> Tables:
+    files = [
+        ("widget_exe", "WidgetComp", "widget.exe", 900_000, "1.2.3.0"),
+        ("helper_exe", "HelperComp", "helper~1.exe|helper.exe", 300_000, None),
+        ("readme", "DocsComp", "readme.txt", 5_000_000, None),
+    ]
+    files += [(f"f{i}", "DocsComp", f"file{i}.dat", i, None) for i in range(filler)]
+    return {
+        "Directory": (
+            [("Directory", STRING_KEY), ("Directory_Parent", STRING), ("DefaultDir", STRING)],
+            [
+                ("TARGETDIR", None, "SourceDir"),
+                ("ProgramFilesFolder", "TARGETDIR", "."),
+                ("ContosoDir", "ProgramFilesFolder", "Contoso"),
+                ("INSTALLDIR", "ContosoDir", "Widget:WidgetSrc"),
+                ("BinDir", "INSTALLDIR", "bin"),
+            ],
+        ),
+        "Component": (
+            [("Component", STRING_KEY), ("ComponentId", STRING), ("Directory_", STRING),
+             ("Attributes", SHORT), ("Condition", STRING), ("KeyPath", STRING)],
+            [
+                ("WidgetComp", "{C0000000-0000-0000-0000-000000000001}", "INSTALLDIR", 0, None, "widget_exe"),
+                ("HelperComp", "{C0000000-0000-0000-0000-000000000002}", "BinDir", 0, None, "helper_exe"),
+                ("DocsComp", "{C0000000-0000-0000-0000-000000000003}", "INSTALLDIR", 0, None, "readme"),
+                ("RegComp", "{C0000000-0000-0000-0000-000000000004}", "INSTALLDIR", 4, None, "reg_version"),
+            ],
+        ),
+        "File": (
+            [("File", STRING_KEY), ("Component_", STRING), ("FileName", STRING), ("FileSize", LONG),
+             ("Version", STRING), ("Language", STRING), ("Attributes", SHORT), ("Sequence", SHORT)],
+            [row + (None, 0, (i % 30000) + 1) for i, row in enumerate(files)],
+        ),
+        "Registry": (
+            [("Registry", STRING_KEY), ("Root", SHORT), ("Key", STRING), ("Name", STRING),
+             ("Value", STRING), ("Component_", STRING)],
+            [
+                ("reg_version", -1, "Software\\[Manufacturer]\\Widget [ProductVersion]", "Version",
+                 "[ProductVersion]", "RegComp"),
+                ("reg_other", 2, "Software\\Other", None, "x", "DocsComp"),
+            ],
+        ),
+        "Upgrade": (
+            [("UpgradeCode", STRING_KEY), ("VersionMin", STRING), ("VersionMax", STRING),
+             ("Language", STRING), ("Attributes", LONG), ("Remove", STRING), ("ActionProperty", STRING)],
+            [(upgrade_code, None, "1.2.3", None, 256, None, "WIX_UPGRADE_DETECTED")],
+        ),
+    }
@@ -0,0 +1,167 @@
+"""
+Writer for synthetic PE images (headers, sections, resource directory,
+certificate table and overlay), used by scripts/check_pe.py.
+"""
+from __future__ import annotations
+
+import struct
+from typing import Dict, List, Optional, Tuple
+
+FILE_ALIGN = 0x200
+SECTION_ALIGN = 0x1000
+HEADERS_SIZE = 0x400
+
+RT_RCDATA = 10
+RT_VERSION = 16
+RT_MANIFEST = 24
+
+TEXT_FLAGS = 0x60000020
+DATA_FLAGS = 0xC0000040
+RSRC_FLAGS = 0x40000040
+
+# {(type id, name id, language): data}
+Resources = Dict[Tuple[int, int, int], bytes]
+
+
+def _align(n: int, a: int) -> int:
+    return (n + a - 1) // a * a
+
+
+def _vs_node(key: str, value: bytes, value_len: int, value_type: int, children: bytes = b"") -> bytes:
+    out = bytearray(6) + key.encode("utf-16le") + b"\0\0"
+    out += b"\0" * (_align(len(out), 4) - len(out))
+    out += value
+    if children:
+        out += b"\0" * (_align(len(out), 4) - len(out))
+        out += children
+    struct.pack_into("<HHH", out, 0, len(out), value_len, value_type)
+    return bytes(out)
+
+
+def _padded(node: bytes) -> bytes:
+    return node + b"\0" * (_align(len(node), 4) - len(node))
+
+
+def version_info(strings: Dict[str, str], file_version: Tuple[int, int, int, int] = (1, 0, 0, 0)) -> bytes:
+    """A VS_VERSIONINFO resource with one en-US string table."""
+    table = b"".join(
+        _padded(_vs_node(k, v.encode("utf-16le") + b"\0\0", len(v) + 1, 1)) for k, v in strings.items()
+    )
+    string_file_info = _vs_node("StringFileInfo", b"", 0, 1, _padded(_vs_node("040904b0", b"", 0, 1, table)))
+    ms = file_version[0] << 16 | file_version[1]
+    ls = file_version[2] << 16 | file_version[3]
+    fixed = struct.pack("<13I", 0xFEEF04BD, 0x10000, ms, ls, ms, ls, 0x3F, 0, 0x40004, 1, 0, 0, 0)
+    return _vs_node("VS_VERSION_INFO", fixed, len(fixed), 0, _padded(string_file_info))
+
+
+def manifest(level: str = "requireAdministrator") -> bytes:
+    return (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\r\n'
+        '<assembly xmlns="urn:schemas-microsoft-com:asm.v1" manifestVersion="1.0">'
+        '<trustInfo xmlns="urn:schemas-microsoft-com:asm.v3"><security><requestedPrivileges>'
+        f'<requestedExecutionLevel level="{level}" uiAccess="false"/>'
+        "</requestedPrivileges></security></trustInfo></assembly>"
+    ).encode("utf-8")
+
+
+def _build_rsrc(resources: Resources, va: int) -> bytes:
+    tree: Dict[int, Dict[int, Dict[int, bytes]]] = {}
+    for (rtype, name, lang), data in resources.items():
+        tree.setdefault(rtype, {}).setdefault(name, {})[lang] = data
+
+    def dir_size(n: int) -> int:
+        return 16 + 8 * n
+
+    pos = dir_size(len(tree))
+    type_dirs: Dict[int, int] = {}
+    name_dirs: Dict[Tuple[int, int], int] = {}
+    for t in sorted(tree):
+        type_dirs[t] = pos
+        pos += dir_size(len(tree[t]))
+    for t in sorted(tree):
+        for n in sorted(tree[t]):
+            name_dirs[(t, n)] = pos
+            pos += dir_size(len(tree[t][n]))
+    leaves = [(t, n, lang) for t in sorted(tree) for n in sorted(tree[t]) for lang in sorted(tree[t][n])]
+    entries = {leaf: pos + 16 * i for i, leaf in enumerate(leaves)}
+    pos += 16 * len(leaves)
+    data_at: Dict[Tuple[int, int, int], int] = {}
+    for leaf in leaves:
+        pos = _align(pos, 8)
+        data_at[leaf] = pos
+        pos += len(tree[leaf[0]][leaf[1]][leaf[2]])
+
+    buf = bytearray(pos)
+
+    def put_dir(at: int, children: List[Tuple[int, int]]) -> None:
+        struct.pack_into("<IIHHHH", buf, at, 0, 0, 4, 0, 0, len(children))
+        for i, (ident, target) in enumerate(children):
+            struct.pack_into("<II", buf, at + 16 + 8 * i, ident, target)
+
+    put_dir(0, [(t, type_dirs[t] | 0x80000000) for t in sorted(tree)])
+    for t in sorted(tree):
+        put_dir(type_dirs[t], [(n, name_dirs[(t, n)] | 0x80000000) for n in sorted(tree[t])])
+        for n in sorted(tree[t]):
+            put_dir(name_dirs[(t, n)], [(lang, entries[(t, n, lang)]) for lang in sorted(tree[t][n])])
+    for leaf, at in entries.items():
+        data = tree[leaf[0]][leaf[1]][leaf[2]]
+        struct.pack_into("<IIII", buf, at, va + data_at[leaf], len(data), 0, 0)
+        buf[data_at[leaf]:data_at[leaf] + len(data)] = data
+    return bytes(buf)
+
+
+def build_pe(
+    sections: List[Tuple[str, bytes, int]],
+    resources: Optional[Resources] = None,
+    overlay: bytes = b"",
+    certificate: bytes = b"",
+    pe32_plus: bool = False,
+) -> bytes:
+    """
+    A PE image with the given (name, data, characteristics) sections, a
+    .rsrc section holding resources, then the overlay and finally the
+    certificate table, the way signed installers are laid out.
+    """
+    sections = list(sections)
+    vas = [SECTION_ALIGN]
+    for _, data, _ in sections:
+        vas.append(vas[-1] + _align(max(len(data), 1), SECTION_ALIGN))
+    if resources:
+        sections.append((".rsrc", _build_rsrc(resources, vas[-1]), RSRC_FLAGS))
+        vas.append(vas[-1] + _align(len(sections[-1][1]), SECTION_ALIGN))
+
+    table = b""
+    body = b""
+    raw = HEADERS_SIZE
+    dirs = [(0, 0)] * 16
+    for (name, data, flags), va in zip(sections, vas):
+        raw_size = _align(len(data), FILE_ALIGN)
+        table += struct.pack("<8sIIIIIIHHI", name.encode("ascii"), len(data), va, raw_size, raw, 0, 0, 0, 0, flags)
+        body += data + b"\0" * (raw_size - len(data))
+        if name == ".rsrc":
+            dirs[2] = (va, len(data))
+        raw += raw_size
+    if certificate:
+        dirs[4] = (raw + len(overlay), len(certificate))
+
+    opt_size = 240 if pe32_plus else 224
+    optional = bytearray(opt_size)
+    struct.pack_into("<H", optional, 0, 0x20B if pe32_plus else 0x10B)
+    struct.pack_into("<I", optional, 32, SECTION_ALIGN)
+    struct.pack_into("<I", optional, 36, FILE_ALIGN)
+    struct.pack_into("<I", optional, 56, vas[-1])
+    struct.pack_into("<I", optional, 60, HEADERS_SIZE)
+    dirs_at = 112 if pe32_plus else 96
+    struct.pack_into("<I", optional, dirs_at - 4, 16)
+    for i, (a, n) in enumerate(dirs):
+        struct.pack_into("<II", optional, dirs_at + 8 * i, a, n)
+
+    mz = bytearray(0x80)
+    mz[0:2] = b"MZ"
+    struct.pack_into("<I", mz, 0x3C, 0x80)
+    mz[0x40:0x40 + 39] = b"This program cannot be run in DOS mode."
+    machine = 0x8664 if pe32_plus else 0x14C
+    coff = struct.pack("<4sHHIIIHH", b"PE\0\0", machine, len(sections), 0x5F000000, 0, 0, opt_size, 0x0102)
+    header = bytes(mz) + coff + bytes(optional) + table
+    assert len(header) <= HEADERS_SIZE, "too many sections for the header area"
+    return header + b"\0" * (HEADERS_SIZE - len(header)) + body + overlay + certificate
@@ -0,0 +1,318 @@
+"""
+Benchmark analyze_exe / analyze_msi on a synthetic corpus.
+
+Run from project root:
+    python -m benchmarks.run                       # default sizes 1M,16M,256M
+    python -m benchmarks.run --sizes 1M,64M,4G --out results.json
+    python -m benchmarks.run --baseline benchmarks/baseline.json --threshold 0.15
+
+Each case runs in a fresh interpreter so its peak RSS is its own. Stage
+timings are the best of --repeat runs. With --baseline, any stage that got
+slower (or a case whose peak RSS grew) by more than --threshold is reported
+and the exit code is 1.
+
+For EXEs, "hash+analyze" hashes the file (SHA-256) and then analyzes it,
+while "analyze+hash" takes the digest from the analysis reads; the "reads"
+column is the bytes each one reads per byte of the file. EXEs large enough
+to be scanned in parallel also get "deep/N" stages (a deep scan on N worker
+processes, N = 1, 2, 4, ... up to the CPU count), with the speedup over
+deep/1 printed after the table.
+
+Every case also times writing its plan as JSON: "json" is the records
+writer the CLI and scan workers use, "json/model" the same plan validated
+into the Pydantic InstallPlan and dumped by it (1000 plans per run, so
+the column is microseconds per plan). The two must be byte-identical.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import asdict
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional
+
+from benchmarks.corpus import CaseSpec, default_corpus, materialize, parse_size
+
+# Differences below these are noise, whatever the ratio.
+_MIN_SECONDS_DELTA = 0.02
+_MIN_RSS_DELTA = 8 * 1024 ** 2
+
+_EXPECTED = {
+    "inno": "Inno Setup",
+    "nsis": "NSIS",
+    "installshield": "InstallShield",
+    "burn": "WiX Burn / Bootstrapper",
+    "squirrel": "Squirrel",
+    "unknown": "Unknown EXE installer",
+}
+
+
+def _peak_rss() -> Optional[int]:
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _best(fn: Callable[[], Any], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def _worker_counts() -> List[int]:
+    cpus = os.cpu_count() or 1
+    counts = [1]
+    while counts[-1] * 2 <= cpus:
+        counts.append(counts[-1] * 2)
+    return counts + ([cpus] if counts[-1] != cpus else [])
+
+
+_JSON_PLANS = 1000
+
+
+def _json_stages(plan: Any) -> Dict[str, Callable[[], Any]]:
+    from installer_intel.records import dumps
+
+    model = plan.to_model()
+    if dumps(plan) != model.model_dump_json() or dumps(plan, indent=2) != model.model_dump_json(indent=2):
+        raise RuntimeError(f"{plan.input_path}: records JSON differs from the Pydantic model's")
+
+    def records() -> None:
+        for _ in range(_JSON_PLANS):
+            dumps(plan)
+
+    def pydantic() -> None:
+        for _ in range(_JSON_PLANS):
+            plan.to_model().model_dump_json()
+
+    return {"json": records, "json/model": pydantic}
+
+
+def measure_case(spec: CaseSpec, path: str, repeat: int) -> Dict[str, Any]:
+    """Run every stage for one case in this process."""
+    from installer_intel.analyzers.exe import analyze_exe
+    from installer_intel.analyzers.msi import analyze_msi
+    from installer_intel.analyzers.msidb import MsiDatabase
+    from installer_intel.analyzers.parallel import PARALLEL_MIN_BYTES
+    from installer_intel.analyzers.signatures import detect_installer_type_file, get_signatures
+    from installer_intel.analyzers.stream import iter_file_strings
+    from installer_intel.cache import file_sha256
+    from installer_intel.timings import record_timings
+
+    sigs = get_signatures()
+    rss_start = _peak_rss()
+    size = os.path.getsize(path)
+    stages: Dict[str, Callable[[], Any]] = {}
+    if spec.kind == "exe":
+        def strings() -> None:
+            with open(path, "rb") as f:
+                for _ in iter_file_strings(f):
+                    pass
+
+        def detect() -> None:
+            with open(path, "rb") as f:
+                detect_installer_type_file(f, signatures=sigs)
+
+        def hash_then_analyze() -> None:
+            file_sha256(path)
+            analyze_exe(path, signatures=sigs)
+
+        stages = {
+            "strings": strings,
+            "detect": detect,
+            "analyze_exe": lambda: analyze_exe(path, signatures=sigs),
+            "hash+analyze": hash_then_analyze,
+            "analyze+hash": lambda: analyze_exe(path, signatures=sigs, hashes=("sha256",)),
+        }
+        if size >= PARALLEL_MIN_BYTES:
+            for workers in _worker_counts():
+                stages[f"deep/{workers}"] = partial(analyze_exe, path, signatures=sigs, depth="deep", workers=workers)
+        plan = analyze_exe(path, signatures=sigs)
+        reads = {}
+        for hashes in ((), ("sha256",)):
+            with record_timings() as rec:
+                analyze_exe(path, signatures=sigs, hashes=hashes)
+            reads[hashes] = sum(s.bytes_read for s in rec.diagnostics().stages)
+        reads = {
+            "hash+analyze": round((size + reads[()]) / max(size, 1), 3),
+            "analyze+hash": round(reads[("sha256",)] / max(size, 1), 3),
+        }
+    else:
+        def properties() -> None:
+            with MsiDatabase.open(path) as db:
+                db.properties()
+
+        stages = {"properties": properties, "analyze_msi": lambda: analyze_msi(path)}
+        plan = analyze_msi(path)
+        reads = {}
+    stages.update(_json_stages(plan))
+
+    result: Dict[str, Any] = {
+        "name": spec.name,
+        "kind": spec.kind,
+        "size": size,
+        "installer_type": plan.installer_type,
+        "stages": {},
+        "reads": reads,
+    }
+    for stage, fn in stages.items():
+        seconds = _best(fn, repeat)
+        result["stages"][stage] = {
+            "seconds": round(seconds, 6),
+            "mb_s": round(size / 1024 ** 2 / seconds, 2) if seconds > 0 else None,
+        }
+    result["peak_rss"] = _peak_rss()
+    result["rss_at_start"] = rss_start
+    return result
+
+
+def _run_isolated(spec: CaseSpec, path: str, repeat: int) -> Dict[str, Any]:
+    cmd = [
+        sys.executable, "-m", "benchmarks.run",
+        "--case", json.dumps(asdict(spec)), "--path", path, "--repeat", str(repeat),
+    ]
+    proc = subprocess.run(cmd, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"{spec.name}: benchmark worker failed:\n{proc.stderr}")
+    return json.loads(proc.stdout)
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """Human-readable regressions of results against baseline."""
+    base_cases = {c["name"]: c for c in baseline.get("cases", [])}
+    problems: List[str] = []
+    for case in results["cases"]:
+        base = base_cases.get(case["name"])
+        if base is None:
+            continue
+        for stage, now in case["stages"].items():
+            was = base["stages"].get(stage)
+            if not was:
+                continue
+            delta = now["seconds"] - was["seconds"]
+            if delta > _MIN_SECONDS_DELTA and now["seconds"] > was["seconds"] * (1 + threshold):
+                problems.append(
+                    f"{case['name']} {stage}: {was['seconds'] * 1000:.1f} ms -> {now['seconds'] * 1000:.1f} ms "
+                    f"(+{delta / was['seconds']:.0%})"
+                )
+        if case.get("peak_rss") and base.get("peak_rss"):
+            delta = case["peak_rss"] - base["peak_rss"]
+            if delta > _MIN_RSS_DELTA and case["peak_rss"] > base["peak_rss"] * (1 + threshold):
+                problems.append(
+                    f"{case['name']} peak RSS: {base['peak_rss'] / 1024 ** 2:.0f} MB -> "
+                    f"{case['peak_rss'] / 1024 ** 2:.0f} MB"
+                )
+    return problems
+
+
+def _print_table(results: Dict[str, Any]) -> None:
+    print(f"{'case':<20} {'size':>10} {'stage':<12} {'ms':>10} {'MB/s':>9} {'peak RSS':>9} {'reads':>6}")
+    for case in results["cases"]:
+        first = True
+        for stage, m in case["stages"].items():
+            name = size = rss = ""
+            if first:
+                name = case["name"]
+                size = f"{case['size'] / 1024 ** 2:.1f}M"
+                rss = f"{case['peak_rss'] / 1024 ** 2:.0f}M" if case.get("peak_rss") else "-"
+                first = False
+            reads = case.get("reads", {}).get(stage)
+            reads = f"{reads:.2f}x" if reads is not None else ""
+            print(
+                f"{name:<20} {size:>10} {stage:<12} {m['seconds'] * 1000:>10.1f} {m['mb_s'] or 0:>9.1f} {rss:>9}"
+                f" {reads:>6}"
+            )
+    for case in results["cases"]:
+        serial = case["stages"].get("deep/1")
+        if serial:
+            speedups = [
+                f"{stage[5:]} workers {serial['seconds'] / m['seconds']:.2f}x"
+                for stage, m in case["stages"].items() if stage.startswith("deep/") and stage != "deep/1"
+            ]
+            print(f"{case['name']}: parallel deep scan speedup: {', '.join(speedups) or 'single CPU'}")
+    ratios = [
+        case["stages"]["json/model"]["seconds"] / case["stages"]["json"]["seconds"]
+        for case in results["cases"] if case["stages"].get("json", {}).get("seconds")
+    ]
+    if ratios:
+        print(f"plan JSON: records writer {min(ratios):.1f}x to {max(ratios):.1f}x cheaper per plan than the model")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sizes", default="1M,16M,256M", help="Comma-separated EXE sizes (e.g. 1M,64M,4G)")
+    ap.add_argument("--families", default=None, help="Comma-separated marker families (default: all)")
+    ap.add_argument("--repeat", type=int, default=3, help="Runs per stage; the best is kept")
+    ap.add_argument("--work-dir", default=os.path.join(tempfile.gettempdir(), "installer-intel-bench"),
+                    help="Where generated inputs are kept between runs")
+    ap.add_argument("--out", help="Write results JSON here")
+    ap.add_argument("--baseline", help="Compare against this results JSON")
+    ap.add_argument("--threshold", type=float, default=0.15, help="Allowed slowdown ratio (default 0.15)")
+    ap.add_argument("--case", help=argparse.SUPPRESS)
+    ap.add_argument("--path", help=argparse.SUPPRESS)
+    args = ap.parse_args(argv)
+
+    if args.case:
+        # Worker mode: measure one case and print its JSON.
+        spec = CaseSpec(**json.loads(args.case))
+        print(json.dumps(measure_case(spec, args.path, args.repeat)))
+        return 0
+
+    from installer_intel import __version__
+
+    sizes = [parse_size(s) for s in args.sizes.split(",") if s]
+    families = args.families.split(",") if args.families else None
+    cases = []
+    for spec in default_corpus(sizes, families):
+        path = materialize(spec, args.work_dir)
+        result = _run_isolated(spec, path, args.repeat)
+        expected = _EXPECTED.get(spec.family) if spec.kind == "exe" else "MSI"
+        if result["installer_type"] != expected:
+            print(f"WARNING: {spec.name}: detected {result['installer_type']!r}, expected {expected!r}")
+        cases.append(result)
+
+    results = {
+        "meta": {
+            "installer_intel": __version__,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "repeat": args.repeat,
+        },
+        "cases": cases,
+    }
+    _print_table(results)
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Wrote {args.out}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        problems = compare(results, baseline, args.threshold)
+        if problems:
+            print(f"REGRESSIONS (threshold {args.threshold:.0%}):")
+            for p in problems:
+                print(f"  {p}")
+            return 1
+        print(f"No regressions against {args.baseline} (threshold {args.threshold:.0%}).")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,27 @@
+"""
+Console entry point for installer-intel.
+
+`installer-intel --version` is answered here without importing the CLI
+module (Typer, Click) or anything it loads; every other invocation is
+handed to the Typer app.
+"""
+
+from __future__ import annotations
+
+import sys
+
+
+def main() -> None:
+    if sys.argv[1:] in (["--version"], ["-v"]):
+        from installer_intel import __version__
+
+        print(__version__)
+        return
+
+    from installer_intel.cli import app
+
+    app(prog_name="installer-intel")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,35 @@
-from .msi import analyze_msi
-from .exe import analyze_exe
+"""
+Public analyzer entry points. They return the validated Pydantic
+InstallPlan (models.py). The functions in the analyzer modules themselves
+return records.Plan, which the CLI, scan workers and the server use without
+paying for validation; Plan.to_model() converts one.
+"""
 
-__all__ = ["analyze_msi", "analyze_exe"]
+from __future__ import annotations
+
+import functools
+import inspect
+from typing import TYPE_CHECKING, Callable
+
+from . import exe, msi, package
+
+if TYPE_CHECKING:
+    from installer_intel.models import InstallPlan
+    from installer_intel.records import Plan
+
+
+def _as_model(analyze: Callable[..., "Plan"]) -> Callable[..., "InstallPlan"]:
+    @functools.wraps(analyze)
+    def analyze_model(*args, **kwargs) -> "InstallPlan":
+        return analyze(*args, **kwargs).to_model()
+
+    analyze_model.__annotations__ = {**analyze.__annotations__, "return": "InstallPlan"}
+    analyze_model.__signature__ = inspect.signature(analyze).replace(return_annotation="InstallPlan")
+    return analyze_model
+
+
+analyze_msi = _as_model(msi.analyze_msi)
+analyze_exe = _as_model(exe.analyze_exe)
+analyze_package = _as_model(package.analyze_package)
+
+__all__ = ["analyze_msi", "analyze_exe", "analyze_package"]
@@ -0,0 +1,262 @@
+"""
+Minimal reader for OLE compound files (Compound File Binary, [MS-CFB]).
+
+MSI packages are compound files: a small FAT-style filesystem of sectors
+holding named streams. This reader maps the file, loads the allocation
+tables and directory once, and reads individual streams on demand, so
+nothing beyond the streams actually requested is touched.
+
+Only reading is supported; storages are flattened into "/"-separated paths.
+"""
+
+from __future__ import annotations
+
+import mmap
+import struct
+import sys
+from array import array
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from installer_intel.timings import count
+
+CFB_MAGIC = b"\xD0\xCF\x11\xE0\xA1\xB1\x1A\xE1"
+
+_FREESECT = 0xFFFFFFFF
+_ENDOFCHAIN = 0xFFFFFFFE
+_NOSTREAM = 0xFFFFFFFF
+_MAXREGSECT = 0xFFFFFFFA
+
+_TYPE_STORAGE = 1
+_TYPE_STREAM = 2
+_TYPE_ROOT = 5
+
+
+class CompoundFileError(ValueError):
+    """Raised when a file is not a readable compound file."""
+
+
+@dataclass(frozen=True)
+class DirEntry:
+    sid: int
+    name: str
+    type: int
+    left: int
+    right: int
+    child: int
+    start: int
+    size: int
+
+
+def _u32_array(data: bytes) -> array:
+    a = array("I")
+    if a.itemsize != 4:  # pragma: no cover - exotic platforms
+        a = array("L")
+    a.frombytes(data)
+    if sys.byteorder == "big":
+        a.byteswap()
+    return a
+
+
+class CompoundFile:
+    """
+    Read-only view of a compound file held in a bytes-like buffer (bytes,
+    mmap, ...). Use CompoundFile.open(path) to map a file from disk.
+    """
+
+    def __init__(self, buf) -> None:
+        self._buf = buf
+        self._mm: Optional[mmap.mmap] = None
+        self._fh = None
+
+        header = bytes(buf[:512])
+        if len(header) < 512 or header[:8] != CFB_MAGIC:
+            raise CompoundFileError("Not an OLE compound file (bad signature)")
+
+        (_minor, major, byte_order, sector_shift, mini_shift) = struct.unpack_from("<HHHHH", header, 0x18)
+        if byte_order != 0xFFFE:
+            raise CompoundFileError("Unsupported byte order")
+        if major not in (3, 4) or sector_shift not in (9, 12):
+            raise CompoundFileError(f"Unsupported compound file version {major} (sector shift {sector_shift})")
+
+        self.sector_size = 1 << sector_shift
+        self.mini_sector_size = 1 << mini_shift
+        (
+            _num_dir_sectors,
+            num_fat_sectors,
+            first_dir_sector,
+            _transaction,
+            self.mini_cutoff,
+            first_minifat_sector,
+            _num_minifat_sectors,
+            first_difat_sector,
+            num_difat_sectors,
+        ) = struct.unpack_from("<IIIIIIIII", header, 0x28)
+
+        self._fat = self._load_fat(header, num_fat_sectors, first_difat_sector, num_difat_sectors)
+        self._entries = self._load_directory(first_dir_sector)
+        self._minifat: Optional[array] = None
+        self._first_minifat_sector = first_minifat_sector
+        self._ministream: Optional[bytes] = None
+        self._paths = self._build_paths()
+
+    # ----- construction -------------------------------------------------
+
+    @classmethod
+    def open(cls, path: str) -> "CompoundFile":
+        fh = open(path, "rb")
+        try:
+            mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            fh.close()
+            raise CompoundFileError(f"Cannot map {path} (empty or unreadable file)")
+        try:
+            cf = cls(mm)
+        except Exception:
+            mm.close()
+            fh.close()
+            raise
+        cf._mm = mm
+        cf._fh = fh
+        return cf
+
+    @property
+    def extent(self) -> int:
+        """Bytes from the header to the end of the last allocated sector."""
+        for sid in range(len(self._fat) - 1, -1, -1):
+            if self._fat[sid] != _FREESECT:
+                return (sid + 2) * self.sector_size
+        return self.sector_size
+
+    def close(self) -> None:
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+
+    def __enter__(self) -> "CompoundFile":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    # ----- sectors and allocation tables ----------------------------------
+
+    def _sector(self, sid: int) -> bytes:
+        start = (sid + 1) * self.sector_size
+        data = self._buf[start:start + self.sector_size]
+        if len(data) < self.sector_size:
+            # The last sector of a file may be truncated; pad it.
+            data = bytes(data) + b"\0" * (self.sector_size - len(data))
+        return data
+
+    def _load_fat(self, header: bytes, num_fat: int, difat_sid: int, num_difat: int) -> array:
+        fat_sids = list(_u32_array(header[0x4C:0x200]))
+        per_sector = self.sector_size // 4
+        seen = 0
+        while difat_sid not in (_ENDOFCHAIN, _FREESECT) and seen < num_difat:
+            entries = _u32_array(self._sector(difat_sid))
+            fat_sids.extend(entries[:per_sector - 1])
+            difat_sid = entries[per_sector - 1]
+            seen += 1
+        fat_sids = [s for s in fat_sids[:num_fat] if s <= _MAXREGSECT]
+        return _u32_array(b"".join(self._sector(s) for s in fat_sids))
+
+    def _chain(self, start: int, table: array) -> List[int]:
+        out: List[int] = []
+        sid = start
+        limit = len(table)
+        while sid <= _MAXREGSECT:
+            if sid >= limit or len(out) > limit:
+                raise CompoundFileError("Corrupt sector chain")
+            out.append(sid)
+            sid = table[sid]
+        return out
+
+    def _read_chain(self, start: int, size: Optional[int] = None) -> bytes:
+        sids = self._chain(start, self._fat)
+        # Coalesce runs of consecutive sectors into single slices.
+        parts = []
+        i = 0
+        while i < len(sids):
+            j = i
+            while j + 1 < len(sids) and sids[j + 1] == sids[j] + 1:
+                j += 1
+            begin = (sids[i] + 1) * self.sector_size
+            parts.append(self._buf[begin:begin + (j - i + 1) * self.sector_size])
+            i = j + 1
+        data = b"".join(parts)
+        return data if size is None else data[:size]
+
+    # ----- directory ------------------------------------------------------
+
+    def _load_directory(self, first_dir_sector: int) -> List[DirEntry]:
+        raw = self._read_chain(first_dir_sector)
+        entries: List[DirEntry] = []
+        for sid in range(len(raw) // 128):
+            e = raw[sid * 128:(sid + 1) * 128]
+            name_len = struct.unpack_from("<H", e, 64)[0]
+            name = e[:max(0, name_len - 2)].decode("utf-16-le", errors="replace")
+            etype = e[66]
+            left, right, child = struct.unpack_from("<III", e, 68)
+            start, size_lo, size_hi = struct.unpack_from("<III", e, 116)
+            size = size_lo if self.sector_size == 512 else size_lo | (size_hi << 32)
+            entries.append(DirEntry(sid, name, etype, left, right, child, start, size))
+        if not entries or entries[0].type != _TYPE_ROOT:
+            raise CompoundFileError("Missing root directory entry")
+        return entries
+
+    def _build_paths(self) -> Dict[str, DirEntry]:
+        paths: Dict[str, DirEntry] = {}
+        n = len(self._entries)
+        visited = set()
+        stack = [(self._entries[0].child, "")]
+        while stack:
+            sid, prefix = stack.pop()
+            if sid == _NOSTREAM or sid >= n or sid in visited:
+                continue
+            visited.add(sid)
+            e = self._entries[sid]
+            stack.append((e.left, prefix))
+            stack.append((e.right, prefix))
+            path = prefix + e.name
+            if e.type == _TYPE_STREAM:
+                paths[path] = e
+            elif e.type == _TYPE_STORAGE:
+                stack.append((e.child, path + "/"))
+        return paths
+
+    # ----- streams --------------------------------------------------------
+
+    def list_streams(self) -> List[str]:
+        return list(self._paths)
+
+    def exists(self, path: str) -> bool:
+        return path in self._paths
+
+    def stream_size(self, path: str) -> int:
+        return self._paths[path].size
+
+    def read_stream(self, path: str) -> bytes:
+        """Read a stream by path. Raises KeyError if it does not exist."""
+        e = self._paths[path]
+        if e.size == 0:
+            return b""
+        count(bytes_read=e.size)
+        if e.size < self.mini_cutoff:
+            return self._read_mini(e.start, e.size)
+        return self._read_chain(e.start, e.size)
+
+    def _read_mini(self, start: int, size: int) -> bytes:
+        if self._minifat is None:
+            root = self._entries[0]
+            self._minifat = _u32_array(self._read_chain(self._first_minifat_sector)) \
+                if self._first_minifat_sector <= _MAXREGSECT else array("I")
+            self._ministream = self._read_chain(root.start, root.size) \
+                if root.start <= _MAXREGSECT else b""
+        ms = self.mini_sector_size
+        return b"".join(
+            self._ministream[sid * ms:(sid + 1) * ms] for sid in self._chain(start, self._minifat)
+        )[:size]
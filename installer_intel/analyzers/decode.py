@@ -0,0 +1,238 @@
+"""
+Seekable readers over compressed and encrypted data, for analyzing what is
+inside a package without unpacking it.
+
+- InflateFile: the output of a raw deflate stream (a zip member). Output is
+  produced by inflating forward; the decompressor state is checkpointed at
+  intervals, so a backward seek resumes from the nearest checkpoint instead
+  of the start, and recently inflated blocks are kept for re-reads.
+- CbcFile: the plaintext of AES-CBC ciphertext (PKCS#7 padded). Each block
+  decrypts from itself and the ciphertext block before it, so any range is
+  decrypted directly.
+
+Both read the underlying file only as far as their callers read them, with
+memory bounded by the read size, the block cache and the checkpoints (at
+most max_memory / CHECKPOINT_COST of them). AES needs the optional
+cryptography package.
+"""
+
+from __future__ import annotations
+
+import bisect
+import io
+import zlib
+from collections import OrderedDict
+from typing import BinaryIO, List, Optional, Tuple
+
+from installer_intel.analyzers.stream import DEFAULT_MAX_MEMORY
+from installer_intel.timings import count, stage
+
+try:
+    from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+except ImportError:  # optional: .intunewin content is not decrypted without it
+    Cipher = None
+
+BLOCK = 64 * 1024
+CACHE_BLOCKS = 64
+CHECKPOINT = 1024 * 1024  # inflated bytes between checkpoints, at least
+# Memory a checkpoint is budgeted at: a copy of the decompressor with its
+# 32 KB window and state.
+CHECKPOINT_COST = 256 * 1024
+_AES_BLOCK = 16
+
+
+class DecodeError(ValueError):
+    """The data does not decode (corrupt stream, wrong key)."""
+
+
+class _Reader:
+    """File object plumbing over read_at(pos, n) and a size."""
+
+    size = 0
+
+    def __init__(self) -> None:
+        self._pos = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    def read_at(self, pos: int, n: int) -> bytes:
+        raise NotImplementedError
+
+    def read(self, n: Optional[int] = -1) -> bytes:
+        left = max(0, self.size - self._pos)
+        data = self.read_at(self._pos, left if n is None or n < 0 else min(n, left))
+        self._pos += len(data)
+        return data
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += self.size
+        if offset < 0:
+            raise ValueError("Negative seek position")
+        self._pos = offset
+        return offset
+
+    def tell(self) -> int:
+        return self._pos
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class InflateFile(_Reader):
+    """
+    The size bytes inflated from the raw deflate data at [start, start +
+    packed) of f.
+    """
+
+    def __init__(
+        self, f: BinaryIO, start: int, packed: int, size: int, max_memory: int = DEFAULT_MAX_MEMORY,
+    ) -> None:
+        super().__init__()
+        self._f = f
+        self._start = start
+        self._packed = packed
+        self.size = size
+        limit = max(2, max_memory // CHECKPOINT_COST)
+        self._interval = max(CHECKPOINT, -(-size // limit))
+        # (inflated offset, packed bytes consumed, decompressor there)
+        self._checkpoints: List[Tuple[int, int, "zlib._Decompress"]] = [(0, 0, zlib.decompressobj(-15))]
+        self._blocks: "OrderedDict[int, bytes]" = OrderedDict()
+        self._restart(0)
+
+    def _restart(self, index: int) -> None:
+        out, consumed, d = self._checkpoints[index]
+        self._d = d.copy()  # the checkpoint itself stays reusable
+        self._out = out  # inflated offset the decompressor has reached
+        self._in = consumed  # packed bytes read, including _tail
+        self._tail = b""  # read but not yet consumed by the decompressor
+        self._partial = b""  # inflated since the last block boundary
+
+    def _advance(self) -> bytes:
+        """Inflate up to the next block boundary; b"" at the end of the stream."""
+        while True:
+            if self._tail:
+                data = self._tail
+            else:
+                want = min(BLOCK, self._packed - self._in)
+                if want <= 0:
+                    return b""
+                with stage("read"):
+                    self._f.seek(self._start + self._in)
+                    data = self._f.read(want)
+                    count(bytes_read=len(data))
+                if not data:
+                    raise DecodeError("Deflate stream is truncated")
+                self._in += len(data)
+            try:
+                out = self._d.decompress(data, BLOCK - len(self._partial))
+            except zlib.error as e:
+                raise DecodeError(f"Corrupt deflate stream: {e}") from None
+            self._tail = self._d.unconsumed_tail
+            if out:
+                return out
+            if self._d.eof:
+                return b""
+
+    def _keep(self, out: bytes) -> None:
+        """Cache each completed block and checkpoint every interval."""
+        self._out += len(out)
+        self._partial += out
+        if len(self._partial) < BLOCK:
+            return
+        self._blocks[self._out // BLOCK - 1] = self._partial
+        self._partial = b""
+        while len(self._blocks) > CACHE_BLOCKS:
+            self._blocks.popitem(last=False)
+        if self._out >= self._checkpoints[-1][0] + self._interval:
+            self._checkpoints.append((self._out, self._in - len(self._tail), self._d.copy()))
+
+    def _block(self, index: int) -> bytes:
+        block = self._blocks.get(index)
+        if block is not None:
+            self._blocks.move_to_end(index)
+            return block
+        pos = index * BLOCK
+        # Go on from where the decompressor is, unless a checkpoint is closer.
+        best = bisect.bisect_right([cp[0] for cp in self._checkpoints], pos) - 1
+        boundary = self._out - len(self._partial)
+        if not self._checkpoints[best][0] <= boundary <= pos:
+            self._restart(best)
+        with stage("inflate"):
+            while index not in self._blocks:
+                out = self._advance()
+                if not out:
+                    if self._partial and self._out // BLOCK == index:
+                        return self._partial  # the last, short block
+                    raise DecodeError("Deflate stream ends before its stated size")
+                self._keep(out)
+        return self._blocks[index]
+
+    def read_at(self, pos: int, n: int) -> bytes:
+        end = min(self.size, pos + n)
+        if n <= 0 or pos >= end:
+            return b""
+        data = b"".join(self._block(i) for i in range(pos // BLOCK, (end - 1) // BLOCK + 1))
+        skip = pos - pos // BLOCK * BLOCK
+        return data[skip:skip + end - pos]
+
+
+class CbcFile(_Reader):
+    """
+    The plaintext of AES-CBC ciphertext at [start, start + length) of f,
+    with PKCS#7 padding removed.
+    """
+
+    def __init__(self, f: BinaryIO, start: int, length: int, key: bytes, iv: bytes) -> None:
+        if Cipher is None:
+            raise ImportError("Decrypting needs the cryptography package (pip install 'installer-intel[intune]')")
+        super().__init__()
+        if length < _AES_BLOCK or length % _AES_BLOCK:
+            raise DecodeError(f"Ciphertext of {length} bytes is not whole AES blocks")
+        self._f = f
+        self._start = start
+        self._length = length
+        self._key = key
+        self._iv = iv
+        self.size = length  # until the padding is known
+        last = self._decrypt(length - _AES_BLOCK, length)
+        pad = last[-1]
+        if not 1 <= pad <= _AES_BLOCK or last[-pad:] != bytes([pad]) * pad:
+            raise DecodeError("Bad padding after decryption (wrong key?)")
+        self.size = length - pad
+
+    def _decrypt(self, first: int, last: int) -> bytes:
+        """Plaintext of ciphertext bytes [first, last), both block-aligned."""
+        with stage("decrypt"):
+            at = first - _AES_BLOCK if first else first
+            self._f.seek(self._start + at)
+            data = self._f.read(last - at)
+            if len(data) != last - at:
+                raise DecodeError("Ciphertext is truncated")
+            iv = data[:_AES_BLOCK] if first else self._iv
+            body = data[_AES_BLOCK:] if first else data
+            decryptor = Cipher(algorithms.AES(self._key), modes.CBC(iv)).decryptor()
+            return decryptor.update(body) + decryptor.finalize()
+
+    def read_at(self, pos: int, n: int) -> bytes:
+        end = min(self.size, pos + n)
+        if n <= 0 or pos >= end:
+            return b""
+        first = pos - pos % _AES_BLOCK
+        last = min(self._length, -(-end // _AES_BLOCK) * _AES_BLOCK)
+        return self._decrypt(first, last)[pos - first:end - first]
@@ -0,0 +1,604 @@
+"""
+Headers of the Inno Setup and NSIS installer engines, read with a few seeks.
+
+Signatures only tell which engine built an EXE. The engine's own header
+says so exactly, and also gives what canned commands cannot: the format
+version, how the data is compressed and where it is, and the uninstall
+registry key. Neither header needs a scan to find:
+
+- Inno Setup: the loader's offset table is RCDATA resource 11111 (5.1.5
+  and later), or an "Inno" magic at offset 0x30 points to it (earlier
+  loaders). The table gives the offsets of setup-0 and setup-1 (the
+  files). setup-0 starts with an ID string holding the version, followed
+  by a block of the setup settings in 4 KB CRC-checked chunks. The block is
+  decompressed only as far as the leading strings (AppName, AppId,
+  AppVersion, DefaultDirName, UninstallFilesDir, ...). The uninstall key
+  is ...\\Uninstall\\<AppId>_is1.
+- NSIS: the first header (flags, 0xDEADBEEF, "NullsoftInst", sizes) sits
+  on a 512-byte boundary where the exehead ends, normally at the start of
+  the overlay. The bytes after it give the compression (zlib, LZMA or
+  bzip2, solid or not). The install header is decompressed (bzip2 is
+  recognized but not decoded), and registry writes under ...\\Uninstall\\
+  are found in its entry table and string table.
+
+Locating a header costs a few hundred bytes of reads. Decoding it costs the
+compressed header, of which at most MAX_HEADER bytes are decompressed. A
+file whose header cannot be found is left to the signatures. A header that
+is found but cannot be decoded still settles the engine, with a note.
+"""
+
+from __future__ import annotations
+
+import re
+import struct
+import zlib
+from dataclasses import dataclass, field
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from installer_intel.analyzers.pe import RT_RCDATA, PeImage
+from installer_intel.timings import count
+
+try:
+    import lzma
+except ImportError:  # Python built without it: LZMA headers are not decoded
+    lzma = None
+
+_DECOMPRESS_ERRORS = (zlib.error, EOFError) + ((lzma.LZMAError,) if lzma is not None else ())
+
+# Decompressed header bytes read at most.
+MAX_HEADER = 4 * 1024 * 1024
+UNINSTALL_KEY = "Software\\Microsoft\\Windows\\CurrentVersion\\Uninstall\\"
+
+_INNO_RESOURCE = 11111
+_INNO_MAGIC_AT = 0x30
+_INNO_MAGIC = b"Inno"
+# Offset table IDs, with the first loader version that wrote each.
+_INNO_LOADERS = {
+    b"rDlPtS02\x87\x65\xba\xcd": (1, 2, 10),
+    b"rDlPtS04\x87\x65\xba\xcd": (4, 0, 0),
+    b"rDlPtS05\x87\x65\xba\xcd": (4, 0, 3),
+    b"rDlPtS06\x87\x65\xba\xcd": (4, 0, 10),
+    b"rDlPtS07\x87\x65\xba\xcd": (4, 1, 6),
+    b"rDlPtS\xcd\xe6\xd7\x7b\x0b\x2a": (5, 1, 5),
+    b"nS5W7dT\x83\xaa\x1b\x0f\x6a": (5, 1, 5),
+}
+_INNO_ID_SIZE = 64
+_INNO_ID = re.compile(rb"Setup Data \((\d+)\.(\d+)\.(\d+)")
+_INNO_CHUNK = 4096
+# The setup header's leading strings: (name, first version, version dropped,
+# ANSI even in Unicode builds). Later fields are not decoded.
+_INNO_FIELDS = (
+    ("AppName", None, None, False),
+    ("AppVerName", None, None, False),
+    ("AppId", (1, 3, 0), None, False),
+    ("AppCopyright", None, None, False),
+    ("AppPublisher", (1, 3, 0), None, False),
+    ("AppPublisherURL", (1, 3, 0), None, False),
+    ("AppSupportPhone", (5, 1, 13), None, False),
+    ("AppSupportURL", (1, 3, 0), None, False),
+    ("AppUpdatesURL", (1, 3, 0), None, False),
+    ("AppVersion", (1, 3, 0), None, False),
+    ("DefaultDirName", None, None, False),
+    ("DefaultGroupName", None, None, False),
+    ("UninstallIconName", None, (3, 0, 0), False),
+    ("BaseFilename", None, None, False),
+    ("LicenseText", (1, 3, 0), (5, 2, 5), True),
+    ("InfoBeforeText", (1, 3, 0), (5, 2, 5), True),
+    ("InfoAfterText", (1, 3, 0), (5, 2, 5), True),
+    ("UninstallFilesDir", (1, 3, 3), None, False),
+    ("UninstallDisplayName", (1, 3, 6), None, False),
+    ("UninstallDisplayIcon", (1, 3, 6), None, False),
+    ("AppMutex", (1, 3, 14), None, False),
+    ("DefaultUserInfoName", (3, 0, 0), None, False),
+    ("DefaultUserInfoOrg", (3, 0, 0), None, False),
+    ("DefaultUserInfoSerial", (4, 0, 0), None, False),
+    ("CompiledCodeText", (4, 0, 0), (5, 2, 5), True),
+    ("AppReadmeFile", (4, 2, 4), None, False),
+    ("AppContact", (4, 2, 4), None, False),
+    ("AppComments", (4, 2, 4), None, False),
+    ("AppModifyPath", (4, 2, 4), None, False),
+    ("CreateUninstallRegKey", (5, 3, 8), None, False),
+    ("Uninstallable", (5, 3, 10), None, False),
+)
+# Decoded but too long or too internal for the plan.
+_INNO_HIDDEN = ("LicenseText", "InfoBeforeText", "InfoAfterText", "CompiledCodeText")
+
+_NSIS_FIRST = struct.Struct("<II12sII")  # flags, signature, magic, header size, data size
+_NSIS_SIGNATURE = 0xDEADBEEF
+_NSIS_MAGIC = b"NullsoftInst"
+_NSIS_ALIGN = 512
+_NSIS_SEARCH = 64 * 1024
+_NSIS_UNINSTALLER = 1  # first header flags
+_NSIS_SILENT = 2
+_NSIS_BLOCKS = 8  # pages, sections, entries, strings, language tables, colors, font, data
+_NSIS_ENTRY = struct.Struct("<7I")  # opcode, six parameters
+_NSIS_ROOTS = {
+    0: "SHCTX",
+    0x80000066: "SHCTX",
+    0x80000000: "HKCR",
+    0x80000001: "HKCU",
+    0x80000002: "HKLM",
+    0x80000003: "HKU",
+}
+_NSIS_VALUE_TYPES = (1, 2, 3, 4)  # string, DWORD (NSIS 2), binary, DWORD (NSIS 3)
+# String codes: NSIS 3 (both encodings) and NSIS 2 (ANSI).
+_NSIS_CODES = {1: "lang", 2: "shell", 3: "var", 4: "skip", 252: "skip", 253: "var", 254: "shell", 255: "lang"}
+_NSIS_VARS = (
+    *(f"${i}" for i in range(10)), *(f"$R{i}" for i in range(10)),
+    "$CMDLINE", "$INSTDIR", "$OUTDIR", "$EXEDIR", "$LANGUAGE",
+)
+_NSIS_VERSION = re.compile(r"Nullsoft Install System v?(\d[\w.]*)")
+_NSIS_READ = 16 * 1024
+
+
+class HeaderError(ValueError):
+    """An engine header that is found but does not decode."""
+
+
+@dataclass
+class EngineHeader:
+    engine: str  # as the signatures name it: "Inno Setup" | "NSIS"
+    offset: int  # the structure that identified the engine
+    evidence: str
+    info: Dict[str, Any] = field(default_factory=dict)  # metadata["SetupHeader"]
+    uninstall_key: Optional[Tuple[str, str]] = None  # (hive, key); hive "SHCTX" is HKLM or HKCU
+    uninstall_command: Optional[str] = None
+    quiet_uninstall: bool = False  # uninstall_command is silent as it is
+    uninstallable: bool = True
+    notes: List[str] = field(default_factory=list)
+
+
+def read_engine_header(f: BinaryIO, image: PeImage) -> Optional[EngineHeader]:
+    """The Inno Setup or NSIS header of the PE image open as f, or None."""
+    for read in (_inno_header, _nsis_header):
+        try:
+            header = read(f, image)
+        except (HeaderError, struct.error):
+            header = None
+        if header is not None:
+            return header
+    return None
+
+
+def _read(f: BinaryIO, offset: int, size: int) -> bytes:
+    f.seek(offset)
+    data = f.read(size)
+    count(bytes_read=len(data))
+    return data
+
+
+def _u32(data: bytes, at: int = 0) -> int:
+    return struct.unpack_from("<I", data, at)[0]
+
+
+# ----- decompression ---------------------------------------------------------
+
+
+class _Chunks:
+    """Bytes from an iterator of chunks, taken as needed."""
+
+    def __init__(self, chunks: Iterable[bytes]) -> None:
+        self._it = iter(chunks)
+        self._buf = b""
+
+    def take(self, n: int) -> bytes:
+        while len(self._buf) < n:
+            chunk = next(self._it, None)
+            if chunk is None:
+                raise HeaderError("the header data ends early")
+            self._buf += chunk
+        out, self._buf = self._buf[:n], self._buf[n:]
+        return out
+
+    def piece(self) -> bytes:
+        """Whatever is buffered, else the next chunk; b"" at the end."""
+        out, self._buf = self._buf, b""
+        return out or next(self._it, b"")
+
+
+def _lzma_decompressor(props: bytes, limit: int, x86: bool = False):
+    if lzma is None:
+        raise HeaderError("LZMA is not available in this Python")
+    d = props[0]
+    lc, lp, pb = d % 9, d // 9 % 5, d // 45
+    # liblzma takes lc + lp <= 4 and pb <= 4. No match reaches back past the
+    # limit bytes we decompress at most, so a larger dictionary is never needed
+    # (and would be allocated in full).
+    if lc + lp > 4 or pb > 4:
+        raise HeaderError("bad LZMA properties")
+    dict_size = min(max(_u32(props, 1), 4096), max(limit, 4096))
+    lzma1 = {"id": lzma.FILTER_LZMA1, "dict_size": dict_size, "lc": lc, "lp": lp, "pb": pb}
+    filters = [{"id": lzma.FILTER_X86}, lzma1] if x86 else [lzma1]
+    try:
+        return lzma.LZMADecompressor(lzma.FORMAT_RAW, filters=filters)
+    except lzma.LZMAError:
+        raise HeaderError("bad LZMA properties") from None
+
+
+class _Unpacked:
+    """
+    The output of decompressing src ("stored", "zlib", "deflate" for raw
+    deflate, or "lzma" with its 5 property bytes first), produced only as
+    far as it is read and never past limit bytes.
+    """
+
+    def __init__(self, src: _Chunks, method: str, limit: int = MAX_HEADER, x86: bool = False) -> None:
+        self._src = src
+        self._method = method
+        self._limit = limit
+        self._out = bytearray()
+        self._pending = b""
+        self.produced = 0
+        if method == "lzma":
+            self._d = _lzma_decompressor(src.take(5), limit, x86)
+        elif method in ("zlib", "deflate"):
+            self._d = zlib.decompressobj(15 if method == "zlib" else -15)
+        else:
+            self._d = None
+
+    def take(self, n: int) -> bytes:
+        while len(self._out) < n:
+            self._more()
+        out = bytes(self._out[:n])
+        del self._out[:n]
+        return out
+
+    def _more(self) -> None:
+        room = min(self._limit - self.produced, 64 * 1024)
+        if room <= 0:
+            raise HeaderError(f"the header is over {self._limit // 1024 ** 2} MB")
+        out = b""
+        try:
+            while not out:
+                out = self._step(room)
+                if out is None:
+                    raise HeaderError("the header data ends early")
+        except _DECOMPRESS_ERRORS as e:
+            raise HeaderError(f"the header does not decompress: {e}") from None
+        self.produced += len(out)
+        self._out += out
+
+    def _step(self, room: int) -> Optional[bytes]:
+        """Some output (possibly none yet), or None when the input is used up."""
+        if self._d is None:
+            return self._src.piece() or None
+        if self._method == "lzma":
+            if self._d.eof:
+                return None
+            data = self._src.piece() if self._d.needs_input else b""
+            if self._d.needs_input and not data:
+                return None
+            return self._d.decompress(data, room)
+        data = self._pending or self._src.piece()
+        if self._d.eof or not data:
+            return None
+        out = self._d.decompress(data, room)
+        self._pending = self._d.unconsumed_tail
+        return out
+
+
+def _file_chunks(f: BinaryIO, start: int, end: int) -> Iterator[bytes]:
+    while start < end:
+        data = _read(f, start, min(_NSIS_READ, end - start))
+        if not data:
+            return
+        yield data
+        start += len(data)
+
+
+# ----- Inno Setup ------------------------------------------------------------
+
+
+def _inno_header(f: BinaryIO, image: PeImage) -> Optional[EngineHeader]:
+    table_at = next(
+        (r.offset for r in image.resources if r.type == RT_RCDATA and r.name == _INNO_RESOURCE and r.size >= 12),
+        None,
+    )
+    if table_at is None:
+        magic = _read(f, _INNO_MAGIC_AT, 12)
+        if len(magic) < 12 or magic[:4] != _INNO_MAGIC or _u32(magic, 4) != ~_u32(magic, 8) & 0xFFFFFFFF:
+            return None
+        table_at = _u32(magic, 4)
+    table = _inno_offsets(_read(f, table_at, 64))
+    if table is None:
+        return None
+    loader, setup0, setup1 = table
+
+    ident = _read(f, setup0, _INNO_ID_SIZE).rstrip(b"\0")
+    m = _INNO_ID.search(ident)
+    if m is None:
+        return None
+    version = tuple(int(g) for g in m.groups())
+    unicode = b"(u)" in ident.lower() or version >= (6, 0, 0)
+    header = EngineHeader(
+        engine="Inno Setup",
+        offset=table_at,
+        evidence=f"Inno Setup loader offset table at 0x{table_at:X}; "
+                 f"'{ident.decode('latin-1')}' at 0x{setup0:X}",
+        info={
+            "Engine": "Inno Setup",
+            "Version": ".".join(map(str, version)),
+            "LoaderVersion": ".".join(map(str, loader)) + "+",
+            "Unicode": unicode,
+            "HeaderOffset": setup0,
+            "DataOffset": setup1 or None,
+        },
+    )
+    if not setup1:
+        header.notes.append("Inno Setup files are in separate setup-N.bin slices next to the EXE.")
+    try:
+        fields = _inno_fields(f, setup0 + _INNO_ID_SIZE, version, unicode, header.info)
+    except (HeaderError, struct.error) as e:
+        header.notes.append(f"Inno Setup header not decoded: {e}.")
+        return header
+    header.info.update((k, v) for k, v in fields.items() if v and k not in _INNO_HIDDEN)
+
+    header.uninstallable = _inno_flag(fields.get("Uninstallable"))
+    if not header.uninstallable:
+        header.notes.append("Inno Setup header: Uninstallable=no, there is no uninstaller.")
+        return header
+    header.uninstall_command = f'"{fields.get("UninstallFilesDir") or "{app}"}\\unins000.exe"'
+    app_id = fields.get("AppId") or fields.get("AppName")
+    if not _inno_flag(fields.get("CreateUninstallRegKey")) or not app_id:
+        return header
+    literal = app_id.replace("{{", "\0")
+    if "{" in literal:
+        header.notes.append(f"AppId {app_id} uses Inno Setup constants; the uninstall key is set at install time.")
+    else:
+        header.uninstall_key = ("HKLM", f"{UNINSTALL_KEY}{literal.replace(chr(0), '{')}_is1")
+    return header
+
+
+def _inno_offsets(data: bytes) -> Optional[Tuple[Tuple[int, ...], int, int]]:
+    """(loader version, setup-0 offset, setup-1 offset) from a loader offset table."""
+    loader = _INNO_LOADERS.get(data[:12])
+    if loader is None or len(data) < 64:
+        return None
+    pos = 12
+    if loader >= (5, 1, 5):
+        if _u32(data, pos) != 1:
+            raise HeaderError(f"unknown Inno Setup offset table revision {_u32(data, pos)}")
+        pos += 4
+    pos += 8  # total size, setup EXE offset
+    pos += 4 if loader >= (4, 1, 6) else 8  # setup EXE sizes
+    pos += 4  # setup EXE checksum
+    if loader < (4, 0, 0):
+        pos += 4  # messages offset
+    setup0, setup1 = struct.unpack_from("<II", data, pos)
+    pos += 8
+    if loader >= (4, 0, 10) and zlib.crc32(data[:pos]) != _u32(data, pos):
+        raise HeaderError("Inno Setup offset table CRC mismatch")
+    return loader, setup0, setup1
+
+
+def _inno_chunks(f: BinaryIO, start: int, stored: int) -> Iterator[bytes]:
+    end = start + stored
+    while start < end:
+        data = _read(f, start, min(4 + _INNO_CHUNK, end - start))
+        if len(data) < 5 or zlib.crc32(data[4:]) != _u32(data):
+            raise HeaderError(f"setup header chunk at 0x{start:X} fails its CRC")
+        yield data[4:]
+        start += len(data)
+
+
+def _inno_fields(
+    f: BinaryIO, at: int, version: Tuple[int, ...], unicode: bool, info: Dict[str, Any],
+) -> Dict[str, str]:
+    """The leading strings of the setup header block at at."""
+    if version >= (4, 0, 9):
+        head = _read(f, at, 9)
+        stored, compressed = struct.unpack_from("<IB", head, 4)
+        method = ("lzma" if version >= (4, 1, 6) else "zlib") if compressed else "stored"
+    else:
+        head = _read(f, at, 12)
+        packed, unpacked = struct.unpack_from("<II", head, 4)
+        method, stored = ("stored", unpacked) if packed == 0xFFFFFFFF else ("zlib", packed)
+        stored += -(-stored // _INNO_CHUNK) * 4  # a CRC per chunk
+    if zlib.crc32(head[4:]) != _u32(head):
+        raise HeaderError("setup header block CRC mismatch")
+    info["Compression"] = method
+    src = _Unpacked(_Chunks(_inno_chunks(f, at + len(head), stored)), method)
+    if version < (1, 3, 0):
+        src.take(4)  # uncompressed size
+    fields: Dict[str, str] = {}
+    for name, since, until, ansi in _INNO_FIELDS:
+        if (since is not None and version < since) or (until is not None and version >= until):
+            continue
+        raw = src.take(_u32(src.take(4)))
+        fields[name] = raw.decode("utf-16-le" if unicode and not ansi else "cp1252", "replace")
+    return fields
+
+
+def _inno_flag(value: Optional[str]) -> bool:
+    """A yes/no setting; anything but a plain no (e.g. a check function) counts as yes."""
+    return (value or "yes").strip().lower() not in ("no", "false", "0")
+
+
+# ----- NSIS ------------------------------------------------------------------
+
+
+def _nsis_header(f: BinaryIO, image: PeImage) -> Optional[EngineHeader]:
+    if image.overlay is None:
+        return None
+    start, end = image.overlay
+    first = _nsis_first(_read(f, start, _NSIS_FIRST.size))
+    at = start
+    if first is None:
+        base = start - start % _NSIS_ALIGN
+        window = _read(f, base, min(end - base, _NSIS_SEARCH + _NSIS_FIRST.size))
+        for pos in range(_NSIS_ALIGN, len(window) - _NSIS_FIRST.size + 1, _NSIS_ALIGN):
+            first = _nsis_first(window[pos:pos + _NSIS_FIRST.size])
+            if first is not None:
+                at = base + pos
+                break
+        else:
+            return None
+    flags, header_size, data_size = first
+    if header_size < 4 + 8 * _NSIS_BLOCKS or at + data_size > image.file_size:
+        return None
+
+    manifest = _NSIS_VERSION.search(image.manifest or "")
+    header = EngineHeader(
+        engine="NSIS",
+        offset=at,
+        evidence=f"NSIS first header (0xDEADBEEF NullsoftInst) at 0x{at:X}",
+        info={
+            "Engine": "NSIS",
+            "Version": manifest.group(1) if manifest else None,
+            "HeaderOffset": at,
+            "HeaderSize": header_size,
+            "DataSize": data_size,
+            "Silent": bool(flags & _NSIS_SILENT),
+            "Uninstaller": bool(flags & _NSIS_UNINSTALLER),
+        },
+    )
+    if flags & _NSIS_UNINSTALLER:
+        header.notes.append("NSIS header flags mark this EXE as an uninstaller.")
+    if flags & _NSIS_SILENT:
+        header.notes.append("NSIS header flags: the installer always runs silently.")
+    try:
+        _nsis_decode(f, at + _NSIS_FIRST.size, at + data_size, header_size, header)
+    except (HeaderError, struct.error) as e:
+        header.notes.append(f"NSIS header not decoded: {e}.")
+    return header
+
+
+def _nsis_first(data: bytes) -> Optional[Tuple[int, int, int]]:
+    if len(data) < _NSIS_FIRST.size:
+        return None
+    flags, signature, magic, header_size, data_size = _NSIS_FIRST.unpack(data)
+    if signature != _NSIS_SIGNATURE or magic != _NSIS_MAGIC:
+        return None
+    return flags, header_size, data_size
+
+
+def _is_lzma(p: bytes) -> bool:
+    return len(p) >= 6 and p[0] == 0x5D and p[1] == 0 and p[2] == 0 and p[5] == 0
+
+
+def _is_bzip2(p: bytes) -> bool:
+    return len(p) >= 2 and p[0] == 0x31 and p[1] < 14
+
+
+def _nsis_decode(f: BinaryIO, start: int, end: int, header_size: int, header: EngineHeader) -> None:
+    """Tell the compression from the bytes at start, then decode the install header."""
+    sig = _read(f, start, 16)
+    first = _u32(sig)
+    x86 = False
+    if first == header_size:
+        method, solid, at = "stored", False, start + 4
+    else:
+        # Solid: one stream from here on. Otherwise a block, its size with the
+        # top bit set when compressed (blocks are under 16 MB, so the top byte
+        # is 0x80). LZMA may have a filter flag byte first.
+        solid = first >> 24 != 0x80
+        at = start if solid else start + 4
+        if not solid:
+            end = min(end, at + (first & 0x7FFFFFFF))
+        body = sig[at - start:]
+        flagged = not _is_lzma(body) and body[0] <= 1 and _is_lzma(body[1:])
+        method = "lzma" if _is_lzma(body) or flagged else "bzip2" if _is_bzip2(body) else "zlib"
+        if flagged:
+            x86, at = body[0] == 1, at + 1
+    header.info["Compression"] = method
+    header.info["Solid"] = solid
+    if method == "bzip2":
+        raise HeaderError("bzip2 headers are not decoded")
+    if header_size > MAX_HEADER:
+        raise HeaderError(f"the header is over {MAX_HEADER // 1024 ** 2} MB")
+    src = _Unpacked(_Chunks(_file_chunks(f, at, end)), "deflate" if method == "zlib" else method, x86=x86)
+    if solid and _u32(src.take(4)) != header_size:
+        raise HeaderError("the solid stream does not start with the header")
+    _nsis_install_header(src.take(header_size), header)
+
+
+def _nsis_install_header(h: bytes, header: EngineHeader) -> None:
+    """Uninstall key values written by the install header's entries."""
+    blocks = [struct.unpack_from("<II", h, 4 + 8 * i) for i in range(_NSIS_BLOCKS)]
+    entries_at, entries = blocks[2]
+    strings_at = blocks[3][0]
+    strings_end = min([o for o, _ in blocks if o > strings_at] + [len(h)])
+    if entries_at + entries * _NSIS_ENTRY.size > len(h) or strings_at >= strings_end:
+        raise HeaderError("the install header's blocks are out of range")
+    strings = h[strings_at:strings_end]
+    unicode = strings[:2] == b"\0\0"
+    header.info["Unicode"] = unicode
+
+    key: Optional[Tuple[str, str]] = None
+    values: Dict[str, Tuple[str, bool]] = {}
+    literal_key = True
+    for i in range(entries):
+        _, root, key_ptr, name_ptr, value_ptr, value_type, _ = _NSIS_ENTRY.unpack_from(h, entries_at + i * 28)
+        if root not in _NSIS_ROOTS or value_type not in _NSIS_VALUE_TYPES:
+            continue
+        path, literal = _nsis_string(strings, key_ptr, unicode)
+        if not path.lower().startswith(UNINSTALL_KEY.lower()) or len(path) <= len(UNINSTALL_KEY):
+            continue
+        if key is None:
+            key, literal_key = (_NSIS_ROOTS[root], path), literal
+        elif key != (_NSIS_ROOTS[root], path):
+            continue
+        if value_type == 1:
+            values[_nsis_string(strings, name_ptr, unicode)[0]] = _nsis_string(strings, value_ptr, unicode)
+    if key is None:
+        header.notes.append("The NSIS script writes no uninstall registry key.")
+        return
+
+    for name in ("DisplayName", "DisplayVersion", "Publisher"):
+        if name in values:
+            header.info[name] = values[name][0]
+    if literal_key:
+        header.uninstall_key = key
+    else:
+        header.notes.append(f"The NSIS uninstall key {key[1]} uses variables; it is only known at install time.")
+    if "QuietUninstallString" in values:
+        header.uninstall_command, header.quiet_uninstall = values["QuietUninstallString"][0], True
+    elif "UninstallString" in values:
+        header.uninstall_command = values["UninstallString"][0]
+
+
+def _nsis_string(table: bytes, index: int, unicode: bool) -> Tuple[str, bool]:
+    """
+    (text, literal) of the string at index (in characters) of an NSIS string
+    table. Variables are rendered as in scripts and make it not literal.
+    """
+    out: List[str] = []
+    literal = True
+    width = 2 if unicode else 1
+    # Characters are collected as raw code units and decoded run by run, so
+    # UTF-16 surrogate pairs (characters outside the BMP) come out whole.
+    run = bytearray()
+
+    def flush() -> None:
+        if run:
+            out.append(run.decode("utf-16-le" if unicode else "cp1252", "replace"))
+            run.clear()
+
+    pos = index * width
+    while pos + width <= len(table):
+        unit = table[pos:pos + width]
+        c = int.from_bytes(unit, "little")
+        pos += width
+        if c == 0:
+            break
+        code = _NSIS_CODES.get(c) if not unicode or c <= 4 else None
+        if code is None:
+            run += unit
+            continue
+        if code == "skip":
+            run += table[pos:pos + width]
+            pos += width
+            continue
+        flush()
+        literal = False
+        low, high = table[pos:pos + 2].ljust(2, b"\0")
+        arg = (low | high << 8) & 0x7FFF if unicode else (low & 0x7F) | (high & 0x7F) << 7
+        pos += 2
+        if code == "var":
+            out.append(_NSIS_VARS[arg] if arg < len(_NSIS_VARS) else f"$var{arg}")
+        elif code == "shell":
+            out.append(f"$SHELLFOLDER{arg}")
+        else:
+            out.append(f"$(LangString{arg})")
+    flush()
+    return "".join(out), literal
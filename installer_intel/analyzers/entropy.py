@@ -0,0 +1,134 @@
+"""
+Block entropy of file ranges, to find compressed or encrypted data.
+
+Installer payloads (LZMA, zlib, CAB) are close to uniformly distributed
+bytes, and the strings string extraction finds in them are coincidences.
+Each range is split into BLOCK-sized blocks and the entropy of every block
+is estimated from a fixed sample of its bytes (every SAMPLE_STRIDE-th one,
+with the Miller-Madow bias correction), which costs a small fraction of
+extracting strings from the same bytes. With numpy installed the histograms
+of a whole window of blocks are computed in one call; without it each
+block is counted with collections.Counter. Both produce the same entropy.
+"""
+
+from __future__ import annotations
+
+import math
+from collections import Counter
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, BinaryIO, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from installer_intel.analyzers.stream import DEFAULT_MAX_MEMORY, window_size
+from installer_intel.timings import count, stage
+
+if TYPE_CHECKING:
+    from installer_intel.analyzers.hashing import StreamHasher
+
+try:
+    import numpy as np
+except ImportError:  # optional: pure-Python histograms
+    np = None
+
+BLOCK = 64 * 1024
+SAMPLE_STRIDE = 16
+# Bits per byte at or above which a block counts as compressed. Compressed
+# and encrypted data estimates at 7.95-8.0, machine code and text well below.
+COMPRESSED_ENTROPY = 7.9
+
+_SAMPLES = BLOCK // SAMPLE_STRIDE
+_LOG2 = [0.0] + [math.log2(n) for n in range(1, _SAMPLES + 1)]
+_BIAS = 1 / (2 * _SAMPLES * math.log(2))
+
+Range = Tuple[int, int]
+
+
+@dataclass(frozen=True)
+class EntropyRegion:
+    """A run of adjacent compressed blocks."""
+
+    start: int
+    end: int
+    entropy: float  # mean bits per byte over the run
+
+    @property
+    def size(self) -> int:
+        return self.end - self.start
+
+
+def _entropy(histogram: Iterable[int]) -> float:
+    """Bias-corrected entropy in bits per byte of a _SAMPLES-byte sample."""
+    total = 0.0
+    bins = 0
+    for n in histogram:
+        if n:
+            total += n * _LOG2[n]
+            bins += 1
+    return _LOG2[_SAMPLES] - total / _SAMPLES + (bins - 1) * _BIAS
+
+
+def _histograms(data: bytes, blocks: int) -> List[Sequence[int]]:
+    """Sample histograms of the first blocks full blocks of data."""
+    if np is not None:
+        sample = np.frombuffer(data, dtype=np.uint8, count=blocks * BLOCK)[::SAMPLE_STRIDE]
+        keys = sample.astype(np.intp) + np.repeat(np.arange(blocks, dtype=np.intp) * 256, _SAMPLES)
+        return np.bincount(keys, minlength=blocks * 256).reshape(blocks, 256).tolist()
+    out = []
+    for i in range(blocks):
+        counts = Counter(data[i * BLOCK:(i + 1) * BLOCK:SAMPLE_STRIDE])
+        out.append([counts[b] for b in range(256)])  # byte order, like bincount
+    return out
+
+
+def iter_block_entropy(
+    f: BinaryIO,
+    start: int,
+    end: int,
+    max_memory: int = DEFAULT_MAX_MEMORY,
+    hasher: Optional["StreamHasher"] = None,
+) -> Iterator[Tuple[int, float]]:
+    """
+    Yield (block offset, bits per byte) for each full BLOCK of [start, end),
+    from start. A trailing partial block is not reported.
+    """
+    window = max(BLOCK, window_size(max_memory) // BLOCK * BLOCK)
+    pos = start
+    f.seek(start)
+    while end - pos >= BLOCK:
+        data = f.read(min(window, (end - pos) // BLOCK * BLOCK))
+        count(bytes_read=len(data))
+        if hasher is not None:
+            hasher.update(pos, data)
+        blocks = len(data) // BLOCK
+        if not blocks:
+            return
+        for i, histogram in enumerate(_histograms(data, blocks)):
+            yield pos + i * BLOCK, _entropy(histogram)
+        pos += blocks * BLOCK
+
+
+def compressed_regions(
+    f: BinaryIO,
+    ranges: Iterable[Range],
+    max_memory: int = DEFAULT_MAX_MEMORY,
+    threshold: float = COMPRESSED_ENTROPY,
+    hasher: Optional["StreamHasher"] = None,
+) -> List[EntropyRegion]:
+    """Runs of blocks at or above threshold within ranges, in file order."""
+    out: List[EntropyRegion] = []
+    with stage("entropy"):
+        for start, end in ranges:
+            run: List[float] = []
+            run_start = start
+            for offset, bits in iter_block_entropy(f, start, end, max_memory, hasher):
+                if bits >= threshold:
+                    if not run:
+                        run_start = offset
+                    run.append(bits)
+                    continue
+                if run:
+                    out.append(EntropyRegion(run_start, offset, sum(run) / len(run)))
+                    run = []
+            if run:
+                run_end = run_start + len(run) * BLOCK
+                out.append(EntropyRegion(run_start, run_end, sum(run) / len(run)))
+    return out
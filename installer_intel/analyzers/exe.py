@@ -1,63 +1,399 @@
 from __future__ import annotations
 
 import os
-from installer_intel.models import CommandCandidate, DetectionRule, Evidence, InstallPlan
-from installer_intel.analyzers.signatures import detect_installer_type
+from typing import TYPE_CHECKING, BinaryIO, Dict, List, Optional, Sequence, Tuple
 
+from installer_intel.records import CommandCandidate, Coverage, DetectionRule, Evidence, Plan
+from installer_intel.analyzers.engines import EngineHeader, read_engine_header
+from installer_intel.analyzers.entropy import EntropyRegion, compressed_regions
+from installer_intel.analyzers.hashing import StreamHasher, check_algorithms, hash_version, record_digests
+from installer_intel.analyzers.nested import MAX_NESTING, adopt_children, embedded_plans
+from installer_intel.analyzers.parallel import default_workers, parallel_path, scan_parallel
+from installer_intel.analyzers.pe import (
+    RT_MANIFEST,
+    RT_VERSION,
+    PeFormatError,
+    PeImage,
+    Range,
+    merge_ranges,
+    parse_pe,
+    subtract_ranges,
+)
+from installer_intel.analyzers.signatures import SignatureHit, SignatureSet, get_signatures
+from installer_intel.analyzers.stream import DEFAULT_MAX_MEMORY, iter_file_strings
+from installer_intel.analyzers.strings import MAX_RUN
+from installer_intel.timings import stage
 
-def analyze_exe(exe_path: str) -> InstallPlan:
+if TYPE_CHECKING:
+    from installer_intel.cache import ResultCache
+
+# Version resource strings copied into the plan metadata.
+_VERSION_FIELDS = ("ProductName", "CompanyName", "FileDescription", "FileVersion", "ProductVersion")
+
+# Tiers, in scan order (unless an Inno Setup or NSIS header settles the
+# type first: see analyzers.engines):
+# - triage: bounded regions (file head, version/manifest resources, head and
+#   tail of the overlay); a few hundred KB however big the file.
+# - stub: the rest of the PE image ("file": the rest of a non-PE file).
+# - payload: overlay and large resources. Below deep, blocks of compressed
+#   data are found by their entropy and not string-scanned.
+# Depths limit how far the tiers go:
+# - triage: the triage tier only.
+# - standard: until a tier settles the type; the payload only if nothing
+#   matched before it.
+# - deep: every tier, without stopping early.
+DEPTHS = ("triage", "standard", "deep")
+DEFAULT_DEPTH = "standard"
+
+TRIAGE_HEAD = 512 * 1024
+TRIAGE_OVERLAY_HEAD = 256 * 1024
+TRIAGE_TAIL = 64 * 1024
+_TRIAGE_RESOURCE = 64 * 1024
+# Triage settles a file only with a single, confident signature.
+TRIAGE_CONFIDENCE = 0.80
+# Tiers whose compressed blocks are skipped below deep.
+_BULK_TIERS = ("payload", "file")
+# Compressed regions at least this large are reported as evidence.
+_REPORT_REGION = 1024 * 1024
+# A decoded engine header is exact, unlike a string match.
+HEADER_CONFIDENCE = 0.99
+
+
+def analyze_exe(
+    exe_path: str,
+    max_memory: int = DEFAULT_MAX_MEMORY,
+    signatures: Optional[SignatureSet] = None,
+    cache: Optional["ResultCache"] = None,
+    depth: str = DEFAULT_DEPTH,
+    hashes: Sequence[str] = (),
+    workers: Optional[int] = None,
+) -> Plan:
+    """
+    Analyze an EXE. hashes names digests (see HASH_ALGORITHMS) to record in
+    the plan metadata, with a file_hash detection rule; they are computed
+    from the same reads as the scan. Tiers with PARALLEL_MIN_BYTES or more
+    to scan are scanned on up to workers processes (default: one per CPU;
+    see analyzers.parallel), with the same result.
+    """
+    if depth not in DEPTHS:
+        raise ValueError(f"Unknown depth {depth!r} (choose from {', '.join(DEPTHS)})")
+    hashes = check_algorithms(hashes)
+    workers = default_workers() if workers is None else max(1, workers)
+    if cache is not None:
+        # Cached per content hash, signature set, depth and digests, so
+        # editing the signature database invalidates earlier results. The
+        # SHA-256 the cache is keyed by comes out of the same pass.
+        sigs = signatures or get_signatures()
+        digests: Dict[str, str] = {}
+
+        def analyze() -> Plan:
+            with stage("plan"):
+                return _analyze_exe(exe_path, max_memory, sigs, depth, hashes, digests, workers)
+
+        return cache.get_or_analyze(exe_path, exe_cache_version(sigs, depth, hashes), analyze, digests)
+
+    with stage("plan"):
+        return _analyze_exe(exe_path, max_memory, signatures, depth, hashes, workers=workers)
+
+
+def exe_cache_version(signatures: SignatureSet, depth: str = DEFAULT_DEPTH, hashes: Sequence[str] = ()) -> str:
+    version = f"exe:{signatures.version}"
+    if depth != DEFAULT_DEPTH:
+        version += f":{depth}"
+    return version + hash_version(hashes)
+
+
+def _tiers(image: Optional[PeImage], size: int) -> List[Tuple[str, List[Range]]]:
+    """(tier, file ranges) in the order they are scanned; ranges never repeat."""
+    if image is None:
+        triage = merge_ranges([(0, min(size, TRIAGE_HEAD)), (max(0, size - TRIAGE_TAIL), size)])
+        return [("triage", triage), ("file", subtract_ranges([(0, size)], triage, 2 * MAX_RUN))]
+
+    primary, deferred = image.scan_ranges()
+    triage = [(0, min(image.image_end, TRIAGE_HEAD))]
+    triage += [
+        (r.offset, r.offset + min(r.size, _TRIAGE_RESOURCE))
+        for r in image.resources if r.type in (RT_VERSION, RT_MANIFEST)
+    ]
+    if image.overlay is not None:
+        start, end = image.overlay
+        triage += [(start, min(end, start + TRIAGE_OVERLAY_HEAD)), (max(start, end - TRIAGE_TAIL), end)]
+    triage = merge_ranges(triage)
+    return [
+        ("triage", triage),
+        ("stub", subtract_ranges(primary, triage, 2 * MAX_RUN)),
+        ("payload", subtract_ranges(deferred, triage, 2 * MAX_RUN)),
+    ]
+
+
+def _counted(
+    f: BinaryIO, ranges: List[Range], max_memory: int, scanned: List[int], hasher: Optional[StreamHasher],
+):
+    """Strings of ranges; adds the bytes actually covered to scanned[0]."""
+    for start, end in ranges:
+        reached = start
+        try:
+            for item in iter_file_strings(f, max_memory, start=start, end=end, hasher=hasher):
+                reached = max(reached, item[0])
+                yield item
+            reached = end
+        finally:
+            scanned[0] += reached - start
+
+
+def _detect_tiered(
+    f: BinaryIO,
+    image: Optional[PeImage],
+    size: int,
+    max_memory: int,
+    signatures: Optional[SignatureSet],
+    depth: str,
+    hasher: Optional[StreamHasher] = None,
+    workers: int = 1,
+    engine: Optional[EngineHeader] = None,
+) -> Tuple[str, float, List[SignatureHit], Coverage, int, List[EntropyRegion]]:
+    """
+    Run tiers in order until one settles the type, within depth. Triage
+    settles with a single signature at TRIAGE_CONFIDENCE or more; later
+    tiers with any hit, so the payload is only scanned when the stub matched
+    nothing (strings in the installer engine itself are more telling than
+    whatever files the payload contains). An engine header settles the type
+    before any tier; deep still runs them all.
+    Returns the classification, the coverage, the bytes of tiers that did
+    not run and the compressed regions that were skipped.
+    """
+    sigs = signatures or get_signatures()
+    tiers = _tiers(image, size)
+    found: Dict[str, int] = {}
+    scanned = [0]
+    skipped = 0
+    regions: List[EntropyRegion] = []
+    decided = tiers[0][0]
+    installer_type, conf, hits = sigs.classify(found)
+    ran = 0
+    for tier, ranges in tiers:
+        if (depth == "triage" and tier != "triage") or (engine is not None and depth != "deep"):
+            break
+        ran += 1
+        if ranges and depth != "deep" and tier in _BULK_TIERS:
+            compressed = compressed_regions(f, ranges, max_memory, hasher=hasher)
+            if compressed:
+                regions += compressed
+                before = sum(end - start for start, end in ranges)
+                ranges = subtract_ranges(ranges, [(r.start, r.end) for r in compressed], 2 * MAX_RUN)
+                skipped += before - sum(end - start for start, end in ranges)
+        if ranges:
+            decided = tier
+            path = parallel_path(f, ranges, workers)
+            if path is not None:
+                scanned[0] += scan_parallel(
+                    f, path, ranges, sigs, found, depth != "deep", workers, max_memory, hasher,
+                )
+            else:
+                strings = _counted(f, ranges, max_memory, scanned, hasher)
+                try:
+                    found = sigs.scan(strings, found, stop_early=depth != "deep")
+                finally:
+                    strings.close()
+        installer_type, conf, hits = sigs.classify(found)
+        if depth == "deep":
+            continue
+        if tier == "triage" and len(hits) == 1 and hits[0].confidence >= TRIAGE_CONFIDENCE:
+            break
+        if tier != "triage" and hits:
+            break
+    if engine is not None:
+        installer_type, conf = engine.engine, HEADER_CONFIDENCE
+        if not ran:
+            decided = "header"
+    unscanned = sum(end - start for _, ranges in tiers[ran:] for start, end in ranges)
+    coverage = Coverage(
+        depth=depth, tier=decided, bytes_scanned=scanned[0], bytes_skipped=skipped, file_bytes=size,
+    )
+    return installer_type, conf, hits, coverage, unscanned, regions
+
+
+def _human(n: int) -> str:
+    for unit, scale in (("GB", 1024 ** 3), ("MB", 1024 ** 2), ("KB", 1024)):
+        if n >= scale:
+            return f"{n / scale:.1f} {unit}"
+    return f"{n} bytes"
+
+
+def _analyze_exe(
+    exe_path: str,
+    max_memory: int,
+    signatures: Optional[SignatureSet],
+    depth: str = DEFAULT_DEPTH,
+    hashes: Sequence[str] = (),
+    digests: Optional[Dict[str, str]] = None,
+    workers: int = 1,
+) -> Plan:
+    # Stream the file instead of reading it whole: memory stays bounded by
+    # max_memory no matter how large the installer is. Digests are fed from
+    # the same reads; with digests given (a cache key is wanted) SHA-256 is
+    # computed too and every digest is stored there.
+    size = os.path.getsize(exe_path)
+    algorithms = (*hashes, "sha256") if digests is not None else hashes
+    hasher = StreamHasher(exe_path, size, algorithms, max_memory) if algorithms else None
     with open(exe_path, "rb") as f:
-        data = f.read()
+        plan = exe_plan(f, size, exe_path, max_memory, signatures, depth, hasher, workers=workers)
+    if hasher is not None:
+        computed = hasher.hexdigests()
+        if digests is not None:
+            digests.update(computed)
+        if hashes:
+            record_digests(plan, {a: computed[a] for a in hashes})
+    return plan
+
+
+def exe_plan(
+    f: BinaryIO,
+    size: int,
+    exe_path: str,
+    max_memory: int,
+    signatures: Optional[SignatureSet],
+    depth: str,
+    hasher: Optional[StreamHasher] = None,
+    nesting: int = MAX_NESTING,
+    workers: int = 1,
+) -> Plan:
+    """
+    Plan of the EXE open as f, which may be a view of an embedded one or a
+    remote file; exe_path names it. Embedded packages are analyzed nesting
+    levels deep. Large tiers of a local file are scanned on workers
+    processes.
+    """
+    with stage("pe"):
+        try:
+            image: Optional[PeImage] = parse_pe(f, size)
+        except PeFormatError:
+            image = None
+    engine = None
+    if image is not None:
+        with stage("header"):
+            engine = read_engine_header(f, image)
+    installer_type, conf, hits, coverage, unscanned, regions = _detect_tiered(
+        f, image, size, max_memory, signatures, depth, hasher, workers, engine,
+    )
+    children: List[Plan] = []
+    nested_notes: List[str] = []
+    if image is not None and depth != "triage" and nesting > 0:
+        # Where bundles keep their packages: the overlay and large resources.
+        def analyze_child(view: BinaryIO, child_size: int, label: str, levels: int) -> Plan:
+            return exe_plan(view, child_size, label, max_memory, signatures, depth, None, levels)
 
-    installer_type, conf, hits = detect_installer_type(data)
+        children, nested_notes = embedded_plans(
+            f, image.scan_ranges()[1], exe_path, analyze_child, nesting, depth == "deep", max_memory, hasher,
+        )
 
-    plan = InstallPlan(
+    plan = Plan(
         input_path=exe_path,
         file_type="exe",
         installer_type=installer_type,
         confidence=conf,
         metadata={
             "FileName": os.path.basename(exe_path),
-            "SizeBytes": len(data),
+            "SizeBytes": size,
         },
+        coverage=coverage,
     )
 
+    if image is None:
+        plan.notes.append("Not a valid PE image; scanned as a flat file.")
+    else:
+        for key in _VERSION_FIELDS:
+            if key in image.version_info:
+                plan.metadata[key] = image.version_info[key]
+        plan.metadata["HasSignature"] = image.signed  # certificate present; not verified
+        level = image.requested_execution_level
+        if level:
+            plan.metadata["RequestedExecutionLevel"] = level
+    if engine is not None:
+        plan.metadata["SetupHeader"] = engine.info
+        plan.evidence.append(Evidence(kind="header", detail=engine.evidence))
+        plan.notes.extend(engine.notes)
+    if unscanned:
+        by = f"the {engine.engine} header" if coverage.tier == "header" else f"the {coverage.tier} tier"
+        plan.notes.append(
+            f"Decided by {by}; {unscanned / 1024 ** 2:.1f} MB was not string-scanned"
+            + (" (--depth deep scans everything)." if hits or engine or depth != "triage"
+               else "; try --depth standard.")
+        )
+
+    if coverage.bytes_skipped:
+        plan.notes.append(
+            f"Skipped {coverage.bytes_skipped / 1024 ** 2:.1f} MB of compressed data "
+            f"({100 * coverage.bytes_skipped / max(size, 1):.0f}% of the file; --depth deep scans it)."
+        )
+    for r in regions:
+        if r.size >= _REPORT_REGION:
+            plan.evidence.append(Evidence(
+                kind="entropy",
+                detail=f"Compressed payload at offset 0x{r.start:X}, {_human(r.size)} ({r.entropy:.2f} bits/byte)",
+            ))
+
     # Add evidence
     for h in hits:
         plan.notes.append(f"Hit: {h.name} ({h.confidence:.2f}) - {h.evidence}")
+        for pattern, offset in h.matches:
+            plan.evidence.append(
+                Evidence(kind="signature", detail=f"{h.name}: '{pattern}' at offset 0x{offset:X}")
+            )
 
     # Silent candidates by type (heuristic)
     it = installer_type.lower()
 
+    # With the engine's header decoded the engine is certain, and so are its switches.
+    source = "header" if engine is not None else "signature"
+
     if "inno" in it:
         plan.install_candidates.extend([
             CommandCandidate(
                 command=f'"{exe_path}" /VERYSILENT /SUPPRESSMSGBOXES /NORESTART /SP-',
-                confidence=0.88,
-                evidence=[Evidence(kind="signature", detail="Inno Setup common flags")],
+                confidence=0.95 if engine else 0.88,
+                evidence=[Evidence(kind=source, detail="Inno Setup common flags")],
             ),
             CommandCandidate(
                 command=f'"{exe_path}" /SILENT /SUPPRESSMSGBOXES /NORESTART /SP-',
                 confidence=0.62,
-                evidence=[Evidence(kind="signature", detail="Inno Setup alternate silent flags")],
+                evidence=[Evidence(kind=source, detail="Inno Setup alternate silent flags")],
             ),
         ])
-        plan.uninstall_candidates.append(
-            CommandCandidate(
-                command="unins000.exe /VERYSILENT /SUPPRESSMSGBOXES /NORESTART /SP-",
-                confidence=0.55,
-                evidence=[Evidence(kind="signature", detail="Inno Setup typical uninstaller name")],
+        if engine is None:
+            plan.uninstall_candidates.append(
+                CommandCandidate(
+                    command="unins000.exe /VERYSILENT /SUPPRESSMSGBOXES /NORESTART /SP-",
+                    confidence=0.55,
+                    evidence=[Evidence(kind="signature", detail="Inno Setup typical uninstaller name")],
+                )
+            )
+        elif engine.uninstall_command:
+            plan.uninstall_candidates.append(
+                CommandCandidate(
+                    command=f"{engine.uninstall_command} /VERYSILENT /SUPPRESSMSGBOXES /NORESTART",
+                    confidence=0.80,
+                    evidence=[Evidence(kind="header", detail="Uninstaller in UninstallFilesDir of the setup header")],
+                )
             )
-        )
 
     elif "nsis" in it:
         plan.install_candidates.append(
             CommandCandidate(
                 command=f'"{exe_path}" /S',
-                confidence=0.85,
-                evidence=[Evidence(kind="signature", detail="NSIS commonly supports /S")],
+                confidence=0.92 if engine else 0.85,
+                evidence=[Evidence(kind=source, detail="NSIS commonly supports /S")],
             )
         )
+        if engine is not None and engine.uninstall_command:
+            value = "QuietUninstallString" if engine.quiet_uninstall else "UninstallString"
+            plan.uninstall_candidates.append(
+                CommandCandidate(
+                    command=engine.uninstall_command if engine.quiet_uninstall else f"{engine.uninstall_command} /S",
+                    confidence=0.85 if engine.quiet_uninstall else 0.80,
+                    evidence=[Evidence(kind="header", detail=f"{value} written by the NSIS script")],
+                )
+            )
 
     elif "installshield" in it:
         plan.install_candidates.append(
@@ -117,6 +453,33 @@ def analyze_exe(exe_path: str) -> InstallPlan:
         ])
         plan.notes.append("Unknown installer type; silent switches are guesses. Add more signatures to improve.")
 
+    if engine is not None and engine.uninstall_key is not None:
+        hive, key = engine.uninstall_key
+        if engine.engine == "Inno Setup":
+            detail, confidence = "Uninstall key named by the AppId in the Inno Setup header (HKCU if per-user)", 0.85
+        elif hive == "SHCTX":
+            detail = "Uninstall key written by the NSIS script to SHCTX (HKLM if all-users, else HKCU)"
+            confidence = 0.75
+        else:
+            detail, confidence = "Uninstall key written by the NSIS script", 0.90
+        plan.detection_rules.append(
+            DetectionRule(
+                kind="registry_key",
+                value=f"{'HKLM' if hive == 'SHCTX' else hive}\\{key}",
+                confidence=confidence,
+                evidence=[Evidence(kind="header", detail=detail)],
+            )
+        )
+
+    if children:
+        adopt_children(plan, children)
+        codes = sum(1 for r in plan.detection_rules if r.kind == "msi_product_code")
+        plan.notes.append(
+            f"Found {len(children)} embedded container(s); see children"
+            + (f". ProductCodes of {codes} embedded MSI(s) are listed as detection rules." if codes else ".")
+        )
+    plan.notes.extend(nested_notes)
+
     # Minimal detection guess (weak): suggest checking ARP via DisplayName in trace mode later
     plan.detection_rules.append(
         DetectionRule(
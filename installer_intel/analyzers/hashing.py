@@ -0,0 +1,136 @@
+"""
+File digests computed from the buffers the analysis reads anyway.
+
+Hashing a multi-GB installer separately means reading it a second time. A
+StreamHasher is handed every buffer the read pipeline produces (string
+windows, entropy windows) together with its file offset. Buffers that
+continue where the digest stands are hashed in place; a gap of up to
+MAX_GAP before a buffer is read through a second handle, and buffers behind
+the digest position or further ahead are ignored (a later tier usually
+reaches the gap itself, so it is not read twice). Tiers are scanned roughly in file
+order, so most of the file reaches the digest this way; hexdigests() then
+reads only whatever the analysis never touched.
+"""
+
+from __future__ import annotations
+
+import hashlib
+from typing import BinaryIO, Callable, Dict, Iterable, Optional, Sequence, Tuple
+
+from installer_intel.records import DetectionRule, Evidence, Plan
+from installer_intel.analyzers.stream import DEFAULT_MAX_MEMORY, window_size
+from installer_intel.timings import count, stage
+
+# Digest algorithms, strongest first.
+HASH_ALGORITHMS = ("sha256", "sha1", "md5")
+
+MAX_GAP = 1024 * 1024
+
+
+def check_algorithms(algorithms: Iterable[str]) -> Tuple[str, ...]:
+    """Normalize algorithm names (lower case, strongest first, no repeats)."""
+    wanted = {a.strip().lower() for a in algorithms if a.strip()}
+    unknown = sorted(wanted - set(HASH_ALGORITHMS))
+    if unknown:
+        raise ValueError(
+            f"Unknown hash algorithm {', '.join(unknown)} (choose from {', '.join(HASH_ALGORITHMS)})"
+        )
+    return tuple(a for a in HASH_ALGORITHMS if a in wanted)
+
+
+def hash_version(algorithms: Sequence[str]) -> str:
+    """Cache version suffix for plans that record these digests."""
+    return f":h={'+'.join(algorithms)}" if algorithms else ""
+
+
+def record_digests(plan: Plan, digests: Dict[str, str]) -> None:
+    """
+    Add digests to the plan metadata ("SHA256", "SHA1", "MD5") and a
+    file_hash detection rule on the strongest one.
+    """
+    for algorithm in HASH_ALGORITHMS:
+        if algorithm in digests:
+            plan.metadata[algorithm.upper()] = digests[algorithm]
+    strongest = next((a for a in HASH_ALGORITHMS if a in digests), None)
+    if strongest is None:
+        return
+    plan.detection_rules.append(
+        DetectionRule(
+            kind="file_hash",
+            value=f"{strongest}:{digests[strongest]}",
+            confidence=0.40,
+            evidence=[Evidence(
+                kind="hash",
+                detail="Identifies this exact installer file (package dedupe, content checks), not the installed app",
+            )],
+        )
+    )
+
+
+class StreamHasher:
+    """
+    Digests of one file, fed in file order by the read pipeline. Parts it
+    is not offered are read on a handle of its own, from opener() if given
+    (e.g. for a remote file) or else by opening path.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        size: int,
+        algorithms: Iterable[str],
+        max_memory: int = DEFAULT_MAX_MEMORY,
+        opener: Optional[Callable[[], BinaryIO]] = None,
+    ) -> None:
+        self.path = path
+        self._opener = opener or (lambda: open(path, "rb"))
+        self.size = size
+        self.pos = 0  # bytes [0, pos) are in the digests
+        self._hashes = {a: hashlib.new(a) for a in check_algorithms(algorithms)}
+        self._window = window_size(max_memory)  # read size for gaps and the rest
+        self._digests: Optional[Dict[str, str]] = None
+
+    def update(self, offset: int, data) -> None:
+        """
+        Offer a buffer (bytes, or a memoryview into a mapping) that starts
+        at offset. Takes whatever extends the digest, reading gaps of up to
+        MAX_GAP itself.
+        """
+        end = offset + len(data)
+        if end <= self.pos or offset - self.pos > MAX_GAP or self._digests is not None:
+            return
+        with stage("hash"):
+            if offset > self.pos:
+                self._read_to(offset)
+            view = memoryview(data)
+            try:
+                self._feed(view[self.pos - offset:])
+            finally:
+                view.release()
+            self.pos = end
+
+    def hexdigests(self) -> Dict[str, str]:
+        """{algorithm: hex digest}, reading the part of the file not yet fed."""
+        if self._digests is None:
+            with stage("hash"):
+                self._read_to(self.size)
+            self._digests = {a: h.hexdigest() for a, h in self._hashes.items()}
+        return self._digests
+
+    def _feed(self, data) -> None:
+        for h in self._hashes.values():
+            h.update(data)
+
+    def _read_to(self, end: int) -> None:
+        if end <= self.pos:
+            return
+        # A handle of our own, so the scanner's file position is untouched.
+        with self._opener() as f:
+            f.seek(self.pos)
+            while self.pos < end:
+                data = f.read(min(self._window, end - self.pos))
+                if not data:
+                    raise OSError(f"{self.path} shrank while it was being hashed")
+                count(bytes_read=len(data))
+                self._feed(data)
+                self.pos += len(data)
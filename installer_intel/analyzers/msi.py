@@ -1,14 +1,199 @@
 from __future__ import annotations
 
 import os
-from typing import Dict, Optional, Tuple
+import re
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Sequence, Tuple
 
-from installer_intel.models import CommandCandidate, DetectionRule, Evidence, InstallPlan
+from installer_intel.records import CommandCandidate, DetectionRule, Evidence, Plan
+from installer_intel.analyzers.cfb import CompoundFile, CompoundFileError
+from installer_intel.analyzers.hashing import StreamHasher, check_algorithms, hash_version, record_digests
+from installer_intel.analyzers.msidb import MsiDatabase
+from installer_intel.timings import stage
 
+if TYPE_CHECKING:
+    from installer_intel.cache import ResultCache
 
-def _read_msi_property(msi_path: str, prop: str) -> Optional[str]:
+# How many file / registry detection rules to suggest at most.
+_MAX_FILE_RULES = 2
+_MAX_REGISTRY_RULES = 2
+
+# Standard Windows Installer folder properties. Paths are rendered relative
+# to them in MSI notation, e.g. "[ProgramFilesFolder]Contoso\App\app.exe".
+_SYSTEM_FOLDERS = {
+    "AdminToolsFolder", "AppDataFolder", "CommonAppDataFolder", "CommonFiles64Folder",
+    "CommonFilesFolder", "DesktopFolder", "FavoritesFolder", "FontsFolder", "LocalAppDataFolder",
+    "MyPicturesFolder", "NetHoodFolder", "PersonalFolder", "PrintHoodFolder", "ProgramFiles64Folder",
+    "ProgramFilesFolder", "ProgramMenuFolder", "RecentFolder", "SendToFolder", "StartMenuFolder",
+    "StartupFolder", "System16Folder", "System64Folder", "SystemFolder", "TempFolder",
+    "TemplateFolder", "WindowsFolder", "WindowsVolume",
+}
+
+_REGISTRY_ROOTS = {0: "HKCR", 1: "HKCU", 2: "HKLM", 3: "HKU"}
+
+# Component.Attributes bit: KeyPath refers to the Registry table
+_COMPONENT_REGISTRY_KEYPATH = 0x0004
+# Upgrade.Attributes bit: detect only, do not remove
+_UPGRADE_ONLY_DETECT = 0x0002
+
+_PROPERTY_REF = re.compile(r"\[([A-Za-z_][A-Za-z0-9_.]*)\]")
+
+
+@dataclass
+class _MsiInfo:
+    properties: Dict[str, str]
+    source: Optional[str]  # "native" | "winapi" | None
+    key_files: List[Tuple[str, Optional[str], str]] = field(default_factory=list)  # (path, version, component)
+    registry_keys: List[Tuple[str, Optional[str], str]] = field(default_factory=list)  # (key, value name, component)
+    upgrades: List[Dict[str, Any]] = field(default_factory=list)
+
+
+def _long_name(name: str) -> str:
+    """Target long name from a 'short|long' (optionally 'target:source') MSI name."""
+    return name.split(":", 1)[0].split("|", 1)[-1]
+
+
+def _resolve_directories(db: MsiDatabase) -> Dict[str, str]:
+    table = db.table("Directory")
+    if table is None:
+        return {}
+    entries = {d: (parent, default) for d, parent, default in table.rows("Directory", "Directory_Parent", "DefaultDir")}
+    resolved: Dict[str, str] = {}
+
+    def resolve(key: str, depth: int = 0) -> str:
+        if key in resolved:
+            return resolved[key]
+        parent, default = entries.get(key, (None, "."))
+        if key in _SYSTEM_FOLDERS or parent is None or parent == key or depth > 64:
+            path = f"[{key}]"
+        else:
+            name = _long_name(default or ".")
+            path = resolve(parent, depth + 1)
+            if name != ".":
+                path += name + "\\"
+        resolved[key] = path
+        return path
+
+    for key in entries:
+        resolve(key)
+    return resolved
+
+
+def _format(value: str, props: Dict[str, str]) -> Optional[str]:
+    """Expand [Property] references; None if any stay unresolved."""
+    out = _PROPERTY_REF.sub(lambda m: props.get(m.group(1), m.group(0)), value)
+    return None if "[" in out else out
+
+
+def _read_key_files(db: MsiDatabase) -> List[Tuple[str, Optional[str], str]]:
+    """Executables that are component key paths, largest first."""
+    components = db.table("Component")
+    files = db.table("File")
+    if components is None or files is None:
+        return []
+
+    comp_dir: Dict[str, str] = {}
+    key_files: Dict[str, str] = {}
+    for comp, directory, attrs, key_path in components.rows("Component", "Directory_", "Attributes", "KeyPath"):
+        if comp is None:
+            continue
+        comp_dir[comp] = directory
+        if key_path and not (attrs or 0) & _COMPONENT_REGISTRY_KEYPATH:
+            key_files[key_path] = comp
+    if not key_files:
+        return []
+
+    dirs = _resolve_directories(db)
+    found = []
+    for file_key, comp, file_name, size, version in files.rows(
+        "File", "Component_", "FileName", "FileSize", "Version", where={"File": key_files.keys()},
+    ):
+        name = _long_name(file_name or "")
+        if not name.lower().endswith(".exe"):
+            continue
+        path = dirs.get(comp_dir.get(comp, ""), "") + name
+        found.append((size or 0, path, version, comp))
+    found.sort(key=lambda f: f[0], reverse=True)
+    return [(path, version, comp) for _, path, version, comp in found[:_MAX_FILE_RULES]]
+
+
+def _read_registry_keys(db: MsiDatabase, props: Dict[str, str]) -> List[Tuple[str, Optional[str], str]]:
+    """Registry values that are component key paths, with properties expanded."""
+    components = db.table("Component")
+    registry = db.table("Registry")
+    if components is None or registry is None:
+        return []
+
+    key_regs: Dict[str, str] = {}
+    for comp, attrs, key_path in components.rows("Component", "Attributes", "KeyPath"):
+        if comp and key_path and (attrs or 0) & _COMPONENT_REGISTRY_KEYPATH:
+            key_regs[key_path] = comp
+    if not key_regs:
+        return []
+
+    # Root -1 means HKLM for per-machine installs and HKCU otherwise.
+    per_machine = props.get("ALLUSERS") == "1"
+    found = []
+    for reg, root, key, name in registry.rows("Registry", "Root", "Key", "Name", where={"Registry": key_regs.keys()}):
+        hive = _REGISTRY_ROOTS.get(root) if root != -1 else ("HKLM" if per_machine else "HKCU")
+        key = _format(key or "", props)
+        if hive is None or not key:
+            continue
+        value_name = _format(name, props) if name else None
+        found.append((f"{hive}\\{key}", value_name, key_regs[reg]))
+        if len(found) >= _MAX_REGISTRY_RULES:
+            break
+    return found
+
+
+def _read_upgrades(db: MsiDatabase) -> List[Dict[str, Any]]:
+    table = db.table("Upgrade")
+    if table is None:
+        return []
+    return [
+        {
+            "UpgradeCode": code,
+            "VersionMin": vmin,
+            "VersionMax": vmax,
+            "Attributes": attrs,
+            "ActionProperty": action,
+        }
+        for code, vmin, vmax, attrs, action in table.rows(
+            "UpgradeCode", "VersionMin", "VersionMax", "Attributes", "ActionProperty",
+        )
+    ]
+
+
+def _read_native(msi_path: str) -> Optional[_MsiInfo]:
     """
-    Read an MSI property from the Property table via Windows-only _msi module.
+    Read everything analyze_msi needs with the built-in MSI reader (any
+    platform), opening the database once. Tables are only touched if needed.
+    """
+    try:
+        with stage("msi.open"):
+            db = MsiDatabase.open(msi_path)
+        with db:
+            return _read_database(db)
+    except (OSError, CompoundFileError):
+        return None
+
+
+def _read_database(db: MsiDatabase) -> _MsiInfo:
+    with stage("msi.properties"):
+        props = dict(db.properties())
+    with stage("msi.tables"):
+        return _MsiInfo(
+            properties=props,
+            source="native",
+            key_files=_read_key_files(db),
+            registry_keys=_read_registry_keys(db, props),
+            upgrades=_read_upgrades(db),
+        )
+
+
+def _read_properties_winapi(msi_path: str) -> Optional[Dict[str, str]]:
+    """
+    Read the Property table via Windows-only _msi module, in a single view.
     """
     try:
         import _msi  # type: ignore
@@ -20,35 +205,110 @@ def _read_msi_property(msi_path: str, prop: str) -> Optional[str]:
 
     try:
         db = _msi.OpenDatabase(msi_path, _msi.MSIDBOPEN_READONLY)
-        view = db.OpenView(f"SELECT `Value` FROM `Property` WHERE `Property`='{prop}'")
+        view = db.OpenView("SELECT `Property`, `Value` FROM `Property`")
         view.Execute(None)
-        rec = view.Fetch()
+        props: Dict[str, str] = {}
+        while True:
+            rec = view.Fetch()
+            if rec is None:
+                break
+            props[rec.GetString(1)] = rec.GetString(2)
         view.Close()
-        if rec is None:
-            return None
-        return rec.GetString(1)
+        return props
     except Exception:
         return None
 
 
-def analyze_msi(msi_path: str) -> InstallPlan:
-    product_code = _read_msi_property(msi_path, "ProductCode")
-    upgrade_code = _read_msi_property(msi_path, "UpgradeCode")
-    product_version = _read_msi_property(msi_path, "ProductVersion")
-    manufacturer = _read_msi_property(msi_path, "Manufacturer")
-    product_name = _read_msi_property(msi_path, "ProductName")
+def _read_msi(msi_path: str) -> _MsiInfo:
+    """
+    The built-in reader is tried first; the Windows Installer API is only a
+    fallback (properties only) for files it cannot parse.
+    """
+    info = _read_native(msi_path)
+    if info is not None:
+        return info
+    props = _read_properties_winapi(msi_path)
+    if props is not None:
+        return _MsiInfo(properties=props, source="winapi")
+    return _MsiInfo(properties={}, source=None)
+
+
+def analyze_msi(
+    msi_path: str, cache: Optional["ResultCache"] = None, hashes: Sequence[str] = (),
+) -> Plan:
+    """
+    Analyze an MSI. hashes names digests to record in the plan metadata,
+    with a file_hash detection rule (see analyze_exe).
+    """
+    hashes = check_algorithms(hashes)
+    if cache is not None:
+        # With digests requested, the hashing pass also yields the cache key.
+        digests: Dict[str, str] = {}
+        return cache.get_or_analyze(
+            msi_path,
+            "msi" + hash_version(hashes),
+            lambda: _analyze_msi(msi_path, hashes, digests),
+            digests if hashes else None,
+        )
+    return _analyze_msi(msi_path, hashes)
+
+
+def analyze_msi_buffer(buf, label: str, lenient: bool = False) -> Plan:
+    """
+    Analyze an MSI held in a bytes-like buffer: bytes, or a FileView onto
+    the part of a larger file it occupies, so an embedded MSI is read in
+    place. label stands in for the path. Raises CompoundFileError if buf is
+    not an MSI database, or with lenient returns the plan analyze_msi gives
+    such a file (a note that the database could not be read).
+    """
+    try:
+        with stage("msi.open"):
+            db = MsiDatabase(CompoundFile(buf))
+        with db:
+            info = _read_database(db)
+    except CompoundFileError:
+        if not lenient:
+            raise
+        info = _MsiInfo(properties={}, source=None)
+    return _build_plan(label, info)
+
+
+def _analyze_msi(msi_path: str, hashes: Sequence[str], digests: Optional[Dict[str, str]] = None) -> Plan:
+    with stage("plan"):
+        info = _read_msi(msi_path)
+        plan = _build_plan(msi_path, info)
+        if hashes:
+            # The database reader only touches the streams it needs, so the
+            # digests take one sequential pass of their own.
+            algorithms = (*hashes, "sha256") if digests is not None else hashes
+            computed = StreamHasher(msi_path, os.path.getsize(msi_path), algorithms).hexdigests()
+            if digests is not None:
+                digests.update(computed)
+            record_digests(plan, {a: computed[a] for a in hashes})
+        return plan
+
+
+def _build_plan(msi_path: str, info: _MsiInfo) -> Plan:
+    props = info.properties
+    product_code = props.get("ProductCode") or None
+    upgrade_code = props.get("UpgradeCode") or None
+    product_version = props.get("ProductVersion") or None
+    manufacturer = props.get("Manufacturer") or None
+    product_name = props.get("ProductName") or None
 
-    meta: Dict[str, Optional[str]] = {
+    meta: Dict[str, Any] = {
         "ProductName": product_name,
         "ProductCode": product_code,
         "UpgradeCode": upgrade_code,
         "ProductVersion": product_version,
         "Manufacturer": manufacturer,
     }
+    if info.upgrades:
+        meta["Upgrades"] = info.upgrades
 
     confidence = 0.95 if product_code else 0.75
 
-    plan = InstallPlan(
+    plan = Plan(
         input_path=msi_path,
         file_type="msi",
         installer_type="MSI",
@@ -92,10 +352,49 @@ def analyze_msi(msi_path: str) -> InstallPlan:
             )
         )
 
-    # Extra helpful note if _msi isn't available
-    try:
-        import _msi  # type: ignore # noqa: F401
-    except Exception:
-        plan.notes.append("Python _msi module unavailable. Use CPython on Windows (not WSL) to read MSI properties.")
+    if upgrade_code:
+        plan.detection_rules.append(
+            DetectionRule(
+                kind="msi_upgrade_code",
+                value=upgrade_code,
+                confidence=0.75,
+                evidence=[Evidence(kind="msi", detail="UpgradeCode matches any installed version of this product")],
+            )
+        )
+        removes = [
+            u for u in info.upgrades
+            if u["UpgradeCode"] == upgrade_code and not (u["Attributes"] or 0) & _UPGRADE_ONLY_DETECT
+        ]
+        if removes:
+            plan.notes.append("Major upgrade: installing removes earlier versions that share this UpgradeCode.")
+
+    for path, version, comp in info.key_files:
+        detail = f"Key file of component {comp}"
+        if version:
+            detail += f" (version {version})"
+        plan.detection_rules.append(
+            DetectionRule(
+                kind="file_exists",
+                value=path,
+                confidence=0.70,
+                evidence=[Evidence(kind="msi", detail=detail)],
+            )
+        )
+
+    for key, value_name, comp in info.registry_keys:
+        detail = f"Registry key path of component {comp}"
+        if value_name:
+            detail += f" (value '{value_name}')"
+        plan.detection_rules.append(
+            DetectionRule(
+                kind="registry_key",
+                value=key,
+                confidence=0.60,
+                evidence=[Evidence(kind="msi", detail=detail)],
+            )
+        )
+
+    if info.source is None:
+        plan.notes.append("Could not read the MSI database (not a valid MSI or unreadable file).")
 
     return plan
@@ -0,0 +1,374 @@
+"""
+Pure-Python reader for Windows Installer (MSI) databases.
+
+An MSI is a compound file whose streams hold the database tables:
+- stream names are compressed into the 0x3800-0x4840 UTF-16 range
+  (table streams carry a 0x4840 "!" prefix)
+- every string lives once in the string pool (_StringPool holds
+  length/refcount pairs, _StringData the concatenated bytes) and tables
+  refer to strings by 1-based index
+- tables are stored column by column
+
+The string pool is indexed once when the database is opened. Tables are
+described by _Tables/_Columns and read lazily: a table's stream is only
+read when rows are requested, only the requested columns are decoded, and
+rows are produced by a generator. Works on any platform, no Windows
+Installer APIs needed.
+"""
+
+from __future__ import annotations
+
+import codecs
+import struct
+from dataclasses import dataclass
+from typing import Collection, Dict, Iterator, List, Optional, Tuple
+
+from installer_intel.analyzers.cfb import CompoundFile, CompoundFileError
+
+_MIME = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz._"
+
+
+class MsiFormatError(CompoundFileError):
+    """Raised when a compound file does not look like an MSI database."""
+
+
+def decode_stream_name(name: str) -> str:
+    """Decode an MSI-compressed stream name, e.g. to '!_StringPool'."""
+    out: List[str] = []
+    for ch in name:
+        c = ord(ch)
+        if 0x3800 <= c < 0x4800:
+            c -= 0x3800
+            out.append(_MIME[c & 0x3F])
+            out.append(_MIME[(c >> 6) & 0x3F])
+        elif 0x4800 <= c < 0x4840:
+            out.append(_MIME[c - 0x4800])
+        elif c == 0x4840:
+            out.append("!")
+        else:
+            out.append(ch)
+    return "".join(out)
+
+
+def _codec_for(codepage: int) -> str:
+    name = {0: "cp1252", 65001: "utf-8"}.get(codepage, f"cp{codepage}")
+    try:
+        codecs.lookup(name)
+    except LookupError:
+        return "latin-1"
+    return name
+
+
+class StringPool:
+    """
+    Index of the MSI string pool. Lengths and offsets are computed once;
+    individual strings are decoded the first time they are requested.
+    """
+
+    def __init__(self, pool: bytes, data: bytes) -> None:
+        if len(pool) < 4:
+            raise MsiFormatError("String pool is missing or truncated")
+        words = struct.unpack(f"<{len(pool) // 2}H", pool[: len(pool) // 2 * 2])
+        self.codepage = words[0] | ((words[1] & 0x7FFF) << 16)
+        self.ref_size = 3 if words[1] & 0x8000 else 2
+        self._codec = _codec_for(self.codepage)
+        self._data = data
+
+        # index 0 is the null string
+        offsets = [0]
+        lengths = [0]
+        offset = 0
+        i = 2
+        n = len(words)
+        while i + 1 < n:
+            length = words[i]
+            refs = words[i + 1]
+            if length == 0 and refs != 0 and i + 3 < n:
+                # Strings over 64K: the next entry carries the full length.
+                length = words[i + 2] | (words[i + 3] << 16)
+                i += 4
+            else:
+                i += 2
+            offsets.append(offset)
+            lengths.append(length)
+            offset += length
+        self._offsets = offsets
+        self._lengths = lengths
+        self._cache: Dict[int, str] = {}
+        self._index: Optional[Dict[bytes, int]] = None
+
+    def __len__(self) -> int:
+        return len(self._offsets)
+
+    def get(self, index: int) -> Optional[str]:
+        """String for a 1-based pool index; None for index 0 (SQL NULL)."""
+        if index <= 0 or index >= len(self._offsets):
+            return None
+        s = self._cache.get(index)
+        if s is None:
+            start = self._offsets[index]
+            raw = self._data[start:start + self._lengths[index]]
+            s = raw.decode(self._codec, errors="replace")
+            self._cache[index] = s
+        return s
+
+    def index(self, value: str) -> int:
+        """
+        Pool index of a string (0 if absent). The reverse index is built once,
+        keyed on the encoded bytes so no string has to be decoded for it.
+        """
+        if self._index is None:
+            data = self._data
+            entries = zip(range(len(self._offsets) - 1, 0, -1), reversed(self._offsets), reversed(self._lengths))
+            self._index = {data[o:o + n]: i for i, o, n in entries}
+        try:
+            return self._index.get(value.encode(self._codec), 0)
+        except UnicodeEncodeError:
+            return 0
+
+
+# Column type bits as stored in _Columns.Type
+_TYPE_SIZE_MASK = 0x00FF
+_TYPE_MASK = 0x0C00
+_TYPE_STRING = 0x0C00
+_TYPE_BINARY = 0x0800
+_TYPE_NULLABLE = 0x1000
+_TYPE_KEY = 0x2000
+
+# Columns of the standard tables that hold text (True) or integers (False),
+# per the Windows Installer schema. A database that declares one of these
+# with the other type is damaged; rows() refuses it rather than hand back
+# values of the wrong type.
+_STANDARD_COLUMNS: Dict[str, Dict[str, bool]] = {
+    "Property": {"Property": True, "Value": True},
+    "Directory": {"Directory": True, "Directory_Parent": True, "DefaultDir": True},
+    "Component": {"Component": True, "ComponentId": True, "Directory_": True, "Attributes": False, "KeyPath": True},
+    "File": {"File": True, "Component_": True, "FileName": True, "FileSize": False, "Version": True},
+    "Registry": {"Registry": True, "Root": False, "Key": True, "Name": True, "Value": True, "Component_": True},
+    "Upgrade": {
+        "UpgradeCode": True, "VersionMin": True, "VersionMax": True, "Language": True, "Attributes": False,
+        "Remove": True, "ActionProperty": True,
+    },
+}
+
+
+@dataclass(frozen=True)
+class Column:
+    name: str
+    number: int
+    type: int
+
+    @property
+    def is_string(self) -> bool:
+        return self.type & _TYPE_MASK == _TYPE_STRING
+
+    @property
+    def is_binary(self) -> bool:
+        return self.type & _TYPE_MASK == _TYPE_BINARY
+
+    @property
+    def is_key(self) -> bool:
+        return bool(self.type & _TYPE_KEY)
+
+    def storage_size(self, ref_size: int) -> int:
+        if self.is_string:
+            return ref_size
+        if self.is_binary:
+            return 2
+        return 4 if self.type & _TYPE_SIZE_MASK == 4 else 2
+
+
+def _read_ints(raw: bytes, start: int, count: int, size: int) -> List[int]:
+    if size == 2:
+        return list(struct.unpack_from(f"<{count}H", raw, start))
+    if size == 4:
+        return list(struct.unpack_from(f"<{count}I", raw, start))
+    # 3-byte string refs: widen to 4 bytes with slice assignment, then unpack.
+    packed = raw[start:start + 3 * count]
+    wide = bytearray(4 * count)
+    for k in range(3):
+        wide[k::4] = packed[k::3]
+    return list(struct.unpack(f"<{count}I", wide))
+
+
+def _int_value(raw: int, size: int) -> Optional[int]:
+    # Integers are stored offset by 0x8000 / 0x80000000; 0 is NULL.
+    if raw == 0:
+        return None
+    return raw - (0x80000000 if size == 4 else 0x8000)
+
+
+class MsiTable:
+    """
+    One database table. Nothing is read until rows are requested; then only
+    the table's stream is read and only the requested columns are decoded.
+    """
+
+    def __init__(self, db: "MsiDatabase", name: str, columns: List[Column]) -> None:
+        self._db = db
+        self.name = name
+        self.columns = columns
+        self._by_name = {c.name: c for c in columns}
+        self._pos = {c.name: i for i, c in enumerate(columns)}
+        ref = db.strings.ref_size
+        self._sizes = [c.storage_size(ref) for c in columns]
+        self._raw: Optional[bytes] = None
+        self._decoded: Dict[str, List[int]] = {}
+
+    def _stream(self) -> bytes:
+        if self._raw is None:
+            self._raw = self._db._read("!" + self.name) if self._db._has("!" + self.name) else b""
+        return self._raw
+
+    @property
+    def row_count(self) -> int:
+        row_size = sum(self._sizes)
+        return len(self._stream()) // row_size if row_size else 0
+
+    def _column_raw(self, name: str) -> List[int]:
+        """Raw stored values of one column (string refs or offset ints)."""
+        if name not in self._decoded:
+            pos = self._pos[name]
+            rows = self.row_count
+            start = rows * sum(self._sizes[:pos])
+            self._decoded[name] = _read_ints(self._stream(), start, rows, self._sizes[pos])
+        return self._decoded[name]
+
+    def _value(self, col: Column, raw: int):
+        if col.is_string:
+            return self._db.strings.get(raw)
+        if col.is_binary:
+            return None  # stream reference; not materialized
+        return _int_value(raw, self._sizes[self._pos[col.name]])
+
+    def _column(self, name: str) -> Column:
+        """The named column, checked against the standard schema."""
+        col = self._by_name.get(name)
+        if col is None:
+            raise MsiFormatError(f"{self.name} table has no {name} column")
+        text = _STANDARD_COLUMNS.get(self.name, {}).get(name)
+        if text is not None and (col.is_string != text or col.is_binary):
+            raise MsiFormatError(f"{self.name}.{name} is not {'a string' if text else 'an integer'} column")
+        return col
+
+    def rows(
+        self,
+        *names: str,
+        where: Optional[Dict[str, Collection]] = None,
+    ) -> Iterator[Tuple]:
+        """
+        Yield tuples of the named columns (all columns if none are named).
+        where={column: values} keeps only rows whose column is one of values;
+        the filter runs on stored values, so rejected rows are never decoded.
+        Raises MsiFormatError if a named column is missing, or is a standard
+        column declared with the wrong type.
+        """
+        cols = [self._column(n) for n in names] if names else list(self.columns)
+        if self.row_count == 0:
+            return
+
+        keep: Optional[List[bool]] = None
+        for name, wanted in (where or {}).items():
+            col = self._column(name)
+            raw = self._column_raw(name)
+            if col.is_string:
+                refs = {self._db.strings.index(v) for v in wanted}
+                mask = [r in refs for r in raw]
+            else:
+                size = self._sizes[self._pos[name]]
+                mask = [_int_value(r, size) in wanted for r in raw]
+            keep = mask if keep is None else [a and b for a, b in zip(keep, mask)]
+
+        columns = [(c, self._column_raw(c.name)) for c in cols]
+        for i in range(self.row_count):
+            if keep is not None and not keep[i]:
+                continue
+            yield tuple(self._value(c, raw[i]) for c, raw in columns)
+
+
+class MsiDatabase:
+    """
+    Read-only MSI database. Use MsiDatabase.open(path) (or wrap an existing
+    CompoundFile) and close it when done, or use it as a context manager.
+    Tables are loaded lazily through table().
+    """
+
+    def __init__(self, cf: CompoundFile) -> None:
+        self._cf = cf
+        self._streams = {decode_stream_name(name): name for name in cf.list_streams()}
+        if "!_StringPool" not in self._streams or "!_StringData" not in self._streams:
+            raise MsiFormatError("Compound file has no MSI string pool")
+        self.strings = StringPool(self._read("!_StringPool"), self._read("!_StringData"))
+        self._schema: Optional[Dict[str, List[Column]]] = None
+        self._tables: Dict[str, MsiTable] = {}
+        self._properties: Optional[Dict[str, str]] = None
+
+    @classmethod
+    def open(cls, path: str) -> "MsiDatabase":
+        cf = CompoundFile.open(path)
+        try:
+            return cls(cf)
+        except Exception:
+            cf.close()
+            raise
+
+    def close(self) -> None:
+        self._cf.close()
+
+    def __enter__(self) -> "MsiDatabase":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _has(self, decoded_name: str) -> bool:
+        return decoded_name in self._streams
+
+    def _read(self, decoded_name: str) -> bytes:
+        return self._cf.read_stream(self._streams[decoded_name])
+
+    def _load_schema(self) -> Dict[str, List[Column]]:
+        if self._schema is None:
+            schema: Dict[str, List[Column]] = {}
+            if self._has("!_Columns"):
+                cols = MsiTable(self, "_Columns", [
+                    Column("Table", 1, _TYPE_STRING | _TYPE_KEY),
+                    Column("Number", 2, _TYPE_KEY | 2),
+                    Column("Name", 3, _TYPE_STRING),
+                    Column("Type", 4, 2),
+                ])
+                for table, number, name, ctype in cols.rows():
+                    if table is None or number is None or name is None or ctype is None:
+                        continue
+                    schema.setdefault(table, []).append(Column(name, number, ctype))
+            for columns in schema.values():
+                columns.sort(key=lambda c: c.number)
+            self._schema = schema
+        return self._schema
+
+    def table_names(self) -> List[str]:
+        return list(self._load_schema())
+
+    def table(self, name: str) -> Optional[MsiTable]:
+        """The named table, or None if the database does not define it."""
+        if name not in self._tables:
+            columns = self._load_schema().get(name)
+            if columns is None:
+                return None
+            self._tables[name] = MsiTable(self, name, columns)
+        return self._tables[name]
+
+    def properties(self) -> Dict[str, str]:
+        """The Property table as a dict."""
+        if self._properties is None:
+            props: Dict[str, str] = {}
+            table = self.table("Property")
+            if table is not None:
+                for key, value in table.rows("Property", "Value"):
+                    if key is not None:
+                        props[key] = value or ""
+            self._properties = props
+        return self._properties
+
+    def get_property(self, name: str) -> Optional[str]:
+        return self.properties().get(name)
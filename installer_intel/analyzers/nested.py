@@ -0,0 +1,534 @@
+"""
+Installers embedded in installers: MSIs, CABs and zips inside an EXE.
+
+Burn bundles, InstallShield wrappers and many vendor EXEs carry the real
+package in their overlay or in a large resource. Containers are recognized
+by their headers (an OLE compound file, a CAB "MSCF" header, a zip local
+header whose end-of-central-directory record closes the range) and read in
+place through FileView, an offset-bounded view of the open file; nothing is
+written to disk.
+
+Below deep only the start of each range and the end of each container found
+are probed (a bundle's containers usually sit back to back at the start of
+its overlay), plus the zip whose directory ends the range, so the search
+costs a few small reads. Deep reads the ranges in full. MSI and EXE members
+of archives are analyzed in turn: stored ones through a view, compressed
+ones (zip deflate, CAB MSZIP) decompressed in memory up to max_memory;
+zips given as input (package.py) inflate larger deflated members as they
+are read instead. LZX and Quantum CAB folders are listed but not decoded.
+Nesting stops after MAX_NESTING levels, and at MAX_CHILDREN containers per
+file or members per archive.
+"""
+
+from __future__ import annotations
+
+import io
+import struct
+import zipfile
+import zlib
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, BinaryIO, Callable, Dict, List, Optional, Sequence, Tuple
+
+from installer_intel.records import DetectionRule, Embedded, Evidence, Plan
+from installer_intel.analyzers.cfb import CFB_MAGIC, CompoundFile, CompoundFileError
+from installer_intel.analyzers.decode import InflateFile
+from installer_intel.analyzers.msi import analyze_msi_buffer
+from installer_intel.analyzers.stream import DEFAULT_MAX_MEMORY, window_size
+from installer_intel.timings import count, stage
+
+if TYPE_CHECKING:
+    from installer_intel.analyzers.hashing import StreamHasher
+
+try:
+    import lzma
+except ImportError:  # Python built without it
+    lzma = None
+
+MAX_NESTING = 3
+MAX_CHILDREN = 16
+PROBE = 64 * 1024
+# A bundle may install only some of its packages, so an embedded MSI's
+# ProductCode is a little less certain for the parent than for the MSI.
+NESTED_CONFIDENCE = 0.85
+
+CAB_MAGIC = b"MSCF"
+ZIP_MAGIC = b"PK\x03\x04"
+_ZIP_CENTRAL = b"PK\x01\x02"
+_ZIP_END = b"PK\x05\x06"
+_MAGICS = ((CFB_MAGIC, "msi"), (CAB_MAGIC, "cab"), (ZIP_MAGIC, "zip"))
+_OVERLAP = max(len(magic) for magic, _ in _MAGICS) - 1
+
+_CAB_HEADER = struct.Struct("<4sIIIIIBBHHHHH")
+_CAB_FOLDER = struct.Struct("<IHH")
+_CAB_FILE = struct.Struct("<IIHHHH")
+_CAB_DATA = struct.Struct("<IHH")
+_CAB_RESERVE = 0x0004
+_CAB_LINKS = (0x0001, 0x0002)  # previous / next cabinet: two strings each
+_CAB_UTF8_NAME = 0x80
+_CAB_SPANNED = 0xFFFD  # folder index of files continued across cabinets
+_CAB_COMPRESSION = {0: "none", 1: "MSZIP", 2: "Quantum", 3: "LZX"}
+_CAB_DECODED = (0, 1)
+_MSZIP_HISTORY = 32 * 1024
+
+_ZIP_LOCAL = struct.Struct("<4sHHHHHIIIHH")
+_ZIP_EOCD = struct.Struct("<4sHHHHIIH")
+_ZIP_CENTRAL_SIZE = 46
+_ZIP_ENCRYPTED = 0x0001
+_ZIP_METHODS = {0: "stored", 8: "deflate", 12: "bzip2", 14: "lzma"}
+
+_PACKAGES = (".msi", ".exe")
+# What a damaged or misdetected container raises while it is read (OSError
+# from decoders such as bz2). A child that raises one is noted and skipped;
+# the parent's analysis goes on.
+CONTAINER_ERRORS = (CompoundFileError, ValueError, struct.error, zipfile.BadZipFile, zlib.error, EOFError, OSError) + (
+    (lzma.LZMAError,) if lzma is not None else ()
+)
+
+# analyze_exe(f, size, label, nesting) -> plan of an embedded EXE
+ExeAnalyzer = Callable[[BinaryIO, int, str, int], Plan]
+
+
+class FileView:
+    """
+    Read-only file object over bytes [start, end) of an open binary file
+    (or of another view). It can also be sliced like bytes, which is all
+    CompoundFile needs of its buffer. Every read seeks first, so views of
+    the same handle can be used in turn.
+    """
+
+    def __init__(self, f: BinaryIO, start: int, end: int) -> None:
+        self._f = f
+        self.start = start
+        self.end = end
+        self._pos = 0
+
+    def __len__(self) -> int:
+        return self.end - self.start
+
+    def __getitem__(self, key: slice) -> bytes:
+        start, stop, step = key.indices(len(self))
+        if step != 1:
+            raise ValueError("FileView slices must be contiguous")
+        return self._read_at(start, stop - start)
+
+    def _read_at(self, pos: int, n: int) -> bytes:
+        if n <= 0:
+            return b""
+        self._f.seek(self.start + pos)
+        return self._f.read(n)
+
+    def read(self, n: Optional[int] = -1) -> bytes:
+        left = max(0, len(self) - self._pos)
+        data = self._read_at(self._pos, left if n is None or n < 0 else min(n, left))
+        self._pos += len(data)
+        return data
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += len(self)
+        if offset < 0:
+            raise ValueError("Negative seek position")
+        self._pos = offset
+        return offset
+
+    def tell(self) -> int:
+        return self._pos
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+
+@dataclass(frozen=True)
+class Container:
+    kind: str  # "msi" | "cab" | "zip"
+    start: int
+    end: int
+    origin: int  # zips: where the directory's offsets count from; else start
+
+    @property
+    def size(self) -> int:
+        return self.end - self.start
+
+
+@dataclass
+class Member:
+    """An MSI or EXE inside an archive."""
+
+    name: str
+    size: int
+    offset: Optional[int] = None  # stored uncompressed at this offset
+    data: Optional[bytes] = None  # decompressed in memory
+    deflated: Optional[Tuple[int, int]] = None  # (offset, size) of raw deflate data, inflated as read
+    skipped: Optional[str] = None  # why it is not analyzed
+
+
+@dataclass
+class Archive:
+    files: int
+    compression: str
+    members: List[Member]
+
+
+def _read(f: BinaryIO, offset: int, size: int) -> bytes:
+    f.seek(offset)
+    data = f.read(size)
+    count(bytes_read=len(data))
+    return data
+
+
+# ----- finding containers ----------------------------------------------------
+
+
+def _candidates(data: bytes, limit: int) -> List[Tuple[int, str]]:
+    """(offset, kind) of every container magic in data that starts before limit."""
+    out = []
+    for magic, kind in _MAGICS:
+        at = data.find(magic, 0, limit + len(magic) - 1)
+        while at != -1:
+            out.append((at, kind))
+            at = data.find(magic, at + 1, limit + len(magic) - 1)
+    return sorted(out)
+
+
+def _cab_at(f: BinaryIO, offset: int, limit: int) -> Optional[Container]:
+    head = _read(f, offset, _CAB_HEADER.size)
+    if len(head) < _CAB_HEADER.size:
+        return None
+    (_magic, reserved, size, _, files_at, _, minor, major, folders, files, _, _, _) = _CAB_HEADER.unpack(head)
+    if reserved or (major, minor) != (1, 3) or not folders or not files:
+        return None
+    if not _CAB_HEADER.size <= files_at < size or offset + size > limit:
+        return None
+    return Container("cab", offset, offset + size, offset)
+
+
+def zip_closing(f: BinaryIO, start: int, limit: int) -> Optional[Container]:
+    """The zip whose end record closes [start, limit), if it starts inside."""
+    tail_at = max(start, limit - _ZIP_EOCD.size - 0xFFFF)
+    tail = _read(f, tail_at, limit - tail_at)
+    at = tail.rfind(_ZIP_END)
+    if at < 0 or len(tail) - at < _ZIP_EOCD.size:
+        return None
+    (_magic, _, _, _, entries, directory_size, directory_at, comment) = _ZIP_EOCD.unpack_from(tail, at)
+    end = tail_at + at
+    directory = end - directory_size
+    # Appended zips count offsets from their own start, "zip -A" fixed ones
+    # from the start of the file; either way this is where they count from.
+    origin = directory - directory_at
+    if not entries or origin < 0 or directory < start:
+        return None
+    entry = _read(f, directory, _ZIP_CENTRAL_SIZE)
+    if len(entry) < _ZIP_CENTRAL_SIZE or entry[:4] != _ZIP_CENTRAL:
+        return None
+    first = origin + struct.unpack_from("<I", entry, 42)[0]
+    if not start <= first < directory or _read(f, first, len(ZIP_MAGIC)) != ZIP_MAGIC:
+        return None
+    return Container("zip", first, min(limit, end + _ZIP_EOCD.size + comment), origin)
+
+
+def _container_at(f: BinaryIO, offset: int, kind: str, limit: int) -> Optional[Container]:
+    try:
+        if kind == "msi":
+            cf = CompoundFile(FileView(f, offset, limit))
+            return Container("msi", offset, min(limit, offset + cf.extent), offset)
+        if kind == "cab":
+            return _cab_at(f, offset, limit)
+        found = zip_closing(f, offset, limit)
+        return found if found is not None and found.start == offset else None
+    except (CompoundFileError, struct.error):
+        return None
+
+
+def find_containers(
+    f: BinaryIO,
+    ranges: Sequence[Tuple[int, int]],
+    exhaustive: bool = False,
+    max_memory: int = DEFAULT_MAX_MEMORY,
+    hasher: Optional["StreamHasher"] = None,
+) -> List[Container]:
+    """
+    Containers within ranges, in file order, at most MAX_CHILDREN. Below
+    exhaustive, PROBE bytes are searched at the start of each range and at
+    the end of each container found, and a zip is looked for at its end.
+    """
+    found: List[Container] = []
+    with stage("nested"):
+        for start, end in ranges:
+            span = window_size(max_memory) if exhaustive else PROBE
+            pos = start
+            while pos < end and len(found) < MAX_CHILDREN:
+                data = _read(f, pos, min(span + _OVERLAP, end - pos))
+                if hasher is not None:
+                    hasher.update(pos, data)
+                hit = None
+                for at, kind in _candidates(data, span):
+                    hit = _container_at(f, pos + at, kind, end)
+                    if hit is not None:
+                        break
+                if hit is not None:
+                    found.append(hit)
+                    pos = hit.end
+                elif exhaustive:
+                    pos += span
+                else:
+                    break
+            if not exhaustive and len(found) < MAX_CHILDREN:
+                tail = zip_closing(f, start, end)
+                if tail is not None and all(tail.start >= c.end or tail.end <= c.start for c in found):
+                    found.append(tail)
+    return sorted(found, key=lambda c: c.start)
+
+
+# ----- archive members -------------------------------------------------------
+
+
+def zip_data_at(f: BinaryIO, c: Container, info: zipfile.ZipInfo) -> int:
+    """File offset of a zip member's (possibly compressed) data."""
+    local = _ZIP_LOCAL.unpack(_read(f, c.origin + info.header_offset, _ZIP_LOCAL.size))
+    if local[0] != ZIP_MAGIC:
+        raise zipfile.BadZipFile(f"Bad local header for {info.filename}")
+    return c.origin + info.header_offset + _ZIP_LOCAL.size + local[9] + local[10]
+
+
+def _zip_archive(f: BinaryIO, c: Container, max_memory: int, stream: bool = False) -> Archive:
+    """
+    Members of a zip. Compressed members over max_memory are skipped, or
+    with stream (deflate only) inflated as they are read.
+    """
+    with zipfile.ZipFile(FileView(f, c.origin, c.end)) as zf:
+        infos = zf.infolist()
+        members = []
+        for info in infos:
+            if not info.filename.lower().endswith(_PACKAGES):
+                continue
+            m = Member(info.filename, info.file_size)
+            if info.flag_bits & _ZIP_ENCRYPTED:
+                m.skipped = "encrypted"
+            elif info.compress_type == zipfile.ZIP_STORED:
+                m.offset = zip_data_at(f, c, info)
+            elif stream and info.compress_type == zipfile.ZIP_DEFLATED and info.file_size > max_memory:
+                m.deflated = (zip_data_at(f, c, info), info.compress_size)
+            elif info.file_size > max_memory:
+                m.skipped = f"{info.file_size / 1024 ** 2:.1f} MB compressed, over the memory budget"
+            else:
+                try:
+                    m.data = zf.read(info)
+                except NotImplementedError:
+                    m.skipped = f"unsupported compression method {info.compress_type}"
+                except CONTAINER_ERRORS as e:
+                    m.skipped = f"it does not decompress ({e})"
+            members.append(m)
+    methods = sorted({_ZIP_METHODS.get(i.compress_type, str(i.compress_type)) for i in infos})
+    return Archive(len(infos), ", ".join(methods), members)
+
+
+def _cab_folder(f: BinaryIO, base: int, method: int, blocks: int, reserve: int, need: int) -> bytes:
+    """The first need bytes (or more) of a stored or MSZIP folder at base."""
+    out = bytearray()
+    pos = base
+    for _ in range(blocks):
+        if len(out) >= need:
+            break
+        _checksum, packed, _unpacked = _CAB_DATA.unpack(_read(f, pos, _CAB_DATA.size))
+        pos += _CAB_DATA.size + reserve
+        data = _read(f, pos, packed)
+        pos += packed
+        if method == 0:
+            out += data
+            continue
+        if data[:2] != b"CK":
+            raise ValueError("Bad MSZIP block")
+        # Each block is a deflate stream primed with the previous 32 KB of output.
+        history = bytes(out[-_MSZIP_HISTORY:])
+        d = zlib.decompressobj(-15, zdict=history) if history else zlib.decompressobj(-15)
+        out += d.decompress(data[2:]) + d.flush()
+    return bytes(out)
+
+
+def _cab_archive(f: BinaryIO, c: Container, max_memory: int) -> Archive:
+    header = _CAB_HEADER.unpack(_read(f, c.start, _CAB_HEADER.size))
+    files_at, folder_count, file_count, flags = header[4], header[8], header[9], header[10]
+    head = _read(f, c.start, min(c.size, files_at + file_count * (_CAB_FILE.size + 256)))
+    pos = _CAB_HEADER.size
+    reserve_folder = reserve_data = 0
+    if flags & _CAB_RESERVE:
+        reserve_header, reserve_folder, reserve_data = struct.unpack_from("<HBB", head, pos)
+        pos += 4 + reserve_header
+    for flag in _CAB_LINKS:
+        if flags & flag:
+            for _ in range(2):
+                pos = head.index(b"\0", pos) + 1
+    folders = []
+    for _ in range(folder_count):
+        folders.append(_CAB_FOLDER.unpack_from(head, pos))  # (data offset, blocks, compression)
+        pos += _CAB_FOLDER.size + reserve_folder
+
+    pos = files_at
+    entries = []
+    for _ in range(file_count):
+        size, folder_offset, folder, _date, _time, attributes = _CAB_FILE.unpack_from(head, pos)
+        end = head.index(b"\0", pos + _CAB_FILE.size)
+        name = head[pos + _CAB_FILE.size:end].decode("utf-8" if attributes & _CAB_UTF8_NAME else "cp437", "replace")
+        entries.append((name, size, folder_offset, folder))
+        pos = end + 1
+
+    members = []
+    need: Dict[int, int] = {}
+    for name, size, folder_offset, folder in entries:
+        if not name.lower().endswith(_PACKAGES):
+            continue
+        m = Member(name, size)
+        method = folders[folder][2] & 0xF if folder < len(folders) else None
+        if folder >= _CAB_SPANNED or method is None:
+            m.skipped = "continued in another cabinet"
+        elif method not in _CAB_DECODED:
+            m.skipped = f"{_CAB_COMPRESSION.get(method, 'unknown')} compression is not decoded"
+        elif folder_offset + size > max_memory:
+            m.skipped = f"{size / 1024 ** 2:.1f} MB compressed, over the memory budget"
+        else:
+            need[folder] = max(need.get(folder, 0), folder_offset + size)
+        members.append((m, folder_offset, folder))
+
+    decoded = {
+        folder: _cab_folder(f, c.start + folders[folder][0], folders[folder][2] & 0xF, folders[folder][1],
+                            reserve_data, n)
+        for folder, n in need.items()
+    }
+    for m, folder_offset, folder in members:
+        if m.skipped is None:
+            m.data = decoded[folder][folder_offset:folder_offset + m.size]
+            if len(m.data) < m.size:
+                raise ValueError(f"Truncated CAB folder for {m.name}")
+    compression = ", ".join(sorted({_CAB_COMPRESSION.get(t & 0xF, "unknown") for _, _, t in folders}))
+    return Archive(file_count, compression, [m for m, _, _ in members])
+
+
+# ----- child plans -----------------------------------------------------------
+
+
+def archive_children(
+    f: BinaryIO,
+    c: Container,
+    label: str,
+    analyze_exe: ExeAnalyzer,
+    nesting: int,
+    max_memory: int,
+    stream: bool = False,
+) -> Tuple[Archive, List[Plan], List[str]]:
+    """
+    The archive c (a zip or CAB), plans of the MSIs and EXEs in it, labelled
+    "<label>/<member>", and notes on members that were not analyzed. With
+    stream, large deflated zip members are inflated as they are read (see
+    decode.InflateFile) instead of skipped.
+    """
+    with stage("nested"):
+        archive = _zip_archive(f, c, max_memory, stream) if c.kind == "zip" else _cab_archive(f, c, max_memory)
+    children: List[Plan] = []
+    notes: List[str] = []
+    for m in archive.members[:MAX_CHILDREN]:
+        if m.skipped:
+            notes.append(f"{m.name} not analyzed: {m.skipped}.")
+            continue
+        if m.data is not None:
+            buf = m.data
+        elif m.deflated is not None:
+            buf = FileView(InflateFile(f, m.deflated[0], m.deflated[1], m.size, max_memory), 0, m.size)
+        else:
+            buf = FileView(f, m.offset, m.offset + m.size)
+        try:
+            if m.name.lower().endswith(".msi"):
+                child = analyze_msi_buffer(buf, f"{label}/{m.name}")
+            else:
+                view = io.BytesIO(buf) if isinstance(buf, bytes) else buf
+                child = analyze_exe(view, m.size, f"{label}/{m.name}", nesting - 1)
+        except CONTAINER_ERRORS as e:
+            notes.append(f"{m.name} not analyzed: {e}")
+            continue
+        child.embedded = Embedded(offset=m.offset, size=m.size, member=m.name)
+        children.append(child)
+    if len(archive.members) > MAX_CHILDREN:
+        notes.append(f"Only the first {MAX_CHILDREN} of {len(archive.members)} packages were analyzed.")
+    return archive, children, notes
+
+
+def _archive_plan(
+    f: BinaryIO, c: Container, label: str, analyze_exe: ExeAnalyzer, nesting: int, max_memory: int,
+) -> Plan:
+    archive, children, notes = archive_children(f, c, label, analyze_exe, nesting, max_memory)
+    plan = Plan(
+        input_path=label,
+        file_type=c.kind,
+        installer_type=f"{c.kind.upper()} archive",
+        confidence=0.90,
+        metadata={"Files": archive.files, "Compression": archive.compression},
+        notes=notes,
+    )
+    adopt_children(plan, children)
+    return plan
+
+
+def embedded_plans(
+    f: BinaryIO,
+    ranges: Sequence[Tuple[int, int]],
+    label: str,
+    analyze_exe: ExeAnalyzer,
+    nesting: int = MAX_NESTING,
+    exhaustive: bool = False,
+    max_memory: int = DEFAULT_MAX_MEMORY,
+    hasher: Optional["StreamHasher"] = None,
+) -> Tuple[List[Plan], List[str]]:
+    """
+    Plans of the containers within ranges of f, and notes on what could not
+    be analyzed. Children are labelled "<label>!0x<offset>".
+    """
+    notes: List[str] = []
+    children: List[Plan] = []
+    containers = find_containers(f, ranges, exhaustive, max_memory, hasher)
+    for c in containers:
+        child_label = f"{label}!0x{c.start:X}"
+        try:
+            if c.kind == "msi":
+                plan = analyze_msi_buffer(FileView(f, c.start, c.end), child_label)
+            else:
+                plan = _archive_plan(f, c, child_label, analyze_exe, nesting, max_memory)
+        except CONTAINER_ERRORS as e:
+            notes.append(f"Embedded {c.kind.upper()} at offset 0x{c.start:X} could not be read: {e}")
+            continue
+        plan.embedded = Embedded(offset=c.start, size=c.size)
+        children.append(plan)
+    if len(containers) >= MAX_CHILDREN:
+        notes.append(f"Stopped looking for embedded packages after {MAX_CHILDREN}.")
+    return children, notes
+
+
+def adopt_children(plan: Plan, children: List[Plan]) -> None:
+    """
+    Attach child plans to plan, with evidence for each and the ProductCodes
+    of MSIs among them (at any depth) as detection rules.
+    """
+    plan.children.extend(children)
+    codes = {r.value for r in plan.detection_rules if r.kind == "msi_product_code"}
+    for child in children:
+        where = child.embedded
+        at = f"at offset 0x{where.offset:X}" if where.member is None else f"{where.member}"
+        detail = f"Embedded {child.installer_type} {at}"
+        name = child.metadata.get("ProductName") if child.file_type == "msi" else None
+        plan.evidence.append(Evidence(kind="nested", detail=detail + (f": {name}" if name else "")))
+        for rule in child.detection_rules:
+            if rule.kind != "msi_product_code" or rule.value in codes:
+                continue
+            codes.add(rule.value)
+            evidence = rule.evidence if child.file_type != "msi" else [
+                Evidence(kind="nested", detail=f"ProductCode of the embedded MSI {at}")
+            ]
+            plan.detection_rules.append(DetectionRule(
+                kind="msi_product_code",
+                value=rule.value,
+                confidence=min(rule.confidence, NESTED_CONFIDENCE),
+                evidence=evidence,
+            ))
@@ -0,0 +1,306 @@
+"""
+Installers shipped inside packages: .zip archives and Intune .intunewin files.
+
+Neither is unpacked to disk. A zip's MSI and EXE members are analyzed in
+place (stored ones through a view of the file, deflated ones through an
+InflateFile that inflates only what the analyzers read), each into a child
+plan of the package plan.
+
+An .intunewin is a zip holding IntuneWinPackage/Metadata/Detection.xml and
+one encrypted file, IntuneWinPackage/Contents/<FileName>: HMAC-SHA256 (32
+bytes), the AES IV (16 bytes) and the AES-256-CBC ciphertext of a zip of the
+app's source folder. The key is in Detection.xml. The encrypted file is
+read through an InflateFile if the outer zip deflated it, decrypted block
+by block through a CbcFile, and the inner zip analyzed as above, so memory
+stays bounded by the decoders' caches and max_memory whatever the package
+size. The install and uninstall candidates of the SetupFile named in
+Detection.xml become the package's. The HMAC is not checked (it needs a
+pass over all of the ciphertext). Decrypting needs the optional
+cryptography package; without it the plan has Detection.xml's metadata only.
+"""
+
+from __future__ import annotations
+
+import base64
+import binascii
+import os
+import posixpath
+import zipfile
+from typing import TYPE_CHECKING, Any, BinaryIO, Dict, Optional, Sequence, Tuple
+from xml.etree import ElementTree
+
+from installer_intel.records import CommandCandidate, DetectionRule, Evidence, Plan
+from installer_intel.analyzers.decode import CbcFile, DecodeError, InflateFile
+from installer_intel.analyzers.exe import DEFAULT_DEPTH, DEPTHS, exe_plan
+from installer_intel.analyzers.hashing import StreamHasher, check_algorithms, hash_version, record_digests
+from installer_intel.analyzers.nested import (
+    CONTAINER_ERRORS,
+    MAX_NESTING,
+    Container,
+    FileView,
+    adopt_children,
+    archive_children,
+    zip_closing,
+    zip_data_at,
+)
+from installer_intel.analyzers.signatures import SignatureSet, get_signatures
+from installer_intel.analyzers.stream import DEFAULT_MAX_MEMORY
+from installer_intel.timings import stage
+
+if TYPE_CHECKING:
+    from installer_intel.cache import ResultCache
+
+PACKAGE_SUFFIXES = (".zip", ".intunewin")
+
+_DETECTION_XML = "metadata/detection.xml"
+_CONTENTS = "contents/"
+_HMAC_SIZE = 32
+_IV_SIZE = 16
+_MAX_DETECTION_XML = 1024 * 1024
+
+
+def package_cache_version(signatures: SignatureSet, depth: str = DEFAULT_DEPTH, hashes: Sequence[str] = ()) -> str:
+    # EXEs inside are analyzed with the signature set and depth, as in exe_cache_version.
+    version = f"pkg:{signatures.version}"
+    if depth != DEFAULT_DEPTH:
+        version += f":{depth}"
+    return version + hash_version(hashes)
+
+
+def analyze_package(
+    path: str,
+    max_memory: int = DEFAULT_MAX_MEMORY,
+    signatures: Optional[SignatureSet] = None,
+    cache: Optional["ResultCache"] = None,
+    depth: str = DEFAULT_DEPTH,
+    hashes: Sequence[str] = (),
+) -> Plan:
+    """
+    Analyze a .zip or .intunewin and the installers in it (see
+    analyze_exe for depth and hashes; the digests are of the package).
+    """
+    if depth not in DEPTHS:
+        raise ValueError(f"Unknown depth {depth!r} (choose from {', '.join(DEPTHS)})")
+    hashes = check_algorithms(hashes)
+    if cache is not None:
+        sigs = signatures or get_signatures()
+        digests: Dict[str, str] = {}
+        return cache.get_or_analyze(
+            path,
+            package_cache_version(sigs, depth, hashes),
+            lambda: _analyze_package(path, max_memory, sigs, depth, hashes, digests),
+            digests if hashes else None,
+        )
+    return _analyze_package(path, max_memory, signatures, depth, hashes)
+
+
+def _analyze_package(
+    path: str,
+    max_memory: int,
+    signatures: Optional[SignatureSet],
+    depth: str,
+    hashes: Sequence[str],
+    digests: Optional[Dict[str, str]] = None,
+) -> Plan:
+    with stage("plan"):
+        size = os.path.getsize(path)
+        with open(path, "rb") as f:
+            plan = package_plan(f, size, path, os.path.splitext(path)[1].lower(), max_memory, signatures, depth)
+        if hashes:
+            # The members are read in place, not in order: one sequential pass.
+            algorithms = (*hashes, "sha256") if digests is not None else hashes
+            computed = StreamHasher(path, size, algorithms).hexdigests()
+            if digests is not None:
+                digests.update(computed)
+            record_digests(plan, {a: computed[a] for a in hashes})
+        return plan
+
+
+def package_plan(
+    f: BinaryIO,
+    size: int,
+    label: str,
+    suffix: str,
+    max_memory: int = DEFAULT_MAX_MEMORY,
+    signatures: Optional[SignatureSet] = None,
+    depth: str = DEFAULT_DEPTH,
+) -> Plan:
+    """
+    Plan of the package open as f (a local or remote file); label names it
+    and suffix (".zip" or ".intunewin") says which kind it is.
+    """
+    c = zip_closing(f, 0, size)
+    if c is None:
+        raise ValueError(f"Not a zip archive: {label}")
+
+    def analyze_child(view: BinaryIO, child_size: int, child_label: str, levels: int) -> Plan:
+        return exe_plan(view, child_size, child_label, max_memory, signatures, depth, None, levels)
+
+    try:
+        if suffix == ".intunewin":
+            plan = _intunewin_plan(f, c, label, analyze_child, max_memory)
+        else:
+            plan = _zip_plan(f, c, label, analyze_child, max_memory)
+    except (ValueError, OSError):
+        raise
+    except CONTAINER_ERRORS as e:
+        # The central directory is damaged: as unusable as no zip at all.
+        raise ValueError(f"Damaged zip archive {label}: {e}") from None
+    plan.metadata = {"FileName": os.path.basename(label), "SizeBytes": size, **plan.metadata}
+    return plan
+
+
+def _zip_plan(f: BinaryIO, c: Container, label: str, analyze_child, max_memory: int) -> Plan:
+    archive, children, notes = archive_children(f, c, label, analyze_child, MAX_NESTING, max_memory, stream=True)
+    plan = Plan(
+        input_path=label,
+        file_type="zip",
+        installer_type="ZIP archive",
+        confidence=0.90,
+        metadata={"Files": archive.files, "Compression": archive.compression},
+        notes=notes,
+    )
+    adopt_children(plan, children)
+    if len(children) == 1:
+        # Nothing else to run: the one installer's commands are the package's.
+        _promote(plan, children[0], "the only installer in the archive")
+    elif not children:
+        plan.notes.append("No .msi or .exe in the archive.")
+    return plan
+
+
+def _promote(plan: Plan, child: Plan, why: str) -> None:
+    """Copy child's install/uninstall candidates to plan, run from the extracted folder."""
+    member = child.embedded.member if child.embedded is not None else child.input_path
+    evidence = Evidence(kind="nested", detail=f"{member} is {why}")
+    for source, target in (
+        (child.install_candidates, plan.install_candidates),
+        (child.uninstall_candidates, plan.uninstall_candidates),
+    ):
+        for cand in source:
+            target.append(CommandCandidate(
+                command=cand.command.replace(child.input_path, member.replace("/", "\\")),
+                confidence=cand.confidence,
+                evidence=[evidence, *cand.evidence],
+            ))
+
+
+def _detection_info(xml: bytes) -> Tuple[Dict[str, Any], Dict[str, str], Dict[str, str]]:
+    """(ApplicationInfo attributes and fields, EncryptionInfo, MsiInfo) from Detection.xml."""
+    try:
+        root = ElementTree.fromstring(xml)
+    except ElementTree.ParseError as e:
+        raise ValueError(f"Detection.xml does not parse: {e}") from None
+
+    def fields(element: Optional[ElementTree.Element]) -> Dict[str, str]:
+        if element is None:
+            return {}
+        return {child.tag.split("}")[-1]: (child.text or "").strip() for child in element if len(child) == 0}
+
+    def find(name: str) -> Optional[ElementTree.Element]:
+        return next((e for e in root.iter() if e.tag.split("}")[-1] == name), None)
+
+    return {**root.attrib, **fields(root)}, fields(find("EncryptionInfo")), fields(find("MsiInfo"))
+
+
+def _key(value: Optional[str], size: int, what: str) -> bytes:
+    try:
+        data = base64.b64decode(value or "", validate=True)
+    except (binascii.Error, ValueError):
+        data = b""
+    if len(data) != size:
+        raise DecodeError(f"Detection.xml has no valid {what}")
+    return data
+
+
+def _member_file(f: BinaryIO, c: Container, info: zipfile.ZipInfo, max_memory: int) -> BinaryIO:
+    """A member of the zip c, read in place (and inflated as read if deflated)."""
+    at = zip_data_at(f, c, info)
+    if info.compress_type == zipfile.ZIP_STORED:
+        return FileView(f, at, at + info.file_size)
+    if info.compress_type == zipfile.ZIP_DEFLATED:
+        return FileView(InflateFile(f, at, info.compress_size, info.file_size, max_memory), 0, info.file_size)
+    raise ValueError(f"{info.filename}: unsupported compression method {info.compress_type}")
+
+
+def _intunewin_plan(f: BinaryIO, c: Container, label: str, analyze_child, max_memory: int) -> Plan:
+    with zipfile.ZipFile(FileView(f, c.origin, c.end)) as zf:
+        infos = zf.infolist()
+        detection = next((i for i in infos if i.filename.lower().endswith(_DETECTION_XML)), None)
+        if detection is None or detection.file_size > _MAX_DETECTION_XML:
+            raise ValueError("Not an .intunewin package: no IntuneWinPackage/Metadata/Detection.xml")
+        app, encryption, msi = _detection_info(zf.read(detection))
+
+    setup_file = app.get("SetupFile") or None
+    meta: Dict[str, Any] = {
+        "Name": app.get("Name") or None,
+        "SetupFile": setup_file,
+        "UnencryptedContentSize": int(app["UnencryptedContentSize"])
+        if app.get("UnencryptedContentSize", "").isdigit() else None,
+        "ToolVersion": app.get("ToolVersion") or None,
+    }
+    if msi:
+        meta["MsiInfo"] = msi
+    plan = Plan(
+        input_path=label,
+        file_type="intunewin",
+        installer_type="Intune Win32 app",
+        confidence=0.95,
+        evidence=[Evidence(kind="package", detail="IntuneWinPackage/Metadata/Detection.xml")],
+        metadata=meta,
+    )
+    if msi.get("MsiProductCode"):
+        plan.detection_rules.append(DetectionRule(
+            kind="msi_product_code",
+            value=msi["MsiProductCode"],
+            confidence=0.90,
+            evidence=[Evidence(kind="package", detail="MsiInfo in Detection.xml")],
+        ))
+
+    name = app.get("FileName") or "IntunePackage.intunewin"
+    content = next((i for i in infos if i.filename.lower().endswith(_CONTENTS + name.lower())), None)
+    if content is None:
+        plan.notes.append(f"Encrypted content {name} is missing from the package.")
+        return plan
+    try:
+        key = _key(encryption.get("EncryptionKey"), 32, "EncryptionKey")
+        enc = _member_file(f, c, content, max_memory)
+        with stage("read"):
+            enc.seek(_HMAC_SIZE)
+            iv = enc.read(_IV_SIZE)
+        expected = encryption.get("InitializationVector")
+        if expected and iv != _key(expected, _IV_SIZE, "InitializationVector"):
+            raise DecodeError("the IV in the content does not match Detection.xml")
+        start = _HMAC_SIZE + _IV_SIZE
+        plain = CbcFile(enc, start, content.file_size - start, key, iv)
+        inner = zip_closing(plain, 0, plain.size)
+        if inner is None:
+            raise DecodeError("the decrypted content is not a zip")
+        archive, children, notes = archive_children(
+            plain, inner, label, analyze_child, MAX_NESTING, max_memory, stream=True,
+        )
+    except ImportError as e:
+        plan.notes.append(f"Content not decrypted: {e}.")
+        return plan
+    except CONTAINER_ERRORS as e:
+        plan.notes.append(f"Content could not be read: {e}")
+        return plan
+
+    plan.metadata["Files"] = archive.files
+    plan.metadata["Compression"] = archive.compression
+    plan.notes.extend(notes)
+    adopt_children(plan, children)
+    setup = next((ch for ch in children if setup_file and _same_file(ch.embedded.member, setup_file)), None)
+    if setup is not None:
+        _promote(plan, setup, "the SetupFile in Detection.xml")
+    elif setup_file:
+        plan.notes.append(f"SetupFile {setup_file} is not among the analyzed installers.")
+    return plan
+
+
+def _same_file(member: Optional[str], setup_file: str) -> bool:
+    if member is None:
+        return False
+    setup = setup_file.replace("\\", "/").lower()
+    member = member.lower()
+    return member == setup or posixpath.basename(member) == setup
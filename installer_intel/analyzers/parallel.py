@@ -0,0 +1,160 @@
+"""
+Scanning one large file on several processes.
+
+Batch scans already use every core, but a single multi-GB installer is one
+serial pass of string extraction and matching. When the ranges a tier
+scans add up to PARALLEL_MIN_BYTES or more, they are cut into segments
+aligned to the scan window and the segments are scanned by worker
+processes, each from its own mapping of the file (the pages are shared
+through the OS page cache). Extraction and regex matching hold the GIL,
+hence processes rather than threads.
+
+Each worker reports, for every string that lowers the offset of a pattern
+within its segment, the hits (see SignatureSet.hits) and the highest string
+offset reached so far. The parent folds the segments in file order with
+SignatureSet.merge. Hits a worker drops could not have changed anything in
+the fold either, so the patterns, offsets, early stop and coverage come out
+exactly as in the serial scan. Once the fold stops at a decisive signature,
+segments not yet started are cancelled. A StreamHasher is fed by the parent
+while it waits for the workers.
+"""
+
+from __future__ import annotations
+
+import mmap
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, BinaryIO, Dict, List, Optional, Sequence, Tuple
+
+from installer_intel.analyzers.signatures import SignatureSet
+from installer_intel.analyzers.stream import iter_segment_strings, window_size
+from installer_intel.timings import count, stage
+
+if TYPE_CHECKING:
+    from installer_intel.analyzers.hashing import StreamHasher
+
+# Below this many bytes to scan, starting the workers costs more than it saves.
+PARALLEL_MIN_BYTES = 256 * 1024 * 1024
+MIN_SEGMENT = 16 * 1024 * 1024
+# Segments per worker: enough to even out the load, few enough to stay cheap.
+SEGMENTS_PER_WORKER = 4
+
+Range = Tuple[int, int]
+Hits = List[Tuple[str, int]]
+
+_signatures: Optional[SignatureSet] = None  # in each worker process
+
+
+@dataclass
+class SegmentResult:
+    hits: List[Tuple[int, Hits]]  # (highest string offset so far, hits) per string that lowered a pattern
+    reached: int  # highest string offset in the segment; -1 if it has none
+    strings: int
+    bytes_read: int  # the segment's windows, as the serial scan counts them
+
+
+def default_workers() -> int:
+    return os.cpu_count() or 1
+
+
+def parallel_path(f: BinaryIO, ranges: Sequence[Range], workers: int) -> Optional[str]:
+    """The path to scan ranges of f from in parallel, or None to scan serially."""
+    if workers < 2 or sum(end - start for start, end in ranges) < PARALLEL_MIN_BYTES:
+        return None
+    path = getattr(f, "name", None)
+    try:
+        f.fileno()  # a real file, not a view or a remote file
+    except (AttributeError, OSError, ValueError):
+        return None
+    return path if isinstance(path, str) and os.path.isfile(path) else None
+
+
+def _segments(ranges: Sequence[Range], workers: int, window: int) -> List[Tuple[int, int, int, int]]:
+    """(range start, segment start, segment stop, range end), window-aligned within each range."""
+    total = sum(end - start for start, end in ranges)
+    size = max(MIN_SEGMENT, -(-total // (workers * SEGMENTS_PER_WORKER)))
+    size = -(-size // window) * window
+    return [(lower, at, min(end, at + size), end) for lower, end in ranges for at in range(lower, end, size)]
+
+
+def _init_worker(signatures: SignatureSet) -> None:
+    global _signatures
+    _signatures = signatures
+
+
+def _scan_segment(path: str, lower: int, start: int, stop: int, end: int, max_memory: int) -> SegmentResult:
+    lowest: Dict[str, int] = {}
+    kept: List[Tuple[int, Hits]] = []
+    state = [-1, 0]  # highest string offset, strings
+
+    def tracked(strings):
+        for item in strings:
+            state[0] = max(state[0], item[0])
+            state[1] += 1
+            yield item
+
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for hits in _signatures.hits(tracked(iter_segment_strings(mm, lower, start, stop, end, max_memory))):
+            lowered = []
+            for p, at in hits:
+                if p not in lowest or at < lowest[p]:
+                    lowest[p] = at
+                    lowered.append((p, at))
+            if lowered:
+                kept.append((state[0], lowered))
+    return SegmentResult(kept, state[0], state[1], stop - start)
+
+
+def _feed(hasher: "StreamHasher", f: BinaryIO, start: int, end: int, window: int) -> None:
+    f.seek(start)
+    while start < end:
+        data = f.read(min(window, end - start))
+        if not data:
+            return
+        hasher.update(start, data)
+        start += len(data)
+
+
+def scan_parallel(
+    f: BinaryIO,
+    path: str,
+    ranges: Sequence[Range],
+    signatures: SignatureSet,
+    found: Dict[str, int],
+    stop_early: bool,
+    workers: int,
+    max_memory: int,
+    hasher: Optional["StreamHasher"] = None,
+) -> int:
+    """
+    Match signatures against the strings of ranges of the file at path on
+    workers processes, adding to found as SignatureSet.scan would. Returns
+    the bytes covered, counted as a serial scan counts them.
+    """
+    window = window_size(max_memory)
+    segments = _segments(ranges, workers, window)
+    covered = 0
+    with stage("parallel"), ProcessPoolExecutor(
+        max_workers=min(workers, len(segments)), initializer=_init_worker, initargs=(signatures,),
+    ) as pool:
+        futures = [pool.submit(_scan_segment, path, *segment, max_memory) for segment in segments]
+        reached = -1
+        try:
+            for (lower, start, stop, end), future in zip(segments, futures):
+                if hasher is not None:
+                    _feed(hasher, f, start, stop, window)
+                result = future.result()
+                count(bytes_read=result.bytes_read, strings=result.strings)
+                if start == lower:
+                    reached = lower
+                for seen, hits in result.hits:
+                    if signatures.merge((hits,), found, stop_early):
+                        return covered + max(reached, seen) - lower
+                reached = max(reached, result.reached)
+                if stop == end:
+                    covered += end - lower
+        finally:
+            for future in futures:
+                future.cancel()
+    return covered
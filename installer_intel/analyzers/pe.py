@@ -0,0 +1,361 @@
+"""
+Lightweight PE (Portable Executable) layout reader.
+
+Maps the parts of an EXE that matter for installer detection with a handful
+of targeted seeks, never reading section or payload data wholesale:
+
+- headers and section table
+- resource directory, with the VS_VERSIONINFO and manifest resources decoded
+- security directory (Authenticode certificate table)
+- overlay: data appended after the last section, which is where most
+  installer engines keep their (compressed) payload
+
+scan_ranges() splits the file into the stub image, which holds the installer
+engine's own strings and is matched first, and the bulk data (overlay and
+large opaque resources), which is only worth scanning when the stub gave no
+answer.
+"""
+
+from __future__ import annotations
+
+import re
+import struct
+from dataclasses import dataclass, field
+from typing import BinaryIO, Dict, List, Optional, Tuple, Union
+
+Range = Tuple[int, int]  # [start, end) file offsets
+
+RT_RCDATA = 10
+RT_VERSION = 16
+RT_MANIFEST = 24
+
+_DIR_RESOURCE = 2
+_DIR_SECURITY = 4
+
+_MAX_SECTIONS = 96
+_MAX_RESOURCES = 4096
+_MAX_VERSION_INFO = 64 * 1024
+_MAX_MANIFEST = 64 * 1024
+# Resources at least this big are treated like payload (embedded archives,
+# MSIs, ...) and left out of the first matching pass.
+LARGE_RESOURCE = 1024 * 1024
+
+_FIXED_SIGNATURE = 0xFEEF04BD
+_EXECUTION_LEVEL = re.compile(r"requestedExecutionLevel[^>]*?level\s*=\s*[\"']([^\"']+)", re.IGNORECASE)
+
+
+@dataclass(frozen=True)
+class PeSection:
+    name: str
+    virtual_address: int
+    virtual_size: int
+    raw_offset: int
+    raw_size: int
+    characteristics: int
+
+
+@dataclass(frozen=True)
+class PeResource:
+    type: Union[int, str]
+    name: Union[int, str]
+    lang: int
+    offset: int  # file offset of the data
+    size: int
+
+
+@dataclass
+class PeImage:
+    file_size: int
+    machine: int
+    is_64: bool
+    timestamp: int
+    headers_size: int
+    sections: List[PeSection] = field(default_factory=list)
+    resources: List[PeResource] = field(default_factory=list)
+    version_info: Dict[str, str] = field(default_factory=dict)
+    manifest: Optional[str] = None
+    security: Optional[Range] = None
+    image_end: int = 0  # end of the last section's raw data
+    overlay: Optional[Range] = None
+
+    @property
+    def signed(self) -> bool:
+        return self.security is not None
+
+    @property
+    def requested_execution_level(self) -> Optional[str]:
+        m = _EXECUTION_LEVEL.search(self.manifest or "")
+        return m.group(1) if m else None
+
+    def section_at(self, rva: int) -> Optional[PeSection]:
+        for s in self.sections:
+            if s.virtual_address <= rva < s.virtual_address + max(s.virtual_size, s.raw_size):
+                return s
+        return None
+
+    def rva_to_offset(self, rva: int) -> Optional[int]:
+        if rva < self.headers_size:
+            return rva
+        s = self.section_at(rva)
+        if s is None or rva - s.virtual_address >= s.raw_size:
+            return None
+        return s.raw_offset + rva - s.virtual_address
+
+    def scan_ranges(self) -> Tuple[List[Range], List[Range]]:
+        """
+        (primary, deferred) file ranges for signature matching. primary is
+        the stub image minus large resources; deferred is those resources
+        plus the overlay. The certificate table is in neither.
+        """
+        large = sorted(
+            (r.offset, r.offset + r.size) for r in self.resources
+            if r.size >= LARGE_RESOURCE and r.offset + r.size <= self.image_end
+        )
+        primary: List[Range] = []
+        pos = 0
+        for start, end in merge_ranges(large):
+            if start > pos:
+                primary.append((pos, start))
+            pos = max(pos, end)
+        if pos < self.image_end:
+            primary.append((pos, self.image_end))
+        deferred = list(large)
+        if self.overlay is not None:
+            deferred.append(self.overlay)
+        return primary, merge_ranges(deferred)
+
+
+class PeFormatError(ValueError):
+    """Raised when a file is not a readable PE image."""
+
+
+def merge_ranges(ranges: List[Range]) -> List[Range]:
+    """Sort ranges and join overlapping or touching ones; drop empty ones."""
+    out: List[Range] = []
+    for start, end in sorted(ranges):
+        if out and start <= out[-1][1]:
+            out[-1] = (out[-1][0], max(out[-1][1], end))
+        elif end > start:
+            out.append((start, end))
+    return out
+
+
+def subtract_ranges(ranges: List[Range], done: List[Range], overlap: int = 0) -> List[Range]:
+    """
+    The parts of ranges not covered by done. Pieces are widened by overlap
+    bytes where they border a done range, so strings cut at that edge are
+    seen whole.
+    """
+    out: List[Range] = []
+    done = merge_ranges(done)
+    for start, end in merge_ranges(ranges):
+        pos = start
+        for d_start, d_end in done:
+            if d_end <= pos or d_start >= end:
+                continue
+            if d_start > pos:
+                out.append((max(start, pos - overlap) if pos > start else pos, min(end, d_start + overlap)))
+            pos = max(pos, d_end)
+        if pos < end:
+            out.append((max(start, pos - overlap) if pos > start else pos, end))
+    return merge_ranges(out)
+
+
+def _read_at(f: BinaryIO, offset: int, size: int) -> bytes:
+    f.seek(offset)
+    return f.read(size)
+
+
+def parse_pe(f: BinaryIO, file_size: Optional[int] = None) -> PeImage:
+    """
+    Read the PE layout of an open binary file. Raises PeFormatError for
+    files that are not PE images or whose headers are unusable; damaged
+    resources are skipped rather than failing the whole image.
+    """
+    if file_size is None:
+        f.seek(0, 2)
+        file_size = f.tell()
+
+    dos = _read_at(f, 0, 64)
+    if len(dos) < 64 or dos[:2] != b"MZ":
+        raise PeFormatError("Not a PE file (no MZ header)")
+    (pe_offset,) = struct.unpack_from("<I", dos, 0x3C)
+    head = _read_at(f, pe_offset, 24)
+    if len(head) < 24 or head[:4] != b"PE\0\0":
+        raise PeFormatError("Not a PE file (no PE signature)")
+    machine, n_sections, timestamp, _, _, opt_size, _ = struct.unpack_from("<HHIIIHH", head, 4)
+
+    optional = _read_at(f, pe_offset + 24, opt_size)
+    if len(optional) < opt_size or opt_size < 2:
+        raise PeFormatError("Truncated optional header")
+    (magic,) = struct.unpack_from("<H", optional, 0)
+    if magic == 0x10B:
+        is_64, dirs_at = False, 96
+    elif magic == 0x20B:
+        is_64, dirs_at = True, 112
+    else:
+        raise PeFormatError(f"Unknown optional header magic 0x{magic:X}")
+    headers_size = struct.unpack_from("<I", optional, 60)[0] if opt_size >= 64 else 0
+    n_dirs = struct.unpack_from("<I", optional, dirs_at - 4)[0] if opt_size >= dirs_at else 0
+    n_dirs = min(n_dirs, (opt_size - dirs_at) // 8)
+    dirs = [struct.unpack_from("<II", optional, dirs_at + 8 * i) for i in range(max(n_dirs, 0))]
+
+    n_sections = min(n_sections, _MAX_SECTIONS)
+    table = _read_at(f, pe_offset + 24 + opt_size, 40 * n_sections)
+    image = PeImage(
+        file_size=file_size,
+        machine=machine,
+        is_64=is_64,
+        timestamp=timestamp,
+        headers_size=headers_size,
+    )
+    image_end = max(headers_size, pe_offset + 24 + opt_size + len(table))
+    for i in range(len(table) // 40):
+        name, vsize, va, raw_size, raw_ptr = struct.unpack_from("<8sIIII", table, 40 * i)
+        (flags,) = struct.unpack_from("<I", table, 40 * i + 36)
+        raw_size = max(0, min(raw_size, file_size - raw_ptr))
+        image.sections.append(PeSection(
+            name=name.rstrip(b"\0").decode("latin-1"),
+            virtual_address=va,
+            virtual_size=vsize,
+            raw_offset=raw_ptr,
+            raw_size=raw_size,
+            characteristics=flags,
+        ))
+        if raw_size:
+            image_end = max(image_end, raw_ptr + raw_size)
+    image.image_end = min(image_end, file_size)
+
+    overlay_end = file_size
+    if len(dirs) > _DIR_SECURITY:
+        # The one data directory whose address is a file offset, not an RVA.
+        sec_off, sec_size = dirs[_DIR_SECURITY]
+        if sec_size and sec_off >= image.image_end and sec_off + sec_size <= file_size:
+            image.security = (sec_off, sec_off + sec_size)
+            overlay_end = sec_off
+    if overlay_end > image.image_end:
+        image.overlay = (image.image_end, overlay_end)
+
+    if len(dirs) > _DIR_RESOURCE and dirs[_DIR_RESOURCE][1]:
+        base = image.rva_to_offset(dirs[_DIR_RESOURCE][0])
+        if base is not None:
+            try:
+                _read_resources(f, image, base)
+            except struct.error:
+                pass  # truncated directory: keep what was read
+    _read_version_and_manifest(f, image)
+    return image
+
+
+def _resource_name(f: BinaryIO, base: int, value: int) -> Union[int, str]:
+    if not value & 0x80000000:
+        return value
+    raw = _read_at(f, base + (value & 0x7FFFFFFF), 2)
+    if len(raw) < 2:
+        return ""
+    (length,) = struct.unpack("<H", raw)
+    return _read_at(f, f.tell(), 2 * length).decode("utf-16le", "replace")
+
+
+def _read_resources(f: BinaryIO, image: PeImage, base: int) -> None:
+    """Walk the three-level (type / name / language) resource tree."""
+    seen = set()
+
+    def entries(offset: int) -> List[Tuple[int, int]]:
+        if offset in seen:  # loops in a hostile directory
+            return []
+        seen.add(offset)
+        hdr = _read_at(f, base + offset, 16)
+        named, ids = struct.unpack_from("<HH", hdr, 12)
+        n = min(named + ids, _MAX_RESOURCES)
+        raw = _read_at(f, base + offset + 16, 8 * n)
+        return [struct.unpack_from("<II", raw, 8 * i) for i in range(len(raw) // 8)]
+
+    for type_id, type_off in entries(0):
+        if not type_off & 0x80000000:
+            continue
+        rtype = _resource_name(f, base, type_id)
+        for name_id, name_off in entries(type_off & 0x7FFFFFFF):
+            if not name_off & 0x80000000:
+                continue
+            name = _resource_name(f, base, name_id)
+            for lang, data_off in entries(name_off & 0x7FFFFFFF):
+                if data_off & 0x80000000 or len(image.resources) >= _MAX_RESOURCES:
+                    continue
+                rva, size = struct.unpack_from("<II", _read_at(f, base + data_off, 8), 0)
+                offset = image.rva_to_offset(rva)
+                if offset is None or offset >= image.file_size:
+                    continue
+                size = min(size, image.file_size - offset)
+                image.resources.append(PeResource(rtype, name, lang, offset, size))
+
+
+def _read_version_and_manifest(f: BinaryIO, image: PeImage) -> None:
+    for r in image.resources:
+        if r.type == RT_VERSION and not image.version_info:
+            image.version_info = parse_version_info(_read_at(f, r.offset, min(r.size, _MAX_VERSION_INFO)))
+        elif r.type == RT_MANIFEST and image.manifest is None:
+            data = _read_at(f, r.offset, min(r.size, _MAX_MANIFEST))
+            image.manifest = data.decode("utf-8-sig", "replace").strip("\0")
+
+
+def _vs_node(data: bytes, pos: int, end: int) -> Optional[Tuple[str, int, int, int, int]]:
+    """
+    One VS_VERSIONINFO-style node at pos: (key, value offset, value bytes,
+    children offset, node end), or None if it does not fit.
+    """
+    if pos + 6 > end:
+        return None
+    length, value_len, value_type = struct.unpack_from("<HHH", data, pos)
+    node_end = min(pos + length, end)
+    if length < 6:
+        return None
+    key_end = pos + 6
+    while key_end + 1 < node_end and data[key_end:key_end + 2] != b"\0\0":
+        key_end += 2
+    key = data[pos + 6:key_end].decode("utf-16le", "replace")
+    value_at = (key_end + 2 + 3) & ~3
+    value_bytes = value_len * 2 if value_type == 1 else value_len
+    value_bytes = max(0, min(value_bytes, node_end - value_at))
+    children = (value_at + value_bytes + 3) & ~3
+    return key, value_at, value_bytes, children, node_end
+
+
+def _vs_children(data: bytes, pos: int, end: int):
+    while pos < end:
+        node = _vs_node(data, pos, end)
+        if node is None:
+            return
+        yield node
+        pos = (node[4] + 3) & ~3
+
+
+def _version(ms: int, ls: int) -> str:
+    return f"{ms >> 16}.{ms & 0xFFFF}.{ls >> 16}.{ls & 0xFFFF}"
+
+
+def parse_version_info(data: bytes) -> Dict[str, str]:
+    """
+    String values of a VS_VERSIONINFO resource (ProductName, CompanyName,
+    FileVersion, ...; the first language wins). FileVersion and
+    ProductVersion fall back to the binary VS_FIXEDFILEINFO.
+    """
+    root = _vs_node(data, 0, len(data))
+    if root is None or root[0] != "VS_VERSION_INFO":
+        return {}
+    _, value_at, value_bytes, children, end = root
+    info: Dict[str, str] = {}
+    for name, _, _, tables_at, node_end in _vs_children(data, children, end):
+        if name != "StringFileInfo":
+            continue
+        for _, _, _, strings_at, table_end in _vs_children(data, tables_at, node_end):
+            for sname, sval_at, sval_bytes, _, _ in _vs_children(data, strings_at, table_end):
+                text = data[sval_at:sval_at + sval_bytes].decode("utf-16le", "replace").split("\0", 1)[0].strip()
+                if sname and text:
+                    info.setdefault(sname, text)
+    if value_bytes >= 52:
+        sig, _, file_ms, file_ls, prod_ms, prod_ls = struct.unpack_from("<IIIIII", data, value_at)
+        if sig == _FIXED_SIGNATURE:
+            info.setdefault("FileVersion", _version(file_ms, file_ls))
+            info.setdefault("ProductVersion", _version(prod_ms, prod_ls))
+    return info
@@ -0,0 +1,294 @@
+"""
+Range-read analysis of installers served over HTTP(S).
+
+RemoteFile is a read-only, seekable file object over a URL. Reads are served
+from a small LRU cache of fixed-size blocks; missing blocks are fetched with
+one Range request per contiguous run, over keep-alive connections pooled per
+host and reused by every file a process analyzes. The analyzers only read
+what they need (PE headers and resource directory, the tiers they scan, the
+start and end of the overlay, the CFB sectors of the MSI tables they read),
+so a multi-GB installer is analyzed for the price of a few hundred KB to a
+few MB of transfer. Digests are the exception: they need every byte.
+
+The result cache is not used for URLs: its keys are hashes of local files.
+"""
+
+from __future__ import annotations
+
+import http.client
+import io
+import os
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+from urllib.parse import unquote, urljoin, urlsplit
+
+from installer_intel.records import Plan
+from installer_intel.analyzers.exe import DEFAULT_DEPTH, DEPTHS, exe_plan
+from installer_intel.analyzers.hashing import StreamHasher, check_algorithms, record_digests
+from installer_intel.analyzers.msi import analyze_msi_buffer
+from installer_intel.analyzers.nested import FileView
+from installer_intel.analyzers.package import PACKAGE_SUFFIXES, package_plan
+from installer_intel.analyzers.signatures import SignatureSet
+from installer_intel.analyzers.stream import DEFAULT_MAX_MEMORY
+from installer_intel.timings import stage
+
+BLOCK_SIZE = 64 * 1024
+CACHE_BLOCKS = 128  # 8 MB with the default block size
+TIMEOUT = 30.0
+_MAX_REDIRECTS = 5
+_CONTENT_RANGE = re.compile(r"bytes\s+(\d+)-(\d+)/(\d+|\*)")
+
+
+class RemoteError(OSError):
+    """The server cannot serve the file in ranges (or at all)."""
+
+
+def is_url(path: str) -> bool:
+    return path.lower().startswith(("http://", "https://"))
+
+
+def url_suffix(url: str) -> str:
+    """Extension of the file a URL names, e.g. ".exe" (query string ignored)."""
+    return os.path.splitext(unquote(urlsplit(url).path))[1].lower()
+
+
+def url_name(url: str) -> str:
+    return os.path.basename(unquote(urlsplit(url).path))
+
+
+class _Pool:
+    """Idle keep-alive connections per (scheme, host:port)."""
+
+    def __init__(self) -> None:
+        self._idle: Dict[Tuple[str, str], List[http.client.HTTPConnection]] = {}
+        self._lock = threading.Lock()
+        self.opened = 0  # connections made so far
+
+    def get(self, scheme: str, netloc: str, timeout: float) -> http.client.HTTPConnection:
+        with self._lock:
+            idle = self._idle.get((scheme, netloc))
+            if idle:
+                return idle.pop()
+            self.opened += 1
+        cls = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+        return cls(netloc, timeout=timeout)
+
+    def put(self, scheme: str, netloc: str, conn: http.client.HTTPConnection) -> None:
+        with self._lock:
+            self._idle.setdefault((scheme, netloc), []).append(conn)
+
+
+_pool = _Pool()
+
+
+@dataclass
+class Transfer:
+    """What fetching a file has cost, shared by every handle on it."""
+
+    bytes: int = 0
+    requests: int = 0
+
+
+class RemoteFile:
+    """
+    Read-only file object over a URL whose server honours Range requests.
+    Opening it fetches the first block, which also gives the size; pass
+    size (and transfer, to share the counters) to open another handle
+    without that request.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        block_size: int = BLOCK_SIZE,
+        cache_blocks: int = CACHE_BLOCKS,
+        timeout: float = TIMEOUT,
+        size: Optional[int] = None,
+        transfer: Optional[Transfer] = None,
+    ) -> None:
+        self.url = url
+        self.name = url
+        self.block_size = block_size
+        self.timeout = timeout
+        self.transfer = transfer or Transfer()
+        self._blocks: "OrderedDict[int, bytes]" = OrderedDict()
+        self._cache_blocks = max(1, cache_blocks)
+        self._pos = 0
+        self.size = size if size is not None else self._open()
+
+    def _open(self) -> int:
+        status, headers, body = self._request(0, self.block_size - 1)
+        if status == 416:  # empty file: no byte 0 to serve
+            return 0
+        if status == 200:
+            raise RemoteError(f"{self.url}: the server does not support Range requests")
+        match = _CONTENT_RANGE.match(headers.get("content-range", ""))
+        if match is None or match.group(3) == "*":
+            raise RemoteError(f"{self.url}: no file size in the Content-Range header")
+        self._store(0, body)
+        return int(match.group(3))
+
+    def _request(self, first: int, last: int) -> Tuple[int, Dict[str, str], bytes]:
+        """(status, lower-cased headers, body) of GET bytes=first-last, following redirects."""
+        for _ in range(_MAX_REDIRECTS + 1):
+            parts = urlsplit(self.url)
+            target = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+            for attempt in (1, 2):
+                conn = _pool.get(parts.scheme, parts.netloc, self.timeout)
+                try:
+                    with stage("fetch"):
+                        conn.request("GET", target, headers={"Range": f"bytes={first}-{last}"})
+                        resp = conn.getresponse()
+                        body = resp.read()
+                except (http.client.HTTPException, ConnectionError):
+                    # A pooled connection the server has since closed: retry on a new one.
+                    conn.close()
+                    if attempt == 2:
+                        raise
+                    continue
+                break
+            headers = {k.lower(): v for k, v in resp.getheaders()}
+            if resp.will_close:
+                conn.close()
+            else:
+                _pool.put(parts.scheme, parts.netloc, conn)
+            self.transfer.requests += 1
+            self.transfer.bytes += len(body)
+            if resp.status in (301, 302, 303, 307, 308) and "location" in headers:
+                self.url = urljoin(self.url, headers["location"])
+                continue
+            if resp.status not in (200, 206, 416):
+                raise RemoteError(f"{self.url}: HTTP {resp.status} {resp.reason}")
+            return resp.status, headers, body
+        raise RemoteError(f"{self.url}: too many redirects")
+
+    def _store(self, index: int, data: bytes) -> None:
+        for i in range(0, len(data), self.block_size):
+            self._blocks[index + i // self.block_size] = data[i:i + self.block_size]
+            self._blocks.move_to_end(index + i // self.block_size)
+        while len(self._blocks) > self._cache_blocks:
+            self._blocks.popitem(last=False)
+
+    def _fetch(self, first: int, last: int) -> Dict[int, bytes]:
+        """Blocks first..last in one request, cached; returns them."""
+        start = first * self.block_size
+        end = min(self.size, (last + 1) * self.block_size)
+        status, _, body = self._request(start, end - 1)
+        if status != 206 or len(body) != end - start:
+            raise RemoteError(f"{self.url}: expected bytes {start}-{end - 1}, got HTTP {status} ({len(body)} bytes)")
+        self._store(first, body)
+        return {first + i: body[i * self.block_size:(i + 1) * self.block_size] for i in range(last - first + 1)}
+
+    def read_at(self, pos: int, n: int) -> bytes:
+        end = min(self.size, pos + n)
+        if n <= 0 or pos >= end:
+            return b""
+        first, last = pos // self.block_size, (end - 1) // self.block_size
+        got: Dict[int, bytes] = {}
+        missing: List[int] = []
+        for i in range(first, last + 1):
+            block = self._blocks.get(i)
+            if block is None:
+                missing.append(i)
+            else:
+                self._blocks.move_to_end(i)
+                got[i] = block
+        run_start = 0
+        for k in range(1, len(missing) + 1):
+            if k == len(missing) or missing[k] != missing[k - 1] + 1:
+                got.update(self._fetch(missing[run_start], missing[k - 1]))
+                run_start = k
+        data = b"".join(got[i] for i in range(first, last + 1))
+        skip = pos - first * self.block_size
+        return data[skip:skip + end - pos]
+
+    def read(self, n: Optional[int] = -1) -> bytes:
+        left = max(0, self.size - self._pos)
+        data = self.read_at(self._pos, left if n is None or n < 0 else min(n, left))
+        self._pos += len(data)
+        return data
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += self.size
+        if offset < 0:
+            raise ValueError("Negative seek position")
+        self._pos = offset
+        return offset
+
+    def tell(self) -> int:
+        return self._pos
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def close(self) -> None:
+        self._blocks.clear()  # connections stay pooled
+
+    def __enter__(self) -> "RemoteFile":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def reopen(self) -> "RemoteFile":
+        """Another handle on the same file, with its own position and counters shared."""
+        return RemoteFile(
+            self.url, self.block_size, self._cache_blocks, self.timeout, size=self.size, transfer=self.transfer,
+        )
+
+
+def _human(n: int) -> str:
+    for unit, scale in (("GB", 1024 ** 3), ("MB", 1024 ** 2), ("KB", 1024)):
+        if n >= scale:
+            return f"{n / scale:.1f} {unit}"
+    return f"{n} bytes"
+
+
+def analyze_url(
+    url: str,
+    max_memory: int = DEFAULT_MAX_MEMORY,
+    signatures: Optional[SignatureSet] = None,
+    depth: str = DEFAULT_DEPTH,
+    hashes: Sequence[str] = (),
+) -> Plan:
+    """
+    Analyze the .exe, .msi, .zip or .intunewin a URL names, reading it in
+    ranges. The plan records the bytes fetched (metadata BytesFetched, and
+    a note).
+    """
+    if depth not in DEPTHS:
+        raise ValueError(f"Unknown depth {depth!r} (choose from {', '.join(DEPTHS)})")
+    hashes = check_algorithms(hashes)
+    suffix = url_suffix(url)
+    if suffix not in (".exe", ".msi", *PACKAGE_SUFFIXES):
+        raise ValueError("Unsupported file type. Provide a .msi, .exe, .zip or .intunewin")
+
+    with RemoteFile(url) as f:
+        # Digests read the rest of the file on a handle of their own.
+        hasher = StreamHasher(url, f.size, hashes, max_memory, opener=f.reopen) if hashes else None
+        with stage("plan"):
+            if suffix == ".exe":
+                plan = exe_plan(f, f.size, url, max_memory, signatures, depth, hasher)
+            elif suffix in PACKAGE_SUFFIXES:
+                plan = package_plan(f, f.size, url, suffix, max_memory, signatures, depth)
+            else:
+                plan = analyze_msi_buffer(FileView(f, 0, f.size), url, lenient=True)
+        if hasher is not None:
+            record_digests(plan, hasher.hexdigests())
+        plan.metadata["FileName"] = url_name(url)
+        plan.metadata["SizeBytes"] = f.size
+        plan.metadata["BytesFetched"] = f.transfer.bytes
+        plan.notes.append(
+            f"Read over HTTP: fetched {_human(f.transfer.bytes)} of {_human(f.size)} "
+            f"in {f.transfer.requests} range request(s)."
+        )
+    return plan
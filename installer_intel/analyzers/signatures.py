@@ -1,7 +1,40 @@
+"""
+Installer signature database and matcher.
+
+Signatures are declared in signatures.json next to this module. Additional
+files (e.g. in-house signatures) can be layered on top through the
+INSTALLER_INTEL_SIGNATURES environment variable (os.pathsep-separated paths)
+or the CLI --signatures option; a signature with the same name as an
+existing one replaces it.
+
+Each signature lists literal, case-insensitive patterns:
+- any: at least one must be present (if given)
+- all: every one must be present (if given)
+
+All patterns of all signatures are compiled into one regex, so each extracted
+string is searched once no matter how many signatures are loaded. A
+signature marked "decisive" ends the scan as soon as it is satisfied,
+provided no other loaded signature has an equal or higher confidence.
+"""
+
 from __future__ import annotations
 
+import hashlib
+import json
+import os
+import re
 from dataclasses import dataclass
-from typing import List, Optional, Tuple
+from functools import lru_cache
+from itertools import chain
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from installer_intel.analyzers.stream import DEFAULT_MAX_MEMORY, StreamString, iter_file_strings
+from installer_intel.analyzers.strings import iter_ascii, iter_utf16le
+from installer_intel.timings import stage, timed_iter
+
+BUILTIN_SIGNATURES = Path(__file__).with_name("signatures.json")
+SIGNATURES_ENV = "INSTALLER_INTEL_SIGNATURES"
 
 
 @dataclass(frozen=True)
@@ -9,98 +42,219 @@ class SignatureHit:
     name: str
     confidence: float
     evidence: str
+    # (pattern, file offset) of the first occurrence of each matched pattern
+    matches: Tuple[Tuple[str, int], ...] = ()
+
+
+@dataclass(frozen=True)
+class Signature:
+    name: str
+    confidence: float
+    evidence: str
+    any: Tuple[str, ...] = ()
+    all: Tuple[str, ...] = ()
+    decisive: bool = False
+
+    def satisfied(self, found: Dict[str, int]) -> bool:
+        if self.all and not all(p in found for p in self.all):
+            return False
+        if self.any and not any(p in found for p in self.any):
+            return False
+        return True
+
+
+class SignatureSet:
+    """
+    A compiled set of signatures. Build once (see get_signatures) and reuse;
+    compiling is the expensive part, matching is a single pass per string.
+    """
+
+    def __init__(self, signatures: Sequence[Signature], version: str) -> None:
+        self.signatures = list(signatures)
+        self.version = version
+
+        patterns = sorted({p for s in self.signatures for p in s.any + s.all}, key=len, reverse=True)
+        alternation = "|".join(re.escape(p) for p in patterns)
+        # Plain alternation to cheaply reject strings, lookahead form to report
+        # matches at every start position (overlapping ones included).
+        self._prefilter = re.compile(alternation) if patterns else None
+        self._finder = re.compile(f"(?=({alternation}))") if patterns else None
+        # Longest-first alternation reports one pattern per start position, so
+        # a match also implies every shorter pattern that is its prefix.
+        self._implied = {p: tuple(q for q in patterns if p.startswith(q)) for p in patterns}
+        # Stopping early is only safe for a decisive signature that no other
+        # signature could outrank.
+        self._decisive = [
+            s for s in self.signatures
+            if s.decisive and all(o.confidence < s.confidence for o in self.signatures if o is not s)
+        ]
+
+    def scan(
+        self,
+        strings: Iterable[StreamString],
+        found: Optional[Dict[str, int]] = None,
+        stop_early: bool = True,
+    ) -> Dict[str, int]:
+        """
+        Return {pattern: lowest file offset} for every pattern found in a
+        stream of (offset, text, utf16) strings. Stops early once a decisive
+        signature is satisfied, unless stop_early is False. Pass the result
+        of an earlier scan as found to continue matching over another part
+        of the same file.
+        """
+        found = {} if found is None else found
+        if self._prefilter is None:
+            return found
+        with stage("match"):
+            self.merge(self.hits(timed_iter(strings, "strings")), found, stop_early)
+        return found
+
+    def hits(self, strings: Iterable[StreamString]) -> Iterator[List[Tuple[str, int]]]:
+        """
+        [(pattern, file offset), ...] for each string that contains any
+        pattern, in stream order. A pattern can occur more than once.
+        """
+        if self._prefilter is None:
+            return
+        prefilter = self._prefilter.search
+        finder = self._finder.finditer
+        implied = self._implied
+        for off, text, utf16 in strings:
+            low = text.lower()
+            if prefilter(low) is None:
+                continue
+            width = 2 if utf16 else 1
+            yield [(p, off + m.start() * width) for m in finder(low) for p in implied[m.group(1)]]
+
+    def merge(
+        self, hits: Iterable[List[Tuple[str, int]]], found: Dict[str, int], stop_early: bool = True,
+    ) -> bool:
+        """
+        Fold the hits of successive strings into found, as scan does.
+        Returns True if it stopped at a decisive signature (the rest of
+        hits is left unread).
+        """
+        decisive = self._decisive if stop_early else []
+        for string_hits in hits:
+            new = False
+            for p, at in string_hits:
+                if p not in found:
+                    found[p] = at
+                    new = True
+                elif at < found[p]:
+                    found[p] = at
+            if new and any(s.satisfied(found) for s in decisive):
+                return True
+        return False
+
+    def classify(self, found: Dict[str, int]) -> Tuple[str, float, List[SignatureHit]]:
+        hits: List[SignatureHit] = []
+        for s in self.signatures:
+            if s.satisfied(found):
+                matches = tuple((p, found[p]) for p in s.all + s.any if p in found)
+                hits.append(SignatureHit(s.name, s.confidence, s.evidence, matches))
+
+        if not hits:
+            return ("Unknown EXE installer", 0.20, [])
+
+        # Pick best hit
+        best = max(hits, key=lambda h: h.confidence)
+        return (best.name, best.confidence, hits)
+
+    def detect(self, strings: Iterable[StreamString]) -> Tuple[str, float, List[SignatureHit]]:
+        return self.classify(self.scan(strings))
+
+
+def _parse_signatures(path: Path, doc: object) -> List[Signature]:
+    if not isinstance(doc, dict) or not isinstance(doc.get("signatures"), list):
+        raise ValueError(f"{path}: expected an object with a 'signatures' list")
+
+    out: List[Signature] = []
+    for i, entry in enumerate(doc["signatures"]):
+        where = f"{path}: signatures[{i}]"
+        if not isinstance(entry, dict):
+            raise ValueError(f"{where}: expected an object")
+        name = entry.get("name")
+        confidence = entry.get("confidence")
+        if not isinstance(name, str) or not name:
+            raise ValueError(f"{where}: 'name' must be a non-empty string")
+        if not isinstance(confidence, (int, float)) or not 0.0 <= confidence <= 1.0:
+            raise ValueError(f"{where}: 'confidence' must be a number between 0 and 1")
+
+        groups = {}
+        for key in ("any", "all"):
+            values = entry.get(key, [])
+            if not isinstance(values, list) or not all(isinstance(v, str) and v for v in values):
+                raise ValueError(f"{where}: '{key}' must be a list of non-empty strings")
+            groups[key] = tuple(v.lower() for v in values)
+        if not groups["any"] and not groups["all"]:
+            raise ValueError(f"{where}: needs at least one pattern in 'any' or 'all'")
+
+        out.append(Signature(
+            name=name,
+            confidence=float(confidence),
+            evidence=str(entry.get("evidence") or f"Matched {name} strings"),
+            any=groups["any"],
+            all=groups["all"],
+            decisive=bool(entry.get("decisive", False)),
+        ))
+    return out
+
+
+def load_signatures(extra_paths: Sequence[str] = ()) -> SignatureSet:
+    """
+    Load the built-in signature database plus any extra signature files.
+    The set's version is a digest of every file loaded, so it changes
+    whenever any of them does.
+    """
+    by_name: Dict[str, Signature] = {}
+    digest = hashlib.sha256()
+    for path in [BUILTIN_SIGNATURES, *map(Path, extra_paths)]:
+        try:
+            raw = path.read_bytes()
+            doc = json.loads(raw)
+        except (OSError, ValueError) as e:
+            raise ValueError(f"Cannot load signatures from {path}: {e}")
+        digest.update(raw)
+        for sig in _parse_signatures(path, doc):
+            by_name[sig.name] = sig
+    return SignatureSet(list(by_name.values()), version=digest.hexdigest()[:16])
+
+
+@lru_cache(maxsize=8)
+def _cached_signatures(paths: Tuple[str, ...]) -> SignatureSet:
+    return load_signatures(paths)
+
+
+def get_signatures(extra_paths: Sequence[str] = ()) -> SignatureSet:
+    """
+    Compiled signatures for the built-in database, INSTALLER_INTEL_SIGNATURES
+    and extra_paths, cached per combination of files.
+    """
+    env = [p for p in os.environ.get(SIGNATURES_ENV, "").split(os.pathsep) if p]
+    return _cached_signatures(tuple(env) + tuple(str(p) for p in extra_paths))
+
+
+def detect_installer_type(
+    exe_bytes: bytes,
+    signatures: Optional[SignatureSet] = None,
+) -> Tuple[str, float, List[SignatureHit]]:
+    sigs = signatures or get_signatures()
+    strings = chain(
+        ((off, s, False) for off, s in iter_ascii(exe_bytes)),
+        ((off, s, True) for off, s in iter_utf16le(exe_bytes)),
+    )
+    return sigs.detect(strings)
 
 
-def _extract_strings(data: bytes, min_len: int = 6, max_count: int = 4000) -> List[str]:
+def detect_installer_type_file(
+    f: BinaryIO,
+    max_memory: int = DEFAULT_MAX_MEMORY,
+    signatures: Optional[SignatureSet] = None,
+) -> Tuple[str, float, List[SignatureHit]]:
     """
-    Extract a limited set of ASCII and UTF-16LE-ish strings from bytes.
-    Not perfect—good enough for MVP heuristics.
+    Same as detect_installer_type, but streams an open file with memory
+    bounded by max_memory instead of requiring the whole file as bytes.
     """
-    out: List[str] = []
-
-    # ASCII strings
-    cur = bytearray()
-    for b in data:
-        if 32 <= b <= 126:
-            cur.append(b)
-            if len(cur) >= 256:
-                # cap long runs
-                out.append(cur.decode("ascii", errors="ignore"))
-                cur.clear()
-                if len(out) >= max_count:
-                    return out
-        else:
-            if len(cur) >= min_len:
-                out.append(cur.decode("ascii", errors="ignore"))
-                if len(out) >= max_count:
-                    return out
-            cur.clear()
-
-    if len(cur) >= min_len and len(out) < max_count:
-        out.append(cur.decode("ascii", errors="ignore"))
-
-    # UTF-16LE-ish: look for alternating printable/0x00
-    out2: List[str] = []
-    cur_u16 = bytearray()
-    i = 0
-    n = len(data)
-    while i + 1 < n:
-        ch = data[i]
-        zero = data[i + 1]
-        if zero == 0x00 and 32 <= ch <= 126:
-            cur_u16.extend([ch])
-            if len(cur_u16) >= 256:
-                out2.append(cur_u16.decode("ascii", errors="ignore"))
-                cur_u16.clear()
-                if len(out) + len(out2) >= max_count:
-                    break
-        else:
-            if len(cur_u16) >= min_len:
-                out2.append(cur_u16.decode("ascii", errors="ignore"))
-                if len(out) + len(out2) >= max_count:
-                    break
-            cur_u16.clear()
-        i += 2
-
-    if len(cur_u16) >= min_len and (len(out) + len(out2)) < max_count:
-        out2.append(cur_u16.decode("ascii", errors="ignore"))
-
-    return out + out2
-
-
-def detect_installer_type(exe_bytes: bytes) -> Tuple[str, float, List[SignatureHit]]:
-    strings = _extract_strings(exe_bytes)
-    s_join = "\n".join(strings).lower()
-
-    hits: List[SignatureHit] = []
-
-    # Inno Setup
-    if "inno setup" in s_join or "innosetup" in s_join or "unins000.exe" in s_join:
-        hits.append(SignatureHit("Inno Setup", 0.92, "Matched 'Inno Setup' / 'unins000.exe' strings"))
-
-    # NSIS
-    if "nsis" in s_join or "nullsoft" in s_join or "nsis error" in s_join:
-        hits.append(SignatureHit("NSIS", 0.90, "Matched NSIS/Nullsoft strings"))
-
-    # InstallShield
-    if "installshield" in s_join or "isscript" in s_join or "setup.inx" in s_join:
-        hits.append(SignatureHit("InstallShield", 0.82, "Matched InstallShield strings"))
-
-    # WiX Burn
-    if "burn" in s_join and ("wix" in s_join or "bundle" in s_join or "bootstrapper" in s_join):
-        hits.append(SignatureHit("WiX Burn / Bootstrapper", 0.80, "Matched Burn/WiX bundle strings"))
-
-    # Squirrel
-    if "squirrel" in s_join or "update.exe" in s_join:
-        hits.append(SignatureHit("Squirrel", 0.70, "Matched Squirrel 'Update.exe' strings"))
-
-    # MSIX/AppX hints
-    if ".appx" in s_join or ".msix" in s_join or "appxmanifest.xml" in s_join:
-        hits.append(SignatureHit("MSIX/AppX (hint)", 0.55, "Matched MSIX/AppX related strings"))
-
-    if not hits:
-        return ("Unknown EXE installer", 0.20, [])
-
-    # Pick best hit
-    best = max(hits, key=lambda h: h.confidence)
-    return (best.name, best.confidence, hits)
+    sigs = signatures or get_signatures()
+    return sigs.detect(iter_file_strings(f, max_memory=max_memory))
@@ -0,0 +1,216 @@
+"""
+Bounded-memory string scanning of installer files.
+
+Large bootstrappers can be several GB, so the file is never read into memory
+as a whole. Two modes produce the same strings as extracting from the whole
+buffer at once:
+
+- mapped: the file is memory-mapped and scanned window by window. Runs that
+  start inside a window are followed past its end directly in the mapping,
+  and pages behind the scan position are released where the OS allows it.
+- chunked: the file is read sequentially into a window-sized buffer. A run
+  that touches the end of the buffer is held back and rescanned at the start
+  of the next window, so strings spanning window boundaries still match.
+
+Strings are yielded as (offset, text, utf16) tuples, window by window: the
+ASCII strings of a window first, then its UTF-16LE strings. A [start, end)
+byte range limits the scan to part of the file (see iter_file_ranges); runs
+are cut at its edges. A StreamHasher, if given, is offered every window as
+it is read, so digests need no second pass over the same bytes.
+"""
+
+from __future__ import annotations
+
+import mmap
+from typing import TYPE_CHECKING, BinaryIO, Iterable, Iterator, Optional, Tuple
+
+from installer_intel.analyzers.strings import MAX_RUN, iter_ascii, iter_utf16le, resume_offsets
+from installer_intel.timings import count, stage
+
+if TYPE_CHECKING:
+    from installer_intel.analyzers.hashing import StreamHasher
+
+DEFAULT_MAX_MEMORY = 64 * 1024 * 1024
+MIN_WINDOW = 1024 * 1024
+
+StreamString = Tuple[int, str, bool]
+
+
+def window_size(max_memory: int) -> int:
+    """
+    Window size for a memory budget. The chunked mode holds one window plus
+    a translated copy of one extraction block, so a quarter of the budget
+    leaves ample headroom.
+    """
+    return max(MIN_WINDOW, max_memory // 4)
+
+
+def _map(f: BinaryIO) -> Optional[mmap.mmap]:
+    try:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (AttributeError, OSError, ValueError):
+        # No fileno (in-memory streams), empty files, pipes, etc.
+        return None
+
+
+def _release(mm: mmap.mmap, upto: int) -> None:
+    """Drop mapped pages before upto from the resident set, if supported."""
+    advice = getattr(mmap, "MADV_DONTNEED", None)
+    if advice is None or not hasattr(mm, "madvise"):
+        return
+    upto -= upto % mmap.PAGESIZE
+    if upto > 0:
+        try:
+            mm.madvise(advice, 0, upto)
+        except OSError:
+            pass
+
+
+def _offer(hasher: "StreamHasher", mm: mmap.mmap, start: int, end: int) -> None:
+    view = memoryview(mm)
+    try:
+        hasher.update(start, view[start:end])
+    finally:
+        view.release()  # mm cannot be closed while a view is exported
+
+
+def _iter_mapped(
+    mm: mmap.mmap,
+    window: int,
+    min_len: int,
+    start: int,
+    end: int,
+    hasher: Optional["StreamHasher"],
+    stop: Optional[int] = None,
+    lower: Optional[int] = None,
+) -> Iterator[StreamString]:
+    size = min(end, len(mm))
+    stop = size if stop is None else min(stop, size)
+    # A segment of a larger range starts past the runs its predecessor follows.
+    pos_a, pos_u = (start, start) if lower is None else resume_offsets(mm, start, lower, size)
+    ws = start
+    while ws < stop:
+        we = min(stop, ws + window)
+        count(bytes_read=we - ws)  # paged in while extracting
+        if hasher is not None:
+            _offer(hasher, mm, ws, we)
+        for off, text in iter_ascii(mm, min_len, start=pos_a, end=size, stop=we):
+            pos_a = off + len(text)
+            yield off, text, False
+        for off, text in iter_utf16le(mm, min_len, start=pos_u, end=size, stop=we):
+            pos_u = off + 2 * len(text)
+            yield off, text, True
+        pos_a = max(pos_a, we)
+        pos_u = max(pos_u, we)
+        _release(mm, min(pos_a, pos_u))
+        ws = we
+
+
+def _iter_chunked(
+    f: BinaryIO, window: int, min_len: int, start: int, end: Optional[int], hasher: Optional["StreamHasher"],
+) -> Iterator[StreamString]:
+    buf = b""
+    base = start  # file offset of buf[0]
+    pos = {False: start, True: start}  # per-encoding resume offsets
+    eof = False
+    if start or f.seekable():
+        f.seek(start)  # the caller may have moved the file position
+    while True:
+        want = window - len(buf)
+        if end is not None:
+            want = min(want, end - base - len(buf))
+            if want <= 0 and base + len(buf) >= end:
+                eof = True
+        if want > 0 and not eof:
+            with stage("read"):
+                data = f.read(want)
+                count(bytes_read=len(data))
+            if hasher is not None:
+                hasher.update(base + len(buf), data)
+            if len(data) < want or (end is not None and base + len(buf) + len(data) >= end):
+                eof = True
+            buf += data
+        if not buf:
+            return
+        buf_end = base + len(buf)
+
+        for utf16 in (False, True):
+            width = 2 if utf16 else 1
+            start = pos[utf16] - base
+            if utf16:
+                found = iter_utf16le(buf, min_len, start=start)
+            else:
+                found = iter_ascii(buf, min_len, start=start)
+            resume = max(pos[utf16], buf_end - (min_len * width + 1))
+            for off, text in found:
+                piece_end = off + len(text) * width
+                if not eof and piece_end >= len(buf) - (width - 1) and len(text) < MAX_RUN:
+                    # The run may continue in the next window; rescan it from here.
+                    resume = base + off
+                    break
+                resume = max(resume, base + piece_end)
+                yield base + off, text, utf16
+            pos[utf16] = buf_end if eof else resume
+
+        if eof:
+            return
+        cut = min(pos.values()) - base
+        buf = buf[cut:]
+        base += cut
+
+
+def iter_file_strings(
+    f: BinaryIO,
+    max_memory: int = DEFAULT_MAX_MEMORY,
+    min_len: int = 6,
+    use_mmap: bool = True,
+    start: int = 0,
+    end: Optional[int] = None,
+    hasher: Optional["StreamHasher"] = None,
+) -> Iterator[StreamString]:
+    """
+    Yield every string in an open binary file (or in its [start, end) byte
+    range) with memory bounded by max_memory, independent of the file size.
+    """
+    window = window_size(max_memory)
+    mm = _map(f) if use_mmap else None
+    if mm is None:
+        yield from _iter_chunked(f, window, min_len, start, end, hasher)
+        return
+    try:
+        yield from _iter_mapped(mm, window, min_len, start, len(mm) if end is None else end, hasher)
+    finally:
+        mm.close()
+
+
+def iter_file_ranges(
+    f: BinaryIO,
+    ranges: Iterable[Tuple[int, int]],
+    max_memory: int = DEFAULT_MAX_MEMORY,
+    min_len: int = 6,
+    use_mmap: bool = True,
+    hasher: Optional["StreamHasher"] = None,
+) -> Iterator[StreamString]:
+    """Strings of each [start, end) range in turn (see iter_file_strings)."""
+    for start, end in ranges:
+        yield from iter_file_strings(f, max_memory, min_len, use_mmap, start=start, end=end, hasher=hasher)
+
+
+def iter_segment_strings(
+    mm: mmap.mmap,
+    lower: int,
+    start: int,
+    stop: int,
+    end: int,
+    max_memory: int = DEFAULT_MAX_MEMORY,
+    min_len: int = 6,
+) -> Iterator[StreamString]:
+    """
+    The strings of the [lower, end) range of a mapped file that begin in
+    [start, stop), for scanning a range in segments. With start - lower a
+    multiple of window_size(max_memory), consecutive segments together
+    yield what iter_file_strings yields for the range, in the same order.
+    """
+    yield from _iter_mapped(
+        mm, window_size(max_memory), min_len, start, end, None, stop, lower if start > lower else None,
+    )
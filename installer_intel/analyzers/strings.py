@@ -0,0 +1,180 @@
+"""
+Bulk string extraction for installer binaries.
+
+Candidate runs are located with bytes.translate + bytes.find over fixed-size
+blocks and then extended with an anchored byte regex, so the per-byte work
+happens in C rather than in the interpreter. Any buffer-protocol object with
+slicing (bytes, bytearray, mmap) can be scanned; only one block is copied at
+a time, which keeps memory flat when scanning a mapped file.
+
+Semantics match the original heuristic extractor:
+- ASCII runs of printable characters (0x20-0x7E), at least min_len long.
+- UTF-16LE runs of printable characters followed by 0x00.
+- Runs longer than MAX_RUN characters are split into MAX_RUN-sized pieces;
+  a trailing piece shorter than min_len is dropped. Runs are matched a piece
+  at a time, so a run of any length costs MAX_RUN characters of memory.
+
+UTF-16LE runs are reported at both even and odd byte offsets. Runs of
+different alignment can never overlap (a byte cannot be both a printable
+character and a 0x00 terminator), so odd-offset strings are purely additive.
+"""
+
+from __future__ import annotations
+
+import re
+from itertools import islice
+from typing import Iterator, List, Optional, Tuple
+
+# Long runs are split into pieces of this many characters.
+MAX_RUN = 256
+
+# Bytes translated per find() pass.
+_BLOCK = 4 * 1024 * 1024
+
+# printable -> 0x01, NUL -> 0x02, everything else -> 0x00
+_CLASSES = bytes(1 if 32 <= b <= 126 else 2 if b == 0 else 0 for b in range(256))
+
+# One piece of a run, and (for skipping, never copied) a whole run.
+_ASCII_PIECE = re.compile(rb"[\x20-\x7e]{0,%d}" % MAX_RUN)
+_UTF16_PIECE = re.compile(rb"(?:[\x20-\x7e]\x00){0,%d}" % MAX_RUN)
+_ASCII_RUN = re.compile(rb"[\x20-\x7e]*")
+_UTF16_RUN = re.compile(rb"(?:[\x20-\x7e]\x00)*")
+
+
+def _iter_runs(
+    data,
+    needle: bytes,
+    piece_re,
+    width: int,
+    start: int,
+    end: int,
+    stop: int,
+) -> Iterator[Tuple[int, bytes]]:
+    """
+    Yield (offset, raw bytes) for each maximal run in data[start:end] that
+    begins with needle in class space and starts before stop, in pieces of
+    at most MAX_RUN characters of width bytes (piece_re matches one piece,
+    never more, so a long run is never copied whole). A run's pieces follow
+    it past stop; a last piece shorter than needle is dropped. Runs never
+    overlap.
+    """
+    full = MAX_RUN * width
+    pos = start
+    block_start = start
+    while block_start < stop:
+        block_end = min(stop, block_start + _BLOCK)
+        # Extend the translated block so needles starting inside it are seen whole.
+        chunk = data[block_start:min(end, block_end + len(needle) - 1)]
+        if isinstance(chunk, memoryview):
+            chunk = chunk.tobytes()
+        classes = chunk.translate(_CLASSES)
+        limit = block_end - block_start
+        i = max(pos - block_start, 0)
+        while i < limit:
+            j = classes.find(needle, i)
+            if j < 0 or j >= limit:
+                break
+            m = piece_re.match(data, block_start + j, end)
+            yield m.start(), m.group()
+            while m.end() - m.start() == full:
+                m = piece_re.match(data, m.end(), end)
+                if m.end() - m.start() < len(needle):
+                    break
+                yield m.start(), m.group()
+            pos = m.end()
+            i = pos - block_start
+        # Past a run that went beyond this block, nothing is left to find.
+        block_start = max(block_end, pos)
+
+
+def iter_ascii(
+    data,
+    min_len: int = 6,
+    start: int = 0,
+    end: Optional[int] = None,
+    stop: Optional[int] = None,
+) -> Iterator[Tuple[int, str]]:
+    """
+    Yield (offset, text) for every ASCII string in data[start:end].
+    Offsets are relative to the start of data. With stop, only runs that
+    begin before stop are reported (they may still extend up to end).
+    """
+    if end is None:
+        end = len(data)
+    if stop is None:
+        stop = end
+    for off, raw in _iter_runs(data, b"\x01" * min_len, _ASCII_PIECE, 1, start, end, stop):
+        yield off, raw.decode("ascii")
+
+
+def iter_utf16le(
+    data,
+    min_len: int = 6,
+    start: int = 0,
+    end: Optional[int] = None,
+    stop: Optional[int] = None,
+    odd: bool = True,
+) -> Iterator[Tuple[int, str]]:
+    """
+    Yield (offset, text) for every UTF-16LE string in data[start:end].
+    stop behaves as in iter_ascii. With odd=False only runs starting at
+    even offsets are reported.
+    """
+    if end is None:
+        end = len(data)
+    if stop is None:
+        stop = end
+    for off, raw in _iter_runs(data, b"\x01\x02" * min_len, _UTF16_PIECE, 2, start, end, stop):
+        if not odd and off & 1:
+            continue
+        yield off, raw[::2].decode("ascii")
+
+
+def resume_offsets(data, at: int, start: int = 0, end: Optional[int] = None) -> Tuple[int, int]:
+    """
+    Where an ASCII and a UTF-16LE scan of data[start:end] that picks up at
+    offset at resumes: past any run that begins before at and reaches it.
+    Such a run belongs to the scan of what precedes at (which follows it to
+    end), so iter_ascii/iter_utf16le from these offsets with stop give
+    exactly the strings a scan from start reports that begin in [at, stop).
+    """
+    if end is None:
+        end = len(data)
+    pos_a = pos_u = at
+    if start < at < end:
+        if 32 <= data[at - 1] <= 126:
+            pos_a = _ASCII_RUN.match(data, at, end).end()
+        # A (printable, NUL) pair just before at, or one straddling it.
+        if at - 2 >= start and data[at - 1] == 0 and 32 <= data[at - 2] <= 126:
+            pos_u = _UTF16_RUN.match(data, at, end).end()
+        elif data[at] == 0 and 32 <= data[at - 1] <= 126:
+            pos_u = _UTF16_RUN.match(data, at - 1, end).end()
+    return pos_a, pos_u
+
+
+def extract_strings(
+    data,
+    min_len: int = 6,
+    max_count: Optional[int] = None,
+    utf16_odd: bool = True,
+) -> List[str]:
+    """
+    Extract ASCII strings followed by UTF-16LE strings from data.
+
+    max_count bounds the total number of strings; ASCII strings are taken
+    first, UTF-16LE strings fill whatever budget remains.
+    """
+    ascii_iter = (s for _, s in iter_ascii(data, min_len))
+    if max_count is None:
+        out = list(ascii_iter)
+    else:
+        out = list(islice(ascii_iter, max_count))
+        if len(out) >= max_count:
+            return out
+
+    utf16_iter = (s for _, s in iter_utf16le(data, min_len, odd=utf16_odd))
+    if max_count is None:
+        out.extend(utf16_iter)
+    else:
+        out.extend(islice(utf16_iter, max_count - len(out)))
+    return out
@@ -0,0 +1,311 @@
+"""
+Persistent, content-addressed cache of analysis results.
+
+Results are stored in a SQLite database keyed by the file's SHA-256 plus an
+analysis version (analyzer revision, file kind and, for EXEs, the signature
+set version), so changing the signature database invalidates old entries
+automatically. A second table remembers (size, mtime, inode) -> SHA-256 per
+path, so unchanged files are not even re-hashed.
+
+The cache lives in $INSTALLER_INTEL_CACHE_DIR, or the platform cache
+directory (%LOCALAPPDATA% / $XDG_CACHE_HOME / ~/.cache). It is bounded by
+size: least recently used entries are evicted first.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import sqlite3
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+from installer_intel import __version__
+from installer_intel.records import Plan, dumps
+from installer_intel.timings import mark_cached, stage
+
+CACHE_ENV = "INSTALLER_INTEL_CACHE_DIR"
+DEFAULT_MAX_BYTES = 256 * 1024 ** 2
+
+# Bump whenever analyzer output changes for the same input, so results
+# cached by an older build are not served.
+ANALYZER_REVISION = 7
+ANALYZER_VERSION = f"{__version__}+{ANALYZER_REVISION}"
+
+_HASH_CHUNK = 1024 * 1024
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    sha256 TEXT NOT NULL,
+    version TEXT NOT NULL,
+    path TEXT NOT NULL,
+    plan TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    last_used REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS results_last_used ON results(last_used);
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    inode INTEGER NOT NULL,
+    sha256 TEXT NOT NULL
+);
+"""
+
+
+def default_cache_dir() -> Path:
+    env = os.environ.get(CACHE_ENV)
+    if env:
+        return Path(env)
+    if os.name == "nt" and os.environ.get("LOCALAPPDATA"):
+        return Path(os.environ["LOCALAPPDATA"]) / "installer-intel" / "cache"
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return Path(base) / "installer-intel"
+
+
+def file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(_HASH_CHUNK)
+            if not chunk:
+                break
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def rebind_paths(plan: Plan, old_path: str, new_path: str) -> None:
+    """
+    Point a plan analyzed as old_path at the path it is served for: its
+    input_path and FileName, its children's input_path prefix, and the
+    commands that run it. Notes, evidence and other metadata are left alone,
+    even if they happen to contain old_path.
+    """
+    if old_path == new_path:
+        return
+    if "FileName" in plan.metadata:
+        plan.metadata["FileName"] = os.path.basename(new_path)
+    _rebind(plan, old_path, new_path)
+
+
+def _rebind(plan: Plan, old_path: str, new_path: str) -> None:
+    old = plan.input_path
+    if old != old_path and not old.startswith((old_path + "/", old_path + "!")):
+        return
+    new = new_path + old[len(old_path):]
+    plan.input_path = new
+    # Analyzers quote the path wherever a command runs it.
+    for cand in (*plan.install_candidates, *plan.uninstall_candidates):
+        cand.command = cand.command.replace(f'"{old}"', f'"{new}"')
+    for child in plan.children:
+        _rebind(child, old_path, new_path)
+
+
+@dataclass
+class CacheStats:
+    path: str
+    entries: int
+    size_bytes: int
+    max_bytes: int
+    files_tracked: int
+    hits: int
+
+
+class ResultCache:
+    """
+    SQLite-backed InstallPlan cache. Safe to share between processes (each
+    opens its own connection); writes use WAL mode and wait on locks.
+    """
+
+    def __init__(self, directory: Optional[Path] = None, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        self.directory = Path(directory) if directory else default_cache_dir()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.path = self.directory / "results.sqlite"
+        self.max_bytes = max_bytes
+        self._db = sqlite3.connect(str(self.path), timeout=30, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        self._db.close()
+
+    def __enter__(self) -> "ResultCache":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    # ----- hashing --------------------------------------------------------
+
+    def content_hash(self, path: str) -> str:
+        """
+        SHA-256 of a file, reusing the stored digest when size, mtime and
+        inode are unchanged since it was last hashed.
+        """
+        ident = self._identity(path)
+        digest = self._known_hash(ident)
+        if digest is None:
+            digest = file_sha256(ident[0])
+            self._remember_hash(ident, digest)
+        return digest
+
+    @staticmethod
+    def _identity(path: str) -> Tuple[str, int, int, int]:
+        abspath = os.path.abspath(path)
+        st = os.stat(abspath)
+        return abspath, st.st_size, st.st_mtime_ns, st.st_ino
+
+    def _known_hash(self, ident: Tuple[str, int, int, int]) -> Optional[str]:
+        row = self._db.execute(
+            "SELECT sha256 FROM files WHERE path = ? AND size = ? AND mtime_ns = ? AND inode = ?", ident,
+        ).fetchone()
+        return row[0] if row else None
+
+    def _remember_hash(self, ident: Tuple[str, int, int, int], digest: str) -> None:
+        self._db.execute(
+            "INSERT OR REPLACE INTO files (path, size, mtime_ns, inode, sha256) VALUES (?, ?, ?, ?, ?)",
+            (*ident, digest),
+        )
+
+    # ----- lookup / store -------------------------------------------------
+
+    @staticmethod
+    def _key(sha256: str, version: str) -> str:
+        return f"{sha256}:{ANALYZER_VERSION}:{version}"
+
+    def get(self, path: str, version: str) -> Optional[Plan]:
+        return self._get(path, self.content_hash(path), version)
+
+    def _get(self, path: str, sha: str, version: str) -> Optional[Plan]:
+        key = self._key(sha, version)
+        row = self._db.execute("SELECT path, plan FROM results WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        self._db.execute(
+            "UPDATE results SET last_used = ?, hits = hits + 1 WHERE key = ?", (time.time(), key)
+        )
+        plan = Plan.from_json(row[1])
+        rebind_paths(plan, row[0], path)
+        return plan
+
+    def put(self, path: str, version: str, plan: Plan) -> None:
+        self._put(path, self.content_hash(path), version, plan)
+
+    def _put(self, path: str, sha: str, version: str, plan: Plan) -> None:
+        data = dumps(plan, exclude=("diagnostics",))
+        now = time.time()
+        self._db.execute(
+            "INSERT OR REPLACE INTO results (key, sha256, version, path, plan, size, created, last_used)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (self._key(sha, version), sha, f"{ANALYZER_VERSION}:{version}", path, data, len(data), now, now),
+        )
+        self._evict(self.max_bytes)
+
+    def get_or_analyze(
+        self,
+        path: str,
+        version: str,
+        analyze: Callable[[], Plan],
+        digests: Optional[Dict[str, str]] = None,
+    ) -> Plan:
+        """
+        The cached plan for path, or analyze() stored under its content
+        hash. Pass digests if analyze() hashes the file as it reads it and
+        stores the SHA-256 there: a file whose hash is not on record is then
+        analyzed straight away and read once, instead of hashed first.
+        """
+        with stage("cache"):
+            ident = self._identity(path)
+            sha = self._known_hash(ident)
+            if sha is None and digests is None:
+                sha = file_sha256(ident[0])
+                self._remember_hash(ident, sha)
+            plan = self._get(path, sha, version) if sha else None
+        if plan is not None:
+            mark_cached()
+            return plan
+        plan = analyze()
+        with stage("cache"):
+            if sha is None:
+                sha = digests["sha256"] if digests and "sha256" in digests else file_sha256(ident[0])
+                self._remember_hash(ident, sha)
+            self._put(path, sha, version, plan)
+        return plan
+
+    # ----- maintenance ----------------------------------------------------
+
+    def _evict(self, max_bytes: int) -> int:
+        """Drop least recently used entries until the total fits max_bytes."""
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        if total <= max_bytes:
+            return 0
+        removed = 0
+        rows = self._db.execute("SELECT key, size FROM results ORDER BY last_used").fetchall()
+        doomed = []
+        for key, size in rows:
+            if total <= max_bytes:
+                break
+            doomed.append((key,))
+            total -= size
+            removed += 1
+        self._db.executemany("DELETE FROM results WHERE key = ?", doomed)
+        return removed
+
+    def prune(
+        self,
+        max_bytes: Optional[int] = None,
+        stale: bool = True,
+        current_versions: Optional[Iterable[str]] = None,
+    ) -> Tuple[int, int]:
+        """
+        Shrink the cache to max_bytes (default: the configured limit). If
+        stale, also drop results from other analyzer versions (or whose
+        version is not in current_versions, when given) and file records for
+        paths that no longer exist. Returns (results removed, files removed).
+        """
+        removed = 0
+        if stale:
+            if current_versions is not None:
+                # Plans that also record digests carry a ":h=..." suffix.
+                keep = [f"{ANALYZER_VERSION}:{v}" for v in current_versions]
+                marks = ",".join("?" * len(keep))
+                cur = self._db.execute(
+                    f"DELETE FROM results WHERE version NOT IN ({marks})"
+                    f" AND NOT (instr(version, ':h=') > 0 AND substr(version, 1, instr(version, ':h=') - 1)"
+                    f" IN ({marks}))",
+                    keep + keep,
+                )
+            else:
+                cur = self._db.execute(
+                    "DELETE FROM results WHERE substr(version, 1, ?) != ?",
+                    (len(ANALYZER_VERSION) + 1, f"{ANALYZER_VERSION}:"),
+                )
+            removed += cur.rowcount
+        removed += self._evict(self.max_bytes if max_bytes is None else max_bytes)
+
+        files_removed = 0
+        if stale:
+            gone = [(p,) for (p,) in self._db.execute("SELECT path FROM files") if not os.path.exists(p)]
+            self._db.executemany("DELETE FROM files WHERE path = ?", gone)
+            files_removed = len(gone)
+        self._db.execute("VACUUM")
+        return removed, files_removed
+
+    def clear(self) -> None:
+        self._db.execute("DELETE FROM results")
+        self._db.execute("DELETE FROM files")
+        self._db.execute("VACUUM")
+
+    def stats(self) -> CacheStats:
+        entries, size, hits = self._db.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(hits), 0) FROM results"
+        ).fetchone()
+        files = self._db.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+        return CacheStats(str(self.path), entries, size, self.max_bytes, files, hits)
@@ -0,0 +1,317 @@
+"""
+Queryable catalog of InstallPlans.
+
+Plans are stored whole (the JSON the analyzers produced) next to the fields
+people search by, in indexed columns: file and installer type, confidence,
+manufacturer (MSI Manufacturer or EXE CompanyName), product name, version,
+ProductCode and UpgradeCode, plus one row per install/uninstall candidate,
+detection rule and file digest. Filters and group-bys are then SQL over
+those columns, and exports stream the stored JSON without parsing it.
+Embedded plans (children) are cataloged too, under the file they came from.
+
+The catalog lives in the same SQLite file as the repository index (see
+index.py), which keeps it in sync; plans from scan output or JSON files
+can be added with Catalog.add_many().
+"""
+
+from __future__ import annotations
+
+import itertools
+import json
+import sqlite3
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS plans (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    root TEXT NOT NULL,
+    nesting INTEGER NOT NULL,
+    file_type TEXT NOT NULL,
+    installer_type TEXT NOT NULL,
+    confidence REAL NOT NULL,
+    manufacturer TEXT,
+    product_name TEXT,
+    product_version TEXT,
+    product_code TEXT,
+    upgrade_code TEXT,
+    sha256 TEXT,
+    plan TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS plans_root ON plans(root);
+CREATE INDEX IF NOT EXISTS plans_installer_type ON plans(installer_type COLLATE NOCASE, confidence);
+CREATE INDEX IF NOT EXISTS plans_manufacturer ON plans(manufacturer COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS plans_product_code ON plans(product_code);
+CREATE INDEX IF NOT EXISTS plans_upgrade_code ON plans(upgrade_code);
+CREATE TABLE IF NOT EXISTS plan_commands (
+    plan_id INTEGER NOT NULL REFERENCES plans(id) ON DELETE CASCADE,
+    role TEXT NOT NULL,
+    command TEXT NOT NULL,
+    confidence REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS plan_commands_plan ON plan_commands(plan_id, role, confidence);
+CREATE TABLE IF NOT EXISTS plan_rules (
+    plan_id INTEGER NOT NULL REFERENCES plans(id) ON DELETE CASCADE,
+    kind TEXT NOT NULL,
+    value TEXT NOT NULL,
+    confidence REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS plan_rules_value ON plan_rules(kind, value);
+CREATE INDEX IF NOT EXISTS plan_rules_plan ON plan_rules(plan_id);
+CREATE TABLE IF NOT EXISTS plan_hashes (
+    plan_id INTEGER NOT NULL REFERENCES plans(id) ON DELETE CASCADE,
+    algorithm TEXT NOT NULL,
+    digest TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS plan_hashes_digest ON plan_hashes(digest);
+CREATE INDEX IF NOT EXISTS plan_hashes_plan ON plan_hashes(plan_id);
+"""
+
+# Columns --group-by accepts, and those exported to CSV (in order).
+GROUP_COLUMNS = (
+    "installer_type", "file_type", "manufacturer", "product_name", "product_version", "product_code",
+    "upgrade_code",
+)
+CSV_COLUMNS = (
+    "path", "file_type", "installer_type", "confidence", "manufacturer", "product_name", "product_version",
+    "product_code", "upgrade_code", "sha256", "install_command", "uninstall_command",
+)
+_DIGESTS = ("SHA256", "SHA1", "MD5")
+
+
+@dataclass
+class Filters:
+    """
+    Query filters; unset ones match everything. Text matches ignore case;
+    manufacturer, product_name and command match substrings, path is a
+    glob, hash matches any recorded digest.
+    """
+
+    installer_type: Optional[str] = None
+    file_type: Optional[str] = None
+    manufacturer: Optional[str] = None
+    product_name: Optional[str] = None
+    product_code: Optional[str] = None
+    upgrade_code: Optional[str] = None
+    hash: Optional[str] = None
+    command: Optional[str] = None  # any install or uninstall candidate
+    path: Optional[str] = None
+    min_confidence: Optional[float] = None
+    max_confidence: Optional[float] = None
+    nested: bool = True  # include plans of embedded packages
+
+    def where(self) -> Tuple[str, List[Any]]:
+        clauses: List[str] = []
+        params: List[Any] = []
+        for name in ("installer_type", "file_type"):
+            value = getattr(self, name)
+            if value is not None:
+                clauses.append(f"{name} = ? COLLATE NOCASE")
+                params.append(value)
+        for name in ("manufacturer", "product_name"):
+            value = getattr(self, name)
+            if value is not None:
+                clauses.append(f"instr(lower({name}), ?) > 0")
+                params.append(value.lower())
+        for name in ("product_code", "upgrade_code"):
+            value = getattr(self, name)
+            if value is not None:
+                clauses.append(f"{name} = ?")
+                params.append(_guid(value))
+        if self.hash is not None:
+            clauses.append("id IN (SELECT plan_id FROM plan_hashes WHERE digest = ?)")
+            params.append(self.hash.lower().split(":")[-1])
+        if self.command is not None:
+            clauses.append("id IN (SELECT plan_id FROM plan_commands WHERE instr(lower(command), ?) > 0)")
+            params.append(self.command.lower())
+        if self.path is not None:
+            clauses.append("path GLOB ?")
+            params.append(self.path)
+        if self.min_confidence is not None:
+            clauses.append("confidence >= ?")
+            params.append(self.min_confidence)
+        if self.max_confidence is not None:
+            clauses.append("confidence <= ?")
+            params.append(self.max_confidence)
+        if not self.nested:
+            clauses.append("nesting = 0")
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+
+def _guid(value: str) -> str:
+    value = value.strip().upper()
+    return value if value.startswith("{") else "{" + value + "}"
+
+
+def _rows(plan: Dict[str, Any], nesting: int = 0) -> Iterator[Tuple[Dict[str, Any], int]]:
+    """The plan and its descendants, with their nesting level."""
+    yield plan, nesting
+    for child in plan.get("children") or ():
+        yield from _rows(child, nesting + 1)
+
+
+class Catalog:
+    """
+    SQLite catalog of InstallPlans keyed by input path. Open it with
+    Catalog(path) and close it when done, or use it as a context manager.
+    The repository index shares its connection (db).
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        if self.path.parent != Path(""):
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(str(self.path), timeout=30, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("PRAGMA foreign_keys=ON")
+        self.db.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        self.db.close()
+
+    def __enter__(self) -> "Catalog":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        """Cataloged files (not counting embedded packages)."""
+        return self.db.execute("SELECT COUNT(*) FROM plans WHERE nesting = 0").fetchone()[0]
+
+    def put(self, plan_json: str) -> None:
+        """
+        Add a plan and its children, replacing what was cataloged for its
+        file. Wrap many calls in a transaction (add_many does).
+        """
+        plan = json.loads(plan_json)
+        root = plan["input_path"]
+        self.remove([root])
+        for node, nesting in _rows(plan):
+            meta = node.get("metadata") or {}
+            text = plan_json if nesting == 0 else json.dumps(node, separators=(",", ":"))
+            plan_id = self.db.execute(
+                "INSERT INTO plans (path, root, nesting, file_type, installer_type, confidence, manufacturer,"
+                " product_name, product_version, product_code, upgrade_code, sha256, plan)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    node["input_path"], root, nesting, node["file_type"], node["installer_type"],
+                    node["confidence"], _text(meta.get("Manufacturer") or meta.get("CompanyName")),
+                    _text(meta.get("ProductName")), _text(meta.get("ProductVersion")),
+                    _code(meta.get("ProductCode")), _code(meta.get("UpgradeCode")),
+                    _text(meta.get("SHA256")), text,
+                ),
+            ).lastrowid
+            self.db.executemany(
+                "INSERT INTO plan_commands (plan_id, role, command, confidence) VALUES (?, ?, ?, ?)",
+                [
+                    (plan_id, role, c["command"], c["confidence"])
+                    for role in ("install", "uninstall")
+                    for c in node.get(f"{role}_candidates") or ()
+                ],
+            )
+            self.db.executemany(
+                "INSERT INTO plan_rules (plan_id, kind, value, confidence) VALUES (?, ?, ?, ?)",
+                [(plan_id, r["kind"], r["value"], r["confidence"]) for r in node.get("detection_rules") or ()],
+            )
+            self.db.executemany(
+                "INSERT INTO plan_hashes (plan_id, algorithm, digest) VALUES (?, ?, ?)",
+                [(plan_id, a.lower(), str(meta[a]).lower()) for a in _DIGESTS if meta.get(a)],
+            )
+
+    def remove(self, paths: Iterable[str]) -> None:
+        """Drop the plans of these files and of the packages embedded in them."""
+        self.db.executemany("DELETE FROM plans WHERE root = ?", [(p,) for p in paths])
+
+    def add_many(self, plans: Iterable[str]) -> int:
+        """put() each plan JSON in one transaction; returns how many."""
+        count = 0
+        self.db.execute("BEGIN")
+        try:
+            for plan_json in plans:
+                self.put(plan_json)
+                count += 1
+        except BaseException:
+            self.db.execute("ROLLBACK")
+            raise
+        self.db.execute("COMMIT")
+        return count
+
+    def count(self, filters: Filters) -> int:
+        where, params = filters.where()
+        return self.db.execute(f"SELECT COUNT(*) FROM plans{where}", params).fetchone()[0]
+
+    def group(self, filters: Filters, by: Sequence[str]) -> List[Tuple[Any, ...]]:
+        """(values of the by columns..., count), most common first."""
+        for column in by:
+            if column not in GROUP_COLUMNS:
+                raise ValueError(f"Cannot group by {column!r}; choose from {', '.join(GROUP_COLUMNS)}")
+        where, params = filters.where()
+        columns = ", ".join(by)
+        return self.db.execute(
+            f"SELECT {columns}, COUNT(*) AS n FROM plans{where} GROUP BY {columns} ORDER BY n DESC, {columns}",
+            params,
+        ).fetchall()
+
+    def plans(self, filters: Filters, limit: Optional[int] = None) -> Iterator[str]:
+        """InstallPlan JSON of the matching plans, by path, as stored."""
+        where, params = filters.where()
+        sql = f"SELECT plan FROM plans{where} ORDER BY path"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        for (plan,) in self.db.execute(sql, params):
+            yield plan
+
+    def records(self, filters: Filters, limit: Optional[int] = None) -> Iterator[Tuple[Any, ...]]:
+        """CSV_COLUMNS of the matching plans, by path; commands are the top candidates."""
+        where, params = filters.where()
+        best = (
+            "(SELECT command FROM plan_commands c WHERE c.plan_id = plans.id AND c.role = '{}'"
+            " ORDER BY c.confidence DESC LIMIT 1)"
+        )
+        sql = (
+            f"SELECT {', '.join(CSV_COLUMNS[:-2])}, {best.format('install')}, {best.format('uninstall')}"
+            f" FROM plans{where} ORDER BY path"
+        )
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        yield from self.db.execute(sql, params)
+
+
+def _text(value: Any) -> Optional[str]:
+    return str(value) if value not in (None, "") else None
+
+
+def _code(value: Any) -> Optional[str]:
+    return _guid(str(value)) if value else None
+
+
+def read_plans(paths: Iterable[Path]) -> Iterator[str]:
+    """
+    InstallPlan JSON from files written by `analyze --out` (one plan) or
+    `scan` (NDJSON); directories are searched for *.json and *.ndjson.
+    Error lines of scan output are skipped.
+    """
+    for path in map(Path, paths):
+        files = [path] if not path.is_dir() else \
+            sorted(p for p in path.rglob("*") if p.suffix.lower() in (".json", ".ndjson"))
+        for file in files:
+            with open(file, encoding="utf-8") as f:
+                first = f.readline()
+                try:
+                    json.loads(first)
+                except ValueError:
+                    # Not one object per line: a single indented plan
+                    plan = json.loads(first + f.read())
+                    lines: Iterable[str] = [json.dumps(plan, ensure_ascii=False, separators=(",", ":"))]
+                else:
+                    lines = itertools.chain([first], f)
+                for line in lines:
+                    line = line.strip()
+                    if line.startswith("{") and '"installer_type":' in line:
+                        yield line
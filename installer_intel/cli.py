@@ -1,23 +1,37 @@
+"""
+installer-intel command line.
+
+Only Typer is imported at module load. Analyzers, Pydantic models, the
+result cache and Rich are imported inside the commands that use them, so
+cheap invocations stay cheap; --format json and --summary-only print plain
+text and never load Rich. The console entry point (installer_intel.__main__)
+answers --version before even this module is imported.
+"""
+
 from __future__ import annotations
 
 import json
-import os
+import math
 import sys
+import time
 from pathlib import Path
-from typing import Optional
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
 
 import typer
-from rich.console import Console
-from rich.panel import Panel
-from rich.table import Table
 
 from installer_intel import __version__
-from installer_intel.analyzers import analyze_exe, analyze_msi
 from installer_intel.banner import show_banner, should_show_banner
-from installer_intel.models import InstallPlan
+
+if TYPE_CHECKING:
+    from installer_intel.records import Plan, StageTiming
 
 app = typer.Typer(add_completion=False, no_args_is_help=True)
-console = Console()
+cache_app = typer.Typer(help="Inspect and maintain the result cache.", no_args_is_help=True)
+app.add_typer(cache_app, name="cache")
+index_app = typer.Typer(help="Keep an incremental index of an installer repository.", no_args_is_help=True)
+app.add_typer(index_app, name="index")
+
+_FORMATS = ("table", "json")
 
 
 @app.callback(invoke_without_command=True)
@@ -38,7 +52,7 @@ def main(
       (i.e. `installer-intel`), not for --help/--version.
     """
     if version_flag:
-        console.print(__version__)
+        print(__version__)
         raise typer.Exit(0)
 
     # Suppress banner when help is requested explicitly
@@ -50,86 +64,877 @@ def main(
         show_banner()
 
 
-def _write_json(plan: InstallPlan, out_path: Path) -> None:
+_SIZE_UNITS = {"": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+
+
+def _parse_size(value: str) -> int:
+    """
+    Parse a human-friendly byte size such as 512M, 2G or 65536.
+    """
+    v = value.strip().upper().rstrip("B")
+    unit = v[-1:] if v[-1:] in _SIZE_UNITS else ""
+    number = v[: len(v) - len(unit)]
+    try:
+        scaled = float(number) * _SIZE_UNITS[unit]
+        if not math.isfinite(scaled):
+            raise ValueError(value)
+        size = int(scaled)
+    except (ValueError, OverflowError):
+        raise typer.BadParameter(f"Invalid size: {value!r} (use e.g. 256M or 1G)")
+    if size <= 0:
+        raise typer.BadParameter(f"Size must be positive: {value!r}")
+    return size
+
+
+def _write_json(plan: Plan, out_path: Path) -> None:
+    from installer_intel.records import dumps
+
     out_path.parent.mkdir(parents=True, exist_ok=True)
-    out_path.write_text(plan.model_dump_json(indent=2), encoding="utf-8")
+    out_path.write_text(dumps(plan, indent=2), encoding="utf-8")
 
 
-def _print_summary(plan: InstallPlan) -> None:
-    console.print(Panel.fit(f"[bold]installer-intel[/bold]\n{plan.input_path}", title="Analyze Result"))
+def _check_format(value: str) -> str:
+    if value not in _FORMATS:
+        raise typer.BadParameter(f"Unknown format {value!r} (choose from {', '.join(_FORMATS)})")
+    return value
 
-    console.print(f"[bold]Type:[/bold] {plan.installer_type}  (confidence {plan.confidence:.2f})")
-    console.print(f"[bold]File:[/bold] {plan.file_type}")
 
-    if plan.metadata:
-        meta_table = Table(title="Metadata", show_lines=True)
-        meta_table.add_column("Key", style="bold")
-        meta_table.add_column("Value")
-        for k, v in plan.metadata.items():
-            meta_table.add_row(str(k), "" if v is None else str(v))
-        console.print(meta_table)
+def _check_depth(value: str) -> str:
+    from installer_intel.analyzers.exe import DEPTHS
 
-    if plan.install_candidates:
-        t = Table(title="Install candidates", show_lines=True)
-        t.add_column("Confidence", justify="right")
-        t.add_column("Command")
-        for c in plan.install_candidates:
-            t.add_row(f"{c.confidence:.2f}", c.command)
-        console.print(t)
+    if value not in DEPTHS:
+        raise typer.BadParameter(f"Unknown depth {value!r} (choose from {', '.join(DEPTHS)})")
+    return value
 
-    if plan.uninstall_candidates:
-        t = Table(title="Uninstall candidates", show_lines=True)
-        t.add_column("Confidence", justify="right")
-        t.add_column("Command")
-        for c in plan.uninstall_candidates:
-            t.add_row(f"{c.confidence:.2f}", c.command)
-        console.print(t)
 
+def _check_hashes(values: Optional[List[str]]) -> Tuple[str, ...]:
+    from installer_intel.analyzers.hashing import check_algorithms
+
+    try:
+        return check_algorithms(a for v in values or [] for a in v.split(","))
+    except ValueError as e:
+        raise typer.BadParameter(str(e))
+
+
+def _summary_text(plan: Plan) -> str:
+    """Plain-text summary: the best candidate of each kind, no Rich."""
+    lines = [plan.input_path, f"Type: {plan.installer_type} (confidence {plan.confidence:.2f})"]
+    if plan.install_candidates:
+        best = max(plan.install_candidates, key=lambda c: c.confidence)
+        lines.append(f"Install: {best.command} ({best.confidence:.2f})")
+    if plan.uninstall_candidates:
+        best = max(plan.uninstall_candidates, key=lambda c: c.confidence)
+        lines.append(f"Uninstall: {best.command} ({best.confidence:.2f})")
     if plan.detection_rules:
-        t = Table(title="Detection rules", show_lines=True)
-        t.add_column("Confidence", justify="right")
-        t.add_column("Kind")
-        t.add_column("Value")
-        for d in plan.detection_rules:
-            t.add_row(f"{d.confidence:.2f}", d.kind, d.value)
-        console.print(t)
+        best = max(plan.detection_rules, key=lambda d: d.confidence)
+        lines.append(f"Detection: {best.kind} {best.value} ({best.confidence:.2f})")
+    if plan.children:
+        lines.append("Embedded: " + ", ".join(
+            f"{c.installer_type} {c.input_path[len(plan.input_path):]}" for c in plan.children
+        ))
+    if plan.coverage:
+        cov = plan.coverage
+        lines.append(
+            f"Scanned: {cov.bytes_scanned / 1024 ** 2:.1f} of {cov.file_bytes / 1024 ** 2:.1f} MB"
+            + (f", {cov.bytes_skipped / 1024 ** 2:.1f} MB compressed skipped" if cov.bytes_skipped else "")
+            + f" (decided by {cov.tier}, depth {cov.depth})"
+        )
+    if plan.diagnostics:
+        stages = ", ".join(f"{st.stage} {st.seconds:.4f}s" for st in plan.diagnostics.stages)
+        lines.append(f"Timings: total {plan.diagnostics.total_seconds:.4f}s ({stages})")
+    return "\n".join(lines)
+
 
-    if plan.notes:
-        console.print(Panel("\n".join(f"- {n}" for n in plan.notes), title="Notes"))
+def _append_metrics(path: Path, records) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        for r in records:
+            f.write(json.dumps(r) + "\n")
 
 
 @app.command()
 def analyze(
-    path: Path = typer.Argument(..., help="Path to installer (.msi or .exe)"),
-    out: Optional[Path] = typer.Option(None, "--out", "-o", help="Output JSON path (default: ./installplan.json)"),
+    path: str = typer.Argument(..., help="Path or http(s) URL of an installer (.msi or .exe) or package (.zip or .intunewin)"),
+    out: Optional[Path] = typer.Option(
+        None, "--out", "-o", help="Output JSON path (default: ./installplan.json; none with --format json)",
+    ),
     quiet: bool = typer.Option(False, "--quiet", "-q", help="Suppress banner and progress bars"),
+    max_memory: str = typer.Option(
+        "64M",
+        "--max-memory",
+        help="Memory budget for scanning EXEs (e.g. 256M, 1G); large files are streamed within it",
+    ),
+    signatures: Optional[List[Path]] = typer.Option(
+        None,
+        "--signatures",
+        help="Extra signature database (JSON); may be repeated. Also read from $INSTALLER_INTEL_SIGNATURES",
+    ),
+    no_cache: bool = typer.Option(False, "--no-cache", help="Always re-analyze; do not read or write the result cache"),
+    timings: bool = typer.Option(False, "--timings", help="Record per-stage timings, bytes read and peak memory"),
+    metrics: Optional[Path] = typer.Option(
+        None, "--metrics", help="Append per-stage metrics as NDJSON to this file (implies --timings)",
+    ),
+    output_format: str = typer.Option(
+        "table", "--format", "-f", help="table: Rich summary; json: print the InstallPlan JSON to stdout",
+    ),
+    summary_only: bool = typer.Option(False, "--summary-only", help="Print a short plain-text summary instead of tables"),
+    depth: str = typer.Option(
+        "standard", "--depth", help="EXE scan depth: triage (bounded regions), standard, or deep (everything)",
+    ),
+    hashes: Optional[List[str]] = typer.Option(
+        None, "--hash", help="Record file digests (sha256, sha1, md5; repeat or comma-separate) and a file_hash rule",
+    ),
+    jobs: int = typer.Option(
+        0, "--jobs", "-j", help="Worker processes for scanning a large (256 MB+) EXE (default: CPU cores; 1: serial)",
+    ),
 ) -> None:
+    output_format = _check_format(output_format)
+    depth = _check_depth(depth)
+    hashes = _check_hashes(hashes)
+    plain = output_format == "json" or summary_only
+
     # Banner before any analysis output (interactive runs only):
     # - not quiet
     # - TTY
     # - no explicit --out scripting path
-    if out is None and should_show_banner(quiet=quiet):
+    # - human-readable table output
+    if out is None and not plain and should_show_banner(quiet=quiet):
         show_banner()
 
-    p = Path(path)
-    if not p.exists():
-        raise typer.BadParameter(f"File not found: {p}")
+    from installer_intel.analyzers.remote import is_url
 
-    ext = p.suffix.lower().lstrip(".")
+    remote = is_url(path)
+    if not remote and not Path(path).exists():
+        raise typer.BadParameter(f"File not found: {path}")
 
-    if ext == "msi":
-        plan = analyze_msi(str(p))
-    elif ext == "exe":
-        plan = analyze_exe(str(p))
-    else:
-        raise typer.BadParameter("Unsupported file type. Provide a .msi or .exe")
+    from installer_intel.analyzers.signatures import get_signatures
+    from installer_intel.cache import ResultCache
+    from installer_intel.scan import analyze_path
+
+    budget = _parse_size(max_memory)
+    try:
+        sigs = get_signatures([str(sp) for sp in signatures or []])
+    except ValueError as e:
+        raise typer.BadParameter(str(e))
+
+    cache = None if no_cache or remote else ResultCache()
+    try:
+        plan = analyze_path(
+            path, max_memory=budget, signatures=sigs, cache=cache, timings=timings or metrics is not None,
+            depth=depth,
+            hashes=hashes,
+            workers=jobs or None,
+        )
+    except ValueError as e:
+        raise typer.BadParameter(str(e))
+    except OSError as e:  # unreadable file, or a URL the server will not serve in ranges
+        print(f"Error: {e}", file=sys.stderr)
+        raise typer.Exit(1)
+    finally:
+        if cache is not None:
+            cache.close()
+
+    if metrics is not None:
+        from installer_intel.timings import metrics_record
+
+        _append_metrics(metrics, [metrics_record(plan)])
+
+    if output_format == "json":
+        # The plan goes to stdout; a file is only written when asked for.
+        if out is not None:
+            _write_json(plan, out)
+        from installer_intel.records import dumps
+
+        sys.stdout.write(dumps(plan, indent=2) + "\n")
+        return
 
     out_path = out or Path("installplan.json")
     _write_json(plan, out_path)
-    _print_summary(plan)
+    if summary_only:
+        print(_summary_text(plan))
+        print(f"Wrote: {out_path.resolve()}")
+        return
+
+    from installer_intel.render import console, print_summary
+
+    print_summary(plan)
     console.print(f"[green]Wrote:[/green] {out_path.resolve()}")
 
 
+@app.command()
+def scan(
+    targets: Optional[List[str]] = typer.Argument(
+        None, help="Directories (searched recursively), files, glob patterns or http(s) URLs",
+    ),
+    out: Optional[Path] = typer.Option(None, "--out", "-o", help="Write NDJSON here instead of stdout"),
+    jobs: int = typer.Option(0, "--jobs", "-j", help="Worker processes (default: number of CPU cores)"),
+    timeout: float = typer.Option(120.0, "--timeout", help="Per-file time limit in seconds (0 disables)"),
+    max_memory: str = typer.Option(
+        "64M",
+        "--max-memory",
+        help="Memory budget per worker for scanning EXEs (e.g. 256M, 1G)",
+    ),
+    signatures: Optional[List[Path]] = typer.Option(
+        None,
+        "--signatures",
+        help="Extra signature database (JSON); may be repeated. Also read from $INSTALLER_INTEL_SIGNATURES",
+    ),
+    no_cache: bool = typer.Option(False, "--no-cache", help="Always re-analyze; do not read or write the result cache"),
+    timings: bool = typer.Option(False, "--timings", help="Record per-stage timings and summarize them at the end"),
+    metrics: Optional[Path] = typer.Option(
+        None, "--metrics", help="Append per-file stage metrics as NDJSON to this file (implies --timings)",
+    ),
+    output_format: str = typer.Option(
+        "table", "--format", "-f", help="Summary on stderr: table (Rich) or json (one plain JSON object)",
+    ),
+    depth: str = typer.Option(
+        "standard", "--depth", help="EXE scan depth: triage (bounded regions), standard, or deep (everything)",
+    ),
+    hashes: Optional[List[str]] = typer.Option(
+        None, "--hash", help="Record file digests (sha256, sha1, md5; repeat or comma-separate) and a file_hash rule",
+    ),
+    queue: Optional[Path] = typer.Option(
+        None, "--queue", help="Share the work with other nodes through this queue file (SQLite, on a shared path)",
+    ),
+    lease: float = typer.Option(
+        60.0, "--lease", help="With --queue: seconds before files claimed by a node that stopped are redone",
+    ),
+    batch: int = typer.Option(16, "--batch", help="With --queue: files claimed at a time"),
+    merge: bool = typer.Option(
+        False, "--merge", help="With --queue: once the queue is finished, write every node's results, by path",
+    ),
+) -> None:
+    """
+    Analyze every .exe/.msi/.zip/.intunewin under the given paths in parallel.
+
+    Writes one InstallPlan per line (NDJSON) as files finish. Files that
+    fail or time out are written as {"input_path": ..., "error": ...} lines
+    and do not stop the batch. A throughput summary goes to stderr.
+
+    With --queue, several machines can run the same command against one
+    queue file on a share: each claims batches of files under a renewed
+    lease, and files of a node that dies are redone by the others. Nodes
+    may also join with --queue and no targets.
+    """
+    output_format = _check_format(output_format)
+    depth = _check_depth(depth)
+    hashes = _check_hashes(hashes)
+    if not targets and queue is None:
+        raise typer.BadParameter("Give files or directories to scan, or --queue to join a shared scan")
+    if merge and queue is None:
+        raise typer.BadParameter("--merge needs --queue")
+    if lease <= 0 or batch <= 0:
+        raise typer.BadParameter("--lease and --batch must be positive")
+
+    from installer_intel.analyzers.signatures import get_signatures
+    from installer_intel.cache import default_cache_dir
+    from installer_intel.scan import default_jobs, find_installers, scan as scan_paths
+
+    budget = _parse_size(max_memory)
+    signature_paths = [str(sp) for sp in signatures or []]
+    try:
+        get_signatures(signature_paths)  # validate before starting workers
+    except ValueError as e:
+        raise typer.BadParameter(str(e))
+
+    jobs = jobs if jobs > 0 else default_jobs()
+    work = None
+    if queue is not None:
+        from installer_intel.workqueue import WorkQueue, analysis_version
+
+        work = WorkQueue(queue, lease=lease, batch=batch)
+        try:
+            work.check_version(analysis_version(signature_paths, depth, hashes))
+        except ValueError as e:
+            work.close()
+            raise typer.BadParameter(str(e))
+    sink = open(out, "w", encoding="utf-8") if out else sys.stdout
+    count = failed = timed_out = total_bytes = 0
+    stage_totals: Dict[str, StageTiming] = {}
+    metrics_file = open(metrics, "a", encoding="utf-8") if metrics else None
+    t0 = time.perf_counter()
+    try:
+        options = dict(
+            jobs=jobs,
+            timeout=timeout or None,
+            max_memory=budget,
+            signature_paths=signature_paths,
+            cache_dir=None if no_cache else str(default_cache_dir()),
+            timings=timings or metrics is not None,
+            depth=depth,
+            hashes=hashes,
+        )
+        if work is not None:
+            from installer_intel.workqueue import scan_queue
+
+            results = scan_queue(work, targets or (), **options)
+        else:
+            results = scan_paths(find_installers(targets), **options)
+        for r in results:
+            count += 1
+            total_bytes += r.size
+            if r.metrics:
+                _add_stage_totals(stage_totals, r.metrics)
+                if metrics_file:
+                    metrics_file.write(json.dumps(r.metrics) + "\n")
+            if r.ok:
+                if not merge:
+                    sink.write(r.plan_json + "\n")
+            else:
+                failed += 1
+                timed_out += r.timed_out
+                if not merge:
+                    sink.write(json.dumps({"input_path": r.path, "error": r.error, "timed_out": r.timed_out}) + "\n")
+                print(f"Error: {r.path}: {r.error}", file=sys.stderr)
+            sink.flush()
+        if merge:
+            for line in work.results():
+                sink.write(line + "\n")
+    except KeyboardInterrupt:
+        print("Interrupted.", file=sys.stderr)
+    finally:
+        if work is not None:
+            work.close()
+        if out:
+            sink.close()
+        if metrics_file:
+            metrics_file.close()
+    elapsed = time.perf_counter() - t0
+
+    if output_format == "json":
+        summary = {
+            "files": count,
+            "ok": count - failed,
+            "errors": failed,
+            "timeouts": timed_out,
+            "bytes": total_bytes,
+            "seconds": round(elapsed, 3),
+            "jobs": jobs,
+            "stages": {
+                name: {"seconds": st.seconds, "calls": st.calls, "bytes_read": st.bytes_read, "strings": st.strings}
+                for name, st in stage_totals.items()
+            },
+        }
+        print(json.dumps(summary), file=sys.stderr)
+        return
+
+    from installer_intel.render import err_console, print_scan_summary, print_timings
+
+    print_scan_summary(count, failed, timed_out, total_bytes, elapsed, jobs)
+    if stage_totals:
+        # Stage seconds are summed over files (CPU time across workers).
+        busy = sum(st.seconds for st in stage_totals.values())
+        print_timings(list(stage_totals.values()), busy, None, title="Stage totals (all files)", stderr=True)
+    if count == 0 and work is None:
+        err_console.print("[yellow]No .exe, .msi, .zip or .intunewin files found.[/yellow]")
+
+
+def _add_stage_totals(totals: Dict[str, StageTiming], record: Dict) -> None:
+    from installer_intel.records import StageTiming
+
+    for name, m in record["stages"].items():
+        st = totals.get(name)
+        if st is None:
+            st = totals[name] = StageTiming(stage=name, seconds=0.0)
+        st.seconds += m["seconds"]
+        st.calls += m["calls"]
+        st.bytes_read += m["bytes_read"]
+        st.strings += m["strings"]
+
+
+@app.command()
+def serve(
+    host: str = typer.Option("127.0.0.1", "--host", help="Address to listen on"),
+    port: int = typer.Option(8765, "--port", "-p", help="TCP port to listen on"),
+    socket: Optional[Path] = typer.Option(
+        None, "--socket", help="Listen on this Unix socket instead of TCP (mode 0600)",
+    ),
+    jobs: int = typer.Option(0, "--jobs", "-j", help="Worker processes (default: number of CPU cores)"),
+    timeout: float = typer.Option(120.0, "--timeout", help="Per-request analysis time limit in seconds (0 disables)"),
+    max_pending: int = typer.Option(
+        0, "--max-pending", help="Requests admitted at once before answering 503 (default: 4 per worker)",
+    ),
+    max_upload: str = typer.Option("4G", "--max-upload", help="Largest accepted upload (e.g. 512M, 4G)"),
+    max_memory: str = typer.Option(
+        "64M",
+        "--max-memory",
+        help="Memory budget per worker for scanning EXEs (e.g. 256M, 1G)",
+    ),
+    signatures: Optional[List[Path]] = typer.Option(
+        None,
+        "--signatures",
+        help="Extra signature database (JSON); may be repeated. Also read from $INSTALLER_INTEL_SIGNATURES",
+    ),
+    no_cache: bool = typer.Option(False, "--no-cache", help="Always re-analyze; do not read or write the result cache"),
+    allow_path: Optional[List[Path]] = typer.Option(
+        None, "--allow-path", help="Only analyze ?path= requests under this directory; may be repeated",
+    ),
+    depth: str = typer.Option(
+        "standard", "--depth", help="Default EXE scan depth (requests may pass &depth=)",
+    ),
+    hashes: Optional[List[str]] = typer.Option(
+        None, "--hash", help="Default file digests to record (requests may pass &hash=)",
+    ),
+) -> None:
+    """
+    Run a long-lived analysis server over localhost HTTP or a Unix socket.
+
+    Workers keep signatures compiled and the result cache open between
+    requests. POST /analyze?path=... analyzes a local file; POST
+    /analyze?filename=setup.exe analyzes the uploaded request body. Both
+    return the InstallPlan JSON. GET /health reports pool status.
+    """
+    import asyncio
+
+    depth = _check_depth(depth)
+    hashes = _check_hashes(hashes)
+    if socket is not None and not hasattr(asyncio, "start_unix_server"):
+        raise typer.BadParameter("Unix sockets are not supported on this platform; use --host/--port")
+
+    from installer_intel.cache import default_cache_dir
+    from installer_intel.server import AnalysisServer, run
+
+    try:
+        server = AnalysisServer(
+            jobs=jobs or None,
+            timeout=timeout or None,
+            max_pending=max_pending or None,
+            max_upload=_parse_size(max_upload),
+            max_memory=_parse_size(max_memory),
+            signature_paths=[str(sp) for sp in signatures or []],
+            cache_dir=None if no_cache else str(default_cache_dir()),
+            allowed_roots=[str(p) for p in allow_path or []],
+            depth=depth,
+            hashes=hashes,
+        )
+    except ValueError as e:
+        raise typer.BadParameter(str(e))
+
+    if socket is None and host not in ("127.0.0.1", "::1", "localhost"):
+        print(
+            f"Warning: listening on {host}; anyone who can reach it can have local files analyzed"
+            + ("" if allow_path else " (consider --allow-path)"),
+            file=sys.stderr,
+        )
+
+    def ready(addresses: List[str]) -> None:
+        print(
+            f"installer-intel {__version__} serving on {', '.join(addresses)} "
+            f"({server.jobs} worker(s), up to {server.max_pending} pending requests)",
+            file=sys.stderr,
+        )
+
+    try:
+        run(server, host=host, port=port, socket_path=str(socket) if socket else None, on_ready=ready)
+    except OSError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        raise typer.Exit(1)
+    print("Stopped.", file=sys.stderr)
+
+
+@app.command()
+def watch(
+    directory: Path = typer.Argument(..., help="Drop folder to watch (subdirectories included)"),
+    out: Optional[str] = typer.Option(
+        None, "--out", "-o", help="Append NDJSON here ('-' for stdout) instead of writing <file>.installplan.json",
+    ),
+    jobs: int = typer.Option(0, "--jobs", "-j", help="Worker processes (default: number of CPU cores)"),
+    settle: float = typer.Option(2.0, "--settle", help="Seconds a file must stay unchanged before it is analyzed"),
+    poll: bool = typer.Option(False, "--poll", help="List the tree periodically instead of using inotify"),
+    poll_interval: float = typer.Option(5.0, "--poll-interval", help="Seconds between listings when polling"),
+    existing: bool = typer.Option(
+        False, "--existing", help="Also analyze installers already there (skips ones with an up-to-date plan)",
+    ),
+    timeout: float = typer.Option(120.0, "--timeout", help="Per-file time limit in seconds (0 disables)"),
+    max_memory: str = typer.Option(
+        "64M",
+        "--max-memory",
+        help="Memory budget per worker for scanning EXEs (e.g. 256M, 1G)",
+    ),
+    signatures: Optional[List[Path]] = typer.Option(
+        None,
+        "--signatures",
+        help="Extra signature database (JSON); may be repeated. Also read from $INSTALLER_INTEL_SIGNATURES",
+    ),
+    no_cache: bool = typer.Option(False, "--no-cache", help="Always re-analyze; do not read or write the result cache"),
+    depth: str = typer.Option(
+        "standard", "--depth", help="EXE scan depth: triage (bounded regions), standard, or deep (everything)",
+    ),
+    hashes: Optional[List[str]] = typer.Option(
+        None, "--hash", help="Record file digests (sha256, sha1, md5; repeat or comma-separate) and a file_hash rule",
+    ),
+) -> None:
+    """
+    Analyze installers as they land in a drop folder, until interrupted.
+
+    New or modified .exe/.msi/.zip/.intunewin files are analyzed once they
+    have stopped changing for --settle seconds. Each InstallPlan is written
+    next to its file as <file>.installplan.json, or appended to --out as one
+    NDJSON line. Uses inotify on Linux; use --poll on network shares, whose
+    remote writes inotify does not see.
+    """
+    import signal
+
+    depth = _check_depth(depth)
+    hashes = _check_hashes(hashes)
+    if settle < 0 or poll_interval <= 0:
+        raise typer.BadParameter("--settle must be 0 or more and --poll-interval positive")
+
+    from installer_intel.analyzers.signatures import get_signatures
+    from installer_intel.cache import default_cache_dir
+    from installer_intel.watch import Watcher, write_beside
+
+    signature_paths = [str(sp) for sp in signatures or []]
+    try:
+        get_signatures(signature_paths)  # validate before starting workers
+    except ValueError as e:
+        raise typer.BadParameter(str(e))
+
+    if out == "-":
+        sink = sys.stdout
+    elif out:
+        Path(out).parent.mkdir(parents=True, exist_ok=True)
+        sink = open(out, "a", encoding="utf-8")
+    else:
+        sink = None
+
+    def on_result(r) -> None:
+        if not r.ok:
+            print(f"Error: {r.path}: {r.error}", file=sys.stderr)
+            if sink is not None:
+                sink.write(json.dumps({"input_path": r.path, "error": r.error, "timed_out": r.timed_out}) + "\n")
+                sink.flush()
+            return
+        if sink is not None:
+            sink.write(r.plan_json + "\n")
+            sink.flush()
+            if sink is not sys.stdout:
+                print(f"{r.path} ({r.seconds:.2f}s)", file=sys.stderr)
+            return
+        try:
+            print(f"{write_beside(r)} ({r.seconds:.2f}s)", file=sys.stderr)
+        except OSError as e:
+            print(f"Error: {r.path}: cannot write plan: {e}", file=sys.stderr)
+
+    try:
+        watcher = Watcher(
+            str(directory),
+            on_result,
+            jobs=jobs or None,
+            settle=settle,
+            poll=poll,
+            poll_interval=poll_interval,
+            existing=existing,
+            timeout=timeout or None,
+            max_memory=_parse_size(max_memory),
+            signature_paths=signature_paths,
+            cache_dir=None if no_cache else str(default_cache_dir()),
+            depth=depth,
+            hashes=hashes,
+        )
+    except (ValueError, OSError) as e:
+        if sink is not None and sink is not sys.stdout:
+            sink.close()
+        raise typer.BadParameter(str(e))
+
+    if watcher.note:
+        print(f"Warning: {watcher.note}", file=sys.stderr)
+    print(
+        f"installer-intel {__version__} watching {watcher.root} "
+        f"({watcher.kind}, {watcher.jobs} worker(s), settle {settle:g}s)",
+        file=sys.stderr,
+    )
+    if hasattr(signal, "SIGTERM"):
+        signal.signal(signal.SIGTERM, lambda signum, frame: watcher.stop())
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
+        if sink is not None and sink is not sys.stdout:
+            sink.close()
+    print(f"Stopped: {watcher.analyzed} file(s) analyzed, {watcher.failed} error(s).", file=sys.stderr)
+
+
+@index_app.command("update")
+def index_update(
+    targets: List[str] = typer.Argument(..., help="Directories (searched recursively) or files to index"),
+    index: Path = typer.Option(
+        Path("installer-intel-index.sqlite"), "--index", "-i", help="Index file (SQLite); created if missing",
+    ),
+    jobs: int = typer.Option(0, "--jobs", "-j", help="Worker processes (default: number of CPU cores)"),
+    timeout: float = typer.Option(120.0, "--timeout", help="Per-file time limit in seconds (0 disables)"),
+    max_memory: str = typer.Option(
+        "64M",
+        "--max-memory",
+        help="Memory budget per worker for scanning EXEs (e.g. 256M, 1G)",
+    ),
+    signatures: Optional[List[Path]] = typer.Option(
+        None,
+        "--signatures",
+        help="Extra signature database (JSON); may be repeated. Also read from $INSTALLER_INTEL_SIGNATURES",
+    ),
+    no_cache: bool = typer.Option(False, "--no-cache", help="Always re-analyze; do not read or write the result cache"),
+    depth: str = typer.Option(
+        "standard", "--depth", help="EXE scan depth: triage (bounded regions), standard, or deep (everything)",
+    ),
+    hashes: Optional[List[str]] = typer.Option(
+        None, "--hash", help="Digests to record besides SHA-256 (sha1, md5; repeat or comma-separate)",
+    ),
+    retry_errors: bool = typer.Option(False, "--retry-errors", help="Re-analyze files that failed last time"),
+    output_format: str = typer.Option(
+        "table", "--format", "-f", help="Summary on stderr: table (Rich) or json (one plain JSON object)",
+    ),
+) -> None:
+    """
+    Analyze new and changed installers under the given paths into an index.
+
+    Lists the tree in parallel and compares size and mtime with the index:
+    only new or modified files (or ones analyzed by another version or
+    with other options) are analyzed, and entries of deleted files are
+    dropped. A run with nothing to do only lists the tree.
+    """
+    output_format = _check_format(output_format)
+    depth = _check_depth(depth)
+    hashes = _check_hashes(hashes)
+
+    from installer_intel.analyzers.signatures import get_signatures
+    from installer_intel.cache import default_cache_dir
+    from installer_intel.index import RepoIndex
+
+    signature_paths = [str(sp) for sp in signatures or []]
+    try:
+        get_signatures(signature_paths)  # validate before starting workers
+    except ValueError as e:
+        raise typer.BadParameter(str(e))
+
+    def progress(r) -> None:
+        if not r.ok:
+            print(f"Error: {r.path}: {r.error}", file=sys.stderr)
+
+    with RepoIndex(index) as repo:
+        try:
+            result = repo.update(
+                targets,
+                jobs=jobs or None,
+                timeout=timeout or None,
+                max_memory=_parse_size(max_memory),
+                signature_paths=signature_paths,
+                cache_dir=None if no_cache else str(default_cache_dir()),
+                depth=depth,
+                hashes=hashes,
+                retry_errors=retry_errors,
+                progress=progress,
+            )
+        except KeyboardInterrupt:
+            print("Interrupted; files analyzed so far are in the index.", file=sys.stderr)
+            raise typer.Exit(130)
+        entries = len(repo)
+
+    if output_format == "json":
+        from dataclasses import asdict
+
+        print(json.dumps({**asdict(result), "entries": entries, "index": str(index)}), file=sys.stderr)
+        return
+
+    from installer_intel.render import print_index_update
+
+    print_index_update(result, entries, str(index))
+
+
+@index_app.command("import")
+def index_import(
+    files: List[Path] = typer.Argument(
+        ..., help="InstallPlan JSON files, scan NDJSON output, or directories of them",
+    ),
+    index: Path = typer.Option(
+        Path("installer-intel-index.sqlite"), "--index", "-i", help="Index file (SQLite); created if missing",
+    ),
+) -> None:
+    """
+    Add existing InstallPlans (from analyze --out or scan) to the catalog
+    that query searches. Plans replace earlier ones for the same path.
+    """
+    from installer_intel.catalog import Catalog, read_plans
+
+    for f in files:
+        if not f.exists():
+            raise typer.BadParameter(f"File not found: {f}")
+    t0 = time.perf_counter()
+    with Catalog(index) as catalog:
+        try:
+            count = catalog.add_many(read_plans(files))
+        except (ValueError, KeyError) as e:
+            print(f"Error: not an InstallPlan file: {e}", file=sys.stderr)
+            raise typer.Exit(1)
+        entries = len(catalog)
+    print(f"Imported {count} plan(s) in {time.perf_counter() - t0:.2f}s; {entries} file(s) cataloged.", file=sys.stderr)
+
+
+_QUERY_FORMATS = ("table", "ndjson", "csv")
+_QUERY_TABLE_ROWS = 50  # --format table shows this many plans unless --limit says otherwise
+
+
+@app.command()
+def query(
+    index: Path = typer.Option(
+        Path("installer-intel-index.sqlite"), "--index", "-i", help="Index file written by index update/import",
+    ),
+    installer_type: Optional[str] = typer.Option(None, "--type", "-t", help="Installer type, e.g. NSIS or MSI"),
+    file_type: Optional[str] = typer.Option(None, "--file-type", help="exe, msi, cab or zip"),
+    manufacturer: Optional[str] = typer.Option(
+        None, "--manufacturer", "-m", help="Manufacturer (MSI) or CompanyName (EXE) containing this",
+    ),
+    product: Optional[str] = typer.Option(None, "--product", help="ProductName containing this"),
+    product_code: Optional[str] = typer.Option(None, "--product-code", help="MSI ProductCode"),
+    upgrade_code: Optional[str] = typer.Option(None, "--upgrade-code", help="MSI UpgradeCode"),
+    digest: Optional[str] = typer.Option(None, "--hash", help="SHA-256, SHA-1 or MD5 of the file"),
+    command: Optional[str] = typer.Option(None, "--command", help="Install or uninstall command containing this"),
+    path: Optional[str] = typer.Option(None, "--path", help="Input path glob, e.g. '/srv/pkgs/acme/*'"),
+    min_confidence: Optional[float] = typer.Option(None, "--min-confidence", help="Confidence at least this"),
+    max_confidence: Optional[float] = typer.Option(None, "--max-confidence", help="Confidence at most this"),
+    no_nested: bool = typer.Option(False, "--no-nested", help="Leave out packages embedded in other files"),
+    group_by: Optional[List[str]] = typer.Option(
+        None, "--group-by", "-g", help="Count matches per value of these columns (repeat or comma-separate)",
+    ),
+    limit: Optional[int] = typer.Option(None, "--limit", help="At most this many plans"),
+    output_format: str = typer.Option(
+        "table", "--format", "-f", help="table (Rich), ndjson (the plans, or group counts) or csv",
+    ),
+    out: Optional[Path] = typer.Option(None, "--out", "-o", help="Write ndjson/csv here instead of stdout"),
+) -> None:
+    """
+    Search the catalog of an index without loading the plans.
+
+    Filters combine with AND. Without --group-by, matching plans are
+    exported (NDJSON: the stored InstallPlans; CSV: one row of key fields
+    each) as they are read; with it, the number of matches per group.
+    """
+    if output_format not in _QUERY_FORMATS:
+        raise typer.BadParameter(f"Unknown format {output_format!r} (choose from {', '.join(_QUERY_FORMATS)})")
+    if not index.exists():
+        raise typer.BadParameter(f"No index at {index}; create one with `installer-intel index update`")
+
+    from installer_intel.catalog import CSV_COLUMNS, GROUP_COLUMNS, Catalog, Filters
+
+    columns = [c for g in group_by or [] for c in g.split(",") if c]
+    for c in columns:
+        if c not in GROUP_COLUMNS:
+            raise typer.BadParameter(f"Cannot group by {c!r} (choose from {', '.join(GROUP_COLUMNS)})")
+    filters = Filters(
+        installer_type=installer_type,
+        file_type=file_type,
+        manufacturer=manufacturer,
+        product_name=product,
+        product_code=product_code,
+        upgrade_code=upgrade_code,
+        hash=digest,
+        command=command,
+        path=path,
+        min_confidence=min_confidence,
+        max_confidence=max_confidence,
+        nested=not no_nested,
+    )
+
+    t0 = time.perf_counter()
+    with Catalog(index) as catalog:
+        if output_format == "table":
+            if columns:
+                groups = catalog.group(filters, columns)
+                elapsed = time.perf_counter() - t0
+                from installer_intel.render import print_query_groups
+
+                print_query_groups(columns, groups, elapsed)
+            else:
+                rows = list(catalog.records(filters, limit or _QUERY_TABLE_ROWS))
+                total = catalog.count(filters)
+                elapsed = time.perf_counter() - t0
+                from installer_intel.render import print_query_records
+
+                print_query_records(rows, total, elapsed)
+            return
+
+        sink = open(out, "w", encoding="utf-8", newline="") if out else sys.stdout
+        try:
+            if output_format == "csv":
+                import csv
+
+                writer = csv.writer(sink)
+                if columns:
+                    writer.writerow([*columns, "count"])
+                    writer.writerows(catalog.group(filters, columns))
+                else:
+                    writer.writerow(CSV_COLUMNS)
+                    writer.writerows(catalog.records(filters, limit))
+            elif columns:
+                for row in catalog.group(filters, columns):
+                    sink.write(json.dumps({**dict(zip(columns, row)), "count": row[-1]}) + "\n")
+            else:
+                for plan_json in catalog.plans(filters, limit):
+                    sink.write(plan_json + "\n")
+        finally:
+            if out:
+                sink.close()
+
+
+@cache_app.command("stats")
+def cache_stats() -> None:
+    """
+    Show result cache location, size and usage.
+    """
+    from installer_intel.cache import ResultCache
+    from installer_intel.render import print_cache_stats
+
+    with ResultCache() as cache:
+        st = cache.stats()
+    print_cache_stats(st)
+
+
+@cache_app.command("prune")
+def cache_prune(
+    max_size: Optional[str] = typer.Option(
+        None, "--max-size", help="Shrink to this size (e.g. 100M), least recently used first",
+    ),
+    all_entries: bool = typer.Option(False, "--all", help="Remove everything"),
+    signatures: Optional[List[Path]] = typer.Option(
+        None,
+        "--signatures",
+        help="Also keep results for this extra signature database, as given to analyze/scan; may be repeated",
+    ),
+) -> None:
+    """
+    Drop stale results (older analyzer or signature versions, deleted files)
+    and shrink the cache to its size limit. Results for the built-in
+    signatures (and $INSTALLER_INTEL_SIGNATURES) are current, and with
+    --signatures also those for that database.
+    """
+    from installer_intel.analyzers.exe import DEPTHS, exe_cache_version
+    from installer_intel.analyzers.package import package_cache_version
+    from installer_intel.analyzers.signatures import get_signatures
+    from installer_intel.cache import ResultCache
+
+    with ResultCache() as cache:
+        if all_entries:
+            cache.clear()
+            print("Cache cleared.")
+            return
+        try:
+            sig_sets = [get_signatures()]
+            if signatures:
+                sig_sets.append(get_signatures([str(sp) for sp in signatures]))
+        except ValueError as e:
+            raise typer.BadParameter(str(e))
+        limit = _parse_size(max_size) if max_size else None
+        current = [
+            "msi",
+            *(v(sigs, d) for sigs in sig_sets for d in DEPTHS for v in (exe_cache_version, package_cache_version)),
+        ]
+        results, files = cache.prune(max_bytes=limit, current_versions=current)
+        size = cache.stats().size_bytes
+    print(f"Removed {results} result(s) and {files} file record(s); {size / 1024 ** 2:.1f} MB remain.")
+
+
 @app.command()
 def schema() -> None:
     """
@@ -137,7 +942,7 @@ def schema() -> None:
     """
     from installer_intel.models import InstallPlan as _InstallPlan
 
-    console.print_json(data=_InstallPlan.model_json_schema())
+    print(json.dumps(_InstallPlan.model_json_schema(), indent=2))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,264 @@
+"""
+Incremental index of an installer repository.
+
+An index is a SQLite file recording, for each installer under the indexed
+directories, its size, mtime, content hash (SHA-256) and InstallPlan. The
+same file holds the catalog of those plans (see catalog.py), updated in the
+same transactions, so `installer-intel query` can search it.
+RepoIndex.update() lists the tree on a pool of threads (directory listings
+are the slow part on network shares), compares sizes and mtimes with the
+index, analyzes only new and changed files on the scan worker pool and drops
+entries for files that are gone. Entries made by another analysis version
+(analyzer revision, signature set, depth or digests) are redone too, so a
+run with nothing to do costs one listing of the tree and one query.
+
+Files that failed to analyze are recorded with their error and retried when
+they change, or on every run with retry_errors.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+from installer_intel.analyzers.exe import DEFAULT_DEPTH, exe_cache_version
+from installer_intel.analyzers.hashing import check_algorithms, hash_version
+from installer_intel.analyzers.package import PACKAGE_SUFFIXES, package_cache_version
+from installer_intel.analyzers.signatures import get_signatures
+from installer_intel.analyzers.stream import DEFAULT_MAX_MEMORY
+from installer_intel.cache import ANALYZER_VERSION
+from installer_intel.catalog import Catalog
+from installer_intel.scan import SUPPORTED_SUFFIXES, ScanResult, scan
+
+DEFAULT_INDEX = "installer-intel-index.sqlite"
+# Threads listing directories; they mostly wait on the file system.
+DEFAULT_LIST_THREADS = 32
+_BATCH = 256  # rows per write transaction
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    sha256 TEXT,
+    version TEXT NOT NULL,
+    plan TEXT,
+    error TEXT,
+    indexed REAL NOT NULL
+);
+"""
+
+Stat = Tuple[int, int]  # (size, mtime_ns)
+
+
+@dataclass
+class IndexUpdate:
+    files: int = 0  # installers found under the targets
+    unchanged: int = 0
+    added: int = 0
+    changed: int = 0  # re-analyzed: modified, other analysis version or retried
+    removed: int = 0
+    errors: int = 0
+    bytes_analyzed: int = 0
+    list_seconds: float = 0.0
+    seconds: float = 0.0
+
+
+def _list_directory(directory: str) -> Tuple[List[str], List[Tuple[str, int, int]], bool]:
+    """(subdirectories, (path, size, mtime_ns) of installers, listed completely)."""
+    subdirs: List[str] = []
+    files: List[Tuple[str, int, int]] = []
+    try:
+        with os.scandir(directory) as it:
+            for entry in it:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.path)
+                    elif entry.name.lower().endswith(SUPPORTED_SUFFIXES) and entry.is_file():
+                        st = entry.stat()
+                        files.append((entry.path, st.st_size, st.st_mtime_ns))
+                except OSError:
+                    continue
+    except OSError:
+        return subdirs, files, False
+    return subdirs, files, True
+
+
+def stat_tree(
+    targets: Iterable[str], threads: int = DEFAULT_LIST_THREADS,
+) -> Tuple[Dict[str, Stat], List[str]]:
+    """
+    {absolute path: (size, mtime_ns)} of the installers under targets
+    (directories, searched recursively, or files), and the directories that
+    could not be listed.
+    """
+    found: Dict[str, Stat] = {}
+    unlisted: List[str] = []
+    roots = []
+    for target in targets:
+        path = os.path.abspath(target)
+        if os.path.isdir(path):
+            roots.append(path)
+        elif os.path.isfile(path) and path.lower().endswith(SUPPORTED_SUFFIXES):
+            st = os.stat(path)
+            found[path] = (st.st_size, st.st_mtime_ns)
+    with ThreadPoolExecutor(max_workers=max(1, threads)) as pool:
+        pending: Dict[Future, str] = {pool.submit(_list_directory, d): d for d in roots}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                directory = pending.pop(fut)
+                subdirs, files, ok = fut.result()
+                if not ok:
+                    unlisted.append(directory)
+                for path, size, mtime_ns in files:
+                    found[path] = (size, mtime_ns)
+                for d in subdirs:
+                    pending[pool.submit(_list_directory, d)] = d
+    return found, unlisted
+
+
+def _under(path: str, roots: Sequence[str]) -> bool:
+    return any(path == r or path.startswith(r.rstrip(os.sep) + os.sep) for r in roots)
+
+
+class RepoIndex:
+    """
+    SQLite index of analyzed installers, one entry per path, and the
+    catalog of their plans. Open it with RepoIndex(path) and close it when
+    done, or use it as a context manager.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.catalog = Catalog(path)
+        self.path = self.catalog.path
+        self._db = self.catalog.db
+        self._db.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        self.catalog.close()
+
+    def __enter__(self) -> "RepoIndex":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def plans(self) -> Iterator[str]:
+        """InstallPlan JSON of every entry that analyzed successfully, by path."""
+        for (plan,) in self._db.execute("SELECT plan FROM entries WHERE plan IS NOT NULL ORDER BY path"):
+            yield plan
+
+    def errors(self) -> List[Tuple[str, str]]:
+        return self._db.execute("SELECT path, error FROM entries WHERE error IS NOT NULL ORDER BY path").fetchall()
+
+    def update(
+        self,
+        targets: Sequence[str],
+        jobs: Optional[int] = None,
+        timeout: Optional[float] = None,
+        max_memory: int = DEFAULT_MAX_MEMORY,
+        signature_paths: Sequence[str] = (),
+        cache_dir: Optional[str] = None,
+        depth: str = DEFAULT_DEPTH,
+        hashes: Sequence[str] = (),
+        retry_errors: bool = False,
+        threads: int = DEFAULT_LIST_THREADS,
+        progress: Optional[Callable[[ScanResult], None]] = None,
+    ) -> IndexUpdate:
+        """
+        Bring the entries under targets up to date: analyze new and changed
+        files (see scan.scan for jobs, timeout, ...; SHA-256 is always among
+        the digests) and remove entries of files that no longer exist.
+        Entries outside targets are left alone, and so are those under
+        directories that could not be listed. progress is called with each
+        analysis result.
+        """
+        t0 = time.perf_counter()
+        hashes = check_algorithms(("sha256", *hashes))
+        sigs = get_signatures(signature_paths)
+        versions = {
+            ".exe": f"{ANALYZER_VERSION}:{exe_cache_version(sigs, depth, hashes)}",
+            ".msi": f"{ANALYZER_VERSION}:msi{hash_version(hashes)}",
+        }
+        for suffix in PACKAGE_SUFFIXES:
+            versions[suffix] = f"{ANALYZER_VERSION}:{package_cache_version(sigs, depth, hashes)}"
+        found, unlisted = stat_tree(targets, threads)
+        result = IndexUpdate(files=len(found), list_seconds=time.perf_counter() - t0)
+
+        roots = [os.path.abspath(t) for t in targets]
+        known: Dict[str, Tuple[int, int, str, bool]] = {
+            path: (size, mtime_ns, version, failed)
+            for path, size, mtime_ns, version, failed in self._db.execute(
+                "SELECT path, size, mtime_ns, version, error IS NOT NULL FROM entries"
+            )
+            if _under(path, roots)
+        }
+        todo: List[str] = []
+        added: Set[str] = set()
+        for path, stat in found.items():
+            entry = known.get(path)
+            if entry is None:
+                added.add(path)
+                todo.append(path)
+            elif entry[:2] != stat or entry[2] != versions[os.path.splitext(path)[1].lower()] \
+                    or (retry_errors and entry[3]):
+                todo.append(path)
+            else:
+                result.unchanged += 1
+        gone = [(p,) for p in known if p not in found and not _under(p, unlisted)]
+        self._db.execute("BEGIN")
+        self._db.executemany("DELETE FROM entries WHERE path = ?", gone)
+        self.catalog.remove(p for p, in gone)
+        self._db.execute("COMMIT")
+        result.removed = len(gone)
+
+        rows: List[tuple] = []
+        try:
+            for r in scan(
+                sorted(todo), jobs=jobs, timeout=timeout, max_memory=max_memory, signature_paths=signature_paths,
+                cache_dir=cache_dir, depth=depth, hashes=hashes,
+            ):
+                size, mtime_ns = found[r.path]
+                sha = json.loads(r.plan_json)["metadata"].get("SHA256") if r.ok else None
+                version = versions[os.path.splitext(r.path)[1].lower()]
+                rows.append((r.path, size, mtime_ns, sha, version, r.plan_json, r.error, time.time()))
+                if r.path in added:
+                    result.added += 1
+                else:
+                    result.changed += 1
+                result.errors += not r.ok
+                result.bytes_analyzed += r.size
+                if progress is not None:
+                    progress(r)
+                if len(rows) >= _BATCH:
+                    self._write(rows)
+        finally:
+            self._write(rows)  # keep what was analyzed if interrupted
+        result.seconds = time.perf_counter() - t0
+        return result
+
+    def _write(self, rows: List[tuple]) -> None:
+        if not rows:
+            return
+        self._db.execute("BEGIN")
+        self._db.executemany(
+            "INSERT OR REPLACE INTO entries (path, size, mtime_ns, sha256, version, plan, error, indexed)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+        for path, _, _, _, _, plan_json, _, _ in rows:
+            if plan_json is None:
+                self.catalog.remove([path])
+            else:
+                self.catalog.put(plan_json)
+        self._db.execute("COMMIT")
+        rows.clear()
@@ -1,3 +1,9 @@
+"""
+The InstallPlan schema. Analyzers build plans from the lighter records in
+records.py, which mirror these models field for field; the models are used
+to validate and to publish the JSON schema.
+"""
+
 from __future__ import annotations
 
 from typing import Any, Dict, List, Optional
@@ -22,11 +28,44 @@ class DetectionRule(BaseModel):
     evidence: List[Evidence] = Field(default_factory=list)
 
 
+class StageTiming(BaseModel):
+    stage: str  # e.g. "read", "strings", "match", "msi.tables"
+    seconds: float  # exclusive of nested stages
+    calls: int = 0
+    bytes_read: int = 0
+    strings: int = 0
+    peak_rss: Optional[int] = None  # process high-water mark in bytes
+
+
+class Diagnostics(BaseModel):
+    total_seconds: float
+    peak_rss: Optional[int] = None
+    cached: bool = False
+    stages: List[StageTiming] = Field(default_factory=list)
+
+
+class Coverage(BaseModel):
+    depth: str  # requested depth: "triage" | "standard" | "deep"
+    # Deepest tier that ran: "triage" | "stub" | "payload" ("file" for non-PE files), or
+    # "header" when an Inno Setup or NSIS header settled the type without a scan.
+    tier: str
+    bytes_scanned: int = 0  # bytes string-scanned across all tiers that ran
+    bytes_skipped: int = 0  # compressed bytes (by block entropy) not string-scanned
+    file_bytes: int = 0
+
+
+class Embedded(BaseModel):
+    offset: Optional[int] = None  # in the parent file; None for compressed archive members
+    size: int
+    member: Optional[str] = None  # name within the parent CAB or zip
+
+
 class InstallPlan(BaseModel):
-    input_path: str
-    file_type: str  # "msi" | "exe" | "unknown"
+    input_path: str  # children: "<parent>!0x<offset>" or "<archive>/<member>"
+    file_type: str  # "msi" | "exe" | "cab" | "zip" | "intunewin" | "unknown"
     installer_type: str  # "MSI", "Inno Setup", etc.
     confidence: float = Field(ge=0.0, le=1.0)
+    evidence: List[Evidence] = Field(default_factory=list)  # why installer_type was chosen
 
     metadata: Dict[str, Any] = Field(default_factory=dict)
 
@@ -36,3 +75,8 @@ class InstallPlan(BaseModel):
     detection_rules: List[DetectionRule] = Field(default_factory=list)
 
     notes: List[str] = Field(default_factory=list)
+
+    coverage: Optional[Coverage] = None  # EXEs: how much of the file was scanned
+    embedded: Optional[Embedded] = None  # children: where in the parent this came from
+    children: List["InstallPlan"] = Field(default_factory=list)  # embedded MSIs, CABs, zips
+    diagnostics: Optional[Diagnostics] = None  # only with --timings
@@ -0,0 +1,288 @@
+"""
+Lightweight plan records used while analyzing.
+
+Analyzers build plans out of these __slots__ classes. They mirror the
+Pydantic models in models.py field for field (same names, order and
+defaults, keyword-only construction), but skip validation and are a
+fraction of the size. Pydantic only comes in at the output boundary:
+Plan.to_model() gives the InstallPlan model, and dumps() writes the JSON
+directly with pydantic-core's serializer, skipping validation. That JSON
+is byte for byte what InstallPlan.model_dump_json() writes, compact or
+indented, so NDJSON lines, cache entries and installplan.json files are
+unchanged.
+"""
+
+from __future__ import annotations
+
+import json
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Sequence
+
+from pydantic_core import to_json
+
+if TYPE_CHECKING:
+    from installer_intel.models import InstallPlan
+
+
+class _Record:
+    # Each subclass defines as_dict() with its fields spelled out: a dict
+    # literal is several times cheaper than building one from __slots__,
+    # and dumps() calls it for every record of every plan.
+    __slots__ = ()
+
+    def __eq__(self, other: object) -> bool:
+        return type(self) is type(other) and all(getattr(self, n) == getattr(other, n) for n in self.__slots__)
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{n}={getattr(self, n)!r}" for n in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+
+class Evidence(_Record):
+    __slots__ = ("kind", "detail")
+
+    def __init__(self, *, kind: str, detail: str) -> None:
+        self.kind = kind
+        self.detail = detail
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"kind": self.kind, "detail": self.detail}
+
+
+class CommandCandidate(_Record):
+    __slots__ = ("command", "confidence", "evidence")
+
+    def __init__(self, *, command: str, confidence: float, evidence: Optional[List[Evidence]] = None) -> None:
+        self.command = command
+        self.confidence = confidence
+        self.evidence = evidence if evidence is not None else []
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "command": self.command,
+            "confidence": self.confidence,
+            "evidence": [e.as_dict() for e in self.evidence],
+        }
+
+
+class DetectionRule(_Record):
+    __slots__ = ("kind", "value", "confidence", "evidence")
+
+    def __init__(
+        self, *, kind: str, value: str, confidence: float, evidence: Optional[List[Evidence]] = None,
+    ) -> None:
+        self.kind = kind
+        self.value = value
+        self.confidence = confidence
+        self.evidence = evidence if evidence is not None else []
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "kind": self.kind,
+            "value": self.value,
+            "confidence": self.confidence,
+            "evidence": [e.as_dict() for e in self.evidence],
+        }
+
+
+class StageTiming(_Record):
+    __slots__ = ("stage", "seconds", "calls", "bytes_read", "strings", "peak_rss")
+
+    def __init__(
+        self,
+        *,
+        stage: str,
+        seconds: float,
+        calls: int = 0,
+        bytes_read: int = 0,
+        strings: int = 0,
+        peak_rss: Optional[int] = None,
+    ) -> None:
+        self.stage = stage
+        self.seconds = seconds
+        self.calls = calls
+        self.bytes_read = bytes_read
+        self.strings = strings
+        self.peak_rss = peak_rss
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "stage": self.stage,
+            "seconds": self.seconds,
+            "calls": self.calls,
+            "bytes_read": self.bytes_read,
+            "strings": self.strings,
+            "peak_rss": self.peak_rss,
+        }
+
+
+class Diagnostics(_Record):
+    __slots__ = ("total_seconds", "peak_rss", "cached", "stages")
+
+    def __init__(
+        self,
+        *,
+        total_seconds: float,
+        peak_rss: Optional[int] = None,
+        cached: bool = False,
+        stages: Optional[List[StageTiming]] = None,
+    ) -> None:
+        self.total_seconds = total_seconds
+        self.peak_rss = peak_rss
+        self.cached = cached
+        self.stages = stages if stages is not None else []
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "total_seconds": self.total_seconds,
+            "peak_rss": self.peak_rss,
+            "cached": self.cached,
+            "stages": [st.as_dict() for st in self.stages],
+        }
+
+
+class Coverage(_Record):
+    __slots__ = ("depth", "tier", "bytes_scanned", "bytes_skipped", "file_bytes")
+
+    def __init__(
+        self, *, depth: str, tier: str, bytes_scanned: int = 0, bytes_skipped: int = 0, file_bytes: int = 0,
+    ) -> None:
+        self.depth = depth
+        self.tier = tier
+        self.bytes_scanned = bytes_scanned
+        self.bytes_skipped = bytes_skipped
+        self.file_bytes = file_bytes
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "depth": self.depth,
+            "tier": self.tier,
+            "bytes_scanned": self.bytes_scanned,
+            "bytes_skipped": self.bytes_skipped,
+            "file_bytes": self.file_bytes,
+        }
+
+
+class Embedded(_Record):
+    __slots__ = ("offset", "size", "member")
+
+    def __init__(self, *, size: int, offset: Optional[int] = None, member: Optional[str] = None) -> None:
+        self.offset = offset
+        self.size = size
+        self.member = member
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"offset": self.offset, "size": self.size, "member": self.member}
+
+
+class Plan(_Record):
+    """An InstallPlan under construction; see models.InstallPlan for the fields."""
+
+    __slots__ = (
+        "input_path", "file_type", "installer_type", "confidence", "evidence", "metadata", "install_candidates",
+        "uninstall_candidates", "detection_rules", "notes", "coverage", "embedded", "children", "diagnostics",
+    )
+
+    def __init__(
+        self,
+        *,
+        input_path: str,
+        file_type: str,
+        installer_type: str,
+        confidence: float,
+        evidence: Optional[List[Evidence]] = None,
+        metadata: Optional[Dict[str, Any]] = None,
+        install_candidates: Optional[List[CommandCandidate]] = None,
+        uninstall_candidates: Optional[List[CommandCandidate]] = None,
+        detection_rules: Optional[List[DetectionRule]] = None,
+        notes: Optional[List[str]] = None,
+        coverage: Optional[Coverage] = None,
+        embedded: Optional[Embedded] = None,
+        children: Optional[List["Plan"]] = None,
+        diagnostics: Optional[Diagnostics] = None,
+    ) -> None:
+        self.input_path = input_path
+        self.file_type = file_type
+        self.installer_type = installer_type
+        self.confidence = confidence
+        self.evidence = evidence if evidence is not None else []
+        self.metadata = metadata if metadata is not None else {}
+        self.install_candidates = install_candidates if install_candidates is not None else []
+        self.uninstall_candidates = uninstall_candidates if uninstall_candidates is not None else []
+        self.detection_rules = detection_rules if detection_rules is not None else []
+        self.notes = notes if notes is not None else []
+        self.coverage = coverage
+        self.embedded = embedded
+        self.children = children if children is not None else []
+        self.diagnostics = diagnostics
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "input_path": self.input_path,
+            "file_type": self.file_type,
+            "installer_type": self.installer_type,
+            "confidence": self.confidence,
+            "evidence": [e.as_dict() for e in self.evidence],
+            "metadata": self.metadata,
+            "install_candidates": [c.as_dict() for c in self.install_candidates],
+            "uninstall_candidates": [c.as_dict() for c in self.uninstall_candidates],
+            "detection_rules": [r.as_dict() for r in self.detection_rules],
+            "notes": self.notes,
+            "coverage": self.coverage.as_dict() if self.coverage is not None else None,
+            "embedded": self.embedded.as_dict() if self.embedded is not None else None,
+            "children": [c.as_dict() for c in self.children],
+            "diagnostics": self.diagnostics.as_dict() if self.diagnostics is not None else None,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Plan":
+        """A plan from its JSON object (as written by dumps), without validation."""
+
+        def evidence(items: List[Dict[str, Any]]) -> List[Evidence]:
+            return [Evidence(**e) for e in items]
+
+        def candidates(items: List[Dict[str, Any]]) -> List[CommandCandidate]:
+            return [CommandCandidate(**{**c, "evidence": evidence(c.get("evidence", ()))}) for c in items]
+
+        diag = data.get("diagnostics")
+        return cls(
+            input_path=data["input_path"],
+            file_type=data["file_type"],
+            installer_type=data["installer_type"],
+            confidence=data["confidence"],
+            evidence=evidence(data.get("evidence", ())),
+            metadata=data.get("metadata"),
+            install_candidates=candidates(data.get("install_candidates", ())),
+            uninstall_candidates=candidates(data.get("uninstall_candidates", ())),
+            detection_rules=[
+                DetectionRule(**{**d, "evidence": evidence(d.get("evidence", ()))})
+                for d in data.get("detection_rules", ())
+            ],
+            notes=data.get("notes"),
+            coverage=Coverage(**data["coverage"]) if data.get("coverage") else None,
+            embedded=Embedded(**data["embedded"]) if data.get("embedded") else None,
+            children=[cls.from_dict(c) for c in data.get("children", ())],
+            diagnostics=Diagnostics(
+                **{**diag, "stages": [StageTiming(**s) for s in diag.get("stages", ())]}
+            ) if diag else None,
+        )
+
+    @classmethod
+    def from_json(cls, text: str) -> "Plan":
+        return cls.from_dict(json.loads(text))
+
+    def to_model(self) -> "InstallPlan":
+        """The validated Pydantic InstallPlan."""
+        from installer_intel.models import InstallPlan
+
+        return InstallPlan.model_validate(self.as_dict())
+
+
+def dumps(plan: Plan, indent: Optional[int] = None, exclude: Sequence[str] = ()) -> str:
+    """
+    plan as JSON, identical to InstallPlan.model_dump_json(indent=indent,
+    exclude=set(exclude)) for the same plan.
+    """
+    data = plan.as_dict()
+    for name in exclude:
+        del data[name]
+    return to_json(data, indent=indent, inf_nan_mode="null").decode()
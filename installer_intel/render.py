@@ -0,0 +1,241 @@
+"""
+Rich rendering for the CLI.
+
+Kept separate from cli.py so that Rich is only imported when a command
+actually prints tables; --format json, --summary-only and --version never
+load it.
+"""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Iterable, List, Optional
+
+from rich.console import Console
+from rich.panel import Panel
+from rich.table import Table
+
+from installer_intel.cache import CacheStats
+from installer_intel.records import Plan, StageTiming
+
+if TYPE_CHECKING:
+    from installer_intel.index import IndexUpdate
+
+console = Console()
+err_console = Console(stderr=True)
+
+
+def print_summary(plan: Plan) -> None:
+    console.print(Panel.fit(f"[bold]installer-intel[/bold]\n{plan.input_path}", title="Analyze Result"))
+
+    console.print(f"[bold]Type:[/bold] {plan.installer_type}  (confidence {plan.confidence:.2f})")
+    console.print(f"[bold]File:[/bold] {plan.file_type}")
+    if plan.coverage:
+        cov = plan.coverage
+        console.print(
+            f"[bold]Scanned:[/bold] {cov.bytes_scanned / 1024 ** 2:.1f} of {cov.file_bytes / 1024 ** 2:.1f} MB"
+            + (f", {cov.bytes_skipped / 1024 ** 2:.1f} MB compressed skipped" if cov.bytes_skipped else "")
+            + f" (decided by {cov.tier}, depth {cov.depth})"
+        )
+
+    if plan.evidence:
+        ev_table = Table(title="Evidence", show_lines=True)
+        ev_table.add_column("Kind", style="bold")
+        ev_table.add_column("Detail")
+        for e in plan.evidence:
+            ev_table.add_row(e.kind, e.detail)
+        console.print(ev_table)
+
+    if plan.metadata:
+        meta_table = Table(title="Metadata", show_lines=True)
+        meta_table.add_column("Key", style="bold")
+        meta_table.add_column("Value")
+        for k, v in plan.metadata.items():
+            meta_table.add_row(str(k), "" if v is None else str(v))
+        console.print(meta_table)
+
+    if plan.install_candidates:
+        t = Table(title="Install candidates", show_lines=True)
+        t.add_column("Confidence", justify="right")
+        t.add_column("Command")
+        for c in plan.install_candidates:
+            t.add_row(f"{c.confidence:.2f}", c.command)
+        console.print(t)
+
+    if plan.uninstall_candidates:
+        t = Table(title="Uninstall candidates", show_lines=True)
+        t.add_column("Confidence", justify="right")
+        t.add_column("Command")
+        for c in plan.uninstall_candidates:
+            t.add_row(f"{c.confidence:.2f}", c.command)
+        console.print(t)
+
+    if plan.children:
+        t = Table(title="Embedded packages", show_lines=True)
+        t.add_column("Where")
+        t.add_column("Type")
+        t.add_column("Product")
+        for child in _descendants(plan):
+            where = child.input_path[len(plan.input_path):]
+            product = " ".join(str(child.metadata[k]) for k in ("ProductName", "ProductCode") if child.metadata.get(k))
+            t.add_row(where, child.installer_type, product)
+        console.print(t)
+
+    if plan.detection_rules:
+        t = Table(title="Detection rules", show_lines=True)
+        t.add_column("Confidence", justify="right")
+        t.add_column("Kind")
+        t.add_column("Value")
+        for d in plan.detection_rules:
+            t.add_row(f"{d.confidence:.2f}", d.kind, d.value)
+        console.print(t)
+
+    if plan.notes:
+        console.print(Panel("\n".join(f"- {n}" for n in plan.notes), title="Notes"))
+
+    if plan.diagnostics:
+        print_timings(
+            plan.diagnostics.stages,
+            plan.diagnostics.total_seconds,
+            plan.diagnostics.peak_rss,
+            title="Timings (cached result)" if plan.diagnostics.cached else "Timings",
+        )
+
+
+def _descendants(plan: Plan) -> Iterable[Plan]:
+    for child in plan.children:
+        yield child
+        yield from _descendants(child)
+
+
+def print_timings(
+    stages: Iterable[StageTiming],
+    total_seconds: float,
+    peak_rss: Optional[int],
+    title: str = "Timings",
+    stderr: bool = False,
+) -> None:
+    t = Table(title=title, show_lines=False)
+    t.add_column("Stage", style="bold")
+    t.add_column("Seconds", justify="right")
+    t.add_column("%", justify="right")
+    t.add_column("Read", justify="right")
+    t.add_column("MB/s", justify="right")
+    t.add_column("Strings", justify="right")
+    t.add_column("Peak RSS", justify="right")
+    for s in stages:
+        share = s.seconds / total_seconds * 100 if total_seconds else 0.0
+        rate = f"{s.bytes_read / 1024 ** 2 / s.seconds:.1f}" if s.bytes_read and s.seconds > 0 else ""
+        t.add_row(
+            s.stage,
+            f"{s.seconds:.4f}",
+            f"{share:.0f}",
+            f"{s.bytes_read / 1024 ** 2:.1f} MB" if s.bytes_read else "",
+            rate,
+            str(s.strings) if s.strings else "",
+            f"{s.peak_rss / 1024 ** 2:.0f} MB" if s.peak_rss else "",
+        )
+    peak = f", peak RSS {peak_rss / 1024 ** 2:.0f} MB" if peak_rss else ""
+    t.caption = f"total {total_seconds:.4f}s{peak}"
+    (err_console if stderr else console).print(t)
+
+
+def print_scan_summary(
+    count: int,
+    failed: int,
+    timed_out: int,
+    total_bytes: int,
+    elapsed: float,
+    jobs: int,
+) -> None:
+    t = Table(title="Scan summary")
+    t.add_column("Files", justify="right")
+    t.add_column("OK", justify="right")
+    t.add_column("Errors", justify="right")
+    t.add_column("Timeouts", justify="right")
+    t.add_column("Data", justify="right")
+    t.add_column("Elapsed", justify="right")
+    t.add_column("Files/s", justify="right")
+    t.add_column("MB/s", justify="right")
+    rate = elapsed if elapsed > 0 else 1e-9
+    t.add_row(
+        str(count),
+        str(count - failed),
+        str(failed),
+        str(timed_out),
+        f"{total_bytes / 1024 ** 2:.1f} MB",
+        f"{elapsed:.2f}s",
+        f"{count / rate:.1f}",
+        f"{total_bytes / 1024 ** 2 / rate:.1f}",
+    )
+    err_console.print(t)
+    err_console.print(f"{jobs} worker(s)")
+
+
+def print_index_update(result: IndexUpdate, entries: int, index_path: str) -> None:
+    t = Table(title="Index update")
+    t.add_column("Found", justify="right")
+    t.add_column("Unchanged", justify="right")
+    t.add_column("Added", justify="right")
+    t.add_column("Changed", justify="right")
+    t.add_column("Removed", justify="right")
+    t.add_column("Errors", justify="right")
+    t.add_column("Analyzed", justify="right")
+    t.add_column("Listing", justify="right")
+    t.add_column("Elapsed", justify="right")
+    t.add_row(
+        str(result.files),
+        str(result.unchanged),
+        str(result.added),
+        str(result.changed),
+        str(result.removed),
+        str(result.errors),
+        f"{result.bytes_analyzed / 1024 ** 2:.1f} MB",
+        f"{result.list_seconds:.2f}s",
+        f"{result.seconds:.2f}s",
+    )
+    t.caption = f"{entries} entries in {index_path}"
+    err_console.print(t)
+
+
+def print_query_groups(columns: List[str], groups: List[tuple], seconds: float) -> None:
+    t = Table(title="Query")
+    for c in columns:
+        t.add_column(c)
+    t.add_column("Count", justify="right")
+    for row in groups:
+        t.add_row(*("" if v is None else str(v) for v in row))
+    t.caption = f"{len(groups)} group(s), {sum(r[-1] for r in groups)} plan(s) in {seconds * 1000:.0f} ms"
+    console.print(t)
+
+
+def print_query_records(rows: List[tuple], total: int, seconds: float) -> None:
+    """rows are catalog.CSV_COLUMNS."""
+    t = Table(title="Query")
+    t.add_column("Path", style="bold", overflow="fold")
+    t.add_column("Type")
+    t.add_column("Conf", justify="right")
+    t.add_column("Manufacturer")
+    t.add_column("Product")
+    t.add_column("Version")
+    t.add_column("ProductCode")
+    t.add_column("Install", overflow="fold")
+    for path, _, installer_type, confidence, manufacturer, product, version, code, _, _, install, _ in rows:
+        t.add_row(
+            path, installer_type, f"{confidence:.2f}", manufacturer or "", product or "", version or "",
+            code or "", install or "",
+        )
+    shown = f"showing {len(rows)} of " if len(rows) < total else ""
+    t.caption = f"{shown}{total} plan(s) in {seconds * 1000:.0f} ms"
+    console.print(t)
+
+
+def print_cache_stats(st: CacheStats) -> None:
+    t = Table(title="Result cache", show_header=False)
+    t.add_column("Key", style="bold")
+    t.add_column("Value")
+    t.add_row("Location", st.path)
+    t.add_row("Entries", str(st.entries))
+    t.add_row("Size", f"{st.size_bytes / 1024 ** 2:.1f} MB of {st.max_bytes / 1024 ** 2:.0f} MB")
+    t.add_row("Files tracked", str(st.files_tracked))
+    t.add_row("Hits", str(st.hits))
+    console.print(t)
@@ -0,0 +1,407 @@
+"""
+Batch scanning of whole installer repositories.
+
+find_installers() walks directories (or expands globs) for installers and
+packages (.exe, .msi, .zip, .intunewin)
+and scan() analyzes them on a process pool. Each worker process loads the
+signature database once and then handles many files, so interpreter and
+import startup is paid per worker instead of per file. Results are yielded
+as soon as each file finishes; a failing or timed-out file produces an error
+result instead of stopping the batch.
+"""
+
+from __future__ import annotations
+
+import glob
+import multiprocessing
+import os
+import signal
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+from installer_intel.analyzers.exe import DEFAULT_DEPTH, analyze_exe
+from installer_intel.analyzers.msi import analyze_msi
+from installer_intel.analyzers.package import PACKAGE_SUFFIXES, analyze_package
+from installer_intel.analyzers.remote import analyze_url, is_url, url_suffix
+from installer_intel.analyzers.signatures import SignatureSet, get_signatures
+from installer_intel.analyzers.stream import DEFAULT_MAX_MEMORY
+from installer_intel.cache import ResultCache
+from installer_intel.records import Plan, dumps
+from installer_intel.timings import metrics_record, record_timings, stage
+
+SUPPORTED_SUFFIXES = (".exe", ".msi", *PACKAGE_SUFFIXES)
+
+
+class ScanTimeout(Exception):
+    """Raised inside a worker when a file exceeds its time budget."""
+
+
+def analyze_path(
+    path: str,
+    max_memory: int = DEFAULT_MAX_MEMORY,
+    signatures: Optional[SignatureSet] = None,
+    cache: Optional[ResultCache] = None,
+    timings: bool = False,
+    depth: str = DEFAULT_DEPTH,
+    hashes: Sequence[str] = (),
+    workers: Optional[int] = None,
+) -> Plan:
+    """
+    Analyze one installer, dispatching on its extension. With timings, the
+    plan's diagnostics field is filled with per-stage statistics. depth
+    applies to EXEs (see analyzers.exe.DEPTHS); hashes names digests to
+    record (see analyzers.hashing.HASH_ALGORITHMS). workers caps the
+    processes a large EXE is scanned on (default: one per CPU).
+    """
+    if timings:
+        with record_timings() as rec:
+            plan = analyze_path(
+                path, max_memory=max_memory, signatures=signatures, cache=cache, depth=depth, hashes=hashes,
+                workers=workers,
+            )
+            with stage("serialize"):
+                dumps(plan)
+        plan.diagnostics = rec.diagnostics()
+        return plan
+
+    if is_url(path):
+        # Read in ranges; no result cache (it is keyed by local file hashes).
+        return analyze_url(path, max_memory=max_memory, signatures=signatures, depth=depth, hashes=hashes)
+    ext = Path(path).suffix.lower()
+    if ext == ".msi":
+        return analyze_msi(path, cache=cache, hashes=hashes)
+    if ext == ".exe":
+        return analyze_exe(
+            path, max_memory=max_memory, signatures=signatures, cache=cache, depth=depth, hashes=hashes,
+            workers=workers,
+        )
+    if ext in PACKAGE_SUFFIXES:
+        return analyze_package(
+            path, max_memory=max_memory, signatures=signatures, cache=cache, depth=depth, hashes=hashes,
+        )
+    raise ValueError("Unsupported file type. Provide a .msi, .exe, .zip or .intunewin")
+
+
+def find_installers(targets: Iterable[str]) -> Iterator[str]:
+    """
+    Yield supported installers under each target: a directory (searched
+    recursively), a single file, a glob pattern ('**' allowed) or an
+    http(s) URL. Each path is yielded once.
+    """
+    seen = set()
+    for target in targets:
+        if is_url(target):
+            if url_suffix(target) in SUPPORTED_SUFFIXES and target not in seen:
+                seen.add(target)
+                yield target
+            continue
+        if os.path.isdir(target):
+            candidates: Iterable[str] = (
+                os.path.join(root, name)
+                for root, dirs, files in os.walk(target)
+                for name in sorted(files)
+            )
+        elif os.path.isfile(target):
+            candidates = [target]
+        else:
+            candidates = sorted(glob.iglob(target, recursive=True))
+        for p in candidates:
+            if p.lower().endswith(SUPPORTED_SUFFIXES) and os.path.isfile(p) and p not in seen:
+                seen.add(p)
+                yield p
+
+
+@dataclass
+class ScanResult:
+    path: str
+    size: int
+    seconds: float
+    plan_json: Optional[str] = None  # InstallPlan as compact JSON
+    error: Optional[str] = None
+    timed_out: bool = False
+    metrics: Optional[Dict[str, Any]] = None  # see timings.metrics_record
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+# Per-worker state, set once by _init_worker.
+_worker_signatures: Optional[SignatureSet] = None
+_worker_max_memory = DEFAULT_MAX_MEMORY
+_worker_timeout: Optional[float] = None
+_worker_cache: Optional[ResultCache] = None
+_worker_timings = False
+_worker_depth = DEFAULT_DEPTH
+_worker_hashes: Tuple[str, ...] = ()
+_worker_started: Any = None  # StartedFiles.queue, if the parent tracks starts
+
+
+def _init_worker(
+    signature_paths: Sequence[str],
+    max_memory: int,
+    timeout: Optional[float],
+    cache_dir: Optional[str],
+    timings: bool = False,
+    depth: str = DEFAULT_DEPTH,
+    hashes: Sequence[str] = (),
+    started: Any = None,
+) -> None:
+    global _worker_signatures, _worker_max_memory, _worker_timeout, _worker_cache, _worker_timings, _worker_depth
+    global _worker_hashes, _worker_started
+    _worker_signatures = get_signatures(signature_paths)
+    _worker_max_memory = max_memory
+    _worker_timeout = timeout
+    _worker_timings = timings
+    _worker_depth = depth
+    _worker_hashes = tuple(hashes)
+    _worker_started = started
+    if _worker_cache is not None:
+        _worker_cache.close()
+    _worker_cache = ResultCache(Path(cache_dir)) if cache_dir else None
+
+
+def _on_alarm(signum, frame) -> None:
+    raise ScanTimeout()
+
+
+def _disarm_alarm() -> None:
+    """
+    Stop the per-file timer. If it had already fired, its ScanTimeout may
+    still be pending until the eval loop's next check, which the call below
+    provides; it is dropped here instead of escaping later.
+    """
+    try:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        _checkpoint()
+    except ScanTimeout:
+        pass
+
+
+def _checkpoint() -> None:
+    pass
+
+
+def scan_file(path: str, depth: Optional[str] = None, hashes: Optional[Sequence[str]] = None) -> ScanResult:
+    """
+    Analyze one file in a process set up by _init_worker (see worker_pool).
+    depth and hashes override the worker's defaults. Never raises except for
+    KeyboardInterrupt and SystemExit: failures become error results.
+    """
+    if _worker_started is not None:
+        _worker_started.put(path)
+    t0 = time.perf_counter()
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        size = 0
+
+    # The timeout is enforced with SIGALRM where it exists (POSIX); elsewhere
+    # files run to completion. The alarm can interrupt any code, so it is
+    # disarmed on every way out, and a ScanTimeout still pending then is
+    # consumed here rather than escaping from the finally.
+    use_alarm = bool(_worker_timeout) and hasattr(signal, "setitimer")
+    previous = signal.signal(signal.SIGALRM, _on_alarm) if use_alarm else None
+    result: Optional[ScanResult] = None
+    try:
+        try:
+            if use_alarm:
+                signal.setitimer(signal.ITIMER_REAL, _worker_timeout)
+            plan = analyze_path(
+                path, max_memory=_worker_max_memory, signatures=_worker_signatures, cache=_worker_cache,
+                timings=_worker_timings, depth=depth or _worker_depth,
+                hashes=_worker_hashes if hashes is None else hashes,
+                workers=1,  # the pool already has a process per core
+            )
+            if is_url(path):
+                size = plan.metadata.get("SizeBytes", size)
+            result = ScanResult(
+                path, size, time.perf_counter() - t0,
+                plan_json=dumps(plan),
+                metrics=metrics_record(plan) if plan.diagnostics else None,
+            )
+        finally:
+            if use_alarm:
+                _disarm_alarm()
+    except ScanTimeout:
+        pass  # result stays None, unless the alarm fired after it was made
+    except (KeyboardInterrupt, SystemExit):
+        raise
+    except BaseException as e:
+        # Raised inside native code, the alarm can surface as another
+        # exception (pyo3's PanicException is a BaseException).
+        if not (use_alarm and time.perf_counter() - t0 >= _worker_timeout):
+            result = ScanResult(path, size, time.perf_counter() - t0, error=f"{type(e).__name__}: {e}")
+    finally:
+        if use_alarm:
+            _disarm_alarm()
+            signal.signal(signal.SIGALRM, previous)
+    if result is None:
+        return ScanResult(
+            path, size, time.perf_counter() - t0,
+            error=f"Timed out after {_worker_timeout:g}s", timed_out=True,
+        )
+    return result
+
+
+def default_jobs() -> int:
+    return os.cpu_count() or 1
+
+
+def worker_pool(
+    jobs: int,
+    signature_paths: Sequence[str] = (),
+    max_memory: int = DEFAULT_MAX_MEMORY,
+    timeout: Optional[float] = None,
+    cache_dir: Optional[str] = None,
+    timings: bool = False,
+    depth: str = DEFAULT_DEPTH,
+    hashes: Sequence[str] = (),
+    started: Optional[StartedFiles] = None,
+) -> ProcessPoolExecutor:
+    """
+    A pool of jobs processes, each with signatures loaded and the cache open,
+    ready to run scan_file. With started, workers report each file they
+    begin on to it.
+    """
+    return ProcessPoolExecutor(
+        max_workers=jobs,
+        initializer=_init_worker,
+        initargs=(
+            tuple(signature_paths), max_memory, timeout, cache_dir, timings, depth, tuple(hashes),
+            started.queue if started is not None else None,
+        ),
+    )
+
+
+class StartedFiles:
+    """
+    The files a pool's workers have begun on (see worker_pool), so that when
+    a worker dies the files it could have been running, at most one per
+    worker, can be told from those that were only queued.
+    """
+
+    def __init__(self) -> None:
+        self.queue = multiprocessing.SimpleQueue()
+        self._paths: Set[str] = set()
+
+    def _drain(self) -> None:
+        while not self.queue.empty():
+            self._paths.add(self.queue.get())
+
+    def finished(self, path: str) -> None:
+        # A worker reports the start before it sends the result, so the
+        # start of a finished file is already readable here.
+        self._drain()
+        self._paths.discard(path)
+
+    def split(self, broken: Sequence[str]) -> Tuple[List[str], List[str]]:
+        """
+        (started, queued) among the files that failed with a dead worker.
+        If none had started (the workers died on startup), all count as
+        started, so each is tried alone and fails rather than forever
+        being queued again.
+        """
+        self._drain()
+        started = [p for p in broken if p in self._paths]
+        if not started:
+            return list(broken), []
+        return started, [p for p in broken if p not in self._paths]
+
+    def close(self) -> None:
+        self.queue.close()
+
+
+def scan(
+    paths: Iterable[str],
+    jobs: Optional[int] = None,
+    timeout: Optional[float] = None,
+    max_memory: int = DEFAULT_MAX_MEMORY,
+    signature_paths: Sequence[str] = (),
+    cache_dir: Optional[str] = None,
+    timings: bool = False,
+    depth: str = DEFAULT_DEPTH,
+    hashes: Sequence[str] = (),
+) -> Iterator[ScanResult]:
+    """
+    Analyze paths on a pool of jobs worker processes and yield a ScanResult
+    per file in completion order. At most a few files per worker are queued
+    at a time, so paths may be a lazy iterator over a huge tree.
+    jobs=1 runs in this process without a pool. With cache_dir, results are
+    served from / stored in the result cache there. With timings, each plan
+    carries per-stage diagnostics. depth and hashes are passed on to
+    analyze_path.
+    """
+    jobs = jobs or default_jobs()
+    signature_paths = tuple(signature_paths)
+    if jobs == 1:
+        _init_worker(signature_paths, max_memory, timeout, cache_dir, timings, depth, hashes)
+        for p in paths:
+            yield scan_file(p)
+        return
+
+    pending = iter(paths)
+    pool_args = (signature_paths, max_memory, timeout, cache_dir, timings, depth, hashes)
+    limit = jobs * 4
+    # Files that were queued, not yet started, on a pool whose worker died.
+    requeued: Deque[str] = deque()
+    while True:
+        broken: List[str] = []
+        started = StartedFiles()
+        try:
+            with worker_pool(jobs, *pool_args, started=started) as pool:
+                running: Dict[Future, str] = {}
+
+                def fill() -> None:
+                    while len(running) < limit:
+                        p = requeued.popleft() if requeued else next(pending, None)
+                        if p is None:
+                            return
+                        running[pool.submit(scan_file, p)] = p
+
+                fill()
+                while running:
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for fut in done:
+                        p = running.pop(fut)
+                        try:
+                            result = fut.result()
+                        except BrokenProcessPool:
+                            broken.append(p)
+                            continue
+                        started.finished(p)
+                        yield result
+                    if broken:
+                        break
+                    fill()
+                # A worker died (e.g. killed by the OS) and every file in
+                # flight failed with it, whichever one caused it.
+                broken.extend(running.values())
+            if not broken:
+                return
+            # Only the files that were running can have caused it: retry
+            # each alone. The ones still queued go to the next pool.
+            alone, queued = started.split(broken)
+        finally:
+            started.close()
+        requeued.extendleft(reversed(queued))
+        for p in alone:
+            yield scan_alone(p, *pool_args)
+
+
+def scan_alone(path: str, *pool_args) -> ScanResult:
+    """
+    scan_file(path) on a pool of its own (pool_args as for worker_pool,
+    after jobs), to retry files that were running when a worker died: only
+    a file that kills a worker by itself is failed.
+    """
+    with worker_pool(1, *pool_args) as pool:
+        try:
+            return pool.submit(scan_file, path).result()
+        except BrokenProcessPool:
+            return ScanResult(path, 0, 0.0, error="Worker process terminated abruptly")
@@ -0,0 +1,528 @@
+"""
+Long-running analysis daemon (`installer-intel serve`).
+
+A small asyncio HTTP/1.1 front end over the same worker pool that `scan`
+uses: worker processes load the signature database and open the result
+cache once, so each request pays only for the analysis itself.
+
+    GET  /health                        server and pool status
+    POST /analyze?path=/srv/setup.exe   analyze a file the server can read
+    POST /analyze  {"path": "..."}      the same, path in a JSON body
+    POST /analyze?filename=setup.exe    analyze the request body (upload)
+
+Both analyze forms accept &depth=triage|standard|deep (EXEs only) and
+&hash=sha256,sha1,md5 (digests to record; &hash= with no value records none).
+
+A successful analysis returns the InstallPlan JSON; failures return
+{"error": ...} with an HTTP status. Uploads are streamed to a temporary
+file in chunks, never held in memory.
+
+Backpressure: at most max_pending analyses (running, queued or uploading)
+are admitted at a time; further requests get 503 with Retry-After at once
+instead of queueing without bound. Each analysis is limited to the
+per-file timeout (504).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import shutil
+import signal
+import stat
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import AsyncIterator, Callable, Dict, List, Optional, Sequence, Set, Tuple
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from installer_intel import __version__
+from installer_intel.analyzers.exe import DEFAULT_DEPTH, DEPTHS
+from installer_intel.analyzers.hashing import check_algorithms
+from installer_intel.analyzers.signatures import get_signatures
+from installer_intel.analyzers.stream import DEFAULT_MAX_MEMORY
+from installer_intel.cache import ANALYZER_VERSION, rebind_paths
+from installer_intel.records import Plan, dumps
+from installer_intel.scan import SUPPORTED_SUFFIXES, ScanResult, ScanTimeout, default_jobs, scan_file, worker_pool
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_MAX_UPLOAD = 4 * 1024 ** 3
+
+_READ_CHUNK = 256 * 1024
+_MAX_HEADERS = 100
+_MAX_JSON_BODY = 64 * 1024
+_IDLE_TIMEOUT = 30.0  # waiting for a request head or the next body chunk
+_TIMEOUT_GRACE = 5.0  # on top of the worker's own SIGALRM timeout
+
+_REASONS = {
+    100: "Continue",
+    200: "OK",
+    400: "Bad Request",
+    403: "Forbidden",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    408: "Request Timeout",
+    411: "Length Required",
+    413: "Payload Too Large",
+    415: "Unsupported Media Type",
+    422: "Unprocessable Entity",
+    500: "Internal Server Error",
+    501: "Not Implemented",
+    503: "Service Unavailable",
+    504: "Gateway Timeout",
+}
+
+
+class HttpError(Exception):
+    """An error answered with an HTTP status and a JSON {"error": ...} body."""
+
+    def __init__(self, status: int, message: str, headers: Optional[Dict[str, str]] = None) -> None:
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.headers = headers or {}
+
+
+class _Request:
+    def __init__(
+        self,
+        method: str,
+        target: str,
+        version: str,
+        headers: Dict[str, str],
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+    ) -> None:
+        self.method = method
+        self.version = version
+        self.headers = headers
+        self._reader = reader
+        self._writer = writer
+        parts = urlsplit(target)
+        self.path = unquote(parts.path)
+        self.query = {k: v[0] for k, v in parse_qs(parts.query, keep_blank_values=True).items()}
+
+    @property
+    def keep_alive(self) -> bool:
+        conn = self.headers.get("connection", "").lower()
+        if self.version == "HTTP/1.0":
+            return conn == "keep-alive"
+        return conn != "close"
+
+    @property
+    def has_body(self) -> bool:
+        return "transfer-encoding" in self.headers or self.headers.get("content-length", "0") != "0"
+
+    async def chunks(self, limit: int) -> AsyncIterator[bytes]:
+        """Yield the request body in chunks, failing with 413 past limit bytes."""
+        te = self.headers.get("transfer-encoding", "").lower()
+        length: Optional[int] = None
+        if te and te != "chunked":
+            raise HttpError(501, f"Unsupported Transfer-Encoding: {te}")
+        if not te:
+            try:
+                length = int(self.headers.get("content-length", "0"))
+            except ValueError:
+                raise HttpError(400, "Invalid Content-Length")
+            if length < 0:
+                raise HttpError(400, "Invalid Content-Length")
+            if length > limit:
+                raise HttpError(413, f"Body exceeds {limit} bytes")
+            if length == 0:
+                return
+
+        if self.headers.get("expect", "").lower() == "100-continue":
+            self._writer.write(b"HTTP/1.1 100 Continue\r\n\r\n")
+            await self._writer.drain()
+
+        if length is not None:
+            async for data in self._exactly(length):
+                yield data
+            return
+
+        total = 0
+        while True:
+            line = await _idle(self._reader.readline())
+            try:
+                size = int(line.split(b";", 1)[0].strip(), 16)
+            except ValueError:
+                raise HttpError(400, "Invalid chunk size")
+            if size == 0:
+                while (await _idle(self._reader.readline())) not in (b"\r\n", b"\n", b""):
+                    pass  # trailers
+                return
+            total += size
+            if total > limit:
+                raise HttpError(413, f"Body exceeds {limit} bytes")
+            async for data in self._exactly(size):
+                yield data
+            await _idle(self._reader.readline())
+
+    async def _exactly(self, n: int) -> AsyncIterator[bytes]:
+        while n > 0:
+            data = await _idle(self._reader.read(min(n, _READ_CHUNK)))
+            if not data:
+                raise HttpError(400, "Request body ended early")
+            n -= len(data)
+            yield data
+
+    async def read(self, limit: int) -> bytes:
+        return b"".join([data async for data in self.chunks(limit)])
+
+
+async def _idle(awaitable):
+    try:
+        return await asyncio.wait_for(awaitable, _IDLE_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise HttpError(408, "Timed out reading request")
+
+
+async def _read_head(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> Optional[_Request]:
+    line = await reader.readline()
+    if not line.strip():
+        return None
+    try:
+        method, target, version = line.decode("latin-1").split()
+    except ValueError:
+        raise HttpError(400, "Malformed request line")
+    if not version.startswith("HTTP/1."):
+        raise HttpError(400, f"Unsupported protocol: {version}")
+    headers: Dict[str, str] = {}
+    for _ in range(_MAX_HEADERS):
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            return _Request(method.upper(), target, version, headers, reader, writer)
+        name, sep, value = line.decode("latin-1").partition(":")
+        if not sep:
+            raise HttpError(400, "Malformed header line")
+        headers[name.strip().lower()] = value.strip()
+    raise HttpError(400, "Too many headers")
+
+
+def _response(status: int, body: bytes, keep_alive: bool, headers: Optional[Dict[str, str]] = None) -> bytes:
+    lines = [
+        f"HTTP/1.1 {status} {_REASONS.get(status, '')}",
+        "Content-Type: application/json",
+        f"Content-Length: {len(body)}",
+        f"Connection: {'keep-alive' if keep_alive else 'close'}",
+        f"Server: installer-intel/{__version__}",
+    ]
+    lines.extend(f"{k}: {v}" for k, v in (headers or {}).items())
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body
+
+
+def _error_body(message: str) -> bytes:
+    return json.dumps({"error": message}).encode("utf-8")
+
+
+def _url(sockname: tuple) -> str:
+    host, port = sockname[0], sockname[1]
+    return f"http://[{host}]:{port}" if ":" in host else f"http://{host}:{port}"
+
+
+def _warm() -> int:
+    return os.getpid()
+
+
+class AnalysisServer:
+    """
+    Accepts analysis requests and runs them on a warm worker pool.
+    start() binds the listener; close() stops the pool and removes
+    temporary uploads.
+    """
+
+    def __init__(
+        self,
+        jobs: Optional[int] = None,
+        timeout: Optional[float] = 120.0,
+        max_pending: Optional[int] = None,
+        max_upload: int = DEFAULT_MAX_UPLOAD,
+        max_memory: int = DEFAULT_MAX_MEMORY,
+        signature_paths: Sequence[str] = (),
+        cache_dir: Optional[str] = None,
+        allowed_roots: Sequence[str] = (),
+        depth: str = DEFAULT_DEPTH,
+        hashes: Sequence[str] = (),
+    ) -> None:
+        self.jobs = jobs or default_jobs()
+        self.timeout = timeout or None
+        self.max_pending = max_pending or self.jobs * 4
+        self.max_upload = max_upload
+        self.max_memory = max_memory
+        self.signature_paths = tuple(signature_paths)
+        self.cache_dir = cache_dir
+        self.allowed_roots = [os.path.realpath(r) for r in allowed_roots]
+        self.depth = depth
+        self.hashes = check_algorithms(hashes)
+        # Validates the databases before any worker starts.
+        self.signatures_version = get_signatures(self.signature_paths).version
+
+        self.pending = 0
+        self.served = 0
+        self.failed = 0
+        self.rejected = 0
+        self._started = time.time()
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._upload_dir: Optional[str] = None
+        self._socket_path: Optional[str] = None
+        self._connections: Set[asyncio.StreamWriter] = set()
+
+    def _new_pool(self) -> ProcessPoolExecutor:
+        return worker_pool(
+            self.jobs, self.signature_paths, self.max_memory, self.timeout, self.cache_dir,
+            depth=self.depth, hashes=self.hashes,
+        )
+
+    async def start(
+        self,
+        host: str = DEFAULT_HOST,
+        port: int = DEFAULT_PORT,
+        socket_path: Optional[str] = None,
+    ) -> asyncio.AbstractServer:
+        """Start the workers, wait until they are loaded, then listen."""
+        loop = asyncio.get_running_loop()
+        self._upload_dir = tempfile.mkdtemp(prefix="installer-intel-uploads-")
+        self._pool = self._new_pool()
+        await asyncio.gather(*(loop.run_in_executor(self._pool, _warm) for _ in range(self.jobs)))
+
+        if socket_path:
+            if os.path.exists(socket_path) and stat.S_ISSOCK(os.stat(socket_path).st_mode):
+                os.unlink(socket_path)  # left behind by a previous run
+            server = await asyncio.start_unix_server(self._handle, path=socket_path)
+            os.chmod(socket_path, 0o600)
+            self._socket_path = socket_path
+            return server
+        return await asyncio.start_server(self._handle, host=host, port=port)
+
+    def close(self) -> None:
+        for writer in list(self._connections):
+            writer.close()
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+        if self._upload_dir:
+            shutil.rmtree(self._upload_dir, ignore_errors=True)
+            self._upload_dir = None
+        if self._socket_path and os.path.exists(self._socket_path):
+            os.unlink(self._socket_path)
+            self._socket_path = None
+
+    def health(self) -> Dict:
+        return {
+            "status": "ok",
+            "version": __version__,
+            "analyzer_version": ANALYZER_VERSION,
+            "signatures": self.signatures_version,
+            "jobs": self.jobs,
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "served": self.served,
+            "errors": self.failed,
+            "rejected": self.rejected,
+            "uptime_seconds": round(time.time() - self._started, 1),
+        }
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self._connections.add(writer)
+        try:
+            while True:
+                try:
+                    req = await asyncio.wait_for(_read_head(reader, writer), _IDLE_TIMEOUT)
+                except HttpError as e:
+                    writer.write(_response(e.status, _error_body(e.message), False))
+                    break
+                except (asyncio.TimeoutError, ValueError):
+                    break  # idle keep-alive connection, or an overlong line
+                if req is None:
+                    break
+                try:
+                    status, body, headers = await self._dispatch(req)
+                except (asyncio.CancelledError, KeyboardInterrupt, SystemExit):
+                    raise
+                except BaseException as e:
+                    # Not an HttpError: a worker failure or a bug. Answer it
+                    # rather than dropping the connection.
+                    status, body, headers = self._unexpected(e)
+                # A failed request may have left its body unread; do not
+                # try to parse the rest of it as the next request.
+                keep_alive = req.keep_alive and (status < 400 or not req.has_body)
+                writer.write(_response(status, body, keep_alive, headers))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass  # client went away, or sent an overlong line
+        finally:
+            self._connections.discard(writer)
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except (ConnectionError, OSError):
+                pass
+
+    async def _dispatch(self, req: _Request) -> Tuple[int, bytes, Dict[str, str]]:
+        try:
+            if req.path == "/health":
+                if req.method != "GET":
+                    raise HttpError(405, "Use GET /health", {"Allow": "GET"})
+                return 200, json.dumps(self.health()).encode("utf-8"), {}
+            if req.path == "/analyze":
+                if req.method != "POST":
+                    raise HttpError(405, "Use POST /analyze", {"Allow": "POST"})
+                return 200, await self._analyze(req), {}
+            raise HttpError(404, f"No such endpoint: {req.path}")
+        except HttpError as e:
+            if e.status in (422, 500, 504):
+                self.failed += 1
+            return e.status, _error_body(e.message), e.headers
+
+    def _unexpected(self, exc: BaseException) -> Tuple[int, bytes, Dict[str, str]]:
+        self.failed += 1
+        if isinstance(exc, ScanTimeout):
+            message = f"Timed out after {self.timeout:g}s" if self.timeout else "Timed out"
+            return 504, _error_body(message), {}
+        return 500, _error_body(f"{type(exc).__name__}: {exc}"), {}
+
+    async def _analyze(self, req: _Request) -> bytes:
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise HttpError(503, "Server busy, retry later", {"Retry-After": "1"})
+        depth = req.query.get("depth") or self.depth
+        if depth not in DEPTHS:
+            raise HttpError(400, f"Unknown depth {depth!r} (choose from {', '.join(DEPTHS)})")
+        hashes = self.hashes
+        if "hash" in req.query:
+            try:
+                hashes = check_algorithms(req.query["hash"].split(","))
+            except ValueError as e:
+                raise HttpError(400, str(e))
+        self.pending += 1
+        upload: Optional[str] = None
+        try:
+            filename = req.query.get("filename")
+            if filename is not None:
+                upload = await self._receive_upload(req, filename)
+                result = await self._run(upload, depth, hashes)
+            else:
+                path = req.query.get("path")
+                if path is None:
+                    path = self._path_from_json(await req.read(_MAX_JSON_BODY))
+                result = await self._run(self._check_path(path), depth, hashes)
+        finally:
+            self.pending -= 1
+            if upload is not None:
+                try:
+                    os.unlink(upload)
+                except OSError:
+                    pass
+
+        if not result.ok:
+            raise HttpError(504 if result.timed_out else 422, result.error or "Analysis failed")
+        self.served += 1
+        plan_json = result.plan_json or ""
+        if upload is not None:
+            plan = Plan.from_json(plan_json)
+            rebind_paths(plan, upload, os.path.basename(filename))
+            plan_json = dumps(plan)
+        return plan_json.encode("utf-8")
+
+    @staticmethod
+    def _path_from_json(body: bytes) -> str:
+        try:
+            doc = json.loads(body or b"null")
+        except ValueError:
+            raise HttpError(400, "Body is not valid JSON")
+        if not isinstance(doc, dict) or not isinstance(doc.get("path"), str):
+            raise HttpError(400, 'Give ?path=..., ?filename=... with an upload, or a {"path": ...} body')
+        return doc["path"]
+
+    def _check_path(self, path: str) -> str:
+        if not os.path.isabs(path):
+            raise HttpError(400, f"Path must be absolute: {path}")
+        real = os.path.realpath(path)
+        if self.allowed_roots and not any(
+            os.path.commonpath([real, root]) == root for root in self.allowed_roots
+        ):
+            raise HttpError(403, f"Path is outside the allowed directories: {path}")
+        if not real.lower().endswith(SUPPORTED_SUFFIXES):
+            raise HttpError(415, "Unsupported file type. Provide a .msi, .exe, .zip or .intunewin")
+        if not os.path.isfile(real):
+            raise HttpError(404, f"File not found: {path}")
+        # Analyze what was checked: a symlink swapped after now cannot escape.
+        return real
+
+    async def _receive_upload(self, req: _Request, filename: str) -> str:
+        suffix = os.path.splitext(os.path.basename(filename))[1].lower()
+        if suffix not in SUPPORTED_SUFFIXES:
+            raise HttpError(415, "Unsupported file type. Provide a .msi, .exe, .zip or .intunewin")
+        if not req.has_body:
+            raise HttpError(411, "Upload body is empty")
+        loop = asyncio.get_running_loop()
+        fd, tmp = tempfile.mkstemp(suffix=suffix, dir=self._upload_dir)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                async for data in req.chunks(self.max_upload):
+                    await loop.run_in_executor(None, f.write, data)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        return tmp
+
+    async def _run(self, path: str, depth: str, hashes: Sequence[str]) -> ScanResult:
+        loop = asyncio.get_running_loop()
+        pool = self._pool
+        assert pool is not None, "start() was not called"
+        deadline = self.timeout + _TIMEOUT_GRACE if self.timeout else None
+        try:
+            return await asyncio.wait_for(loop.run_in_executor(pool, scan_file, path, depth, hashes), deadline)
+        except asyncio.TimeoutError:
+            raise HttpError(504, f"Timed out after {self.timeout:g}s")
+        except BrokenProcessPool:
+            # A worker died (e.g. killed by the OS). Replace the pool once;
+            # requests that were on the broken pool fail.
+            if self._pool is pool:
+                pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = self._new_pool()
+            raise HttpError(500, "Worker process terminated abruptly")
+
+
+def run(
+    server: AnalysisServer,
+    host: str = DEFAULT_HOST,
+    port: int = DEFAULT_PORT,
+    socket_path: Optional[str] = None,
+    on_ready: Optional[Callable[[List[str]], None]] = None,
+) -> None:
+    """
+    Serve until SIGINT/SIGTERM. on_ready receives the listening addresses
+    once the workers are loaded.
+    """
+
+    async def main() -> None:
+        listener = await server.start(host, port, socket_path)
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, stop.set)
+            except (NotImplementedError, RuntimeError):
+                pass  # Windows: Ctrl+C raises KeyboardInterrupt instead
+        if on_ready is not None:
+            if socket_path:
+                on_ready([f"unix:{socket_path}"])
+            else:
+                on_ready([_url(s.getsockname()) for s in listener.sockets])
+        await stop.wait()
+        listener.close()
+        server.close()
+        await listener.wait_closed()
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
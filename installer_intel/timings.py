@@ -0,0 +1,206 @@
+"""
+Optional per-stage instrumentation.
+
+Analysis code marks stages with stage("name") and reports work with
+count(bytes_read=..., strings=...). Both are no-ops unless a Recorder is
+active in the current context (see record_timings), so instrumentation
+costs nothing in normal runs.
+
+Stage times are exclusive: time spent in a nested stage is charged to that
+stage, not to its parent. Memory is the process peak RSS observed when a
+stage ends (a high-water mark, so it never decreases), sampled at most
+every few milliseconds per stage.
+"""
+
+from __future__ import annotations
+
+import sys
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Iterator, List, Optional, TypeVar
+
+from installer_intel.records import Diagnostics, Plan, StageTiming
+
+T = TypeVar("T")
+
+_SAMPLE_INTERVAL = 0.01
+
+_current: ContextVar[Optional["Recorder"]] = ContextVar("installer_intel_timings", default=None)
+
+
+def peak_rss() -> Optional[int]:
+    """Peak resident set size of this process in bytes, if the OS reports it."""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+@dataclass
+class _Stats:
+    seconds: float = 0.0
+    calls: int = 0
+    bytes_read: int = 0
+    strings: int = 0
+    peak_rss: Optional[int] = None
+    sampled_at: float = 0.0
+
+
+class Recorder:
+    """Collects per-stage statistics for one analysis."""
+
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self.cached = False
+        self._stats: Dict[str, _Stats] = {}
+        # [name, start, time spent in child stages]
+        self._stack: List[list] = []
+
+    def enter(self, name: str) -> None:
+        self._stack.append([name, time.perf_counter(), 0.0])
+
+    def exit(self) -> None:
+        name, start, children = self._stack.pop()
+        now = time.perf_counter()
+        elapsed = now - start
+        st = self._stats.get(name)
+        if st is None:
+            st = self._stats[name] = _Stats()
+        st.seconds += elapsed - children
+        st.calls += 1
+        if now - st.sampled_at >= _SAMPLE_INTERVAL:
+            st.sampled_at = now
+            st.peak_rss = peak_rss()
+        if self._stack:
+            self._stack[-1][2] += elapsed
+
+    def count(self, bytes_read: int = 0, strings: int = 0) -> None:
+        """Attribute work to the innermost active stage."""
+        if not self._stack:
+            return
+        name = self._stack[-1][0]
+        st = self._stats.get(name)
+        if st is None:
+            st = self._stats[name] = _Stats()
+        st.bytes_read += bytes_read
+        st.strings += strings
+
+    def diagnostics(self) -> Diagnostics:
+        return Diagnostics(
+            total_seconds=round(time.perf_counter() - self.started, 6),
+            peak_rss=peak_rss(),
+            cached=self.cached,
+            stages=[
+                StageTiming(
+                    stage=name,
+                    seconds=round(st.seconds, 6),
+                    calls=st.calls,
+                    bytes_read=st.bytes_read,
+                    strings=st.strings,
+                    peak_rss=st.peak_rss,
+                )
+                for name, st in self._stats.items()
+            ],
+        )
+
+
+@contextmanager
+def record_timings() -> Iterator[Recorder]:
+    """
+    Record stages for everything run inside the block:
+
+        with record_timings() as rec:
+            plan = analyze_exe(path)
+        plan.diagnostics = rec.diagnostics()
+    """
+    rec = Recorder()
+    token = _current.set(rec)
+    try:
+        yield rec
+    finally:
+        _current.reset(token)
+
+
+def active() -> Optional[Recorder]:
+    return _current.get()
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    rec = _current.get()
+    if rec is None:
+        yield
+        return
+    rec.enter(name)
+    try:
+        yield
+    finally:
+        rec.exit()
+
+
+def count(bytes_read: int = 0, strings: int = 0) -> None:
+    rec = _current.get()
+    if rec is not None:
+        rec.count(bytes_read, strings)
+
+
+def mark_cached() -> None:
+    """Note that the result was served from the cache."""
+    rec = _current.get()
+    if rec is not None:
+        rec.cached = True
+
+
+def metrics_record(plan: Plan) -> Dict[str, Any]:
+    """
+    One flat, machine-readable metrics record for a plan with diagnostics
+    (written one per line by --metrics, for aggregation across runs).
+    """
+    diag = plan.diagnostics
+    return {
+        "input_path": plan.input_path,
+        "file_type": plan.file_type,
+        "installer_type": plan.installer_type,
+        "cached": diag.cached if diag else None,
+        "total_seconds": diag.total_seconds if diag else None,
+        "peak_rss": diag.peak_rss if diag else None,
+        "stages": {
+            s.stage: {
+                "seconds": s.seconds,
+                "calls": s.calls,
+                "bytes_read": s.bytes_read,
+                "strings": s.strings,
+                "peak_rss": s.peak_rss,
+            }
+            for s in (diag.stages if diag else [])
+        },
+    }
+
+
+def timed_iter(items: Iterable[T], name: str) -> Iterator[T]:
+    """
+    Charge the time spent producing each item of a lazy iterable to stage
+    name, and count the items as strings. Returns items unchanged when no
+    recorder is active.
+    """
+    rec = _current.get()
+    if rec is None:
+        return iter(items)
+    return _timed(rec, iter(items), name)
+
+
+def _timed(rec: Recorder, it: Iterator[T], name: str) -> Iterator[T]:
+    while True:
+        rec.enter(name)
+        try:
+            item = next(it)
+        except StopIteration:
+            return
+        finally:
+            rec.exit()
+        rec._stats[name].strings += 1
+        yield item
@@ -0,0 +1,443 @@
+"""
+Watching a drop folder (`installer-intel watch`).
+
+A Watcher follows a directory tree and analyzes installers as they land in
+it. Changes come from inotify on Linux (a watch per directory, added as
+directories appear) or, elsewhere, when inotify is unavailable or on
+network shares whose remote writes inotify never sees, from a poller that
+lists the tree every poll interval and compares sizes and mtimes.
+
+A changed file is held until it has been quiet for settle seconds: no
+events for it and the same size and mtime on two stats that far apart, so
+a copy still in progress is not analyzed half written. Settled files go to
+the same worker pool as `scan`, at most a few per worker at a time; the
+rest wait in a queue that holds each path once. A file changed again while
+it is analyzed is analyzed again once it settles.
+
+Idle, the watcher blocks in select() on the inotify descriptor (the poller
+wakes once per interval), and its memory is bounded by the number of
+files in the tree, not by how long it runs.
+"""
+
+from __future__ import annotations
+
+import ctypes
+import ctypes.util
+import errno
+import json
+import os
+import select
+import socket
+import struct
+import sys
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from installer_intel.analyzers.exe import DEFAULT_DEPTH
+from installer_intel.analyzers.stream import DEFAULT_MAX_MEMORY
+from installer_intel.scan import (
+    SUPPORTED_SUFFIXES,
+    ScanResult,
+    StartedFiles,
+    default_jobs,
+    scan_alone,
+    scan_file,
+    worker_pool,
+)
+
+DEFAULT_SETTLE = 2.0
+DEFAULT_POLL_INTERVAL = 5.0
+PLAN_SUFFIX = ".installplan.json"
+
+Stat = Tuple[int, int]  # (size, mtime_ns)
+
+# inotify(7)
+_IN_MODIFY = 0x2
+_IN_CLOSE_WRITE = 0x8
+_IN_MOVED_FROM = 0x40
+_IN_MOVED_TO = 0x80
+_IN_CREATE = 0x100
+_IN_DELETE = 0x200
+_IN_DELETE_SELF = 0x400
+_IN_Q_OVERFLOW = 0x4000
+_IN_IGNORED = 0x8000
+_IN_ISDIR = 0x40000000
+_IN_MASK = _IN_MODIFY | _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE | _IN_DELETE_SELF
+_IN_CLOEXEC = 0o2000000
+_IN_NONBLOCK = 0o4000
+_EVENT = struct.Struct("iIII")  # wd, mask, cookie, len; then len bytes of NUL-padded name
+
+
+def is_installer(path: str) -> bool:
+    return path.lower().endswith(SUPPORTED_SUFFIXES)
+
+
+def plan_path(path: str) -> str:
+    """Where the plan for path is written beside it: setup.exe -> setup.exe.installplan.json."""
+    return path + PLAN_SUFFIX
+
+
+def write_beside(result: ScanResult) -> str:
+    """
+    Write result's InstallPlan next to the file, replacing the previous one
+    atomically, and return its path. Failed results write nothing.
+    """
+    out = plan_path(result.path)
+    directory, name = os.path.split(out)
+    tmp = os.path.join(directory, f".{name}.{os.getpid()}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(json.dumps(json.loads(result.plan_json), indent=2, ensure_ascii=False))
+    os.replace(tmp, out)
+    return out
+
+
+def _stat(path: str) -> Optional[Stat]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+
+def _walk(root: str) -> Iterator[Tuple[str, Stat]]:
+    """Every installer under root with its stat, listing each directory once."""
+    stack = [root]
+    while stack:
+        directory = stack.pop()
+        try:
+            with os.scandir(directory) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif is_installer(entry.name) and entry.is_file():
+                            st = entry.stat()
+                            yield entry.path, (st.st_size, st.st_mtime_ns)
+                    except OSError:
+                        continue  # gone while listing
+        except OSError:
+            continue
+
+
+class _Poller:
+    """Changes found by listing the tree every interval seconds."""
+
+    kind = "poll"
+
+    def __init__(self, root: str, interval: float) -> None:
+        self.root = root
+        self.interval = interval
+        self._known: Dict[str, Stat] = dict(_walk(root))
+        self._next = time.monotonic() + interval
+
+    def fileno(self) -> Optional[int]:
+        return None
+
+    def timeout(self, now: float) -> Optional[float]:
+        return max(0.0, self._next - now)
+
+    def changes(self) -> List[str]:
+        if time.monotonic() < self._next:
+            return []
+        current = dict(_walk(self.root))
+        changed = [p for p, st in current.items() if self._known.get(p) != st]
+        changed.extend(p for p in self._known if p not in current)
+        self._known = current
+        self._next = time.monotonic() + self.interval
+        return changed
+
+    def close(self) -> None:
+        self._known = {}
+
+
+class _Inotify:
+    """Changes reported by inotify, with a watch on every directory of the tree."""
+
+    kind = "inotify"
+
+    def __init__(self, root: str) -> None:
+        if not sys.platform.startswith("linux"):
+            raise OSError(errno.ENOSYS, "inotify is only available on Linux")
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or None, use_errno=True)
+        self._add = libc.inotify_add_watch
+        self._add.argtypes = (ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32)
+        self.root = root
+        self._fd = libc.inotify_init1(_IN_CLOEXEC | _IN_NONBLOCK)
+        if self._fd < 0:
+            e = ctypes.get_errno()
+            raise OSError(e, f"inotify_init1: {os.strerror(e)}")
+        self._dirs: Dict[int, str] = {}
+        try:
+            self._watch_tree(root)
+        except OSError:
+            self.close()
+            raise
+
+    def fileno(self) -> Optional[int]:
+        return self._fd
+
+    def timeout(self, now: float) -> Optional[float]:
+        return None
+
+    def _watch(self, directory: str) -> None:
+        wd = self._add(self._fd, os.fsencode(directory), _IN_MASK)
+        if wd < 0:
+            e = ctypes.get_errno()
+            if e in (errno.ENOENT, errno.ENOTDIR):
+                return  # gone before it could be watched
+            # ENOSPC: fs.inotify.max_user_watches is exhausted
+            raise OSError(e, f"inotify_add_watch {directory}: {os.strerror(e)}")
+        self._dirs[wd] = directory
+
+    def _watch_tree(self, top: str) -> List[str]:
+        """Watch top and the directories under it; return the installers already there."""
+        found = []
+        stack = [top]
+        while stack:
+            directory = stack.pop()
+            self._watch(directory)
+            try:
+                with os.scandir(directory) as it:
+                    for entry in it:
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                stack.append(entry.path)
+                            elif is_installer(entry.name):
+                                found.append(entry.path)
+                        except OSError:
+                            continue
+            except OSError:
+                continue
+        return found
+
+    def changes(self) -> List[str]:
+        changed: Dict[str, None] = {}
+        while True:
+            try:
+                data = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            pos = 0
+            while pos + _EVENT.size <= len(data):
+                wd, mask, _, length = _EVENT.unpack_from(data, pos)
+                name = os.fsdecode(data[pos + _EVENT.size:pos + _EVENT.size + length].rstrip(b"\0"))
+                pos += _EVENT.size + length
+                if mask & _IN_Q_OVERFLOW:
+                    # Events were lost: treat everything in the tree as changed.
+                    changed.update((p, None) for p, _ in _walk(self.root))
+                    continue
+                if mask & _IN_IGNORED:
+                    self._dirs.pop(wd, None)
+                    continue
+                directory = self._dirs.get(wd)
+                if directory is None or not name:
+                    continue
+                path = os.path.join(directory, name)
+                if mask & _IN_ISDIR:
+                    if mask & (_IN_CREATE | _IN_MOVED_TO):
+                        # Files copied in before the new watch existed raise no events.
+                        changed.update((p, None) for p in self._watch_tree(path))
+                elif is_installer(name):
+                    changed[path] = None
+        return list(changed)
+
+    def close(self) -> None:
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+        self._dirs = {}
+
+
+class Watcher:
+    """
+    Analyzes installers under root as they are written. run() loops until
+    stop() is called (from another thread or a signal handler) and passes
+    each ScanResult to on_result in the calling thread.
+    """
+
+    def __init__(
+        self,
+        root: str,
+        on_result: Callable[[ScanResult], None],
+        jobs: Optional[int] = None,
+        settle: float = DEFAULT_SETTLE,
+        poll: bool = False,
+        poll_interval: float = DEFAULT_POLL_INTERVAL,
+        existing: bool = False,
+        timeout: Optional[float] = 120.0,
+        max_memory: int = DEFAULT_MAX_MEMORY,
+        signature_paths: Sequence[str] = (),
+        cache_dir: Optional[str] = None,
+        depth: str = DEFAULT_DEPTH,
+        hashes: Sequence[str] = (),
+    ) -> None:
+        if not os.path.isdir(root):
+            raise ValueError(f"Not a directory: {root}")
+        self.root = os.path.abspath(root)
+        self.on_result = on_result
+        self.jobs = jobs or default_jobs()
+        self.settle = settle
+        self.poll_interval = poll_interval
+        self._pool_args = (self.jobs, tuple(signature_paths), max_memory, timeout, cache_dir, False, depth,
+                           tuple(hashes))
+        self.analyzed = 0
+        self.failed = 0
+        self.note: Optional[str] = None  # why polling is used instead of inotify
+
+        self._source = self._open_source(poll)
+        # path -> (stat when last changed, monotonic time of the last change)
+        self._pending: Dict[str, Tuple[Optional[Stat], float]] = {}
+        self._ready: "OrderedDict[str, None]" = OrderedDict()
+        self._running: Dict[Future, str] = {}
+        self._limit = self.jobs * 2
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._started: Optional[StartedFiles] = None
+        self._stopping = False
+        # Finished analyses and stop() wake the select() through this pair.
+        self._wake_r, self._wake_w = socket.socketpair()
+        self._wake_r.setblocking(False)
+        self._wake_w.setblocking(False)
+        if existing:
+            now = time.monotonic()
+            for path, st in _walk(self.root):
+                out = _stat(plan_path(path))
+                if out is None or out[1] < st[1]:
+                    self._pending[path] = (st, now - settle)
+
+    @property
+    def kind(self) -> str:
+        return self._source.kind
+
+    def _open_source(self, poll: bool):
+        if not poll:
+            try:
+                return _Inotify(self.root)
+            except (OSError, AttributeError) as e:
+                self.note = f"inotify unavailable ({e}); polling every {self.poll_interval:g}s"
+        return _Poller(self.root, self.poll_interval)
+
+    def stop(self) -> None:
+        self._stopping = True
+        self._wake()
+
+    def _wake(self, *_) -> None:
+        try:
+            self._wake_w.send(b"\0")
+        except OSError:
+            pass  # already woken (buffer full) or closed
+
+    def _new_pool(self) -> None:
+        if self._started is not None:
+            self._started.close()
+        self._started = StartedFiles()
+        self._pool = worker_pool(*self._pool_args, started=self._started)
+
+    def run(self) -> None:
+        self._new_pool()
+        try:
+            while not self._stopping:
+                self._wait()
+                now = time.monotonic()
+                for path in self._source.changes():
+                    self._changed(path, now)
+                self._settled(time.monotonic())
+                self._collect()
+                self._submit()
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+        if self._started is not None:
+            self._started.close()
+            self._started = None
+        self._source.close()
+        self._wake_r.close()
+        self._wake_w.close()
+
+    def _wait(self) -> None:
+        now = time.monotonic()
+        timeouts = [self._source.timeout(now)]
+        if self._pending:
+            timeouts.append(max(0.0, min(t for _, t in self._pending.values()) + self.settle - now))
+        timeouts = [t for t in timeouts if t is not None]
+        fds = [self._wake_r]
+        if self._source.fileno() is not None:
+            fds.append(self._source.fileno())
+        select.select(fds, [], [], min(timeouts) if timeouts else None)
+        try:
+            while self._wake_r.recv(4096):
+                pass
+        except (BlockingIOError, InterruptedError):
+            pass
+
+    def _changed(self, path: str, now: float) -> None:
+        st = _stat(path)
+        if st is None:
+            self._pending.pop(path, None)
+            self._ready.pop(path, None)
+        else:
+            self._pending[path] = (st, now)
+
+    def _settled(self, now: float) -> None:
+        for path, (st, since) in list(self._pending.items()):
+            if now - since < self.settle:
+                continue
+            current = _stat(path)
+            if current is None:
+                del self._pending[path]
+            elif current != st:
+                self._pending[path] = (current, now)  # still being written
+            else:
+                del self._pending[path]
+                if current[0] > 0:  # an empty file is a copy not yet started
+                    self._ready[path] = None
+
+    def _submit(self) -> None:
+        busy = set(self._running.values())
+        for path in list(self._ready):
+            if len(self._running) >= self._limit:
+                return
+            if path in busy:
+                continue  # changed while being analyzed; runs again after
+            del self._ready[path]
+            future = self._pool.submit(scan_file, path)
+            self._running[future] = path
+            future.add_done_callback(self._wake)
+
+    def _collect(self) -> None:
+        broken: List[str] = []
+        for future in [f for f in self._running if f.done()]:
+            path = self._running.pop(future)
+            try:
+                result = future.result()
+            except BrokenProcessPool:
+                broken.append(path)
+                continue
+            self._started.finished(path)
+            self._report(result)
+        if broken:
+            # A worker died (e.g. killed by the OS) and every file in flight
+            # failed with it. Retry the ones that were running alone, so
+            # only a file that kills a worker by itself is failed; the ones
+            # still queued go back to the front of the queue for a new pool.
+            broken += self._running.values()
+            self._running.clear()
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            alone, queued = self._started.split(broken)
+            for path in reversed(queued):
+                self._ready[path] = None
+                self._ready.move_to_end(path, last=False)
+            for path in alone:
+                self._report(scan_alone(path, *self._pool_args[1:]))
+            self._new_pool()
+
+    def _report(self, result: ScanResult) -> None:
+        self.analyzed += 1
+        self.failed += not result.ok
+        self.on_result(result)
@@ -0,0 +1,384 @@
+"""
+Shared work queue for scanning one library from several machines
+(`installer-intel scan --queue`).
+
+The queue is a SQLite file on a share all nodes can reach; there is no
+coordinator. Each file is a row that is todo, leased, done or failed. A
+node takes a batch of todo files under a lease (a row with an expiry time),
+analyzes them on its own worker pool and writes each result back into the
+file's row, which completes it. A thread renews the node's leases every
+third of the lease time. When a node dies, its leases stop being renewed
+and expire, and the next node to claim work puts their files back to todo.
+A file whose lease expired max_attempts times is marked failed, so a file
+that brings down its node cannot bring down every node in turn. Results
+that arrive under a lease that was already taken back are dropped, from
+the queue and from what scan_queue yields: each file is completed, and
+reported, by exactly one node.
+
+Any node given targets lists them into the queue (files already there are
+left alone), so nodes can start with the same command line. Nodes keep
+claiming until nothing is todo and no lease is outstanding. They wait for
+leases held by other nodes, because those leases may expire and need
+redoing. The results are in the queue, and results() yields them in path
+order as NDJSON lines.
+
+The file uses SQLite's rollback journal rather than WAL, because WAL needs
+shared memory that nodes on different machines do not have. The share must
+support byte-range locks, as SMB does and NFS does with a lock manager.
+Leases expire by the wall clock, so node clocks must agree to well within
+the lease time.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+from installer_intel.analyzers.exe import DEFAULT_DEPTH, exe_cache_version
+from installer_intel.analyzers.hashing import check_algorithms
+from installer_intel.analyzers.remote import is_url
+from installer_intel.analyzers.signatures import get_signatures
+from installer_intel.analyzers.stream import DEFAULT_MAX_MEMORY
+from installer_intel.cache import ANALYZER_VERSION
+from installer_intel.scan import ScanResult, find_installers, scan
+
+DEFAULT_LEASE = 60.0
+DEFAULT_BATCH = 16
+DEFAULT_MAX_ATTEMPTS = 3
+_ADD_BATCH = 512  # paths per insert transaction
+_FLUSH_ROWS = 32  # results per completion transaction
+_FLUSH_SECONDS = 2.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    state TEXT NOT NULL DEFAULT 'todo',
+    lease INTEGER,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    node TEXT,
+    plan TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS files_state ON files (state, path);
+CREATE INDEX IF NOT EXISTS files_lease ON files (lease);
+CREATE TABLE IF NOT EXISTS leases (
+    id INTEGER PRIMARY KEY,
+    node TEXT NOT NULL,
+    expires REAL NOT NULL
+);
+"""
+
+
+@dataclass
+class QueueStatus:
+    todo: int = 0
+    leased: int = 0
+    done: int = 0
+    failed: int = 0
+    listed: bool = False  # a node has finished listing its targets into the queue
+    next_expiry: Optional[float] = None  # earliest lease expiry (time.time()), if any lease is out
+
+    @property
+    def finished(self) -> bool:
+        return self.listed and not self.todo and not self.leased
+
+
+def analysis_version(
+    signature_paths: Sequence[str] = (), depth: str = DEFAULT_DEPTH, hashes: Sequence[str] = (),
+) -> str:
+    """What every node of a queue must agree on so that results are comparable."""
+    return f"{ANALYZER_VERSION}:{exe_cache_version(get_signatures(signature_paths), depth, check_algorithms(hashes))}"
+
+
+def default_node() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class WorkQueue:
+    """
+    One node's connection to a shared queue file. lease is in seconds;
+    claim() takes up to batch files at a time. Close it when done, or use
+    it as a context manager.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        lease: float = DEFAULT_LEASE,
+        batch: int = DEFAULT_BATCH,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+        node: Optional[str] = None,
+    ) -> None:
+        self.path = Path(path)
+        if self.path.parent != Path(""):
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.lease = lease
+        self.batch = batch
+        self.max_attempts = max_attempts
+        self.node = node or default_node()
+        self.lost = 0  # results dropped because their lease had been taken back
+        self._db = self._connect()
+        self._db.executescript(_SCHEMA)
+        self._held: Dict[int, Set[str]] = {}  # lease id -> files of it not yet completed
+        self._lease_of: Dict[str, int] = {}
+        self._rows: List[Tuple[ScanResult, int]] = []  # completed, not yet written, with their lease
+        self._flushed = time.monotonic()
+        self._lock = threading.Lock()  # _held between claim() and the renewing thread
+        self._stop = threading.Event()
+        self._renewer: Optional[threading.Thread] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        db = sqlite3.connect(str(self.path), timeout=60, isolation_level=None)
+        db.execute("PRAGMA journal_mode=DELETE")
+        return db
+
+    def close(self) -> None:
+        """Write pending results and hand back files claimed but not finished."""
+        self._stop.set()
+        if self._renewer is not None:
+            self._renewer.join()
+            self._renewer = None
+        self.flush()
+        with self._lock:
+            held = [(i,) for i in self._held]
+            self._held.clear()
+        if held:
+            with self._transaction():
+                self._db.executemany(
+                    "UPDATE files SET state = 'todo', lease = NULL, attempts = attempts - 1 WHERE lease = ?", held,
+                )
+                self._db.executemany("DELETE FROM leases WHERE id = ?", held)
+        self._lease_of.clear()
+        self._db.close()
+
+    @contextmanager
+    def _transaction(self) -> Iterator[None]:
+        # IMMEDIATE takes the write lock up front, so two nodes never both
+        # read the same todo rows and then collide on the update.
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            raise
+        self._db.execute("COMMIT")
+
+    def __enter__(self) -> "WorkQueue":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def check_version(self, version: str) -> None:
+        """Record version in a new queue, or raise ValueError if the queue was made for another."""
+        with self._transaction():
+            self._db.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('version', ?)", (version,))
+            (found,) = self._db.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        if found != version:
+            raise ValueError(
+                f"{self.path} was created for analysis version {found}; this node would produce {version} "
+                "(check --signatures, --depth and --hash, or start a new queue)"
+            )
+
+    def add(self, targets: Sequence[str]) -> int:
+        """List the installers under targets into the queue; returns how many were new."""
+        added = 0
+        paths: List[tuple] = []
+
+        def insert() -> int:
+            with self._transaction():
+                before = self._db.total_changes
+                self._db.executemany("INSERT OR IGNORE INTO files (path) VALUES (?)", paths)
+                n = self._db.total_changes - before
+            paths.clear()
+            return n
+
+        for p in find_installers(targets):
+            paths.append((p if is_url(p) else os.path.abspath(p),))
+            if len(paths) >= _ADD_BATCH:
+                added += insert()
+        added += insert()
+        self._db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('listed', '1')")
+        return added
+
+    def status(self) -> QueueStatus:
+        st = QueueStatus()
+        for state, n in self._db.execute("SELECT state, COUNT(*) FROM files GROUP BY state"):
+            setattr(st, state, n)
+        st.listed = self._db.execute("SELECT 1 FROM meta WHERE key = 'listed'").fetchone() is not None
+        st.next_expiry = self._db.execute("SELECT MIN(expires) FROM leases").fetchone()[0]
+        return st
+
+    def claim(self) -> List[str]:
+        """
+        Lease up to batch todo files to this node, first taking back the
+        files of expired leases. Returns [] when there is nothing to do now.
+        """
+        now = time.time()
+        with self._transaction():
+            expired = [i for i, in self._db.execute("SELECT id FROM leases WHERE expires < ?", (now,))]
+            for lease_id in expired:
+                self._db.execute(
+                    "UPDATE files SET state = 'failed', lease = NULL,"
+                    " error = 'Abandoned: its lease expired ' || attempts || ' times'"
+                    " WHERE lease = ? AND attempts >= ?",
+                    (lease_id, self.max_attempts),
+                )
+                self._db.execute("UPDATE files SET state = 'todo', lease = NULL WHERE lease = ?", (lease_id,))
+                self._db.execute("DELETE FROM leases WHERE id = ?", (lease_id,))
+            paths = [p for p, in self._db.execute(
+                "SELECT path FROM files WHERE state = 'todo' ORDER BY path LIMIT ?", (self.batch,),
+            )]
+            if paths:
+                lease_id = self._db.execute(
+                    "INSERT INTO leases (node, expires) VALUES (?, ?)", (self.node, now + self.lease),
+                ).lastrowid
+                self._db.executemany(
+                    "UPDATE files SET state = 'leased', lease = ?, attempts = attempts + 1 WHERE path = ?",
+                    [(lease_id, p) for p in paths],
+                )
+        if paths:
+            with self._lock:
+                self._held[lease_id] = set(paths)
+            self._lease_of.update((p, lease_id) for p in paths)
+            self._start_renewing()
+        return paths
+
+    def complete(self, result: ScanResult) -> List[ScanResult]:
+        """
+        Record the result of a claimed file. Results are written in batches:
+        returns those written by the flush this one triggered, if any.
+        """
+        lease_id = self._lease_of.pop(result.path, None)
+        if lease_id is None:
+            return []
+        self._rows.append((result, lease_id))
+        if len(self._rows) >= _FLUSH_ROWS or time.monotonic() - self._flushed >= _FLUSH_SECONDS:
+            return self.flush()
+        return []
+
+    def flush(self) -> List[ScanResult]:
+        """
+        Write completed results, and release leases with no files left.
+        Returns the results written; those whose lease had been taken back
+        are dropped (and counted in lost).
+        """
+        self._flushed = time.monotonic()
+        if not self._rows:
+            return []
+        written = []
+        finished = []
+        with self._transaction():
+            for result, lease_id in self._rows:
+                path = result.path
+                cur = self._db.execute(
+                    "UPDATE files SET state = ?, node = ?, plan = ?, error = ?, lease = NULL"
+                    " WHERE path = ? AND lease = ?",
+                    ("done" if result.ok else "failed", self.node, result.plan_json, result.error, path, lease_id),
+                )
+                if cur.rowcount:
+                    written.append(result)
+                else:
+                    self.lost += 1
+                with self._lock:
+                    left = self._held.get(lease_id)
+                    if left is not None:
+                        left.discard(path)
+                        if not left:
+                            del self._held[lease_id]
+                            finished.append((lease_id,))
+            self._db.executemany("DELETE FROM leases WHERE id = ?", finished)
+        self._rows.clear()
+        return written
+
+    def results(self) -> Iterator[str]:
+        """Every finished file as an NDJSON line (the plan, or an error object), by path."""
+        for path, plan, error in self._db.execute(
+            "SELECT path, plan, error FROM files WHERE state IN ('done', 'failed') ORDER BY path"
+        ):
+            yield plan if plan is not None else json.dumps({"input_path": path, "error": error})
+
+    def _start_renewing(self) -> None:
+        if self._renewer is None:
+            self._renewer = threading.Thread(target=self._renew, name="lease-renewal", daemon=True)
+            self._renewer.start()
+
+    def _renew(self) -> None:
+        db = self._connect()
+        try:
+            while not self._stop.wait(self.lease / 3):
+                with self._lock:
+                    held = list(self._held)
+                if not held:
+                    continue
+                try:
+                    db.executemany(
+                        "UPDATE leases SET expires = ? WHERE id = ?", [(time.time() + self.lease, i) for i in held],
+                    )
+                except sqlite3.Error:
+                    continue  # share briefly unavailable; retried next round
+        finally:
+            db.close()
+
+
+def scan_queue(
+    queue: WorkQueue,
+    targets: Sequence[str] = (),
+    jobs: Optional[int] = None,
+    timeout: Optional[float] = None,
+    max_memory: int = DEFAULT_MAX_MEMORY,
+    signature_paths: Sequence[str] = (),
+    cache_dir: Optional[str] = None,
+    timings: bool = False,
+    depth: str = DEFAULT_DEPTH,
+    hashes: Sequence[str] = (),
+    poll: float = 5.0,
+) -> Iterator[ScanResult]:
+    """
+    Work on queue until every file in it is finished, yielding this node's
+    results as scan.scan does, once they are written to the queue (a batch
+    at a time). A result whose lease another node took back is not yielded:
+    that node reports the file. targets, if any, are listed into the queue
+    first. Between rounds of claiming, the node waits up to poll seconds (or
+    half the lease) for other nodes still listing or holding leases.
+    """
+    queue.check_version(analysis_version(signature_paths, depth, hashes))
+    if targets:
+        queue.add(targets)
+
+    def claimed() -> Iterable[str]:
+        while True:
+            paths = queue.claim()
+            if not paths:
+                return
+            yield from paths
+
+    try:
+        while True:
+            for r in scan(
+                claimed(), jobs=jobs, timeout=timeout, max_memory=max_memory, signature_paths=signature_paths,
+                cache_dir=cache_dir, timings=timings, depth=depth, hashes=hashes,
+            ):
+                yield from queue.complete(r)
+            yield from queue.flush()
+            st = queue.status()
+            if st.finished:
+                return
+            wait = min(poll, queue.lease / 2)
+            if st.next_expiry is not None:
+                wait = min(wait, max(0.1, st.next_expiry - time.time()))
+            time.sleep(wait)
+    finally:
+        queue.flush()
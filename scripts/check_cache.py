@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+"""
+Verify that a cached plan served for another file with the same content is
+rebound to that file's path: its input_path, FileName, children and the
+commands that run it, and nothing else, even when the cached path is short
+and relative and occurs inside unrelated text. `cache prune` keeps results
+cached with an extra signature database when given that database.
+Run from project root: uv run python scripts/check_cache.py
+"""
+from __future__ import annotations
+
+import io
+import os
+import json
+import shutil
+import subprocess
+import sys
+import tempfile
+import zipfile
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+sys.path.insert(0, ROOT)
+
+from benchmarks.corpus import CaseSpec, write_exe  # noqa: E402
+from benchmarks.msi_writer import build_msi  # noqa: E402
+
+
+def main() -> int:
+    from installer_intel.analyzers.signatures import SIGNATURES_ENV
+    from installer_intel.cache import CACHE_ENV, ResultCache, rebind_paths
+    from installer_intel.records import CommandCandidate, Evidence, Plan, dumps
+    from installer_intel.scan import analyze_path
+
+    # 1. Only the fields built from the path change
+    plan = Plan(
+        input_path="0.exe",
+        file_type="exe",
+        installer_type="Inno Setup",
+        confidence=0.9,
+        evidence=[Evidence(kind="string", detail="0.exe")],
+        metadata={"FileName": "0.exe", "OriginalFilename": "setup0.exe"},
+        install_candidates=[CommandCandidate(command='"0.exe" /VERYSILENT', confidence=0.9)],
+        uninstall_candidates=[CommandCandidate(command="unins000.exe /VERYSILENT", confidence=0.5)],
+        notes=["Hit: 0.exe"],
+        children=[Plan(
+            input_path="0.exe!0x400/app.msi",
+            file_type="msi",
+            installer_type="MSI",
+            confidence=0.95,
+            install_candidates=[CommandCandidate(command='msiexec /i "0.exe!0x400/app.msi" /qn', confidence=0.9)],
+        )],
+    )
+    rebind_paths(plan, "0.exe", "new.exe")
+    assert plan.input_path == "new.exe" and plan.metadata == {"FileName": "new.exe", "OriginalFilename": "setup0.exe"}
+    assert [c.command for c in plan.install_candidates + plan.uninstall_candidates] == [
+        '"new.exe" /VERYSILENT', "unins000.exe /VERYSILENT",
+    ]
+    assert plan.evidence[0].detail == "0.exe" and plan.notes == ["Hit: 0.exe"]
+    child = plan.children[0]
+    assert child.input_path == "new.exe!0x400/app.msi", child.input_path
+    assert child.install_candidates[0].command == 'msiexec /i "new.exe!0x400/app.msi" /qn'
+    print("1. Rebinding changes input_path, FileName, children and commands; notes and evidence stay.")
+
+    # 2. Cache hits for copies of short relative paths
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        try:
+            write_exe("0.exe", CaseSpec("inno", "exe", size=256 * 1024, family="inno", seed=1))
+            buf = io.BytesIO()
+            with zipfile.ZipFile(buf, "w") as zf:
+                zf.writestr("app.msi", build_msi({"ProductCode": "{11111111-2222-3333-4444-555555555555}"}))
+            with open("0.zip", "wb") as f:
+                f.write(buf.getvalue())
+            with ResultCache(os.path.join(tmp, "cache")) as cache:
+                for name, copy in (("0.exe", "setup.exe"), ("0.zip", "apps.zip")):
+                    first = analyze_path(name)
+                    cache.put(name, "v", first)
+                    shutil.copyfile(name, copy)
+                    again = cache.get(copy, "v")
+                    direct = analyze_path(copy)
+                    assert again is not None and dumps(again) == dumps(direct), (dumps(again), dumps(direct))
+                    assert dumps(first) != dumps(direct)
+                    if name == "0.exe":
+                        assert again.uninstall_candidates[0].command.startswith("unins000.exe "), again
+        finally:
+            os.chdir(cwd)
+    print("2. Cached plans served for copies of 0.exe and 0.zip equal a fresh analysis of the copy.")
+
+    # 3. Pruning keeps results for the signature databases it is given
+    with tempfile.TemporaryDirectory() as tmp:
+        exe = os.path.join(tmp, "setup.exe")
+        write_exe(exe, CaseSpec("inno", "exe", size=256 * 1024, family="inno", seed=1))
+        extra = os.path.join(tmp, "acme.json")
+        with open(extra, "w", encoding="utf-8") as f:
+            json.dump({"signatures": [{"name": "Acme", "confidence": 0.5, "any": ["acme"]}]}, f)
+        env = {**os.environ, CACHE_ENV: os.path.join(tmp, "cache")}
+        env.pop(SIGNATURES_ENV, None)
+
+        def cli(*args: str) -> str:
+            res = subprocess.run(
+                [sys.executable, "-m", "installer_intel", *args], cwd=ROOT, env=env, capture_output=True, text=True,
+            )
+            assert res.returncode == 0, res.stderr
+            return res.stdout
+
+        def entries() -> int:
+            with ResultCache(os.path.join(tmp, "cache")) as cache:
+                return cache.stats().entries
+
+        cli("analyze", exe, "--format", "json")
+        cli("analyze", exe, "--format", "json", "--signatures", extra)
+        assert entries() == 2
+        assert cli("cache", "prune", "--signatures", extra).startswith("Removed 0 result(s)")
+        assert entries() == 2
+        assert cli("cache", "prune").startswith("Removed 1 result(s)")
+        assert entries() == 1
+    print("3. cache prune --signatures keeps results cached with that database; without it they are stale.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,163 @@
+#!/usr/bin/env python
+"""
+Verify the plan catalog: filters and group-bys over tens of thousands of
+plans answer in milliseconds and agree with filtering the plans in Python,
+exports stream the stored plans, and the index keeps the catalog in sync.
+Run from project root: uv run python scripts/check_catalog.py
+"""
+from __future__ import annotations
+
+import csv
+import io
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from benchmarks.msi_writer import build_msi  # noqa: E402
+from benchmarks.pe_writer import TEXT_FLAGS, build_pe  # noqa: E402
+
+PLANS = 20_000
+TYPES = ["NSIS", "Inno Setup", "MSI", "WiX Burn / Bootstrapper", "InstallShield", "Unknown"]
+VENDORS = [f"Vendor {i}" for i in range(200)]
+
+
+def synthetic_plans(n: int) -> list:
+    from installer_intel.models import CommandCandidate, DetectionRule, InstallPlan
+
+    rng = random.Random(7)
+    upgrade_codes = ["{%08X-AAAA-BBBB-CCCC-DDDDDDDDDDDD}" % i for i in range(n // 10)]
+    plans = []
+    for i in range(n):
+        kind = rng.choice(TYPES)
+        is_msi = kind == "MSI"
+        path = f"/srv/pkgs/{i % 97}/setup{i}.{'msi' if is_msi else 'exe'}"
+        meta = {"SHA256": "%064x" % rng.getrandbits(256), "ProductVersion": f"1.{i % 13}.0"}
+        meta["Manufacturer" if is_msi else "CompanyName"] = rng.choice(VENDORS)
+        if is_msi:
+            meta["ProductCode"] = "{%08X-1111-2222-3333-444444444444}" % i
+            meta["UpgradeCode"] = rng.choice(upgrade_codes)
+        plans.append(InstallPlan(
+            input_path=path,
+            file_type="msi" if is_msi else "exe",
+            installer_type=kind,
+            confidence=round(rng.random(), 2),
+            metadata=meta,
+            install_candidates=[CommandCandidate(command=f'"{path}" /S', confidence=0.8)],
+            detection_rules=[DetectionRule(kind="file_hash", value=f"sha256:{meta['SHA256']}", confidence=0.4)],
+        ))
+    return plans
+
+
+def timed(fn):
+    t0 = time.perf_counter()
+    out = fn()
+    return out, (time.perf_counter() - t0) * 1000
+
+
+def main() -> int:
+    from installer_intel.catalog import Catalog, Filters
+    from installer_intel.index import RepoIndex
+
+    plans = synthetic_plans(PLANS)
+    by_path = {p.input_path: p for p in plans}
+    with tempfile.TemporaryDirectory() as tmp:
+        db = os.path.join(tmp, "catalog.sqlite")
+        ndjson = os.path.join(tmp, "scan.ndjson")
+        with open(ndjson, "w", encoding="utf-8") as f:
+            for p in plans:
+                f.write(p.model_dump_json() + "\n")
+            f.write(json.dumps({"input_path": "/srv/pkgs/bad.exe", "error": "boom", "timed_out": False}) + "\n")
+
+        # 1. Import scan output; error lines are skipped
+        proc = subprocess.run(
+            [sys.executable, "-m", "installer_intel", "index", "import", ndjson, "--index", db],
+            capture_output=True, text=True,
+        )
+        assert proc.returncode == 0, proc.stderr
+        assert f"Imported {PLANS} plan(s)" in proc.stderr, proc.stderr
+        print(f"1. {proc.stderr.strip()}")
+
+        # 2. Filters agree with Python over the plans, in milliseconds
+        with Catalog(db) as catalog:
+            vendor = "Vendor 17"
+            filters = Filters(installer_type="nsis", manufacturer=vendor, max_confidence=0.5)
+            found, ms = timed(lambda: [json.loads(p)["input_path"] for p in catalog.plans(filters)])
+            expected = sorted(
+                p.input_path for p in plans
+                if p.installer_type == "NSIS" and p.metadata.get("CompanyName", "").lower().find(vendor.lower()) >= 0
+                and p.confidence <= 0.5
+            )
+            assert found == expected and found, (len(found), len(expected))
+            print(f"2. NSIS from {vendor!r} with confidence <= 0.5: {len(found)} plans in {ms:.1f} ms.")
+            slowest = ms
+
+            code = next(p for p in plans if p.file_type == "msi").metadata["UpgradeCode"]
+            found, ms = timed(lambda: list(catalog.records(Filters(upgrade_code=code.lower().strip("{}")))))
+            assert sorted(r[0] for r in found) == sorted(
+                p.input_path for p in plans if p.metadata.get("UpgradeCode") == code
+            )
+            assert all(r[-2] == f'"{r[0]}" /S' for r in found)
+            slowest = max(slowest, ms)
+            print(f"   UpgradeCode {code}: {len(found)} MSIs in {ms:.1f} ms.")
+
+            target = plans[1234]
+            (hit,), ms = timed(lambda: list(catalog.plans(Filters(hash=target.metadata["SHA256"].upper()))))
+            assert hit == target.model_dump_json()
+            slowest = max(slowest, ms)
+            print(f"   By SHA-256: {ms:.1f} ms, stored plan returned byte for byte.")
+
+            groups, ms = timed(lambda: catalog.group(Filters(), ["installer_type"]))
+            counts = {t: sum(p.installer_type == t for p in plans) for t in TYPES}
+            assert {t: n for t, n in groups} == counts and groups[0][1] == max(counts.values())
+            slowest = max(slowest, ms)
+            print(f"   Group by installer_type over {PLANS} plans: {ms:.1f} ms.")
+            assert slowest < 250, slowest
+
+        # 3. CLI exports
+        base = [sys.executable, "-m", "installer_intel", "query", "--index", db]
+        out = subprocess.run(base + ["-t", "MSI", "-m", "vendor 3", "--format", "csv"], capture_output=True, text=True)
+        assert out.returncode == 0, out.stderr
+        rows = list(csv.DictReader(io.StringIO(out.stdout)))
+        assert rows and all(r["installer_type"] == "MSI" and "vendor 3" in r["manufacturer"].lower() for r in rows)
+        assert all(r["product_code"] == by_path[r["path"]].metadata["ProductCode"] for r in rows)
+        out = subprocess.run(base + ["-g", "installer_type,file_type", "--format", "ndjson"],
+                             capture_output=True, text=True)
+        groups = [json.loads(line) for line in out.stdout.splitlines()]
+        assert sum(g["count"] for g in groups) == PLANS and {"installer_type", "file_type", "count"} == set(groups[0])
+        out = subprocess.run(base + ["--path", "/srv/pkgs/5/*", "--format", "ndjson", "--limit", "3"],
+                             capture_output=True, text=True)
+        assert [json.loads(line)["input_path"] for line in out.stdout.splitlines()] == \
+            sorted(p for p in by_path if p.startswith("/srv/pkgs/5/"))[:3]
+        print(f"3. query --format csv: {len(rows)} rows; --group-by ndjson: {len(groups)} groups; --limit holds.")
+
+        # 4. The index keeps the catalog in sync, embedded packages included
+        share = os.path.join(tmp, "share")
+        os.makedirs(share)
+        msi = build_msi({"ProductCode": "{CCCCCCCC-1111-2222-3333-444444444444}", "ProductName": "Gamma",
+                         "Manufacturer": "Acme", "UpgradeCode": "{DDDDDDDD-1111-2222-3333-444444444444}"})
+        bundle = build_pe([(".text", random.Random(1).randbytes(60_000) + b"\0.wixburn\0", TEXT_FLAGS)], {}, msi)
+        for name, data in (("gamma.msi", msi), ("bundle.exe", bundle)):
+            with open(os.path.join(share, name), "wb") as f:
+                f.write(data)
+        with RepoIndex(os.path.join(tmp, "index.sqlite")) as index:
+            index.update([share], jobs=1)
+            hits = [json.loads(p)["input_path"] for p in
+                    index.catalog.plans(Filters(upgrade_code="DDDDDDDD-1111-2222-3333-444444444444"))]
+            bundle_path = os.path.join(share, "bundle.exe")
+            assert hits == [f"{bundle_path}!0x{len(bundle) - len(msi):X}", os.path.join(share, "gamma.msi")], hits
+            assert index.catalog.count(Filters(manufacturer="acme", nested=False)) == 1
+            os.remove(bundle_path)
+            index.update([share], jobs=1)
+            assert index.catalog.count(Filters()) == 1 and len(index.catalog) == 1
+        print("4. index update catalogs embedded MSIs and drops deleted files' plans with their children.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,199 @@
+#!/usr/bin/env python
+"""
+Verify Inno Setup and NSIS header decoding: the header is found with a few
+seeks, the version, compression, offsets and app settings come out of it,
+the uninstall registry key becomes a registry_key detection rule and the
+uninstaller an uninstall command, and the type is settled without a string
+scan. Damaged headers fall back to signatures or keep the engine with a note.
+Run from project root: uv run python scripts/check_engines.py
+"""
+from __future__ import annotations
+
+import json
+import os
+import random
+import struct
+import sys
+import tempfile
+import time
+import zlib
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from benchmarks.engine_writer import (  # noqa: E402
+    HKCU,
+    HKLM,
+    SHCTX,
+    UNINSTALL_KEY,
+    build_inno,
+    build_nsis,
+    nsis_header,
+)
+
+GUID = "8A1C2C55-1111-2222-3333-444444444444"
+MB = 1024 ** 2
+APP = {
+    "AppName": "Example App",
+    "AppVerName": "Example App 2.1",
+    "AppId": "{{" + GUID + "}",
+    "AppVersion": "2.1.0",
+    "AppPublisher": "Contoso",
+    "DefaultDirName": "{autopf}\\Example",
+    "UninstallFilesDir": "{app}",
+    "LicenseText": "Do what you like. " * 200,
+}
+
+
+def registry_rules(plan):
+    return [r.value for r in plan.detection_rules if r.kind == "registry_key"]
+
+
+def main() -> int:
+    from installer_intel.analyzers import analyze_exe
+    from installer_intel.timings import record_timings
+
+    with tempfile.TemporaryDirectory() as tmp:
+        def write(name: str, data: bytes) -> str:
+            path = os.path.join(tmp, name)
+            with open(path, "wb") as f:
+                f.write(data)
+            return path
+
+        # 1. Inno Setup 6 (Unicode): loader table in RCDATA 11111, LZMA or stored header block
+        for compression in ("lzma", "stored"):
+            plan = analyze_exe(write("inno6.exe", build_inno(APP, compression=compression)))
+            info = plan.metadata["SetupHeader"]
+            assert (plan.installer_type, plan.confidence, plan.coverage.tier) == ("Inno Setup", 0.99, "header")
+            assert plan.coverage.bytes_scanned == 0
+            assert info["Version"] == "6.2.0" and info["Unicode"] and info["Compression"] == compression, info
+            assert info["DataOffset"] > info["HeaderOffset"] > 0
+            assert (info["AppId"], info["AppVersion"], info["AppPublisher"]) == (APP["AppId"], "2.1.0", "Contoso")
+            assert registry_rules(plan) == [f"HKLM\\{UNINSTALL_KEY}{{{GUID}}}_is1"], registry_rules(plan)
+            assert [c.command for c in plan.uninstall_candidates] == [
+                '"{app}\\unins000.exe" /VERYSILENT /SUPPRESSMSGBOXES /NORESTART'
+            ]
+            assert plan.install_candidates[0].confidence == 0.95
+        print(f"1. Inno Setup 6.2.0: LZMA and stored header blocks decoded; "
+              f"rule {registry_rules(plan)[0]}")
+
+        # 2. Inno Setup 5.1 (ANSI): 4.1.6 loader table found through the magic at 0x30
+        plan = analyze_exe(write("inno5.exe", build_inno(APP, "5.1.2", unicode=False, old_loader=True)))
+        info = plan.metadata["SetupHeader"]
+        assert info["Version"] == "5.1.2" and info["LoaderVersion"] == "4.1.6+" and not info["Unicode"], info
+        assert info["AppName"] == "Example App" and "LicenseText" not in info
+        assert registry_rules(plan) == [f"HKLM\\{UNINSTALL_KEY}{{{GUID}}}_is1"]
+        print("2. Inno Setup 5.1.2: old loader table and ANSI header (license text skipped) decoded.")
+
+        # 3. Settings that change the plan
+        plan = analyze_exe(write("const.exe", build_inno({**APP, "AppId": "{code:GetAppId}"})))
+        assert not registry_rules(plan) and any("constants" in n for n in plan.notes), plan.notes
+        plan = analyze_exe(write("noun.exe", build_inno({**APP, "Uninstallable": "no"})))
+        assert not plan.uninstall_candidates and any("Uninstallable=no" in n for n in plan.notes)
+        plan = analyze_exe(write("byname.exe", build_inno({**APP, "AppId": ""}, external_data=True)))
+        assert registry_rules(plan) == [f"HKLM\\{UNINSTALL_KEY}Example App_is1"]
+        assert plan.metadata["SetupHeader"]["DataOffset"] is None and any(".bin" in n for n in plan.notes)
+        print("3. AppId with constants, Uninstallable=no, AppId defaulting to AppName, external setup-N.bin: ok.")
+
+        # 4. NSIS: every compression, solid or not, Unicode or ANSI
+        key = UNINSTALL_KEY + "Example"
+        writes = [
+            (HKLM, key, "DisplayName", "Example App"),
+            (HKLM, key, "DisplayVersion", "3.4.5"),
+            (HKLM, key, "UninstallString", '"$INSTDIR\\uninstall.exe"'),
+            (HKCU, "Software\\Example", "Path", "$INSTDIR"),
+        ]
+        for unicode in (True, False):
+            header = nsis_header(writes, unicode)
+            for compression, solid, flag in (
+                ("lzma", True, False), ("lzma", False, False), ("lzma", True, True),
+                ("zlib", True, False), ("zlib", False, False), ("stored", False, False),
+            ):
+                plan = analyze_exe(write("nsis.exe", build_nsis(header, compression, solid, filter_flag=flag)))
+                info = plan.metadata["SetupHeader"]
+                case = (unicode, compression, solid, flag)
+                assert (plan.installer_type, plan.coverage.tier) == ("NSIS", "header"), case
+                assert (info["Compression"], info["Solid"], info["Unicode"]) == (compression, solid, unicode), info
+                assert info["Version"] == "3.08" and info["DisplayVersion"] == "3.4.5", info
+                assert registry_rules(plan) == [f"HKLM\\{key}"], (case, plan.notes)
+                assert [c.command for c in plan.uninstall_candidates] == ['"$INSTDIR\\uninstall.exe" /S'], case
+        print("4. NSIS: LZMA (solid, blocks, filter flag), zlib (solid, blocks) and stored headers decoded, "
+              "Unicode and ANSI.")
+
+        # 5. NSIS variations
+        quiet = [(SHCTX, key, "QuietUninstallString", '"$INSTDIR\\uninst.exe" /S')]
+        plan = analyze_exe(write("shctx.exe", build_nsis(nsis_header(quiet), pad=1024, flags=2, version=None)))
+        assert plan.metadata["SetupHeader"]["HeaderOffset"] % 512 == 0 and plan.metadata["SetupHeader"]["Silent"]
+        assert plan.metadata["SetupHeader"]["Version"] is None
+        assert registry_rules(plan) == [f"HKLM\\{key}"] and plan.detection_rules[0].confidence == 0.75
+        assert [c.command for c in plan.uninstall_candidates] == ['"$INSTDIR\\uninst.exe" /S']
+        dynamic = [(HKLM, key + "$INSTDIR", "UninstallString", "$INSTDIR\\u.exe")]
+        plan = analyze_exe(write("dynamic.exe", build_nsis(nsis_header(dynamic))))
+        assert not registry_rules(plan) and any("variables" in n for n in plan.notes)
+        plan = analyze_exe(write("bzip2.exe", build_nsis(nsis_header(writes), "bzip2")))
+        assert plan.installer_type == "NSIS" and plan.metadata["SetupHeader"]["Compression"] == "bzip2"
+        assert any("bzip2" in n for n in plan.notes)
+        # Characters outside the BMP are surrogate pairs in the string table
+        wide = UNINSTALL_KEY + "Ex\U0001F680mple"
+        emoji = [
+            (HKLM, wide, "DisplayName", "Rocket \U0001F680 \U00020000 App"),
+            (HKLM, wide, "UninstallString", '"$INSTDIR\\\U0001F680.exe"'),
+        ]
+        plan = analyze_exe(write("emoji.exe", build_nsis(nsis_header(emoji))))
+        assert registry_rules(plan) == [f"HKLM\\{wide}"], registry_rules(plan)
+        assert [c.command for c in plan.uninstall_candidates] == ['"$INSTDIR\\\U0001F680.exe" /S']
+        name = "Rocket \U0001F680 \U00020000 App"
+        assert plan.metadata["SetupHeader"]["DisplayName"] == name
+        assert json.loads(plan.model_dump_json())["metadata"]["SetupHeader"]["DisplayName"] == name
+        print("5. NSIS: SHCTX and QuietUninstallString, header past the overlay start, silent flag, "
+              "keys with variables, bzip2 recognized, non-BMP characters decoded and serialized: ok.")
+
+        # 6. Damage and depth
+        data = bytearray(build_inno(APP))
+        at = data.index(b"Inno Setup Setup Data") + 64 + 9 + 4  # first chunk's data
+        data[at + 10] ^= 0xFF
+        plan = analyze_exe(write("crc.exe", bytes(data)))
+        assert plan.installer_type == "Inno Setup" and any("CRC" in n for n in plan.notes), plan.notes
+        data = bytearray(build_nsis(nsis_header(writes)))
+        data[data.index(b"NullsoftInst")] ^= 0xFF
+        plan = analyze_exe(write("broken.exe", bytes(data)))
+        assert plan.coverage.tier != "header" and "SetupHeader" not in plan.metadata
+        # LZMA properties liblzma refuses (lc + lp > 4); the Inno Setup chunk CRC is made to match
+        bad_props = (3 + 3 * 9 + 2 * 45, 8 + 4 * 9 + 4 * 45)
+        data = bytearray(build_inno(APP))
+        at = data.index(b"Inno Setup Setup Data") + 64 + 9 + 4
+        size = min(4096, struct.unpack_from("<I", data, at - 9)[0] - 4)
+        for d in bad_props:
+            data[at] = d
+            struct.pack_into("<I", data, at - 4, zlib.crc32(data[at:at + size]))
+            plan = analyze_exe(write("props.exe", bytes(data)))
+            assert plan.installer_type == "Inno Setup" and any("LZMA properties" in n for n in plan.notes), plan.notes
+        # A 4 GB dictionary is not allocated: the header still decodes
+        data = bytearray(build_nsis(nsis_header(writes)))
+        at = data.index(b"\x5d\0\0\1\0", data.index(b"NullsoftInst"))
+        data[at + 3:at + 5] = b"\xff" * 2
+        plan = analyze_exe(write("dict.exe", bytes(data)))
+        assert plan.metadata["SetupHeader"]["DisplayVersion"] == "3.4.5", plan.notes
+        plan = analyze_exe(write("inno6.exe", build_inno(APP)), depth="deep")
+        assert plan.installer_type == "Inno Setup" and plan.coverage.tier != "header" and plan.coverage.bytes_scanned
+        print("6. Bad chunk CRC or LZMA properties keep the engine with a note; a bad NSIS magic falls back to "
+              "signatures; deep still scans.")
+
+        # 7. Cost on a large installer: a few KB read, no scan
+        payload = random.Random(1).randbytes(64 * MB)
+        path = write("big.exe", build_nsis(nsis_header(writes), payload=payload))
+        with record_timings() as rec:
+            t0 = time.perf_counter()
+            plan = analyze_exe(path)
+            seconds = time.perf_counter() - t0
+        read = sum(s.bytes_read for s in rec.diagnostics().stages if s.stage == "header")
+        assert plan.coverage.tier == "header" and read < 64 * 1024, read
+        t0 = time.perf_counter()
+        analyze_exe(path, depth="deep")
+        deep = time.perf_counter() - t0
+        print(f"7. 64 MB NSIS: decided from {read / 1024:.1f} KB of header reads in {seconds * 1000:.0f} ms "
+              f"(a deep scan takes {deep * 1000:.0f} ms).")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+"""
+Verify that file digests are computed from the analysis reads: correct at
+every depth and read mode, recorded in the plan, and costing one read of
+the file instead of two (with and without the result cache).
+Run from project root: uv run python scripts/check_hashing.py
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import random
+import shutil
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from benchmarks.msi_writer import build_msi  # noqa: E402
+from benchmarks.pe_writer import RT_RCDATA, RT_VERSION, TEXT_FLAGS, build_pe, version_info  # noqa: E402
+
+
+def noise(n: int, seed: int) -> bytes:
+    return random.Random(seed).randbytes(n)
+
+
+def expected(path: str):
+    with open(path, "rb") as f:
+        data = f.read()
+    return {a: hashlib.new(a, data).hexdigest() for a in ("sha256", "sha1", "md5")}
+
+
+def bytes_read(plan) -> int:
+    return sum(s.bytes_read for s in plan.diagnostics.stages)
+
+
+def main() -> int:
+    from installer_intel.analyzers.exe import exe_cache_version
+    from installer_intel.analyzers.hashing import StreamHasher, check_algorithms
+    from installer_intel.analyzers.signatures import get_signatures
+    from installer_intel.analyzers.stream import iter_file_strings
+    from installer_intel.cache import ResultCache, file_sha256
+    from installer_intel.scan import analyze_path
+
+    assert check_algorithms(["MD5", "sha256", "md5"]) == ("sha256", "md5")
+    try:
+        check_algorithms(["crc32"])
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("accepted an unknown algorithm")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        stub = [(".text", noise(300_000, 1) + b"\0Nullsoft Install System v3.08\0", TEXT_FLAGS)]
+        samples = {
+            "nsis.exe": build_pe(stub, {(RT_VERSION, 1, 1033): version_info({"ProductName": "X"})},
+                                 noise(24 * 1024 ** 2, 2)),
+            "unknown.exe": build_pe([(".text", noise(50_000, 3), TEXT_FLAGS)],
+                                    {(RT_RCDATA, 5, 0): noise(3 * 1024 ** 2, 4)}, noise(20 * 1024 ** 2, 5)),
+            "flat.exe": noise(5 * 1024 ** 2 + 17, 6),
+        }
+        for name, data in samples.items():
+            with open(os.path.join(tmp, name), "wb") as f:
+                f.write(data)
+
+        # 1. Digests match hashlib at every depth and in both read modes
+        for name in samples:
+            path = os.path.join(tmp, name)
+            want = expected(path)
+            for depth in ("triage", "standard", "deep"):
+                plan = analyze_path(path, depth=depth, hashes=["sha256", "sha1", "md5"])
+                got = {a: plan.metadata[a.upper()] for a in want}
+                assert got == want, (name, depth)
+                rule = [r for r in plan.detection_rules if r.kind == "file_hash"]
+                assert len(rule) == 1 and rule[0].value == f"sha256:{want['sha256']}", rule
+            for use_mmap in (True, False):
+                hasher = StreamHasher(path, os.path.getsize(path), ["md5"], max_memory=4 * 1024 ** 2)
+                with open(path, "rb") as f:
+                    for _ in iter_file_strings(f, 4 * 1024 ** 2, use_mmap=use_mmap, start=1000, hasher=hasher):
+                        pass
+                assert hasher.hexdigests() == {"md5": want["md5"]}, (name, use_mmap)
+        plan = analyze_path(os.path.join(tmp, "nsis.exe"))
+        assert "SHA256" not in plan.metadata and not any(r.kind == "file_hash" for r in plan.detection_rules)
+        print("1. Digests match hashlib at every depth, mapped and chunked; off unless asked for.")
+
+        # 2. One read instead of two
+        for name in ("nsis.exe", "unknown.exe"):
+            path = os.path.join(tmp, name)
+            size = os.path.getsize(path)
+            alone = bytes_read(analyze_path(path, timings=True))
+            single = bytes_read(analyze_path(path, timings=True, hashes=["sha256"]))
+            assert single <= size + 1024 ** 2, (name, single, size)
+            print(f"2. {name}: hashing separately reads {(size + alone) / size:.2f}x the file, "
+                  f"in the analysis pass {single / size:.2f}x.")
+
+        # 3. The cache is keyed by the in-pass SHA-256; new files are read once
+        cache = ResultCache(os.path.join(tmp, "cache"))
+        try:
+            path = os.path.join(tmp, "unknown.exe")
+            size = os.path.getsize(path)
+            plan = analyze_path(path, cache=cache, timings=True)
+            assert not plan.diagnostics.cached and bytes_read(plan) <= size + 1024 ** 2, bytes_read(plan)
+            assert cache.content_hash(path) == file_sha256(path)
+            again = analyze_path(path, cache=cache, timings=True)
+            assert again.diagnostics.cached and again.installer_type == plan.installer_type
+            hashed = analyze_path(path, cache=cache, hashes=["md5"])
+            assert hashed.metadata["MD5"] == expected(path)["md5"], "digests are part of the cache key"
+            assert analyze_path(path, cache=cache, hashes=["md5"], timings=True).diagnostics.cached
+            msi = os.path.join(tmp, "setup.msi")
+            with open(msi, "wb") as f:
+                f.write(build_msi({"ProductCode": "{11111111-2222-3333-4444-555555555555}"}))
+            plan = analyze_path(msi, cache=cache, hashes=["sha1"])
+            assert plan.metadata["SHA1"] == expected(msi)["sha1"]
+            assert cache.content_hash(msi) == file_sha256(msi)
+            copy = os.path.join(tmp, "copy.exe")
+            shutil.copyfile(path, copy)
+            assert analyze_path(copy, cache=cache).input_path == copy
+            entries = cache.stats().entries
+            assert cache.prune(current_versions=["msi", exe_cache_version(get_signatures())])[0] == 0
+            assert cache.stats().entries == entries, "plans with digests survive a prune"
+            assert cache.prune(current_versions=[])[0] == entries
+        finally:
+            cache.close()
+        print("3. Cache keys come from the same pass; plans with digests are cached separately.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+"""
+Verify incremental indexing: only new and changed installers are analyzed,
+deleted ones are dropped, entries from another analysis version are redone,
+and a run with nothing to do only lists the tree.
+Run from project root: uv run python scripts/check_index.py
+"""
+from __future__ import annotations
+
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from benchmarks.msi_writer import build_msi  # noqa: E402
+
+FILES = 2000
+
+
+def main() -> int:
+    from installer_intel.cache import file_sha256
+    from installer_intel.index import RepoIndex, stat_tree
+
+    rng = random.Random(1)
+    with tempfile.TemporaryDirectory() as tmp:
+        share = os.path.join(tmp, "share")
+        paths = []
+        for i in range(FILES):
+            folder = os.path.join(share, f"vendor{i % 40}", f"app{i % 7}")
+            os.makedirs(folder, exist_ok=True)
+            path = os.path.join(folder, f"setup{i}.exe")
+            with open(path, "wb") as f:
+                f.write(rng.randbytes(512) + (b"\0Nullsoft Install System v3.08\0" if i % 2 else b""))
+            paths.append(path)
+        msi = os.path.join(share, "vendor0", "product.msi")
+        with open(msi, "wb") as f:
+            f.write(build_msi({"ProductCode": "{11111111-2222-3333-4444-555555555555}"}))
+        with open(os.path.join(share, "vendor0", "readme.txt"), "w") as f:
+            f.write("not an installer")
+        index_path = os.path.join(tmp, "index.sqlite")
+
+        found, unlisted = stat_tree([share])
+        assert len(found) == FILES + 1 and not unlisted
+
+        # 1. The first run analyzes everything
+        with RepoIndex(index_path) as index:
+            first = index.update([share], jobs=1)
+            assert (first.files, first.added, first.changed, first.removed) == (FILES + 1, FILES + 1, 0, 0), first
+            assert len(index) == FILES + 1 and not index.errors()
+        print(f"1. First run: {first.added} files analyzed in {first.seconds:.1f}s.")
+
+        # 2. Nothing changed: nothing is analyzed
+        with RepoIndex(index_path) as index:
+            t0 = time.perf_counter()
+            again = index.update([share], jobs=1)
+            elapsed = time.perf_counter() - t0
+        assert again.unchanged == FILES + 1 and again.added == again.changed == again.bytes_analyzed == 0, again
+        assert elapsed < 2.0, elapsed
+        print(f"2. No-change run: {elapsed * 1000:.0f} ms for {FILES + 1} files "
+              f"(~{elapsed / (FILES + 1) * 40_000:.1f}s per 40k).")
+
+        # 3. One modified, one added, one deleted
+        modified, deleted = paths[0], paths[1]
+        with open(modified, "ab") as f:
+            f.write(b"\0Inno Setup Setup Data (6.2.0)\0")
+        stat = os.stat(modified)
+        os.utime(modified, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        os.remove(deleted)
+        added = os.path.join(share, "vendor1", "new.exe")
+        with open(added, "wb") as f:
+            f.write(rng.randbytes(300))
+        with RepoIndex(index_path) as index:
+            delta = index.update([share], jobs=1)
+            assert (delta.added, delta.changed, delta.removed, delta.unchanged) == (1, 1, 1, FILES - 1), delta
+            plans = {json.loads(p)["input_path"]: json.loads(p) for p in index.plans()}
+        assert deleted not in plans and added in plans
+        assert plans[modified]["installer_type"] == "Inno Setup"
+        assert plans[modified]["metadata"]["SHA256"] == file_sha256(modified)
+        print("3. One change, one addition, one deletion: two files analyzed, one entry dropped.")
+
+        # 4. Updating part of the tree leaves the rest alone; options invalidate entries
+        with RepoIndex(index_path) as index:
+            part = index.update([os.path.join(share, "vendor3")], jobs=1)
+            assert part.files == part.unchanged and part.removed == 0 and len(index) == FILES + 1
+            deep = index.update([os.path.join(share, "vendor3")], jobs=1, depth="deep")
+            assert deep.changed == deep.files > 0, deep
+            hashed = index.update([msi], jobs=1, hashes=["md5"])
+            assert hashed.changed == 1 and hashed.unchanged == 0
+        print("4. Partial updates keep other entries; a different depth or digest set re-analyzes.")
+
+        # 5. The command line
+        proc = subprocess.run(
+            [sys.executable, "-m", "installer_intel", "index", "update", share, "--index", index_path,
+             "--jobs", "1", "--format", "json", "--no-cache"],
+            capture_output=True, text=True,
+        )
+        assert proc.returncode == 0, proc.stderr
+        summary = json.loads(proc.stderr.strip().splitlines()[-1])
+        assert summary["entries"] == FILES + 1 and summary["files"] == FILES + 1, summary
+        print(f"5. index update --format json: {summary['unchanged']} unchanged, "
+              f"{summary['changed']} re-analyzed.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+"""
+Verify the built-in MSI reader against synthetic MSI databases.
+Run from project root: uv run python scripts/check_msi.py
+"""
+from __future__ import annotations
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from benchmarks.msi_writer import SHORT, STRING, STRING_KEY, build_msi, suite_tables  # noqa: E402
+
+
+def main() -> int:
+    from installer_intel.analyzers import analyze_msi
+    from installer_intel.analyzers.msidb import MsiDatabase, MsiFormatError
+
+    props = {
+        "ProductName": "Contoso Widget",
+        "ProductCode": "{11111111-2222-3333-4444-555555555555}",
+        "UpgradeCode": "{AAAAAAAA-BBBB-CCCC-DDDD-EEEEEEEEEEEE}",
+        "ProductVersion": "1.2.3",
+        "Manufacturer": "Contoso Ltd",
+    }
+    big = dict(props)
+    big.update({f"Prop{i}": f"value {i}" for i in range(3000)})  # forces regular sectors
+
+    cases = [
+        ("small", build_msi(props), props),
+        ("long string refs", build_msi(props, long_refs=True), props),
+        ("utf-8 codepage", build_msi({**props, "Manufacturer": "Contoso Ltée"}, codepage=65001),
+         {**props, "Manufacturer": "Contoso Ltée"}),
+        ("large", build_msi(big), big),
+    ]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for n, (label, raw, want) in enumerate(cases, start=1):
+            path = os.path.join(tmp, f"case{n}.msi")
+            with open(path, "wb") as f:
+                f.write(raw)
+
+            t0 = time.perf_counter()
+            with MsiDatabase.open(path) as db:
+                got = db.properties()
+            elapsed = time.perf_counter() - t0
+            if got != want:
+                print(f"ERROR: {label}: properties differ")
+                return 1
+
+            plan = analyze_msi(path)
+            if plan.metadata.get("ProductCode") != want["ProductCode"]:
+                print(f"ERROR: {label}: analyze_msi did not report the ProductCode")
+                return 1
+            print(f"{n}. {label}: {len(got)} properties read in {elapsed * 1000:.1f} ms")
+
+        # Tables: key-path files/registry values, directories and upgrades,
+        # padded with many unrelated files to exercise lazy decoding.
+        path = os.path.join(tmp, "suite.msi")
+        with open(path, "wb") as f:
+            f.write(build_msi({**props, "ALLUSERS": "1"}, long_refs=True, tables=suite_tables(props["UpgradeCode"], 100_000)))
+
+        t0 = time.perf_counter()
+        plan = analyze_msi(path)
+        elapsed = time.perf_counter() - t0
+        rules = {(r.kind, r.value) for r in plan.detection_rules}
+        want_rules = {
+            ("msi_product_code", props["ProductCode"]),
+            ("msi_upgrade_code", props["UpgradeCode"]),
+            ("file_exists", "[ProgramFilesFolder]Contoso\\Widget\\widget.exe"),
+            ("file_exists", "[ProgramFilesFolder]Contoso\\Widget\\bin\\helper.exe"),
+            ("registry_key", "HKLM\\Software\\Contoso Ltd\\Widget 1.2.3"),
+        }
+        if rules != want_rules:
+            print(f"ERROR: suite: unexpected detection rules {sorted(rules)}")
+            return 1
+        if len(plan.metadata.get("Upgrades", [])) != 1:
+            print("ERROR: suite: Upgrade table not reported")
+            return 1
+        print(f"{len(cases) + 1}. suite with 100000 files: analyzed in {elapsed * 1000:.1f} ms")
+
+        # Damaged schemas: a missing column, or a standard column of the wrong type
+        def damaged(table: str, column: str, new_type) -> dict:
+            tables = suite_tables(props["UpgradeCode"], 10)
+            tables["Property"] = ([("Property", STRING_KEY), ("Value", STRING)], list(props.items()))
+            cols, rows = tables[table]
+            i = [c for c, _ in cols].index(column)
+            if new_type is None:
+                cols, rows = cols[:i] + cols[i + 1:], [r[:i] + r[i + 1:] for r in rows]
+            else:
+                value = 7 if new_type == SHORT else "7"
+                cols = cols[:i] + [(column, new_type)] + cols[i + 1:]
+                rows = [r[:i] + (value,) + r[i + 1:] for r in rows]
+            tables[table] = (cols, rows)
+            return tables
+
+        broken = [
+            ("Property", "Value", None), ("Directory", "Directory_Parent", None),
+            ("Directory", "DefaultDir", SHORT), ("File", "FileName", SHORT), ("Component", "Attributes", STRING),
+        ]
+        for table, column, new_type in broken:
+            path = os.path.join(tmp, "damaged.msi")
+            with open(path, "wb") as f:
+                f.write(build_msi({}, tables=damaged(table, column, new_type)))
+            with MsiDatabase.open(path) as db:
+                try:
+                    list(db.table(table).rows(column))
+                except MsiFormatError:
+                    pass
+                else:
+                    print(f"ERROR: {table}.{column}: damaged column read without an error")
+                    return 1
+            try:
+                plan = analyze_msi(path)
+            except Exception as e:
+                print(f"ERROR: {table}.{column}: analyze_msi raised {e!r}")
+                return 1
+            if plan.file_type != "msi":
+                print(f"ERROR: {table}.{column}: not analyzed as an MSI")
+                return 1
+        print(f"{len(cases) + 2}. {len(broken)} damaged schemas (missing or mistyped columns): MsiFormatError, "
+              f"analyze_msi falls back")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,185 @@
+#!/usr/bin/env python
+"""
+Verify that MSIs, CABs and zips embedded in EXEs are found and analyzed in
+place: child plans form a tree, embedded ProductCodes become the parent's
+detection rules, and depth, nesting and size limits hold.
+Run from project root: uv run python scripts/check_nested.py
+"""
+from __future__ import annotations
+
+import io
+import os
+import random
+import sys
+import tempfile
+import zipfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from benchmarks.cab_writer import LZX, MSZIP, NONE, build_cab  # noqa: E402
+from benchmarks.msi_writer import STRING_KEY, build_msi  # noqa: E402
+from benchmarks.pe_writer import RT_RCDATA, RT_VERSION, TEXT_FLAGS, build_pe, version_info  # noqa: E402
+
+ALPHA = "{AAAAAAAA-1111-2222-3333-444444444444}"
+BETA = "{BBBBBBBB-1111-2222-3333-444444444444}"
+
+
+def noise(n: int, seed: int) -> bytes:
+    return random.Random(seed).randbytes(n)
+
+
+def msi(code: str, name: str) -> bytes:
+    return build_msi({"ProductCode": code, "ProductName": name, "ProductVersion": "1.0.0"})
+
+
+def exe(overlay: bytes, marker: bytes = b"\0WixBundleManifest\0.wixburn\0", resources=None) -> bytes:
+    stub = [(".text", noise(60_000, 1) + marker, TEXT_FLAGS)]
+    res = {(RT_VERSION, 1, 1033): version_info({"ProductName": "Bundle"})}
+    res.update(resources or {})
+    return build_pe(stub, res, overlay)
+
+
+def zipped(members) -> bytes:
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as zf:
+        for name, data, method in members:
+            zf.writestr(zipfile.ZipInfo(name), data, compress_type=method)
+    return buf.getvalue()
+
+
+def codes(plan) -> list:
+    return [r.value for r in plan.detection_rules if r.kind == "msi_product_code"]
+
+
+def tree(plan, root: str = "") -> list:
+    """(input path relative to the root plan's, file type) of every descendant."""
+    root = root or plan.input_path
+    out = []
+    for child in plan.children:
+        out.append((child.input_path[len(root):], child.file_type))
+        out += tree(child, root)
+    return out
+
+
+def main() -> int:
+    from installer_intel.analyzers.cfb import CFB_MAGIC, CompoundFile
+    from installer_intel.analyzers.nested import MAX_CHILDREN, FileView
+    from installer_intel.scan import analyze_path
+
+    alpha, beta = msi(ALPHA, "Alpha"), msi(BETA, "Beta")
+    with tempfile.TemporaryDirectory() as tmp:
+        def write(name: str, data: bytes) -> str:
+            path = os.path.join(tmp, name)
+            with open(path, "wb") as f:
+                f.write(data)
+            return path
+
+        # 1. A bundle with a CAB and an MSI back to back at the start of its overlay
+        cab = build_cab([("readme.txt", b"Read me. " * 5000), ("alpha.msi", alpha)], MSZIP)
+        bundle = exe(cab + beta + noise(8 * 1024 ** 2, 2))
+        path = write("bundle.exe", bundle)
+        before = sorted(os.listdir(tmp))
+        plan = analyze_path(path, timings=True)
+        assert sorted(os.listdir(tmp)) == before, "nothing is extracted to disk"
+        cab_at = bundle.index(b"MSCF")
+        assert tree(plan) == [
+            (f"!0x{cab_at:X}", "cab"), (f"!0x{cab_at:X}/alpha.msi", "msi"), (f"!0x{cab_at + len(cab):X}", "msi"),
+        ], tree(plan)
+        assert plan.children[0].metadata == {"Files": 2, "Compression": "MSZIP"}
+        assert plan.children[1].embedded.offset == cab_at + len(cab)
+        assert plan.children[1].metadata["ProductName"] == "Beta"
+        assert codes(plan) == [ALPHA, BETA], codes(plan)
+        assert all(r.confidence == 0.85 for r in plan.detection_rules if r.kind == "msi_product_code")
+        nested = [s for s in plan.diagnostics.stages if s.stage == "nested"][0]
+        assert nested.bytes_read < 512 * 1024, nested.bytes_read
+        print(f"1. Bundle: CAB (MSZIP) and MSI found, ProductCodes adopted; "
+              f"search read {nested.bytes_read // 1024} KB of {len(bundle) // 1024 ** 2} MB.")
+
+        # 2. A zip appended to an EXE: a stored MSI and a deflated EXE that is itself a bundle
+        sfx = exe(noise(3 * 1024 ** 2, 3) + zipped([
+            ("pkg/beta.msi", beta, zipfile.ZIP_STORED),
+            ("inner.exe", bundle, zipfile.ZIP_DEFLATED),
+        ]), marker=b"")
+        path = write("sfx.exe", sfx)
+        plan = analyze_path(path)
+        zip_at = sfx.index(b"PK\x03\x04")
+        assert [w for w, _ in tree(plan)] == [
+            f"!0x{zip_at:X}", f"!0x{zip_at:X}/pkg/beta.msi", f"!0x{zip_at:X}/inner.exe",
+            f"!0x{zip_at:X}/inner.exe!0x{cab_at:X}", f"!0x{zip_at:X}/inner.exe!0x{cab_at:X}/alpha.msi",
+            f"!0x{zip_at:X}/inner.exe!0x{cab_at + len(cab):X}",
+        ], tree(plan)
+        archive = plan.children[0]
+        stored, inner = archive.children
+        assert sfx[stored.embedded.offset:stored.embedded.offset + 8] == CFB_MAGIC
+        assert inner.embedded.offset is None and inner.installer_type == "WiX Burn / Bootstrapper"
+        assert codes(plan) == [BETA, ALPHA] and codes(inner) == [ALPHA, BETA]
+        print("2. Zip overlay: stored MSI read in place, deflated bundle analyzed in memory, two levels deep.")
+
+        # 3. Containers deep in the overlay are only searched for at --depth deep
+        buried = exe(noise(2 * 1024 ** 2, 4) + beta + noise(1024 ** 2, 5))
+        path = write("buried.exe", buried)
+        assert analyze_path(path).children == []
+        deep = analyze_path(path, depth="deep")
+        assert [c.embedded.offset for c in deep.children] == [buried.index(CFB_MAGIC)] and codes(deep) == [BETA]
+        assert analyze_path(write("triage.exe", bundle), depth="triage").children == []
+        resource = exe(b"", resources={(RT_RCDATA, 7, 0): alpha + noise(1024 ** 2, 6)})
+        assert codes(analyze_path(write("resource.exe", resource))) == [ALPHA]
+        print("3. Buried containers need --depth deep; triage skips the search; large resources are searched.")
+
+        # 4. Limits: undecoded compression, nesting, children per file, memory budget
+        lzx = exe(build_cab([("alpha.msi", alpha)], LZX))
+        plan = analyze_path(write("lzx.exe", lzx))
+        child = plan.children[0]
+        assert child.metadata["Compression"] == "LZX" and child.children == []
+        assert any("LZX compression is not decoded" in n for n in child.notes), child.notes
+        stored_cab = analyze_path(write("stored.exe", exe(build_cab([("a.msi", alpha)], NONE))))
+        assert codes(stored_cab) == [ALPHA]
+
+        level = beta
+        for _ in range(5):
+            level = exe(zipped([("next.exe" if level[:2] == b"MZ" else "last.msi", level, zipfile.ZIP_STORED)]))
+        plan = analyze_path(write("matryoshka.exe", level))
+        depth = 0
+        while plan.children:
+            plan = plan.children[0]
+            depth += plan.file_type == "zip"
+        assert depth == 3 and plan.file_type == "exe", (depth, plan.file_type)
+
+        many = exe(b"".join(msi("{%08X-0000-0000-0000-000000000000}" % i, f"P{i}") for i in range(20)))
+        plan = analyze_path(write("many.exe", many))
+        assert len(plan.children) == MAX_CHILDREN and any("Stopped looking" in n for n in plan.notes)
+
+        big = exe(zipped([("big.exe", exe(noise(3 * 1024 ** 2, 7)), zipfile.ZIP_DEFLATED)]))
+        plan = analyze_path(write("big.exe", big), max_memory=2 * 1024 ** 2)
+        assert plan.children[0].children == [] and "over the memory budget" in plan.children[0].notes[0]
+        print(f"4. LZX listed but not decoded; nesting stops at 3 levels, {MAX_CHILDREN} children; "
+              "members over the memory budget are skipped.")
+
+        # 5. A view reads the same compound file as the bytes
+        with open(os.path.join(tmp, "bundle.exe"), "rb") as f:
+            start = cab_at + len(cab)
+            view = FileView(f, start, start + len(beta))
+            assert view[:8] == CFB_MAGIC and view[-4:] == beta[-4:] and len(view) == len(beta)
+            assert CompoundFile(view).list_streams() == CompoundFile(beta).list_streams()
+        print("5. FileView reads match the embedded bytes.")
+
+        # 6. Damaged children are noted and skipped; the parent and its good children are still analyzed
+        no_value = build_msi({}, tables={"Property": ([("Property", STRING_KEY)], [("ProductCode",)])})
+        members = [("bad.bz2.msi", beta, zipfile.ZIP_BZIP2), ("bad.xz.msi", beta, zipfile.ZIP_LZMA),
+                   ("good.msi", msi(ALPHA, "Alpha"), zipfile.ZIP_DEFLATED)]
+        archive = bytearray(zipped(members))
+        with zipfile.ZipFile(io.BytesIO(bytes(archive))) as zf:
+            for info in zf.infolist()[:2]:
+                at = info.header_offset + 30 + len(info.filename) + info.compress_size // 2
+                archive[at:at + 16] = noise(16, 8)
+        plan = analyze_path(write("damaged.exe", exe(no_value + bytes(archive))))
+        assert [c.file_type for c in plan.children] == ["zip"] and codes(plan) == [ALPHA], (tree(plan), plan.notes)
+        notes = " | ".join(plan.notes + plan.children[0].notes)
+        assert "no Value column" in notes, notes
+        assert "bad.bz2.msi not analyzed" in notes and "bad.xz.msi not analyzed" in notes, notes
+        print("6. A damaged embedded MSI and corrupt bzip2 / LZMA zip members are noted; the rest is analyzed.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
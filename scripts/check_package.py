@@ -0,0 +1,233 @@
+#!/usr/bin/env python
+"""
+Verify analysis of installers inside .zip and .intunewin packages: each MSI
+and EXE gets a child plan matching a direct analysis of it, deflated and
+encrypted content is decoded as it is read within bounded memory, nothing
+is extracted to disk, and the SetupFile's commands become the package's.
+A package with a damaged central directory is refused with a ValueError.
+Run from project root: uv run python scripts/check_package.py
+"""
+from __future__ import annotations
+
+import base64
+import hashlib
+import hmac
+import importlib.util
+import io
+import json
+import os
+import random
+import struct
+import sys
+import tempfile
+import time
+import tracemalloc
+import zipfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from benchmarks.msi_writer import build_msi  # noqa: E402
+from benchmarks.pe_writer import RT_VERSION, TEXT_FLAGS, build_pe, version_info  # noqa: E402
+
+ALPHA = "{AAAAAAAA-5555-2222-3333-444444444444}"
+BETA = "{BBBBBBBB-5555-2222-3333-444444444444}"
+MB = 1024 ** 2
+
+
+def noise(n: int, seed: int) -> bytes:
+    return random.Random(seed).randbytes(n)
+
+
+def zipped(members) -> bytes:
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as zf:
+        for name, data, method in members:
+            zf.writestr(zipfile.ZipInfo(name), data, compress_type=method)
+    return buf.getvalue()
+
+
+def intunewin(
+    content: bytes, setup_file: str, msi_info=None, deflate: bool = False, wrong_key: bool = False,
+) -> bytes:
+    """An .intunewin as IntuneWinAppUtil makes it: the content zip encrypted, keys in Detection.xml."""
+    from cryptography.hazmat.primitives import padding
+    from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+
+    rng = random.Random(7)
+    key, mac_key, iv = rng.randbytes(32), rng.randbytes(32), rng.randbytes(16)
+    padder = padding.PKCS7(128).padder()
+    encryptor = Cipher(algorithms.AES(key), modes.CBC(iv)).encryptor()
+    ciphertext = encryptor.update(padder.update(content) + padder.finalize()) + encryptor.finalize()
+    mac = hmac.new(mac_key, iv + ciphertext, hashlib.sha256).digest()
+    b64 = lambda b: base64.b64encode(b).decode()  # noqa: E731
+    msi_xml = "".join(f"<{k}>{v}</{k}>" for k, v in (msi_info or {}).items())
+    xml = (
+        '<?xml version="1.0" encoding="utf-8"?>'
+        '<ApplicationInfo xmlns:xsd="http://www.w3.org/2001/XMLSchema" ToolVersion="1.8.6.0">'
+        f"<Name>{setup_file}</Name><UnencryptedContentSize>{len(content)}</UnencryptedContentSize>"
+        f"<FileName>IntunePackage.intunewin</FileName><SetupFile>{setup_file}</SetupFile>"
+        f"<EncryptionInfo><EncryptionKey>{b64(rng.randbytes(32) if wrong_key else key)}</EncryptionKey>"
+        f"<MacKey>{b64(mac_key)}</MacKey>"
+        f"<InitializationVector>{b64(iv)}</InitializationVector><Mac>{b64(mac)}</Mac>"
+        "<ProfileIdentifier>ProfileVersion1</ProfileIdentifier>"
+        f"<FileDigest>{b64(hashlib.sha256(content).digest())}</FileDigest>"
+        "<FileDigestAlgorithm>SHA256</FileDigestAlgorithm></EncryptionInfo>"
+        + (f"<MsiInfo>{msi_xml}</MsiInfo>" if msi_info else "")
+        + "</ApplicationInfo>"
+    )
+    return zipped([
+        ("IntuneWinPackage/Contents/IntunePackage.intunewin", mac + iv + ciphertext,
+         zipfile.ZIP_DEFLATED if deflate else zipfile.ZIP_STORED),
+        ("IntuneWinPackage/Metadata/Detection.xml", xml.encode(), zipfile.ZIP_DEFLATED),
+    ])
+
+
+def damaged(data: bytes, how: str) -> bytes:
+    """data (a zip) with its last central directory entry broken."""
+    last = data.rfind(b"PK\x01\x02")
+    if how == "magic":
+        return data[:last] + b"PK\x01\x00" + data[last + 4:]
+    # An extra field claiming more bytes than it has.
+    name_size, extra_size = struct.unpack_from("<HH", data, last + 28)
+    at = last + 46 + name_size
+    data = data[:last + 30] + struct.pack("<H", extra_size + 4) + data[last + 32:at] + b"PK\xff\x00" + data[at:]
+    end = data.rfind(b"PK\x05\x06")
+    directory_size = struct.unpack_from("<I", data, end + 12)[0]
+    return data[:end + 12] + struct.pack("<I", directory_size + 4) + data[end + 16:]
+
+
+def comparable(plan) -> str:
+    """A plan's JSON without what says where it was read from."""
+    data = plan.as_dict()
+    data["embedded"] = data["diagnostics"] = None
+    data["metadata"].pop("FileName", None)
+    return json.dumps(data).replace(json.dumps(plan.input_path)[1:-1], "<path>")
+
+
+def main() -> int:
+    from installer_intel.analyzers.package import analyze_package
+    from installer_intel.scan import analyze_path, find_installers
+
+    alpha = build_msi({"ProductCode": ALPHA, "ProductName": "Alpha", "ProductVersion": "2.0.0"})
+    beta = build_msi({"ProductCode": BETA, "ProductName": "Beta", "ProductVersion": "1.0.0"})
+    stub = [(".text", noise(60_000, 1) + b"\0WixBundleManifest\0.wixburn\0", TEXT_FLAGS)]
+    res = {(RT_VERSION, 1, 1033): version_info({"ProductName": "Bundle"})}
+    # Compressible filler so the member deflates well below its size.
+    filler = b"".join(noise(4096, i) * 8 for i in range(24 * MB // 32768))
+    bundle = build_pe(stub, res, beta + filler)
+    budget = 4 * MB
+
+    with tempfile.TemporaryDirectory() as tmp:
+        def write(name: str, data: bytes) -> str:
+            path = os.path.join(tmp, name)
+            with open(path, "wb") as f:
+                f.write(data)
+            return path
+
+        direct_msi = analyze_path(write("alpha.msi", alpha))
+        direct_exe = analyze_path(write("bundle.exe", bundle), max_memory=budget)
+        os.mkdir(os.path.join(tmp, "pkg"))
+
+        # 1. A zip: a stored MSI, a deflated EXE over the memory budget, other files
+        archive = zipped([
+            ("readme.txt", b"Read me. " * 1000, zipfile.ZIP_DEFLATED),
+            ("msi/alpha.msi", alpha, zipfile.ZIP_STORED),
+            ("setup/bundle.exe", bundle, zipfile.ZIP_DEFLATED),
+        ])
+        path = write(os.path.join("pkg", "apps.zip"), archive)
+        before = sorted(os.listdir(tmp))
+        tracemalloc.start()
+        t0 = time.perf_counter()
+        plan = analyze_path(path, max_memory=budget, timings=True)
+        seconds = time.perf_counter() - t0
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        assert sorted(os.listdir(tmp)) == before, "nothing is extracted to disk"
+        assert plan.file_type == "zip" and plan.metadata["Files"] == 3, plan.metadata
+        assert [c.input_path for c in plan.children] == [f"{path}/msi/alpha.msi", f"{path}/setup/bundle.exe"]
+        msi_child, exe_child = plan.children
+        assert msi_child.embedded.offset == archive.index(alpha)
+        assert exe_child.embedded.offset is None and exe_child.embedded.size == len(bundle)
+        assert comparable(msi_child) == comparable(direct_msi)
+        assert comparable(exe_child) == comparable(direct_exe)
+        assert [r.value for r in plan.detection_rules if r.kind == "msi_product_code"] == [ALPHA, BETA]
+        assert not plan.install_candidates, "two installers: no package-level command"
+        assert peak < len(bundle) // 2, f"peak {peak // MB} MB"
+        inflate = sum(s.seconds for s in plan.diagnostics.stages if s.stage == "inflate")
+        print(f"1. Zip: stored MSI read in place, {len(bundle) // MB} MB deflated EXE inflated as read "
+              f"({inflate:.2f} s inflating, {seconds:.2f} s total, peak {peak / MB:.1f} MB with a "
+              f"{budget // MB} MB budget); plans match direct analysis.")
+
+        # 2. One installer in a zip: its commands run from the extracted folder
+        path = write("single.zip", zipped([("app/alpha.msi", alpha, zipfile.ZIP_DEFLATED)]))
+        plan = analyze_package(path)
+        assert plan.install_candidates and "app\\alpha.msi" in plan.install_candidates[0].command, \
+            plan.install_candidates
+        assert path not in plan.install_candidates[0].command
+        assert plan.children[0].embedded.offset is None
+        print(f"2. Single installer promoted: {plan.install_candidates[0].command}")
+
+        found = list(find_installers([tmp]))
+        assert os.path.join(tmp, "pkg", "apps.zip") in found and path in found, found
+        print("3. Directory scans pick up .zip packages.")
+
+        # 4. Damaged central directories: a clean ValueError, not a traceback
+        fake = zipped([
+            ("IntuneWinPackage/Contents/IntunePackage.intunewin", noise(4096, 2), zipfile.ZIP_STORED),
+            ("IntuneWinPackage/Metadata/Detection.xml", b"<ApplicationInfo/>", zipfile.ZIP_DEFLATED),
+        ])
+        for name, data in (("damaged.zip", archive), ("damaged.intunewin", fake)):
+            for how, message in (("magic", "Bad magic number"), ("extra", "Corrupt extra field")):
+                path = write(name, damaged(data, how))
+                try:
+                    analyze_path(path)
+                except ValueError as e:
+                    assert str(e).startswith(f"Damaged zip archive {path}: {message}"), e
+                else:
+                    raise AssertionError(f"{name} with a damaged central directory ({how}) was analyzed")
+        print("4. Damaged .zip and .intunewin central directories (bad magic, corrupt extra field): ValueError.")
+
+        if importlib.util.find_spec("cryptography") is None:
+            print("5-7. Skipped: .intunewin checks need the cryptography package.")
+            return 0
+
+        # 5. An .intunewin wrapping a zip of the source folder; SetupFile is the bundle
+        content = zipped([
+            ("alpha.msi", alpha, zipfile.ZIP_DEFLATED),
+            ("bundle.exe", bundle, zipfile.ZIP_DEFLATED),
+            ("config/settings.ini", b"[x]\ny=1\n", zipfile.ZIP_DEFLATED),
+        ])
+        msi_info = {"MsiProductCode": ALPHA, "MsiProductVersion": "2.0.0", "MsiExecutionContext": "System"}
+        for deflate in (False, True):
+            path = write("app.intunewin", intunewin(content, "bundle.exe", msi_info, deflate))
+            tracemalloc.start()
+            plan = analyze_path(path, max_memory=budget)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            assert plan.file_type == "intunewin" and plan.confidence == 0.95, plan.installer_type
+            assert plan.metadata["SetupFile"] == "bundle.exe" and plan.metadata["ToolVersion"] == "1.8.6.0"
+            assert plan.metadata["UnencryptedContentSize"] == len(content)
+            assert plan.metadata["MsiInfo"]["MsiExecutionContext"] == "System"
+            assert [c.input_path for c in plan.children] == [f"{path}/alpha.msi", f"{path}/bundle.exe"]
+            assert comparable(plan.children[0]) == comparable(direct_msi)
+            assert comparable(plan.children[1]) == comparable(direct_exe)
+            assert [r.value for r in plan.detection_rules if r.kind == "msi_product_code"] == [ALPHA, BETA]
+            assert [c.command for c in plan.install_candidates] == [
+                c.command.replace(direct_exe.input_path, "bundle.exe") for c in direct_exe.install_candidates
+            ], plan.install_candidates
+            assert peak < len(bundle) // 2, f"peak {peak // MB} MB"
+            print(f"{6 if deflate else 5}. .intunewin ({'deflated' if deflate else 'stored'} content): decrypted "
+                  f"and inflated as read, peak {peak / MB:.1f} MB; SetupFile commands promoted.")
+
+        # 7. A wrong key still gives Detection.xml's metadata
+        path = write("bad.intunewin", intunewin(content, "bundle.exe", msi_info, wrong_key=True))
+        plan = analyze_package(path)
+        assert not plan.children and plan.metadata["SetupFile"] == "bundle.exe"
+        assert any("could not be read" in n for n in plan.notes), plan.notes
+        assert [r.value for r in plan.detection_rules] == [ALPHA]
+        print(f"7. Wrong key: metadata-only plan ({plan.notes[-1]})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+"""
+Verify that scanning a large EXE on several processes gives exactly the
+serial result: same signature hits and offsets, same early stop and
+coverage, same digests, whatever the number of workers. The size threshold
+is lowered so small files take the parallel path; segment boundaries are
+placed inside long strings on purpose.
+Run from project root: uv run python scripts/check_parallel.py
+"""
+from __future__ import annotations
+
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from benchmarks.corpus import CaseSpec, write_exe  # noqa: E402
+
+MB = 1024 ** 2
+
+
+def comparable(plan) -> str:
+    data = plan.as_dict()
+    data["diagnostics"] = None
+    return json.dumps(data, sort_keys=True)
+
+
+def main() -> int:
+    from installer_intel.analyzers import parallel
+    from installer_intel.analyzers.exe import analyze_exe
+    from installer_intel.analyzers.stream import MIN_WINDOW
+    from installer_intel.analyzers.strings import iter_ascii, iter_utf16le
+    from installer_intel.timings import record_timings
+
+    parallel.PARALLEL_MIN_BYTES = 4 * MB
+    parallel.MIN_SEGMENT = MIN_WINDOW
+    budget = 4 * MIN_WINDOW  # 1 MB windows, so segments are 1 MB apart
+
+    specs = [
+        # Non-decisive family with its markers late: the payload tier is scanned in full.
+        CaseSpec("nsis-late", "exe", size=16 * MB, family="nsis", marker_offsets=(0.8,), text_ratio=0.4, seed=1),
+        # Markers in two places: the lowest offsets must win across segments.
+        CaseSpec("inno-twice", "exe", size=16 * MB, family="inno", marker_offsets=(0.7, 0.3), text_ratio=0.4,
+                 seed=2),
+        CaseSpec("burn-mid", "exe", size=12 * MB, family="burn", marker_offsets=(0.5,), text_ratio=0.4, seed=3),
+        CaseSpec("unknown", "exe", size=8 * MB, family="unknown", text_ratio=0.4, seed=4),
+    ]
+    with tempfile.TemporaryDirectory() as tmp:
+        # 1. Strings straddling every segment boundary, in both encodings and alignments
+        path = os.path.join(tmp, "straddle.exe")
+        write_exe(path, specs[0])
+        with open(path, "r+b") as f:
+            for k in range(1, 16):
+                f.seek(k * MB - 300 + k % 3)
+                f.write(b"Nullsoft Install System " * 20 if k % 2 else "NSIS Error ".encode("utf-16-le") * 40)
+        with open(path, "rb") as f:
+            data = f.read()
+        assert any(off < k * MB < off + len(t) for off, t in iter_ascii(data) for k in range(1, 16))
+        assert any(off < k * MB < off + 2 * len(t) for off, t in iter_utf16le(data) for k in range(1, 16))
+        for depth in ("standard", "deep"):
+            serial = analyze_exe(path, max_memory=budget, depth=depth, workers=1)
+            for workers in (2, 3, 5):
+                plan = analyze_exe(path, max_memory=budget, depth=depth, workers=workers)
+                assert comparable(plan) == comparable(serial), (depth, workers)
+        print("1. Strings across segment boundaries: plans identical to serial for 2, 3 and 5 workers.")
+
+        # 2. Corpus files at both depths, with digests taken from the scan reads
+        for spec in specs:
+            path = os.path.join(tmp, spec.filename())
+            write_exe(path, spec)
+            for depth in ("standard", "deep"):
+                serial = analyze_exe(path, max_memory=budget, depth=depth, hashes=("sha256",), workers=1)
+                with record_timings() as rec:
+                    plan = analyze_exe(path, max_memory=budget, depth=depth, hashes=("sha256",), workers=4)
+                assert comparable(plan) == comparable(serial), (spec.name, depth)
+                stages = {s.stage: s for s in rec.diagnostics().stages}
+                assert "parallel" in stages and stages["parallel"].strings > 0, sorted(stages)
+        print(f"2. {len(specs)} corpus EXEs at standard and deep depth: same types, offsets, coverage and SHA-256.")
+
+        # 3. A decisive signature early on stops the scan and cancels later segments
+        spec = CaseSpec("inno-early", "exe", size=64 * MB, family="inno", marker_offsets=(0.05,), text_ratio=0.4,
+                        seed=5)
+        path = os.path.join(tmp, spec.filename())
+        write_exe(path, spec)
+        serial = analyze_exe(path, max_memory=budget, workers=1)
+        with record_timings() as rec:
+            plan = analyze_exe(path, max_memory=budget, workers=4)
+        assert comparable(plan) == comparable(serial)
+        scanned = {s.stage: s for s in rec.diagnostics().stages}["parallel"].bytes_read
+        assert plan.coverage.bytes_scanned < 16 * MB and scanned < 32 * MB, (plan.coverage, scanned)
+        print(f"3. Early stop: {plan.coverage.bytes_scanned / MB:.1f} MB covered as in serial; "
+              f"workers read {scanned / MB:.0f} MB of {spec.size // MB} MB before cancelling.")
+
+        # 4. Timing, for the record (speedup needs as many cores as workers)
+        path = os.path.join(tmp, "nsis-late.exe")
+        times = {}
+        for workers in (1, min(4, os.cpu_count() or 1)):
+            t0 = time.perf_counter()
+            analyze_exe(path, max_memory=budget, depth="deep", workers=workers)
+            times[workers] = time.perf_counter() - t0
+        print("4. Deep scan of 16 MB: " + ", ".join(f"{w} worker(s) {t * 1000:.0f} ms" for w, t in times.items())
+              + f" on {os.cpu_count()} CPU(s).")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
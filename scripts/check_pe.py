@@ -0,0 +1,228 @@
+#!/usr/bin/env python
+"""
+Verify the PE layout reader, tiered (triage / stub / payload) signature
+matching and entropy-based skipping of compressed data against synthetic PE
+images.
+Run from project root: uv run python scripts/check_pe.py
+"""
+from __future__ import annotations
+
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from benchmarks.pe_writer import (  # noqa: E402
+    DATA_FLAGS,
+    RT_MANIFEST,
+    RT_RCDATA,
+    RT_VERSION,
+    TEXT_FLAGS,
+    build_pe,
+    manifest,
+    version_info,
+)
+
+
+def noise(n: int, seed: int) -> bytes:
+    return random.Random(seed).randbytes(n)
+
+
+def script(n: int) -> bytes:
+    """Low-entropy filler, like the uncompressed script blocks of a payload."""
+    line = b"SetOutPath $INSTDIR\r\nFile /r app\\*.*\r\nWriteUninstaller uninst.exe\r\n"
+    return (line * (n // len(line) + 1))[:n]
+
+
+def stage_bytes(plan, name: str) -> int:
+    return sum(s.bytes_read for s in plan.diagnostics.stages if s.stage == name)
+
+
+def main() -> int:
+    from installer_intel.analyzers.entropy import BLOCK, compressed_regions
+    from installer_intel.analyzers.pe import PeFormatError, parse_pe
+    from installer_intel.analyzers.signatures import detect_installer_type_file
+    from installer_intel.analyzers.stream import iter_file_ranges
+    from installer_intel.analyzers.strings import iter_ascii, iter_utf16le
+    from installer_intel.scan import analyze_path
+
+    strings = {
+        "CompanyName": "Contoso Ltd",
+        "FileDescription": "Contoso Widget Setup",
+        "ProductName": "Contoso Widget",
+        "ProductVersion": "4.5.6",
+        "Comments": "This installation was built with Inno Setup.",
+    }
+    resources = {
+        (RT_VERSION, 1, 1033): version_info(strings, file_version=(4, 5, 6, 7)),
+        (RT_MANIFEST, 1, 1033): manifest("requireAdministrator"),
+    }
+    stub = [(".text", noise(40_000, 1), TEXT_FLAGS), (".data", b"\0" * 5000 + b"Runtime" * 100, DATA_FLAGS)]
+    overlay = noise(48 * 1024 ** 2, 2)
+    cert = b"\0\x02\x02\0" + b"cert" * 500
+
+    # 1. Layout
+    data = build_pe(stub, resources, overlay, cert)
+    image = parse_pe(io.BytesIO(data))
+    assert [s.name for s in image.sections] == [".text", ".data", ".rsrc"], image.sections
+    assert image.version_info["ProductName"] == "Contoso Widget"
+    assert image.version_info["CompanyName"] == "Contoso Ltd"
+    assert image.version_info["FileVersion"] == "4.5.6.7", "falls back to VS_FIXEDFILEINFO"
+    assert image.version_info["ProductVersion"] == "4.5.6", "string table wins over fixed info"
+    assert image.requested_execution_level == "requireAdministrator"
+    assert image.signed and image.security == (len(data) - len(cert), len(data))
+    assert image.overlay == (image.image_end, len(data) - len(cert))
+    assert image.overlay[1] - image.overlay[0] == len(overlay)
+    primary, deferred = image.scan_ranges()
+    assert primary == [(0, image.image_end)] and deferred == [image.overlay]
+    assert parse_pe(io.BytesIO(build_pe(stub, resources, pe32_plus=True))).is_64
+    print("1. Sections, version info, manifest, certificate table and overlay are mapped.")
+
+    # 2. Malformed input
+    for bad in (b"", b"MZ" + b"\0" * 10, data[:0x90], b"ZM" + data[2:0x400]):
+        try:
+            parse_pe(io.BytesIO(bad))
+        except PeFormatError:
+            continue
+        raise AssertionError(f"accepted a malformed header ({len(bad)} bytes)")
+    mangled = bytearray(data[:image.image_end])
+    rsrc = image.sections[-1]
+    mangled[rsrc.raw_offset:rsrc.raw_offset + 64] = b"\xff" * 64
+    parse_pe(io.BytesIO(bytes(mangled)))  # damaged resources are skipped, not fatal
+    print("2. Malformed headers are rejected; damaged resource directories are tolerated.")
+
+    # 3. Byte ranges stream the same strings as slicing, mapped and chunked
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "ranges.bin")
+        blob = bytearray(noise(3 * 1024 ** 2, 3))
+        for i in range(0, len(blob) - 64, 997):
+            blob[i:i + 20] = b"window edge string %d" % (i % 10)
+        with open(path, "wb") as f:
+            f.write(blob)
+        ranges = [(0, 5000), (1024 ** 2 - 7, 2 * 1024 ** 2 + 13), (len(blob) - 100, len(blob))]
+        want = []
+        for start, end in ranges:
+            piece = bytes(blob[start:end])
+            want += [(start + o, s, False) for o, s in iter_ascii(piece)]
+            want += [(start + o, s, True) for o, s in iter_utf16le(piece)]
+        for use_mmap in (True, False):
+            with open(path, "rb") as f:
+                got = list(iter_file_ranges(f, ranges, max_memory=4 * 1024 ** 2, use_mmap=use_mmap))
+            assert sorted(got) == sorted(want), f"range strings differ (mmap={use_mmap})"
+    print("3. Range scans match slicing, in mapped and chunked mode.")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # 4. Stub-first: identified from the version resource, overlay skipped
+        exe = os.path.join(tmp, "inno.exe")
+        with open(exe, "wb") as f:
+            f.write(data)
+        t0 = time.perf_counter()
+        plan = analyze_path(exe, timings=True)
+        targeted = time.perf_counter() - t0
+        with open(exe, "rb") as f:
+            t0 = time.perf_counter()
+            full_type = detect_installer_type_file(f)[0]
+            full = time.perf_counter() - t0
+        assert plan.installer_type == full_type == "Inno Setup", (plan.installer_type, full_type)
+        assert plan.metadata["ProductName"] == "Contoso Widget"
+        assert plan.metadata["FileVersion"] == "4.5.6.7"
+        assert plan.metadata["HasSignature"] is True
+        assert plan.metadata["RequestedExecutionLevel"] == "requireAdministrator"
+        assert any("not string-scanned" in n for n in plan.notes), plan.notes
+        assert plan.coverage.tier == "triage", plan.coverage
+        read = plan.coverage.bytes_scanned
+        assert read < 1024 ** 2 and stage_bytes(plan, "strings") < 1024 ** 2, f"read {read} bytes"
+        print(f"4. Decided by triage: {read / 1024:.0f} KB scanned in {targeted * 1000:.0f} ms "
+              f"vs full scan {full * 1000:.0f} ms ({full / targeted:.0f}x).")
+
+        # 5. Nothing in the stub: the overlay is scanned
+        payload = bytearray(noise(4 * 1024 ** 2, 4))
+        payload[2_900_000:3_100_000] = script(200_000)
+        payload[3_000_000:3_000_040] = b"\0Nullsoft Install System v3.08\0NSIS Err\0"
+        nsis = os.path.join(tmp, "nsis.exe")
+        with open(nsis, "wb") as f:
+            f.write(build_pe(stub, None, bytes(payload)))
+        plan = analyze_path(nsis)
+        assert plan.installer_type == "NSIS", plan.installer_type
+        assert plan.coverage.tier == "payload"
+        assert not any("not string-scanned" in n for n in plan.notes)
+        triage = analyze_path(nsis, depth="triage")
+        assert triage.installer_type == "Unknown EXE installer" and triage.coverage.tier == "triage"
+        assert triage.coverage.bytes_scanned < 1024 ** 2
+        assert any("try --depth standard" in n for n in triage.notes), triage.notes
+        print("5. No stub match: the overlay is scanned (not at --depth triage) and the installer identified.")
+
+        # 6. Large resources are deferred like the overlay
+        blob = bytearray(noise(2 * 1024 ** 2, 5))
+        blob[1_400_000:1_600_000] = script(200_000)
+        blob[1_500_000:1_500_030] = b"\0InstallShield Setup Launcher\0"
+        ishield = os.path.join(tmp, "ishield.exe")
+        with open(ishield, "wb") as f:
+            f.write(build_pe(stub, {(RT_RCDATA, 7, 0): bytes(blob)}))
+        image = parse_pe(open(ishield, "rb"))
+        primary, deferred = image.scan_ranges()
+        assert len(deferred) == 1 and deferred[0][1] - deferred[0][0] == len(blob)
+        plan = analyze_path(ishield)
+        assert plan.installer_type == "InstallShield", plan.installer_type
+        print("6. Large resources are matched only after the stub, and still matched.")
+
+        # 7. Weak or conflicting triage hits escalate; deep scans everything
+        weak = os.path.join(tmp, "weak.exe")
+        text = bytearray(noise(1024 ** 2, 7))
+        text[900_000:900_020] = b"\0Nullsoft Install\0\0"  # beyond the triage head
+        with open(weak, "wb") as f:
+            f.write(build_pe([(".text", bytes(text), TEXT_FLAGS)], {
+                (RT_VERSION, 1, 1033): version_info({"Comments": "Launches Update.exe"}),
+            }, overlay))
+        plan = analyze_path(weak)
+        assert plan.installer_type == "NSIS" and plan.coverage.tier == "stub", (plan.installer_type, plan.coverage)
+        plan = analyze_path(exe, depth="deep")
+        assert plan.coverage.tier == "payload" and plan.coverage.bytes_scanned >= len(overlay)
+        assert not any("not string-scanned" in n for n in plan.notes)
+        print("7. A low-confidence triage hit escalates to the stub; --depth deep scans the payload too.")
+
+        # 8. Not a PE: whole-file scan, as before
+        plain = os.path.join(tmp, "plain.exe")
+        with open(plain, "wb") as f:
+            f.write(noise(100_000, 6) + b"\0Inno Setup\0")
+        plan = analyze_path(plain)
+        assert plan.installer_type == "Inno Setup"
+        assert any("Not a valid PE image" in n for n in plan.notes)
+        assert plan.coverage.tier in ("triage", "file")
+        print("8. Non-PE files are scanned as flat files.")
+
+        # 9. Compressed blocks of the payload are skipped below --depth deep
+        with open(nsis, "rb") as f:
+            start, end = parse_pe(f).overlay
+            regions = compressed_regions(f, [(start, end)])
+        assert [(r.start, r.end) for r in regions] == [
+            (start, start + 44 * BLOCK), (start + 48 * BLOCK, start + 64 * BLOCK),
+        ], [(r.start - start, r.end - start) for r in regions]
+        assert all(r.entropy > 7.9 for r in regions)
+        with open(exe, "rb") as f:
+            text_end = parse_pe(f).image_end
+            assert not compressed_regions(f, [(0, text_end)]), "headers and version resource are not compressed"
+        hidden = os.path.join(tmp, "hidden.exe")
+        payload = bytearray(noise(8 * 1024 ** 2, 8))
+        payload[6_000_000:6_000_040] = b"\0Nullsoft Install System v3.08\0NSIS Err\0"
+        with open(hidden, "wb") as f:
+            f.write(build_pe(stub, None, bytes(payload)))
+        plan = analyze_path(hidden)
+        assert plan.installer_type == "Unknown EXE installer", plan.installer_type
+        assert plan.coverage.tier == "payload" and plan.coverage.bytes_skipped > 7 * 1024 ** 2, plan.coverage
+        assert plan.coverage.bytes_scanned < 1024 ** 2, plan.coverage
+        assert any(e.kind == "entropy" and "7.7 MB" in e.detail for e in plan.evidence), plan.evidence
+        assert any("compressed data" in n for n in plan.notes), plan.notes
+        deep = analyze_path(hidden, depth="deep")
+        assert deep.installer_type == "NSIS" and deep.coverage.bytes_skipped == 0
+        print(f"9. Compressed payload skipped: {plan.coverage.bytes_skipped / 1024 ** 2:.1f} MB "
+              f"not string-scanned at --depth standard; --depth deep still scans it.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,175 @@
+#!/usr/bin/env python
+"""
+Verify that plans built from records (installer_intel.records) write the
+same JSON as the Pydantic InstallPlan, byte for byte: compact, indented and
+without diagnostics, for every installer family, decoded Inno Setup and NSIS
+headers, zip packages with children, and timed plans. Cached plans read
+back equal. The public analyzers in installer_intel.analyzers return the
+InstallPlan model of the same plan. Building and writing a plan costs less
+time and memory than through the models.
+Run from project root: uv run python scripts/check_records.py
+"""
+from __future__ import annotations
+
+import math
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import zipfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from benchmarks.corpus import MARKERS, CaseSpec, write_exe, write_msi  # noqa: E402
+from benchmarks.engine_writer import HKLM, UNINSTALL_KEY, build_inno, build_nsis, nsis_header  # noqa: E402
+
+PLANS = 1000
+APP = {
+    "AppName": "Exämple App",
+    "AppVerName": "Exämple App 2.1",
+    "AppId": "{{8A1C2C55-1111-2222-3333-444444444444}",
+    "AppVersion": "2.1.0",
+    "AppPublisher": "Contoso",
+    "DefaultDirName": "{autopf}\\Example",
+    "UninstallFilesDir": "{app}",
+}
+
+
+def same_json(plan) -> None:
+    from installer_intel.records import dumps
+
+    model = plan.to_model()
+    assert dumps(plan) == model.model_dump_json(), plan.input_path
+    assert dumps(plan, indent=2) == model.model_dump_json(indent=2), plan.input_path
+    assert dumps(plan, exclude=("diagnostics",)) == model.model_dump_json(exclude={"diagnostics"}), plan.input_path
+
+
+def build(ns, i: int):
+    """A plan the size of a typical EXE result, from records or from models."""
+    evidence = [ns.Evidence(kind="signature", detail=f"NSIS: 'Nullsoft Install System' at offset 0x{i:X}")] * 4
+    plan = ns.Plan if ns.__name__.endswith("records") else ns.InstallPlan
+    return plan(
+        input_path=f"/srv/installers/app{i}.exe",
+        file_type="exe",
+        installer_type="NSIS",
+        confidence=0.9,
+        evidence=evidence,
+        metadata={"FileName": f"app{i}.exe", "SizeBytes": 1048576 + i, "ProductName": "Example App"},
+        install_candidates=[
+            ns.CommandCandidate(command=f'"app{i}.exe" /S', confidence=0.85,
+                                evidence=[ns.Evidence(kind="signature", detail="NSIS commonly supports /S")]),
+        ],
+        uninstall_candidates=[
+            ns.CommandCandidate(command='"$INSTDIR\\uninstall.exe" /S', confidence=0.6,
+                                evidence=[ns.Evidence(kind="header", detail="UninstallString written by the script")]),
+        ],
+        detection_rules=[
+            ns.DetectionRule(kind="registry_key", value=f"HKLM\\{UNINSTALL_KEY}Example{i}", confidence=0.75,
+                             evidence=[ns.Evidence(kind="header", detail="Written by the NSIS script")]),
+        ],
+        notes=[f"Hit: NSIS (0.90) - {i}"],
+        coverage=ns.Coverage(depth="standard", tier="header", bytes_scanned=65536, file_bytes=1048576 + i),
+    )
+
+
+def cost(ns, write) -> tuple:
+    """Seconds per plan to build and write PLANS plans, and bytes to hold them."""
+    t0 = time.perf_counter()
+    for i in range(PLANS):
+        write(build(ns, i))
+    seconds = (time.perf_counter() - t0) / PLANS
+    tracemalloc.start()
+    kept = [build(ns, i) for i in range(PLANS)]
+    held = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del kept
+    return seconds, held
+
+
+def main() -> int:
+    from installer_intel import models, records
+    from installer_intel.cache import ResultCache
+    from installer_intel.records import Plan, dumps
+    from installer_intel.scan import analyze_path
+
+    with tempfile.TemporaryDirectory() as tmp:
+        def write(name: str, data: bytes) -> str:
+            path = os.path.join(tmp, name)
+            with open(path, "wb") as f:
+                f.write(data)
+            return path
+
+        # 1. Every EXE family and MSIs, compact and indented, with and without timings
+        paths = []
+        for k, family in enumerate(MARKERS):
+            paths.append(os.path.join(tmp, f"{family}.exe"))
+            write_exe(paths[-1], CaseSpec(family, "exe", size=512 * 1024, family=family, seed=k + 1))
+        for name, files in (("small.msi", 3), ("suite.msi", 40)):
+            paths.append(os.path.join(tmp, name))
+            write_msi(paths[-1], CaseSpec(name, "msi", msi_files=files, seed=7))
+        for path in paths:
+            same_json(analyze_path(path))
+            timed = analyze_path(path, timings=True)
+            assert timed.diagnostics is not None and timed.diagnostics.stages
+            same_json(timed)
+        print(f"1. {len(MARKERS)} EXE families and 2 MSIs, plain and with --timings: same JSON as the model.")
+
+        # 2. Decoded setup headers (non-ASCII values) and a zip with children
+        writes = [(HKLM, UNINSTALL_KEY + "Example", "DisplayName", "Exämple App"),
+                  (HKLM, UNINSTALL_KEY + "Example", "UninstallString", '"$INSTDIR\\uninstall.exe"')]
+        inno = analyze_path(write("inno6.exe", build_inno(APP)), timings=True)
+        nsis = analyze_path(write("nsis.exe", build_nsis(nsis_header(writes))), timings=True)
+        assert "SetupHeader" in inno.metadata and "SetupHeader" in nsis.metadata
+        with zipfile.ZipFile(os.path.join(tmp, "apps.zip"), "w", zipfile.ZIP_DEFLATED) as zf:
+            for path in (paths[-1], os.path.join(tmp, "inno6.exe"), os.path.join(tmp, "nsis.exe")):
+                zf.write(path, os.path.basename(path))
+        package = analyze_path(os.path.join(tmp, "apps.zip"), timings=True)
+        assert len(package.children) == 3 and all(c.embedded for c in package.children)
+        for plan in (inno, nsis, package):
+            same_json(plan)
+        print("2. Inno Setup and NSIS headers, and a zip with 3 child plans: same JSON as the model.")
+
+        # 3. Floats Pydantic writes its own way, and values JSON cannot hold
+        plan = build(records, 0)
+        for value in (1.5e-05, 9.99e-05, 1e-07, 2.5e-100, 5e-324, 0.1 + 0.2, 0.0):
+            plan.confidence = value
+            plan.detection_rules[0].confidence = value / 3
+            same_json(plan)
+        plan.metadata.update(Floats=[123456789.0, 1e16, 1.5e300, -0.0, -3e-05], NaN=math.nan, Inf=-math.inf,
+                             Text="ünïcode ☃ \"quoted\"\n\x00")
+        same_json(plan)
+        assert '"NaN":null' in dumps(plan)
+        print("3. Very small floats, non-finite values and non-ASCII strings: same JSON as the model.")
+
+        # 4. Cache round trip
+        with ResultCache(os.path.join(tmp, "cache")) as cache:
+            for path in paths[:3] + [os.path.join(tmp, "apps.zip")]:
+                first = analyze_path(path, cache=cache)
+                again = analyze_path(path, cache=cache)
+                assert isinstance(again, Plan) and again == first, path
+                assert dumps(again) == dumps(first)
+        print("4. Plans read back from the result cache equal the analyzed ones.")
+
+        # 5. The public entry points keep the model API
+        from installer_intel import analyzers
+
+        for public, path in ((analyzers.analyze_exe, paths[0]), (analyzers.analyze_msi, paths[-1]),
+                             (analyzers.analyze_package, os.path.join(tmp, "apps.zip"))):
+            model = public(path)
+            assert isinstance(model, models.InstallPlan), type(model)
+            assert model.model_dump_json() == dumps(analyze_path(path)), path
+        print("5. installer_intel.analyzers returns InstallPlan models with the same JSON.")
+
+    # 6. Per-plan cost: build and write, records against validated models
+    ours, ours_held = cost(records, dumps)
+    theirs, theirs_held = cost(models, lambda p: p.model_dump_json())
+    assert ours < theirs and ours_held < theirs_held, (ours, theirs, ours_held, theirs_held)
+    print(f"6. Build and write a plan: {ours * 1e6:.0f} us with records, {theirs * 1e6:.0f} us with models "
+          f"({theirs / ours:.1f}x); {PLANS} plans hold {ours_held / 1024:.0f} KB against "
+          f"{theirs_held / 1024:.0f} KB.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
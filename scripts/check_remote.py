@@ -0,0 +1,212 @@
+#!/usr/bin/env python
+"""
+Verify analysis of installers over HTTP against a local server that honours
+Range: plans match the local ones (installers inside a zip too), only the
+needed ranges are fetched, over pooled connections, and servers without
+Range support are refused.
+Run from project root: uv run python scripts/check_remote.py
+"""
+from __future__ import annotations
+
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import zipfile
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from benchmarks.msi_writer import build_msi  # noqa: E402
+from benchmarks.pe_writer import RT_VERSION, TEXT_FLAGS, build_pe, version_info  # noqa: E402
+
+PRODUCT = "{EEEEEEEE-1111-2222-3333-444444444444}"
+
+
+class RangeHandler(SimpleHTTPRequestHandler):
+    """Static files with single-range GET support and keep-alive."""
+
+    protocol_version = "HTTP/1.1"
+    ranges = True
+    served = 0  # body bytes sent, across all handlers
+    connections = 0
+
+    def setup(self) -> None:
+        super().setup()
+        type(self).connections += 1
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        path = self.translate_path(self.path)
+        if not os.path.isfile(path):
+            self.send_error(404)
+            return
+        size = os.path.getsize(path)
+        match = re.fullmatch(r"bytes=(\d+)-(\d*)", self.headers.get("Range", ""))
+        if match is None or not self.ranges:
+            start, end = 0, size - 1
+            self.send_response(200)
+        else:
+            start = int(match.group(1))
+            end = min(size - 1, int(match.group(2) or size - 1))
+            if start >= size:
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{size}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        self.send_header("Content-Length", str(end - start + 1))
+        self.end_headers()
+        with open(path, "rb") as f:
+            f.seek(start)
+            left = end - start + 1
+            while left:
+                data = f.read(min(left, 1024 ** 2))
+                self.wfile.write(data)
+                left -= len(data)
+                type(self).served += len(data)
+
+
+class NoRangeHandler(RangeHandler):
+    ranges = False
+
+
+def serve(directory: str, handler) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), partial(handler, directory=directory))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def comparable(plan_json: str) -> dict:
+    """A plan with the file's name and location, and timings, taken out."""
+    plan = json.loads(plan_json)
+    plan["diagnostics"] = None
+    for key in ("FileName", "SizeBytes", "BytesFetched"):
+        plan["metadata"].pop(key, None)
+    plan["notes"] = [n for n in plan["notes"] if not n.startswith("Read over HTTP")]
+    return json.loads(json.dumps(plan).replace(plan["input_path"], "<input>"))
+
+
+def main() -> int:
+    from installer_intel.analyzers.remote import RemoteError, RemoteFile, _pool
+    from installer_intel.cache import file_sha256
+    from installer_intel.scan import analyze_path
+    from installer_intel.records import dumps
+
+    rng = random.Random(3)
+    msi = build_msi({"ProductCode": PRODUCT, "ProductName": "Epsilon", "Manufacturer": "Acme",
+                     "ProductVersion": "4.5.6"}, extra_streams={"Data.cab": rng.randbytes(6 * 1024 ** 2)})
+    stub = [(".text", rng.randbytes(200_000) + b"\0.wixburn\0WixBundleManifest\0", TEXT_FLAGS)]
+    bundle = build_pe(stub, {(RT_VERSION, 1, 1033): version_info({"ProductName": "Epsilon Bundle"})},
+                      msi + rng.randbytes(40 * 1024 ** 2))
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, data in (("bundle.exe", bundle), ("epsilon.msi", msi), ("empty.exe", b"")):
+            with open(os.path.join(tmp, name), "wb") as f:
+                f.write(data)
+        with zipfile.ZipFile(os.path.join(tmp, "apps.zip"), "w") as zf:
+            zf.write(os.path.join(tmp, "bundle.exe"), "bundle.exe")
+            zf.write(os.path.join(tmp, "epsilon.msi"), "epsilon.msi", zipfile.ZIP_DEFLATED)
+        server = serve(tmp, RangeHandler)
+        base = f"http://127.0.0.1:{server.server_address[1]}"
+
+        # 1. A 46 MB bundle: same plan as from disk, a small fraction fetched
+        local = analyze_path(os.path.join(tmp, "bundle.exe"))
+        remote = analyze_path(f"{base}/bundle.exe", timings=True)
+        assert comparable(dumps(remote)) == comparable(dumps(local))
+        fetched = remote.metadata["BytesFetched"]
+        assert remote.metadata["SizeBytes"] == len(bundle) and fetched == RangeHandler.served
+        assert fetched < 0.05 * len(bundle), fetched
+        assert [c.metadata["ProductCode"] for c in remote.children] == [PRODUCT]
+        stages = {s.stage for s in remote.diagnostics.stages}
+        assert "fetch" in stages, stages
+        print(f"1. bundle.exe ({len(bundle) // 1024 ** 2} MB): plan matches the local one; "
+              f"fetched {fetched // 1024} KB.")
+
+        # 2. An MSI with a 6 MB cabinet: only the tables' sectors are fetched
+        RangeHandler.served = 0
+        local = analyze_path(os.path.join(tmp, "epsilon.msi"))
+        remote = analyze_path(f"{base}/epsilon.msi")
+        assert comparable(dumps(remote)) == comparable(dumps(local))
+        assert remote.metadata["BytesFetched"] == RangeHandler.served < 1024 ** 2, RangeHandler.served
+        print(f"2. epsilon.msi ({len(msi) // 1024 ** 2} MB): ProductCode read from "
+              f"{remote.metadata['BytesFetched'] // 1024} KB of ranges.")
+
+        # 3. Connections are pooled across files; the block cache serves rereads
+        opened = _pool.opened
+        for _ in range(3):
+            analyze_path(f"{base}/epsilon.msi?mirror=1")
+        assert _pool.opened == opened, (opened, _pool.opened)
+        with RemoteFile(f"{base}/bundle.exe") as f:
+            f.seek(1000)
+            first = f.read(100_000)
+            before = f.transfer.requests
+            f.seek(1000)
+            assert f.read(100_000) == first == bundle[1000:101_000] and f.transfer.requests == before
+            f.seek(len(bundle) - 10)
+            assert f.read(100) == bundle[-10:]
+        print(f"3. Repeat analyses reuse {_pool.opened} pooled connection(s); cached blocks are not refetched.")
+
+        # 4. Digests need every byte, and match the local file's
+        remote = analyze_path(f"{base}/bundle.exe", hashes=["sha256"])
+        assert remote.metadata["SHA256"] == file_sha256(os.path.join(tmp, "bundle.exe"))
+        assert len(bundle) <= remote.metadata["BytesFetched"] < len(bundle) * 1.05
+        print("4. --hash over HTTP reads the whole file once and matches the local digest.")
+
+        # 5. The command line, errors, and servers without Range support
+        out = subprocess.run(
+            [sys.executable, "-m", "installer_intel", "scan", f"{base}/bundle.exe", f"{base}/epsilon.msi",
+             f"{base}/missing.msi", f"{base}/empty.exe", "--jobs", "1", "--format", "json"],
+            capture_output=True, text=True,
+        )
+        lines = [json.loads(line) for line in out.stdout.splitlines()]
+        assert [x.get("installer_type") for x in lines[:2]] == ["WiX Burn / Bootstrapper", "MSI"], lines
+        assert "HTTP 404" in lines[2]["error"] and lines[3]["file_type"] == "exe", lines[2:]
+        assert json.loads(out.stderr.splitlines()[-1])["bytes"] == len(bundle) + len(msi)
+        plain = serve(tmp, NoRangeHandler)
+        try:
+            RemoteFile(f"http://127.0.0.1:{plain.server_address[1]}/epsilon.msi")
+            raise AssertionError("a server without Range support was accepted")
+        except RemoteError as e:
+            assert "does not support Range" in str(e)
+        out = subprocess.run(
+            [sys.executable, "-m", "installer_intel", "analyze",
+             f"http://127.0.0.1:{plain.server_address[1]}/bundle.exe", "--format", "json"],
+            capture_output=True, text=True,
+        )
+        assert out.returncode == 1 and "Range" in out.stderr, out.stderr
+        print("5. scan takes URLs (404 and empty files handled); servers without Range support are refused.")
+
+        # 6. Installers inside a zip: stored ones read in ranges, deflated ones inflated as fetched
+        RangeHandler.served = 0
+        local = analyze_path(os.path.join(tmp, "apps.zip"))
+        remote = analyze_path(f"{base}/apps.zip")
+        assert comparable(dumps(remote)) == comparable(dumps(local))
+        assert [c.file_type for c in remote.children] == ["exe", "msi"]
+        assert RangeHandler.served < 0.2 * os.path.getsize(os.path.join(tmp, "apps.zip")), RangeHandler.served
+        print(f"6. apps.zip: both installers analyzed from {RangeHandler.served // 1024} KB of ranges.")
+
+        # 7. A damaged MSI: the same fallback plan as a local one, not an error
+        for name, data in (("damaged.msi", rng.randbytes(64 * 1024)), ("truncated.msi", msi[:4096])):
+            with open(os.path.join(tmp, name), "wb") as f:
+                f.write(data)
+            local = analyze_path(os.path.join(tmp, name))
+            remote = analyze_path(f"{base}/{name}")
+            assert comparable(dumps(remote)) == comparable(dumps(local))
+            assert any(n.startswith("Could not read the MSI database") for n in remote.notes), remote.notes
+        print("7. Damaged and truncated MSIs over HTTP: the same 'Could not read' plan as from disk.")
+        plain.shutdown()
+        server.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
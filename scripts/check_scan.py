@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+"""
+Verify that a batch scan survives workers dying: when one input kills its
+worker process, only that input is reported as failed, every other file in
+flight at the time is analyzed again and reported normally, and each path
+is reported exactly once. Only the files that were running are retried
+alone; those still queued go to the new pool.
+Run from project root: uv run python scripts/check_scan.py
+"""
+from __future__ import annotations
+
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from benchmarks.corpus import CaseSpec, write_exe, write_msi  # noqa: E402
+
+
+def main() -> int:
+    # Workers must inherit the patched analyze_path below.
+    multiprocessing.set_start_method("fork", force=True)
+    from installer_intel import scan as scan_module
+    from installer_intel.scan import scan
+
+    analyze_path = scan_module.analyze_path
+
+    def dies_on_poison(path, **kwargs):
+        if "poison" in os.path.basename(path):
+            time.sleep(0.2)  # let the other files get in flight
+            os._exit(1)
+        time.sleep(0.05)
+        return analyze_path(path, **kwargs)
+
+    scan_alone = scan_module.scan_alone
+    isolated = []
+
+    def counted_scan_alone(path, *pool_args):
+        isolated.append(path)
+        return scan_alone(path, *pool_args)
+
+    scan_module.analyze_path = dies_on_poison
+    scan_module.scan_alone = counted_scan_alone
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = []
+        for i in range(16):
+            path = os.path.join(tmp, f"app{i}.msi" if i % 4 == 0 else f"app{i}.exe")
+            if path.endswith(".msi"):
+                write_msi(path, CaseSpec(f"m{i}", "msi", msi_files=3, seed=i))
+            else:
+                write_exe(path, CaseSpec(f"e{i}", "exe", size=128 * 1024, family="nsis", seed=i))
+            paths.append(path)
+
+        for poisons in ((5,), (2, 11)):
+            targets = list(paths)
+            for k in poisons:
+                bad = os.path.join(tmp, f"poison{k}.exe")
+                os.replace(targets[k], bad)
+                targets[k] = bad
+            isolated.clear()
+            t0 = time.perf_counter()
+            results = list(scan(targets, jobs=3))
+            seconds = time.perf_counter() - t0
+            assert sorted(r.path for r in results) == sorted(targets), "a path was lost or reported twice"
+            failed = sorted(r.path for r in results if not r.ok)
+            assert failed == sorted(targets[k] for k in poisons), [(r.path, r.error) for r in results if not r.ok]
+            assert all("terminated abruptly" in r.error for r in results if not r.ok)
+            # Only files running on one of the 3 workers are retried alone,
+            # not the up to 12 queued in the pool when it broke.
+            assert set(failed) <= set(isolated) and len(isolated) <= 3 * len(poisons), isolated
+            for k in poisons:
+                os.replace(targets[k], paths[k])
+            print(f"{len(poisons)}. {len(poisons)} input(s) killing their worker among {len(targets)} files: "
+                  f"only they failed, the rest analyzed once, {len(isolated)} retried alone ({seconds:.1f}s).")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
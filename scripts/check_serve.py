@@ -0,0 +1,226 @@
+#!/usr/bin/env python
+"""
+Exercise the analysis server (installer-intel serve) end to end: path and
+upload requests over TCP and a Unix socket, keep-alive, backpressure (503),
+timeouts (504), request errors and unexpected worker exceptions (500).
+Run from project root: uv run python scripts/check_serve.py
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import http.client
+import json
+import os
+import socket
+import sys
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from benchmarks.corpus import CaseSpec, write_exe, write_msi  # noqa: E402
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path: str) -> None:
+        super().__init__("localhost")
+        self._path = path
+
+    def connect(self) -> None:
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self._path)
+
+
+class Running:
+    """An AnalysisServer listening on a background event loop."""
+
+    def __init__(self, server, socket_path: Optional[str] = None) -> None:
+        self.server = server
+        self.loop = asyncio.new_event_loop()
+        threading.Thread(target=self.loop.run_forever, daemon=True).start()
+        self.listener = asyncio.run_coroutine_threadsafe(
+            server.start(port=0, socket_path=socket_path), self.loop,
+        ).result(60)
+        self.socket_path = socket_path
+        self.port = None if socket_path else self.listener.sockets[0].getsockname()[1]
+
+    def connect(self) -> http.client.HTTPConnection:
+        if self.socket_path:
+            return UnixHTTPConnection(self.socket_path)
+        return http.client.HTTPConnection("127.0.0.1", self.port, timeout=60)
+
+    def request(
+        self, method: str, url: str, body=None, headers: Optional[Dict[str, str]] = None, chunked: bool = False,
+    ) -> Tuple[int, dict]:
+        conn = self.connect()
+        try:
+            conn.request(method, url, body=body, headers=headers or {}, encode_chunked=chunked)
+            resp = conn.getresponse()
+            return resp.status, json.loads(resp.read() or b"null")
+        finally:
+            conn.close()
+
+    def stop(self) -> None:
+        async def shutdown() -> None:
+            self.listener.close()
+            self.server.close()
+            await self.listener.wait_closed()
+
+        asyncio.run_coroutine_threadsafe(shutdown(), self.loop).result(60)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+
+def raise_in_worker(exc: BaseException) -> None:
+    raise exc
+
+
+def check(cond: bool, label: str) -> bool:
+    print(f"{'ok  ' if cond else 'FAIL'} {label}")
+    return cond
+
+
+def main() -> int:
+    from installer_intel.scan import ScanTimeout
+    from installer_intel.server import AnalysisServer
+
+    class FailingServer(AnalysisServer):
+        """Its workers raise self.exc instead of analyzing."""
+
+        exc: BaseException = RuntimeError("worker bug")
+
+        async def _run(self, path, depth, hashes):
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._pool, raise_in_worker, self.exc)
+
+    ok = True
+    with tempfile.TemporaryDirectory() as tmp:
+        exe = os.path.join(tmp, "setup.exe")
+        big = os.path.join(tmp, "big.exe")
+        msi = os.path.join(tmp, "product.msi")
+        write_exe(exe, CaseSpec("setup", "exe", size=2 * 1024 ** 2, family="inno"))
+        write_exe(big, CaseSpec("big", "exe", size=64 * 1024 ** 2, family="nsis", text_ratio=0.2))
+        write_msi(msi, CaseSpec("product", "msi"))
+        other = os.path.join(tmp, "notes.txt")
+        open(other, "w").close()
+
+        srv = Running(AnalysisServer(jobs=2, max_pending=2, allowed_roots=[tmp]))
+        try:
+            status, body = srv.request("GET", "/health")
+            ok &= check(status == 200 and body["jobs"] == 2, "GET /health")
+
+            status, body = srv.request("POST", f"/analyze?path={exe}")
+            ok &= check(status == 200 and body["installer_type"] == "Inno Setup", "POST /analyze?path= (exe)")
+
+            status, body = srv.request("POST", f"/analyze?path={exe}&hash=md5")
+            with open(exe, "rb") as f:
+                md5 = hashlib.md5(f.read()).hexdigest()
+            ok &= check(status == 200 and body["metadata"].get("MD5") == md5, "&hash= records digests")
+            status, body = srv.request("POST", f"/analyze?path={exe}&hash=crc32")
+            ok &= check(status == 400, "unknown &hash= -> 400")
+
+            status, body = srv.request(
+                "POST", "/analyze", body=json.dumps({"path": msi}), headers={"Content-Type": "application/json"},
+            )
+            ok &= check(status == 200 and body["file_type"] == "msi", "POST /analyze with JSON body (msi)")
+
+            with open(msi, "rb") as f:
+                status, body = srv.request("POST", "/analyze?filename=upload.msi", body=f)
+            ok &= check(status == 200 and body["input_path"] == "upload.msi", "upload with Content-Length")
+
+            def chunked():
+                with open(exe, "rb") as f:
+                    while True:
+                        data = f.read(100_000)
+                        if not data:
+                            return
+                        yield data
+
+            status, body = srv.request(
+                "POST", "/analyze?filename=up.exe", body=chunked(),
+                headers={"Transfer-Encoding": "chunked"}, chunked=True,
+            )
+            ok &= check(status == 200 and body["installer_type"] == "Inno Setup", "chunked upload")
+            ok &= check(not os.listdir(srv.server._upload_dir), "uploads are deleted after analysis")
+
+            conn = srv.connect()
+            statuses = []
+            for _ in range(3):
+                conn.request("POST", f"/analyze?path={exe}")
+                resp = conn.getresponse()
+                resp.read()
+                statuses.append(resp.status)
+            conn.close()
+            ok &= check(statuses == [200, 200, 200], "three requests on one keep-alive connection")
+
+            errors = [
+                ("GET", "/analyze", 405),
+                ("GET", "/nope", 404),
+                ("POST", f"/analyze?path={os.path.join(tmp, 'missing.exe')}", 404),
+                ("POST", f"/analyze?path={other}", 415),
+                ("POST", "/analyze?path=relative.exe", 400),
+                ("POST", "/analyze?path=/etc/hosts.exe", 403),
+            ]
+            for method, url, want in errors:
+                status, body = srv.request(method, url)
+                ok &= check(status == want and "error" in body, f"{method} {url.split('?')[0]} -> {want}")
+
+            link = os.path.join(tmp, "link.exe")
+            os.symlink(exe, link)
+            status, body = srv.request("POST", f"/analyze?path={link}")
+            ok &= check(status == 200 and body["input_path"] == os.path.realpath(exe),
+                        "a symlink is analyzed as the file it was checked as")
+
+            with ThreadPoolExecutor(12) as ex:
+                results = list(ex.map(lambda _: srv.request("POST", f"/analyze?path={big}")[0], range(12)))
+            ok &= check(
+                set(results) <= {200, 503} and 503 in results and 200 in results,
+                f"backpressure with max_pending=2: {results.count(200)} served, {results.count(503)} rejected",
+            )
+            status, body = srv.request("GET", "/health")
+            ok &= check(body["pending"] == 0 and body["rejected"] == results.count(503), "health counters")
+        finally:
+            srv.stop()
+
+        sock = os.path.join(tmp, "ii.sock")
+        srv = Running(AnalysisServer(jobs=1, timeout=0.001, max_upload=1024 ** 2), socket_path=sock)
+        try:
+            ok &= check(oct(os.stat(sock).st_mode & 0o777) == "0o600", "Unix socket is private (0600)")
+            status, body = srv.request("POST", f"/analyze?path={big}")
+            ok &= check(status == 504, "per-request timeout -> 504 over the Unix socket")
+            # Rejected from the headers alone, before any of the body is sent.
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+                s.connect(sock)
+                s.sendall(b"POST /analyze?filename=big.exe HTTP/1.1\r\nHost: x\r\n"
+                          b"Content-Length: %d\r\nExpect: 100-continue\r\n\r\n" % os.path.getsize(big))
+                reply = s.recv(4096)
+            ok &= check(reply.startswith(b"HTTP/1.1 413 "), "upload over --max-upload -> 413")
+        finally:
+            srv.stop()
+        ok &= check(not os.path.exists(sock), "socket removed on shutdown")
+
+        srv = Running(FailingServer(jobs=1, timeout=30))
+        try:
+            conn = srv.connect()
+            replies = []
+            for exc in (RuntimeError("worker bug"), ScanTimeout()):
+                srv.server.exc = exc
+                conn.request("POST", f"/analyze?path={exe}")
+                resp = conn.getresponse()
+                replies.append((resp.status, json.loads(resp.read()).get("error")))
+            conn.close()
+            ok &= check(replies[0] == (500, "RuntimeError: worker bug"), "other worker exception -> 500")
+            ok &= check(replies[1] == (504, "Timed out after 30s"), "ScanTimeout from a worker -> 504")
+            status, body = srv.request("GET", "/health")
+            ok &= check(status == 200 and body["errors"] == 2, "the server keeps serving after them")
+        finally:
+            srv.stop()
+
+    print("All checks passed." if ok else "Some checks FAILED.")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
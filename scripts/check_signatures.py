@@ -0,0 +1,182 @@
+#!/usr/bin/env python
+"""
+Verify the signature database: extra files given with --signatures or
+$INSTALLER_INTEL_SIGNATURES add families and replace built-in ones by name,
+malformed entries are refused with a message naming the file and entry,
+patterns are literal (regex syntax in them is not interpreted), and a
+decisive signature ends the serial scan early only when nothing can
+outrank it.
+Run from project root: uv run python scripts/check_signatures.py
+"""
+from __future__ import annotations
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+sys.path.insert(0, ROOT)
+
+from benchmarks.corpus import CaseSpec, write_exe  # noqa: E402
+
+MB = 1024 ** 2
+
+# Replaces the built-in NSIS family and adds one that claims its strings.
+OVERRIDE = {
+    "signatures": [
+        {"name": "NSIS", "confidence": 0.9, "any": ["acme nsis fork"]},
+        {"name": "Acme Packager", "confidence": 0.6, "evidence": "Acme stub", "any": ["nullsoft install system"]},
+    ]
+}
+
+MALFORMED = [
+    ({"signatures": {"name": "A"}}, "expected an object with a 'signatures' list"),
+    ({"signatures": ["NSIS"]}, "signatures[0]: expected an object"),
+    ({"signatures": [{"confidence": 0.5, "any": ["x"]}]}, "signatures[0]: 'name' must be a non-empty string"),
+    ({"signatures": [{"name": "A", "any": ["x"]}]}, "'confidence' must be a number between 0 and 1"),
+    ({"signatures": [{"name": "A", "confidence": 1.5, "any": ["x"]}]}, "'confidence' must be a number between 0 and 1"),
+    ({"signatures": [{"name": "A", "confidence": 0.5, "any": "x"}]}, "'any' must be a list of non-empty strings"),
+    ({"signatures": [{"name": "A", "confidence": 0.5, "all": [""]}]}, "'all' must be a list of non-empty strings"),
+    ({"signatures": [{"name": "A", "confidence": 0.5}]}, "needs at least one pattern in 'any' or 'all'"),
+]
+
+
+def refusal(path: str) -> str:
+    from installer_intel.analyzers.signatures import load_signatures
+
+    try:
+        load_signatures([path])
+    except ValueError as e:
+        return str(e)
+    raise AssertionError(f"{path} was accepted")
+
+
+def cli(*args: str, env=None) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, "-m", "installer_intel", *args], cwd=ROOT, env=env, capture_output=True, text=True,
+    )
+
+
+def main() -> int:
+    from installer_intel.analyzers.exe import analyze_exe
+    from installer_intel.analyzers.signatures import (
+        SIGNATURES_ENV,
+        SignatureSet,
+        get_signatures,
+        load_signatures,
+    )
+
+    with tempfile.TemporaryDirectory() as tmp:
+        def write(name: str, doc) -> str:
+            path = os.path.join(tmp, name)
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(doc if isinstance(doc, str) else json.dumps(doc))
+            return path
+
+        exe = os.path.join(tmp, "nsis.exe")
+        write_exe(exe, CaseSpec("nsis", "exe", size=2 * MB, family="nsis"))
+        extra = write("acme.json", OVERRIDE)
+
+        # 1. Override by name, through the API, the environment and the CLI
+        builtin = load_signatures()
+        sigs = load_signatures([extra])
+        by_name = {s.name: s for s in sigs.signatures}
+        assert len(sigs.signatures) == len(builtin.signatures) + 1
+        assert by_name["NSIS"].any == ("acme nsis fork",) and sigs.version != builtin.version
+        assert analyze_exe(exe).installer_type == "NSIS"
+        plan = analyze_exe(exe, signatures=sigs)
+        assert (plan.installer_type, plan.confidence) == ("Acme Packager", 0.6), plan.installer_type
+        # Later files win: a second file restores the built-in definition.
+        restore = write("restore.json", {"signatures": [
+            {"name": "NSIS", "confidence": 0.9, "any": ["nsis", "nullsoft"]},
+        ]})
+        assert analyze_exe(exe, signatures=load_signatures([extra, restore])).installer_type == "NSIS"
+
+        os.environ[SIGNATURES_ENV] = extra
+        try:
+            assert get_signatures().version == sigs.version
+            assert get_signatures([restore]).version == load_signatures([extra, restore]).version
+        finally:
+            del os.environ[SIGNATURES_ENV]
+        assert get_signatures().version == builtin.version
+
+        env = {**os.environ, SIGNATURES_ENV: extra}
+        for args, kwargs in ((("--signatures", extra), {}), ((), {"env": env})):
+            res = cli("analyze", exe, "--format", "json", "--no-cache", *args, **kwargs)
+            assert res.returncode == 0, res.stderr
+            assert json.loads(res.stdout)["installer_type"] == "Acme Packager"
+        print(f"1. {os.path.basename(extra)} replaces NSIS by name and adds Acme Packager "
+              f"(API, ${SIGNATURES_ENV} and --signatures); a later file wins.")
+
+        # 2. Malformed files are refused with the file and entry named
+        for i, (doc, message) in enumerate(MALFORMED):
+            path = write(f"bad{i}.json", doc)
+            error = refusal(path)
+            assert error.startswith(path) and message in error, (error, message)
+        path = write("second.json", {"signatures": [OVERRIDE["signatures"][1], {"name": "B", "confidence": 0.5}]})
+        assert "signatures[1]: needs at least one pattern" in refusal(path)
+        broken = write("broken.json", '{"signatures": [')
+        assert refusal(broken).startswith(f"Cannot load signatures from {broken}: ")
+        missing = os.path.join(tmp, "missing.json")
+        assert refusal(missing).startswith(f"Cannot load signatures from {missing}: ")
+
+        res = cli("analyze", exe, "--format", "json", "--no-cache", "--signatures", path)
+        assert res.returncode == 2 and "signatures[1]" in res.stderr and not res.stdout, res
+        res = cli("scan", exe, "--no-cache", "--signatures", broken)
+        assert res.returncode == 2 and "Cannot load signatures" in res.stderr, res
+        print(f"2. {len(MALFORMED) + 3} malformed or unreadable files refused with file and entry named; "
+              f"analyze and scan exit with a usage error.")
+
+        # 3. Patterns are literal and case-insensitive: regex syntax is not interpreted
+        sigs = load_signatures([write("regex.json", {"signatures": [
+            {"name": "Literal", "confidence": 0.5, "any": ["setup(x64", "[a-z]+", "a.b"]},
+        ]})])
+        assert sigs.scan([(0, "aXb abc setupx64 setup(x", False)]) == {}
+        assert sigs.scan([(10, "Run SETUP(x64 or a.b", False)]) == {"setup(x64": 14, "a.b": 27}
+        print("3. Patterns with regex syntax load and match only literally.")
+
+        # 4. A decisive signature stops the serial scan, unless something could outrank it
+        consumed = []
+
+        def strings(n: int = 1000):
+            consumed.clear()
+            yield 0x400, "Inno Setup Setup Data (6.2.0)", False
+            for k in range(1, n):
+                consumed.append(k)
+                yield 0x400 + 64 * k, f"KERNEL32.dll GetProcAddress {k}", False
+            yield 0x400 + 64 * n, "Nullsoft Install System", True
+
+        found = builtin.scan(strings())
+        assert found == {"inno setup": 0x400} and len(consumed) <= 1, (found, len(consumed))
+        found = builtin.scan(strings(), stop_early=False)
+        assert "nullsoft" in found and len(consumed) == 999
+        rival = SignatureSet(
+            builtin.signatures + load_signatures([write("rival.json", {"signatures": [
+                {"name": "Inno Rival", "confidence": 0.95, "any": ["rival"]},
+            ]})]).signatures[-1:],
+            version="rival",
+        )
+        found = rival.scan(strings())
+        assert "nullsoft" in found and len(consumed) == 999
+
+        spec = CaseSpec("inno-early", "exe", size=32 * MB, family="inno", marker_offsets=(0.05,), text_ratio=0.4,
+                        seed=5)
+        path = os.path.join(tmp, spec.filename())
+        write_exe(path, spec)
+        budget = 4 * MB
+        standard = analyze_exe(path, max_memory=budget, workers=1)
+        deep = analyze_exe(path, max_memory=budget, depth="deep", workers=1)
+        assert standard.installer_type == deep.installer_type == "Inno Setup"
+        assert standard.coverage.bytes_scanned < 8 * MB < deep.coverage.bytes_scanned, (
+            standard.coverage, deep.coverage,
+        )
+        print(f"4. Early stop: a decisive hit ends the string stream; a higher-confidence rival or "
+              f"stop_early=False reads it all. Serial scan of {spec.size // MB} MB: "
+              f"{standard.coverage.bytes_scanned / MB:.1f} MB (deep: {deep.coverage.bytes_scanned / MB:.1f} MB).")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+"""
+Check that cold `installer-intel --version` stays within a startup budget
+and does not import the CLI stack (Typer, Click, Rich, Pydantic, analyzers).
+Run from project root: uv run python scripts/check_startup.py [--budget-ms 50]
+"""
+from __future__ import annotations
+
+import argparse
+import subprocess
+import sys
+import time
+from typing import List
+
+HEAVY = ("typer", "click", "rich", "pydantic", "installer_intel.cli", "installer_intel.analyzers")
+
+
+def best_of(cmd: List[str], runs: int) -> float:
+    best = float("inf")
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def imported_modules(cmd: List[str]) -> List[str]:
+    result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+    mods = []
+    for line in result.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            mods.append(line.rsplit("|", 1)[1].strip())
+    return mods
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--budget-ms", type=float, default=50.0,
+                    help="Allowed startup cost of --version over a bare interpreter (default 50 ms)")
+    ap.add_argument("--runs", type=int, default=7)
+    args = ap.parse_args()
+
+    version_cmd = [sys.executable, "-m", "installer_intel", "--version"]
+
+    heavy = [m for m in imported_modules([sys.executable, "-X", "importtime", *version_cmd[1:]])
+             if m.startswith(HEAVY)]
+    if heavy:
+        print(f"ERROR: --version imports {', '.join(sorted(set(heavy)))}")
+        return 1
+    print("1. --version imports none of: " + ", ".join(HEAVY))
+
+    bare = best_of([sys.executable, "-c", "pass"], args.runs)
+    version = best_of(version_cmd, args.runs)
+    overhead = (version - bare) * 1000
+    print(f"2. bare interpreter {bare * 1000:.1f} ms, --version {version * 1000:.1f} ms "
+          f"(+{overhead:.1f} ms, budget {args.budget_ms:.0f} ms)")
+    if overhead > args.budget_ms:
+        print("ERROR: --version startup is over budget")
+        return 1
+
+    full = best_of([sys.executable, "-m", "installer_intel", "--help"], args.runs)
+    print(f"3. for reference, --help (loads the CLI): {full * 1000:.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
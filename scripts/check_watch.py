@@ -0,0 +1,206 @@
+#!/usr/bin/env python
+"""
+Verify watch mode (installer-intel watch): files written slowly are analyzed
+once, after they stop changing; files renamed or copied into new
+subdirectories are picked up; a modified file is analyzed again; deleted and
+empty files are not; plans land beside the files; --existing skips files
+with an up-to-date plan; the poller finds the same files; idle costs next
+to no CPU; a file that kills its worker fails alone.
+Run from project root: uv run python scripts/check_watch.py
+"""
+from __future__ import annotations
+
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from typing import List
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from benchmarks.corpus import CaseSpec, write_exe, write_msi  # noqa: E402
+
+SETTLE = 0.5
+
+
+class Running:
+    """A Watcher on a background thread, recording results with the time they arrived."""
+
+    def __init__(self, root: str, **kwargs) -> None:
+        from installer_intel.watch import Watcher, write_beside
+
+        self.results: List[tuple] = []
+
+        def on_result(r) -> None:
+            if r.ok:
+                write_beside(r)
+            self.results.append((time.monotonic(), r))
+
+        self.watcher = Watcher(root, on_result, jobs=2, settle=SETTLE, **kwargs)
+        self.thread = threading.Thread(target=self.watcher.run, daemon=True)
+        self.thread.start()
+
+    def wait(self, n: int, limit: float = 30.0) -> None:
+        deadline = time.monotonic() + limit
+        while len(self.results) < n and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert len(self.results) >= n, (n, [r.path for _, r in self.results])
+
+    def quiet(self, seconds: float) -> None:
+        n = len(self.results)
+        time.sleep(seconds)
+        assert len(self.results) == n, [r.path for _, r in self.results[n:]]
+
+    def stop(self) -> None:
+        self.watcher.stop()
+        self.thread.join(30)
+        assert not self.thread.is_alive()
+
+
+def load(path: str) -> dict:
+    from installer_intel.watch import plan_path
+
+    with open(plan_path(path), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def main() -> int:
+    from installer_intel import scan as scan_module, watch as watch_module
+    from installer_intel.watch import plan_path
+
+    with tempfile.TemporaryDirectory() as tmp:
+        src = os.path.join(tmp, "src")
+        drop = os.path.join(tmp, "drop")
+        os.makedirs(src)
+        os.makedirs(drop)
+        exe = os.path.join(src, "setup.exe")
+        write_exe(exe, CaseSpec("inno", "exe", size=2 * 1024 ** 2, family="inno", seed=1))
+        msi = os.path.join(src, "product.msi")
+        write_msi(msi, CaseSpec("msi", "msi", msi_files=10, seed=2))
+        with open(exe, "rb") as f:
+            data = f.read()
+
+        run = Running(drop)
+        assert run.watcher.kind == "inotify", run.watcher.note
+
+        # 1. A slow copy is analyzed once, after it settles
+        target = os.path.join(drop, "slow.exe")
+        with open(target, "wb") as f:
+            for i in range(4):
+                f.write(data[i * len(data) // 4:(i + 1) * len(data) // 4])
+                f.flush()
+                time.sleep(SETTLE * 0.6)
+        written = time.monotonic()
+        run.wait(1)
+        run.quiet(SETTLE * 3)
+        at, result = run.results[0]
+        assert result.ok and result.path == target and at >= written, (result.error, at - written)
+        plan = load(target)
+        assert plan["installer_type"] == "Inno Setup" and plan["coverage"]["file_bytes"] == len(data), plan
+        print(f"1. Slow copy ({len(data) // 1024} KB in 4 writes): analyzed once, "
+              f"{at - written:.2f}s after the last write.")
+
+        # 2. Renamed in, copied into a new subdirectory, modified, deleted, empty, not an installer
+        shutil.copyfile(msi, os.path.join(drop, "product.msi.part"))
+        os.rename(os.path.join(drop, "product.msi.part"), os.path.join(drop, "product.msi"))
+        os.makedirs(os.path.join(drop, "vendor", "2.0"))
+        shutil.copyfile(exe, os.path.join(drop, "vendor", "2.0", "setup.exe"))
+        shutil.copyfile(exe, os.path.join(drop, "gone.exe"))
+        os.remove(os.path.join(drop, "gone.exe"))
+        open(os.path.join(drop, "empty.exe"), "wb").close()
+        shutil.copyfile(exe, os.path.join(drop, "readme.txt"))
+        run.wait(3)
+        run.quiet(SETTLE * 3)
+        paths = sorted(os.path.relpath(r.path, drop) for _, r in run.results[1:])
+        assert paths == ["product.msi", os.path.join("vendor", "2.0", "setup.exe")], paths
+        assert load(os.path.join(drop, "product.msi"))["installer_type"] == "MSI"
+        with open(target, "ab") as f:
+            f.write(b"\0" * 4096)
+        run.wait(4)
+        assert run.results[3][1].path == target and load(target)["coverage"]["file_bytes"] == len(data) + 4096
+        print("2. Renamed-in MSI, copy into a new subdirectory and a modified file analyzed; "
+              "deleted, empty and other files ignored.")
+
+        # 3. Idle: blocked in select(), no work
+        watcher = run.watcher
+        cpu = time.process_time()
+        time.sleep(2.0)
+        idle = time.process_time() - cpu
+        assert idle < 0.05, idle
+        assert not watcher._pending and not watcher._ready and not watcher._running
+        run.stop()
+        print(f"3. Idle for 2s: {idle * 1000:.1f} ms of CPU; no pending, queued or running files.")
+
+        # 4. --existing analyzes only files without an up-to-date plan
+        os.remove(plan_path(os.path.join(drop, "product.msi")))
+        run = Running(drop, existing=True)
+        run.wait(1)
+        run.quiet(SETTLE * 3)
+        run.stop()
+        assert [r.path for _, r in run.results] == [os.path.join(drop, "product.msi")]
+        print("4. --existing: only the file without an up-to-date plan analyzed.")
+
+        # 5. The poller finds the same changes
+        run = Running(drop, poll=True, poll_interval=0.3)
+        assert run.watcher.kind == "poll"
+        shutil.copyfile(msi, os.path.join(drop, "vendor", "polled.msi"))
+        with open(target, "ab") as f:
+            f.write(b"\0" * 4096)
+        run.wait(2)
+        run.quiet(SETTLE * 3)
+        run.stop()
+        assert sorted(r.path for _, r in run.results) == [os.path.join(drop, "slow.exe"),
+                                                           os.path.join(drop, "vendor", "polled.msi")]
+        print("5. Polling: new and modified files analyzed.")
+
+        # 6. A file that kills its worker fails alone; the files in flight with it are analyzed
+        multiprocessing.set_start_method("fork", force=True)  # workers inherit the patch
+        analyze_path = scan_module.analyze_path
+
+        def dies_on_poison(path, **kwargs):
+            if "poison" in os.path.basename(path):
+                time.sleep(0.2)
+                os._exit(1)
+            time.sleep(1.0)  # still running when the poisoned worker dies
+            return analyze_path(path, **kwargs)
+
+        scan_alone = watch_module.scan_alone
+        isolated: List[str] = []
+
+        def counted_scan_alone(path, *pool_args):
+            isolated.append(os.path.basename(path))
+            return scan_alone(path, *pool_args)
+
+        scan_module.analyze_path = dies_on_poison
+        watch_module.scan_alone = counted_scan_alone
+        try:
+            crash = os.path.join(tmp, "crash")
+            os.makedirs(crash)
+            run = Running(crash)
+            names = ["ok0.msi", "poison.exe", "ok1.msi", "ok2.msi"]  # in this order onto two workers
+            for name in names:
+                shutil.copyfile(exe if name.endswith(".exe") else msi, os.path.join(crash, name))
+            run.wait(len(names))
+            run.quiet(SETTLE * 2)
+            run.stop()
+        finally:
+            scan_module.analyze_path = analyze_path
+            watch_module.scan_alone = scan_alone
+        reported = sorted(os.path.basename(r.path) for _, r in run.results)
+        failed = [os.path.basename(r.path) for _, r in run.results if not r.ok]
+        assert reported == sorted(names) and failed == ["poison.exe"], (reported, failed)
+        assert run.watcher.failed == 1
+        # Only the files running on the two workers are retried alone; the
+        # ones queued behind them go to the new pool.
+        assert "poison.exe" in isolated and len(isolated) <= 2, isolated
+        print(f"6. A file killing its worker: only it failed; the files in flight with it analyzed once, "
+              f"{len(isolated)} of {len(names)} retried alone.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())